@@ -6,3 +6,8 @@ VERSION = '1.1.3'
 
 PREPROCESSED_DB_NAME = path.join('genomes',"genomes.db")
 GFF3_DB_DIR = path.join('genomes','gff3')
+PACKED_SEQ_DIR = path.join('genomes','packed')
+BLAST_CACHE_DIR = path.join('genomes','blast_cache')
+HOMOLOGY_PAIR_DIR = path.join('genomes','homology_pairs')
+BLAST_RUN_DIR = path.join('genomes','blast_runs')
+AI_CACHE_DIR = 'ai_cache'
@@ -0,0 +1,723 @@
+# cotton_toolkit/cli.py
+"""
+FCGT 命令行入口（pyproject 中注册为 fcgt），不依赖 Tk，可在无图形界面的集群节点上运行全部流水线。
+
+用法示例:
+    fcgt -c config.yml download --genome NBI_v1.1 --file-type gff3
+    fcgt -c config.yml --json blast --type blastn --target NBI_v1.1 --query q.fa -o hits.xlsx
+    fcgt -c config.yml extract-seq --assembly NBI_v1.1 --genes Gh_A01G0001,Gh_A01G0002 > cds.fa
+
+日志输出到 stderr；结果（序列、表格、JSON）输出到 stdout。
+使用 --json 时，进度与结果以 JSON Lines 输出到 stdout，每行一个事件:
+    {"event": "progress", "task": ..., "percent": 40, "message": ...}
+    {"event": "status", "task": ..., "key": ..., "message": ...}
+    {"event": "result", "task": ..., "status": "success" | "failed" | "cancelled", "result": ..., "elapsed": ...}
+
+退出码: 0 成功；1 任务失败；2 参数或配置错误；130 被中断（Ctrl+C / SIGTERM）。
+"""
+import builtins
+import json
+import logging
+import os
+import re
+import signal
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import click
+
+from cotton_toolkit import VERSION
+from cotton_toolkit.utils.startup_profiler import (
+    finish_startup_profiler,
+    start_startup_profiler,
+    startup_phase,
+    startup_profiling_requested,
+)
+
+
+def _(text: str) -> str:
+    # 翻译函数在加载配置后才安装到 builtins，因此每次调用时再查找
+    translator = getattr(builtins, '_', None)
+    return translator(text) if translator is not None and translator is not _ else text
+
+
+logger = logging.getLogger("cotton_toolkit.cli")
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+_SPLIT_PATTERN = re.compile(r'[\s,;]+')
+
+
+class CliState:
+    """在各子命令间共享的全局选项与延迟加载的配置。"""
+
+    def __init__(self, config_path: str, json_output: bool, log_level: str, language: Optional[str]):
+        self.config_path = config_path
+        self.json_output = json_output
+        self.log_level = log_level
+        self.language = language
+        self._config = None
+
+    @property
+    def config(self):
+        if self._config is None:
+            self._config = _load_config(self)
+        return self._config
+
+    def emit(self, event: Dict[str, Any]) -> None:
+        """--json 模式下向 stdout 写出一个事件。"""
+        if self.json_output:
+            sys.stdout.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+            sys.stdout.flush()
+
+
+def _load_config(state: CliState):
+    from cotton_toolkit.config.compatibility_check import check_config_compatibility
+    from cotton_toolkit.config.loader import load_config
+    from cotton_toolkit.utils.localization import setup_localization
+
+    if not os.path.exists(state.config_path):
+        raise click.UsageError(_("配置文件未找到: {}").format(os.path.abspath(state.config_path)))
+    try:
+        with startup_phase(_("加载配置")):
+            config = load_config(state.config_path)
+    except Exception as e:
+        raise click.UsageError(_("加载配置文件失败: {}").format(e))
+
+    # 与GUI一致：先确定语言并安装翻译函数，之后再导入流水线模块
+    language = state.language or getattr(config, 'i18n_language', 'en')
+    builtins._ = setup_localization(language)
+
+    level, message = check_config_compatibility(config, language)
+    if level == 'error':
+        raise click.UsageError(message)
+    if level == 'warning':
+        logger.warning(message)
+    return config
+
+
+def _setup_logging(log_level: str) -> None:
+    """初始化全局日志，并将控制台输出改到 stderr，使 stdout 只承载结果。"""
+    from cotton_toolkit.utils.logger import setup_global_logger
+
+    setup_global_logger(log_level_str=log_level, console_stream=sys.stderr)
+
+
+def _split_values(values: Optional[str]) -> List[str]:
+    return [v for v in _SPLIT_PATTERN.split(values.strip())] if values and values.strip() else []
+
+
+def _read_gene_ids(genes: Optional[str], genes_file: Optional[str]) -> List[str]:
+    """合并 --genes（逗号/空白分隔）与 --genes-file（每行一个或以逗号/空白分隔）中的基因ID，保持顺序去重。"""
+    gene_ids = _split_values(genes)
+    if genes_file:
+        with open(genes_file, 'r', encoding='utf-8-sig') as f:
+            for line in f:
+                gene_ids.extend(_split_values(line))
+    return list(dict.fromkeys(gene_ids))
+
+
+def _parse_region(region: str) -> Tuple[str, int, int]:
+    from cotton_toolkit.utils.gene_utils import parse_region_string
+
+    parsed = parse_region_string(region)
+    if not parsed:
+        raise click.BadParameter(_("无法解析区域 '{}'，正确格式为 Chr01:1000-2000。").format(region))
+    return parsed
+
+
+def _parse_stranded_region(region: str) -> Tuple[str, int, int, str]:
+    """区域格式: Chr01:1000-2000，可在末尾用 :- 指定负链（与GUI序列提取一致）。"""
+    strand = '+'
+    if region.endswith((':-', ':+')):
+        region, strand = region[:-2], region[-1]
+    return (*_parse_region(region), strand)
+
+
+def _serialize_result(result: Any) -> Any:
+    """将流水线返回值转为可写入JSON的对象。"""
+    import pandas as pd
+
+    if isinstance(result, pd.DataFrame):
+        return {'rows': len(result), 'columns': list(result.columns),
+                'records': json.loads(result.to_json(orient='records', force_ascii=False))}
+    if isinstance(result, (dict, list, str, int, float, bool)) or result is None:
+        return result
+    return str(result)
+
+
+def _print_result(result: Any) -> None:
+    """文本模式下将结果写到 stdout：表格为CSV，序列为FASTA，其余为文字。"""
+    import pandas as pd
+    from cotton_toolkit.utils.sequence_io import format_fasta_record
+
+    if isinstance(result, pd.DataFrame):
+        result.to_csv(sys.stdout, index=False)
+    elif isinstance(result, dict) and result and all(isinstance(v, str) for v in result.values()):
+        for seq_id, sequence in result.items():
+            sys.stdout.write(format_fasta_record(seq_id, sequence))
+    elif isinstance(result, dict):
+        click.echo(json.dumps(result, ensure_ascii=False, indent=2, default=str))
+    elif isinstance(result, str):
+        click.echo(result)
+
+
+def _run_task(state: CliState, task_name: str, func: Callable, none_is_failure: bool = False,
+              result_printer: Optional[Callable[[Any], None]] = _print_result, **kwargs) -> None:
+    """
+    在当前进程中运行一个 @pipeline_task 函数并以退出码结束进程。
+    Ctrl+C / SIGTERM 会设置取消事件让任务尽快停止；再按一次 Ctrl+C 立即退出。
+    返回 False（或 none_is_failure 时返回 None）视为失败。
+    """
+    cancel_event = threading.Event()
+    last_progress = {'percent': None, 'message': None}
+
+    def progress_callback(percent: int, message: str) -> None:
+        if (percent, message) == (last_progress['percent'], last_progress['message']):
+            return
+        last_progress.update(percent=percent, message=message)
+        if state.json_output:
+            state.emit({'event': 'progress', 'task': task_name, 'percent': percent, 'message': message})
+        else:
+            click.echo("[{:>3}%] {}".format(int(percent), message), err=True)
+
+    def status_callback(key: str, message: str) -> None:
+        if state.json_output:
+            state.emit({'event': 'status', 'task': task_name, 'key': key, 'message': message})
+        else:
+            click.echo("[{}] {}".format(key, message), err=True)
+
+    def on_signal(signum, frame):
+        if cancel_event.is_set():
+            raise KeyboardInterrupt
+        logger.warning(_("收到中断信号，正在取消任务（再次按 Ctrl+C 立即退出）..."))
+        cancel_event.set()
+
+    previous_handlers = {sig: signal.signal(sig, on_signal) for sig in (signal.SIGINT, signal.SIGTERM)}
+    if 'status_callback' in kwargs and kwargs['status_callback'] is None:
+        kwargs['status_callback'] = status_callback
+
+    config = state.config
+    finish_startup_profiler()
+    started = time.monotonic()
+    result, error = None, None
+    try:
+        result = func(config=config, cancel_event=cancel_event, progress_callback=progress_callback, **kwargs)
+    except KeyboardInterrupt:
+        cancel_event.set()
+    except Exception as e:
+        error = e
+    finally:
+        for sig, handler in previous_handlers.items():
+            signal.signal(sig, handler)
+    elapsed = time.monotonic() - started
+
+    if cancel_event.is_set():
+        status, exit_code = 'cancelled', EXIT_INTERRUPTED
+    elif error is not None or result is False or (none_is_failure and result is None):
+        status, exit_code = 'failed', EXIT_FAILED
+    else:
+        status, exit_code = 'success', EXIT_OK
+
+    if state.json_output:
+        event = {'event': 'result', 'task': task_name, 'status': status, 'elapsed': round(elapsed, 3),
+                 'result': _serialize_result(result)}
+        if error is not None:
+            event['error'] = str(error)
+        state.emit(event)
+    else:
+        if status == 'success' and result_printer:
+            result_printer(result)
+        if error is not None:
+            click.echo(_("错误: {}").format(error), err=True)
+        elif status == 'failed':
+            click.echo(_("任务 '{}' 未成功完成，详情见日志。").format(task_name), err=True)
+    sys.exit(exit_code)
+
+
+class _PipelineLoader:
+    """访问 run_* 函数时才导入对应的流水线模块，并计入启动分析。"""
+
+    def __getattr__(self, name: str):
+        from cotton_toolkit import pipelines
+
+        with startup_phase(_("导入流水线 {}").format(name)):
+            return getattr(pipelines, name)
+
+
+def _pipelines(state: CliState) -> _PipelineLoader:
+    """先加载配置（同时安装翻译函数），再延迟导入流水线模块。"""
+    state.config
+    return _PipelineLoader()
+
+
+def _require_feature(state: CliState, feature: str, skip: Tuple[str, ...] = ()) -> None:
+    """
+    检查功能所需的外部依赖（结果带缓存，检测与加载配置并行进行）。
+    必需依赖缺失时以退出码 1 结束；可降级的功能只给出警告。
+    """
+    from cotton_toolkit.utils.dependency_probe import FEATURES, format_missing_dependencies, get_dependency_probe
+
+    probe = get_dependency_probe()
+    state.config
+    missing = [name for name in probe.missing_for(feature) if name not in skip]
+    if not missing:
+        return
+    message = format_missing_dependencies(feature, missing)
+    if FEATURES[feature].fallback:
+        logger.warning(message)
+    else:
+        raise click.ClickException(message)
+
+
+def _require_gene_ids(genes: Optional[str], genes_file: Optional[str]) -> List[str]:
+    gene_ids = _read_gene_ids(genes, genes_file)
+    if not gene_ids:
+        raise click.UsageError(_("请通过 --genes 或 --genes-file 提供至少一个基因ID。"))
+    return gene_ids
+
+
+genes_options = [
+    click.option('--genes', help=_("基因ID，以逗号或空白分隔。")),
+    click.option('--genes-file', type=click.Path(exists=True, dir_okay=False),
+                 help=_("基因ID列表文件，每行一个或以逗号/空白分隔。")),
+]
+
+
+def with_gene_options(func):
+    for option in reversed(genes_options):
+        func = option(func)
+    return func
+
+
+@click.group(context_settings={'help_option_names': ['-h', '--help']})
+@click.option('-c', '--config', 'config_path', default='config.yml', show_default=True, envvar='FCGT_CONFIG',
+              type=click.Path(dir_okay=False), help=_("主配置文件路径（也可通过环境变量 FCGT_CONFIG 指定）。"))
+@click.option('--json', 'json_output', is_flag=True, help=_("以 JSON Lines 输出进度与结果。"))
+@click.option('--log-level', default='INFO', show_default=True,
+              type=click.Choice(['DEBUG', 'INFO', 'WARNING', 'ERROR'], case_sensitive=False))
+@click.option('--lang', 'language', default=None, help=_("界面语言代码，默认使用配置文件中的 i18n_language。"))
+@click.option('--profile-startup', is_flag=True, envvar='FCGT_PROFILE_STARTUP',
+              help=_("在任务开始前输出启动各阶段与模块导入的耗时。"))
+@click.version_option(VERSION, prog_name='fcgt')
+@click.pass_context
+def cli(ctx: click.Context, config_path: str, json_output: bool, log_level: str, language: Optional[str],
+        profile_startup: bool):
+    """Friendly Cotton Genomes Toolkit 命令行工具。"""
+    if profile_startup or startup_profiling_requested():
+        start_startup_profiler()
+        ctx.call_on_close(finish_startup_profiler)
+    _setup_logging(log_level)
+    ctx.obj = CliState(config_path, json_output, log_level, language)
+
+
+# --- 数据下载与预处理 ---
+
+@cli.command()
+@click.option('--genome', 'genomes', multiple=True, help=_("基因组版本ID，可重复；默认全部。"))
+@click.option('--file-type', 'file_types', multiple=True,
+              help=_("文件类型（如 gff3、GO、IPR、predicted_cds），可重复；默认全部。"))
+@click.option('--force/--no-force', default=None, help=_("覆盖已存在的文件。"))
+@click.option('--proxy/--no-proxy', default=None, help=_("是否使用配置中的代理下载。"))
+@click.pass_obj
+def download(state: CliState, genomes, file_types, force, proxy):
+    """下载基因组数据文件。"""
+    overrides = {'versions': list(genomes) or None, 'file_types': list(file_types) or None}
+    if force is not None:
+        overrides['force'] = force
+    if proxy is not None:
+        overrides['use_proxy_for_download'] = proxy
+    _run_task(state, 'download', _pipelines(state).run_download_pipeline, none_is_failure=True,
+              cli_overrides=overrides)
+
+
+@cli.command()
+@click.option('--genome', 'assembly_id', help=_("只处理指定的基因组版本；默认全部。"))
+@click.option('--gene-models/--no-gene-models', default=True, show_default=True,
+              help=_("是否构建基因模型数据库。"))
+@click.option('--packed-sequences/--no-packed-sequences', default=True, show_default=True,
+              help=_("是否构建打包序列文件。"))
+@click.pass_obj
+def preprocess(state: CliState, assembly_id, gene_models, packed_sequences):
+    """预处理注释文件（转换为数据库、构建基因模型与序列索引）。"""
+    _run_task(state, 'preprocess', _pipelines(state).run_preprocess_annotation_files, selected_assembly_id=assembly_id,
+              status_callback=None, build_gene_models=gene_models, build_packed_sequences=packed_sequences)
+
+
+@cli.command('build-blast-db')
+@click.option('--genome', 'assembly_id', help=_("只处理指定的基因组版本；默认全部。"))
+@click.pass_obj
+def build_blast_db(state: CliState, assembly_id):
+    """为已下载的序列文件构建BLAST数据库。"""
+    _require_feature(state, 'build_blast_db')
+    _run_task(state, 'build-blast-db', _pipelines(state).run_build_blast_db_pipeline, selected_assembly_id=assembly_id,
+              status_callback=None)
+
+
+# --- BLAST 与同源 ---
+
+@cli.command()
+@click.option('--type', 'blast_type', required=True,
+              type=click.Choice(['blastn', 'blastp', 'blastx', 'tblastn']))
+@click.option('--target', 'target_assembly_id', required=True, help=_("目标基因组版本ID。"))
+@click.option('--query', 'query_file', type=click.Path(exists=True, dir_okay=False),
+              help=_("查询序列文件（FASTA/FASTQ，可为 .gz）。"))
+@click.option('--query-text', help=_("直接给出的查询序列文本。"))
+@click.option('-o', '--output', 'output_path', type=click.Path(dir_okay=False),
+              help=_("输出文件；不指定时以CSV写到 stdout。"))
+@click.option('--evalue', default=1e-5, show_default=True, type=float)
+@click.option('--word-size', default=11, show_default=True, type=int)
+@click.option('--max-target-seqs', default=50, show_default=True, type=int)
+@click.option('--format', 'blast_output_format', default='xml', show_default=True,
+              type=click.Choice(['xml', 'tabular']), help=_("BLAST 原始输出格式。"))
+@click.option('--alignments', is_flag=True, help=_("表格输出中包含比对序列。"))
+@click.option('--min-length', 'min_query_length', type=int)
+@click.option('--max-length', 'max_query_length', type=int)
+@click.option('--subsample', 'subsample_fraction', type=click.FloatRange(0, 1, min_open=True))
+@click.option('--seed', 'subsample_seed', default=0, show_default=True, type=int)
+@click.option('--threads', 'max_threads', type=click.IntRange(min=1), help=_("最多使用的线程数。"))
+@click.pass_obj
+def blast(state: CliState, query_file, query_text, **options):
+    """运行本地BLAST比对。"""
+    if not query_file and not query_text:
+        raise click.UsageError(_("请通过 --query 或 --query-text 提供查询序列。"))
+    # 只需要本次使用的那一个 BLAST 程序
+    _require_feature(state, 'blast', skip=tuple({'blastn', 'blastp', 'blastx', 'tblastn'} - {options['blast_type']}))
+    _run_task(state, 'blast', _pipelines(state).run_blast_pipeline, none_is_failure=True, query_file_path=query_file,
+              query_text=query_text, **options)
+
+
+def _criteria_overrides(top_n, evalue, pid, score, strict_subgenome, rbh) -> Dict[str, Any]:
+    criteria = {'top_n': top_n, 'evalue_threshold': evalue, 'pid_threshold': pid, 'score_threshold': score,
+                'strict_subgenome_priority': strict_subgenome, 'reciprocal_best_hit': rbh}
+    return {key: value for key, value in criteria.items() if value is not None}
+
+
+criteria_options = [
+    click.option('--top-n', type=int, help=_("每个基因保留的同源基因数。")),
+    click.option('--evalue', type=float, help=_("E-value 阈值。")),
+    click.option('--pid', type=float, help=_("一致性百分比阈值。")),
+    click.option('--score', type=float, help=_("比对得分阈值。")),
+    click.option('--strict-subgenome/--no-strict-subgenome', default=None, help=_("严格优先同一亚组。")),
+    click.option('--rbh/--no-rbh', default=None, help=_("只保留互为最佳匹配的结果。")),
+]
+
+
+def with_criteria_options(func):
+    for option in reversed(criteria_options):
+        func = option(func)
+    return func
+
+
+@cli.command()
+@click.option('--source', 'source_assembly_id', required=True, help=_("源基因组版本ID。"))
+@click.option('--target', 'target_assembly_id', required=True, help=_("目标基因组版本ID。"))
+@with_gene_options
+@click.option('--region', help=_("按区域选取源基因，格式 Chr01:1000-2000。"))
+@click.option('-o', '--output', 'output_path', type=click.Path(dir_okay=False),
+              help=_("输出CSV；不指定时写到 stdout。"))
+@with_criteria_options
+@click.pass_obj
+def homology(state: CliState, source_assembly_id, target_assembly_id, genes, genes_file, region, output_path,
+             top_n, evalue, pid, score, strict_subgenome, rbh):
+    """在两个基因组之间查找同源基因。"""
+    gene_ids = _read_gene_ids(genes, genes_file) or None
+    if not gene_ids and not region:
+        raise click.UsageError(_("请提供 --genes/--genes-file 或 --region。"))
+    _require_feature(state, 'homology')
+    _run_task(state, 'homology', _pipelines(state).run_homology_mapping, none_is_failure=True,
+              source_assembly_id=source_assembly_id, target_assembly_id=target_assembly_id, gene_ids=gene_ids,
+              region=_parse_region(region) if region else None, output_csv_path=output_path,
+              criteria_overrides=_criteria_overrides(top_n, evalue, pid, score, strict_subgenome, rbh))
+
+
+@cli.command('precompute-homology')
+@click.option('--source', 'source_assembly_id', required=True, help=_("源基因组版本ID。"))
+@click.option('--target', 'target_assembly_id', required=True, help=_("目标基因组版本ID。"))
+@click.option('--evalue', default=1e-10, show_default=True, type=float)
+@click.option('--max-target-seqs', default=5, show_default=True, type=int)
+@click.option('--chunk-size', default=500, show_default=True, type=int)
+@click.option('--force', is_flag=True, help=_("即使已是最新也重新计算。"))
+@click.pass_obj
+def precompute_homology(state: CliState, **options):
+    """预先计算两个基因组之间的全基因组同源表。"""
+    _require_feature(state, 'precompute_homology')
+    _run_task(state, 'precompute-homology', _pipelines(state).run_precompute_homology, none_is_failure=True, **options)
+
+
+@cli.command('locus-convert')
+@click.option('--source', 'source_assembly_id', required=True, help=_("源基因组版本ID。"))
+@click.option('--target', 'target_assembly_id', required=True, help=_("目标基因组版本ID。"))
+@click.option('--region', required=True, help=_("源基因组区域，格式 Chr01:1000-2000。"))
+@click.option('-o', '--output', 'output_path', required=True, type=click.Path(dir_okay=False))
+@with_criteria_options
+@click.pass_obj
+def locus_convert(state: CliState, source_assembly_id, target_assembly_id, region, output_path,
+                  top_n, evalue, pid, score, strict_subgenome, rbh):
+    """将一个基因组区域转换为另一个基因组中的对应位点。"""
+    _require_feature(state, 'locus_conversion')
+    _run_task(state, 'locus-convert', _pipelines(state).run_locus_conversion, none_is_failure=True,
+              source_assembly_id=source_assembly_id, target_assembly_id=target_assembly_id,
+              region=_parse_region(region), output_path=output_path,
+              criteria_overrides=_criteria_overrides(top_n, evalue, pid, score, strict_subgenome, rbh))
+
+
+# --- 查询与提取 ---
+
+@cli.command('gff-lookup')
+@click.option('--assembly', 'assembly_id', required=True, help=_("基因组版本ID。"))
+@with_gene_options
+@click.option('--region', help=_("按区域查询，格式 Chr01:1000-2000。"))
+@click.option('-o', '--output', 'output_csv_path', required=True, type=click.Path(dir_okay=False))
+@click.option('--structure', 'include_structure', is_flag=True, help=_("同时输出外显子/CDS等结构特征。"))
+@click.pass_obj
+def gff_lookup(state: CliState, assembly_id, genes, genes_file, region, output_csv_path, include_structure):
+    """按基因ID或区域查询GFF注释。"""
+    gene_ids = _read_gene_ids(genes, genes_file) or None
+    if not gene_ids and not region:
+        raise click.UsageError(_("请提供 --genes/--genes-file 或 --region。"))
+    _run_task(state, 'gff-lookup', _pipelines(state).run_gff_lookup, assembly_id=assembly_id, gene_ids=gene_ids,
+              region=_parse_region(region) if region else None, output_csv_path=output_csv_path,
+              include_structure=include_structure)
+
+
+@cli.command('extract-seq')
+@click.option('--assembly', 'assembly_id', required=True, help=_("基因组版本ID。"))
+@with_gene_options
+@click.option('--type', 'sequence_type', default='cds', show_default=True, type=click.Choice(['cds', 'protein']))
+@click.option('-o', '--output', 'output_path', type=click.Path(dir_okay=False),
+              help=_("输出文件（.fa/.csv，可加 .gz）；不指定时以FASTA写到 stdout。"))
+@click.option('--line-width', default=60, show_default=True, type=int)
+@click.pass_obj
+def extract_seq(state: CliState, assembly_id, genes, genes_file, sequence_type, output_path, line_width):
+    """提取基因的CDS或蛋白质序列。"""
+    _run_task(state, 'extract-seq', _pipelines(state).run_sequence_extraction, none_is_failure=True,
+              assembly_id=assembly_id, gene_ids=_require_gene_ids(genes, genes_file), sequence_type=sequence_type,
+              output_path=output_path, line_width=line_width)
+
+
+@cli.command('extract-region')
+@click.option('--assembly', 'assembly_id', required=True, help=_("基因组版本ID。"))
+@click.option('--region', 'regions', multiple=True,
+              help=_("基因组区域 Chr01:1000-2000，末尾加 :- 表示负链；可重复。"))
+@with_gene_options
+@click.option('--upstream', 'upstream_length', default=2000, show_default=True, type=click.IntRange(min=1),
+              help=_("按基因提取启动子时的上游长度。"))
+@click.option('-o', '--output', 'output_path', type=click.Path(dir_okay=False),
+              help=_("输出文件（.fa/.csv，可加 .gz）；不指定时以FASTA写到 stdout。"))
+@click.option('--line-width', default=60, show_default=True, type=int)
+@click.pass_obj
+def extract_region(state: CliState, assembly_id, regions, genes, genes_file, upstream_length, output_path,
+                   line_width):
+    """提取基因组区域序列，或基因上游的启动子序列。"""
+    gene_ids = _read_gene_ids(genes, genes_file) or None
+    if not regions and not gene_ids:
+        raise click.UsageError(_("请提供 --region 或 --genes/--genes-file。"))
+    _run_task(state, 'extract-region', _pipelines(state).run_region_sequence_extraction, none_is_failure=True,
+              assembly_id=assembly_id, regions=[_parse_stranded_region(r) for r in regions] or None,
+              gene_ids=gene_ids, upstream_length=upstream_length, output_path=output_path, line_width=line_width)
+
+
+# --- 功能注释与富集 ---
+
+@cli.command()
+@click.option('--assembly', 'assembly_id', required=True, help=_("基因组版本ID。"))
+@with_gene_options
+@click.option('--type', 'annotation_types', multiple=True, required=True,
+              type=click.Choice(['go', 'ipr', 'kegg_orthologs', 'kegg_pathways']), help=_("注释类型，可重复。"))
+@click.option('-o', '--output', 'output_path', required=True, type=click.Path(dir_okay=False))
+@click.option('--db-dir', 'custom_db_dir', type=click.Path(file_okay=False), help=_("自定义注释数据库目录。"))
+@click.pass_obj
+def annotate(state: CliState, assembly_id, genes, genes_file, annotation_types, output_path, custom_db_dir):
+    """为基因列表添加GO/InterPro/KEGG功能注释。"""
+    _run_task(state, 'annotate', _pipelines(state).run_functional_annotation, none_is_failure=True,
+              assembly_id=assembly_id, gene_ids=_require_gene_ids(genes, genes_file),
+              annotation_types=list(annotation_types), output_path=output_path, custom_db_dir=custom_db_dir)
+
+
+def _read_enrichment_input(path: str, with_log2fc: bool, has_header: bool) -> Tuple[List[str], Optional[Dict[str, float]]]:
+    """读取富集分析输入：每行一个基因ID，或“基因ID log2FC”两列（与GUI中的文本格式一致）。"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        lines = [line for line in f.read().splitlines() if line.strip()]
+    if has_header:
+        lines = lines[1:]
+    gene_ids: List[str] = []
+    log2fc_map: Optional[Dict[str, float]] = {} if with_log2fc else None
+    for number, line in enumerate(lines, start=2 if has_header else 1):
+        parts = _split_values(line)
+        if with_log2fc:
+            if len(parts) < 2:
+                raise click.BadParameter(_("第 {} 行格式错误").format(number), param_hint='--genes-file')
+            try:
+                log2fc_map[parts[0]] = float(parts[1])
+            except ValueError:
+                raise click.BadParameter(_("第 {} 行格式错误").format(number), param_hint='--genes-file')
+            gene_ids.append(parts[0])
+        else:
+            gene_ids.extend(parts)
+    return sorted(set(gene_ids)), log2fc_map
+
+
+@cli.command()
+@click.option('--assembly', 'assembly_id', required=True, help=_("基因组版本ID。"))
+@click.option('--genes-file', required=True, type=click.Path(exists=True, dir_okay=False),
+              help=_("研究基因列表文件。"))
+@click.option('--log2fc', 'with_log2fc', is_flag=True, help=_("输入文件第二列为 log2FC。"))
+@click.option('--header', 'has_header', is_flag=True, help=_("输入文件第一行为表头。"))
+@click.option('--type', 'analysis_type', default='go', show_default=True, type=click.Choice(['go', 'kegg']))
+@click.option('--plot', 'plot_types', multiple=True, default=['bubble', 'bar'], show_default=True,
+              type=click.Choice(['bubble', 'bar', 'upset', 'cnet']), help=_("图表类型，可重复。"))
+@click.option('-o', '--output-dir', 'output_dir', required=True, type=click.Path(file_okay=False))
+@click.option('--collapse-transcripts', is_flag=True, help=_("将转录本合并为基因。"))
+@click.option('--top-n', default=20, show_default=True, type=int)
+@click.option('--sort-by', default='FDR', show_default=True, type=click.Choice(['FDR', 'PValue']))
+@click.option('--title/--no-title', 'show_title', default=True, show_default=True)
+@click.option('--width', default=10.0, show_default=True, type=float)
+@click.option('--height', default=8.0, show_default=True, type=float)
+@click.option('--format', 'file_format', default='png', show_default=True,
+              type=click.Choice(['png', 'svg', 'pdf', 'jpeg']))
+@click.pass_obj
+def enrich(state: CliState, assembly_id, genes_file, with_log2fc, has_header, plot_types, **options):
+    """GO/KEGG 富集分析并绘图。"""
+    study_gene_ids, log2fc_map = _read_enrichment_input(genes_file, with_log2fc, has_header)
+    if not study_gene_ids:
+        raise click.UsageError(_("解析后未发现有效基因ID。"))
+    _require_feature(state, 'enrichment')
+    _run_task(state, 'enrich', _pipelines(state).run_enrichment_pipeline, none_is_failure=True, assembly_id=assembly_id,
+              study_gene_ids=study_gene_ids, gene_log2fc_map=log2fc_map, plot_types=list(plot_types), **options)
+
+
+# --- AI 任务 ---
+
+def _print_usage_summary(result: Any) -> None:
+    from cotton_toolkit.core.ai_usage import format_usage_summary
+
+    if isinstance(result, dict):
+        click.echo(format_usage_summary(result))
+
+
+@cli.command()
+@click.option('-i', '--input', 'input_file', required=True, type=click.Path(exists=True, dir_okay=False),
+              help=_("输入CSV文件。"))
+@click.option('--column', 'source_column', required=True, help=_("要处理的列名。"))
+@click.option('--new-column', required=True, help=_("写入结果的新列名。"))
+@click.option('--task', 'task_type', default='translate', show_default=True,
+              type=click.Choice(['translate', 'analyze', 'custom']))
+@click.option('--prompt', 'custom_prompt_template', help=_("自定义提示词模板，须包含 {text}。"))
+@click.option('--provider', help=_("AI服务商，默认使用配置中的 default_provider。"))
+@click.option('--model', help=_("模型名称，默认使用服务商配置中的模型。"))
+@click.option('-o', '--output', 'output_file', type=click.Path(dir_okay=False),
+              help=_("输出CSV；不指定时在源文件目录下新建文件。"))
+@click.pass_obj
+def ai(state: CliState, input_file, source_column, new_column, task_type, custom_prompt_template, provider, model,
+       output_file):
+    """用AI批量翻译或分析CSV中的一列。"""
+    if task_type == 'custom' and not custom_prompt_template:
+        raise click.UsageError(_("自定义任务需要通过 --prompt 提供提示词模板。"))
+    if custom_prompt_template and '{text}' not in custom_prompt_template:
+        raise click.BadParameter(_("提示词模板必须包含 {text} 占位符。"), param_hint='--prompt')
+    overrides = {'ai_provider': provider or state.config.ai_services.default_provider, 'ai_model': model}
+    _run_task(state, 'ai', _pipelines(state).run_ai_task, none_is_failure=True, result_printer=_print_usage_summary,
+              input_file=input_file, source_column=source_column, new_column=new_column, task_type=task_type,
+              custom_prompt_template=custom_prompt_template, cli_overrides=overrides, output_file=output_file)
+
+
+@cli.group('ai-cache')
+def ai_cache():
+    """管理共享的AI回复缓存。"""
+
+
+def _open_ai_cache(state: CliState):
+    from cotton_toolkit.core.ai_response_cache import get_ai_response_cache
+
+    cache = get_ai_response_cache(state.config)
+    if cache is None:
+        raise click.UsageError(_("AI回复缓存未启用或无法打开。"))
+    return cache
+
+
+def _finish_cache_command(state: CliState, command: str, result: Any) -> None:
+    if state.json_output:
+        state.emit({'event': 'result', 'task': command, 'status': 'success', 'result': result})
+    elif isinstance(result, dict):
+        for key, value in result.items():
+            click.echo("{}: {}".format(key, value))
+    else:
+        click.echo(result)
+
+
+@ai_cache.command('stats')
+@click.pass_obj
+def ai_cache_stats(state: CliState):
+    """显示缓存条目数、占用与命中统计。"""
+    _finish_cache_command(state, 'ai-cache stats', _open_ai_cache(state).stats())
+
+
+@ai_cache.command('export')
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--provider', help=_("只导出指定服务商的条目。"))
+@click.option('--model', help=_("只导出指定模型的条目。"))
+@click.pass_obj
+def ai_cache_export(state: CliState, path, provider, model):
+    """将缓存导出为 gzip 压缩的 JSON Lines 文件。"""
+    count = _open_ai_cache(state).export_to(path, provider=provider, model=model)
+    _finish_cache_command(state, 'ai-cache export', {'path': path, 'entries': count})
+
+
+@ai_cache.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--overwrite', is_flag=True, help=_("覆盖本地已有的条目。"))
+@click.pass_obj
+def ai_cache_import(state: CliState, path, overwrite):
+    """导入由 export 生成的缓存文件。"""
+    try:
+        count = _open_ai_cache(state).import_from(path, overwrite=overwrite)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    _finish_cache_command(state, 'ai-cache import', {'path': path, 'entries': count})
+
+
+@ai_cache.command('clear')
+@click.confirmation_option(prompt=_("确定要清空AI回复缓存吗？"))
+@click.pass_obj
+def ai_cache_clear(state: CliState):
+    """清空缓存。"""
+    _open_ai_cache(state).clear()
+    _finish_cache_command(state, 'ai-cache clear', {'cleared': True})
+
+
+# --- 环境检测 ---
+
+@cli.command()
+@click.option('--refresh', is_flag=True, help=_("忽略缓存，重新运行各程序检测版本。"))
+@click.pass_obj
+def deps(state: CliState, refresh):
+    """检测 BLAST+ 与可选 Python 库是否可用，以及因此受影响的功能。"""
+    from cotton_toolkit.utils.dependency_probe import DependencyProbe, find_unavailable_features, get_dependency_probe
+
+    results = (DependencyProbe(use_cache=False) if refresh else get_dependency_probe()).wait()
+    unavailable = find_unavailable_features(results)
+    if state.json_output:
+        state.emit({'event': 'result', 'task': 'deps', 'status': 'success',
+                    'result': {'dependencies': {name: status._asdict() for name, status in results.items()},
+                               'unavailable_features': unavailable}})
+        return
+    for name, status in results.items():
+        detail = (status.version or "") if status.available else (status.error or "")
+        click.echo("{:<12} {:<4} {:<16} {}".format(name, "ok" if status.available else "--", detail,
+                                                   status.path or ""))
+    for feature, missing in unavailable.items():
+        click.echo(_("功能 '{}' 缺少依赖: {}").format(feature, ", ".join(missing)), err=True)
+
+
+def main():
+    cli(prog_name='fcgt')
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,14 @@ class ProviderConfig(BaseModel):
     model: str = "default-model"
     base_url: Optional[str] = None
     available_models: Optional[str] = None
+    # 服务商账号的每分钟请求数/令牌数配额，为空表示不限流（超限时仍会根据429自动退避）
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
+    # 每百万输入/输出token的价格，用于估算费用；为空时不估算
+    input_price_per_million: Optional[float] = None
+    output_price_per_million: Optional[float] = None
+    # 与其它服务商组成服务商池时的轮询权重
+    weight: int = 1
 
 
 class DownloaderConfig(BaseModel):
@@ -28,6 +36,11 @@ class DownloaderConfig(BaseModel):
 class AIServicesConfig(BaseModel):
     default_provider: str = "google"
     use_proxy_for_ai: bool = False
+    # 与所选服务商一起组成服务商池的其它服务商（按优先级排列），请求按权重分摊，某个服务商出错时自动转移
+    pool_providers: List[str] = Field(default_factory=list)
+    # 服务商连续失败多少次后暂停使用，以及首次暂停的秒数（之后每次翻倍）
+    circuit_failure_threshold: int = 3
+    circuit_cooldown_seconds: float = 30.0
     providers: Dict[str, ProviderConfig] = Field(default_factory=lambda: AIServicesConfig._default_providers())
 
     @staticmethod
@@ -97,9 +110,38 @@ class BatchAIProcessorConfig(BaseModel):
     max_tokens: int = 4096
     max_workers: int = 4
     max_retries: int = 3
+    # 以流式方式接收回复（逐段返回，可统计首字延迟，长回复不易超时）
+    stream_responses: bool = False
+    # 每个请求打包的文本条数（1 表示逐条请求）及打包文本的总字符数上限
+    items_per_request: int = 20
+    max_chars_per_request: int = 6000
+    # CSV按块处理并逐块写出（可断点续跑），每块的行数
+    chunk_rows: int = 2000
+    # 所有AI任务共享的回复缓存：容量上限与有效期（天，为空表示不过期）
+    cache_enabled: bool = True
+    cache_size_limit_mb: int = 512
+    cache_ttl_days: Optional[float] = None
     output_dir_name: str = "ai_processed_results"
     prompt_template_file: str = "prompt_template.txt"
 
+class BlastConfig(BaseModel):
+    cache_enabled: bool = True
+    cache_size_limit_mb: int = 1024
+    # 建库时使用 -parse_seqids，使结果直接携带真实序列ID；ID不符合要求时会自动退回普通建库
+    parse_seqids: bool = True
+    # 传给 makeblastdb -max_file_sz（如 "1GB"），超出后数据库拆分为多个分卷；为空时使用BLAST默认值
+    db_max_file_size: Optional[str] = None
+
+
+class ResourceConfig(BaseModel):
+    # 所有任务共享的CPU线程数上限；为空时使用本机核心数
+    cpu_slots: Optional[int] = None
+    io_slots: int = 8
+    network_slots: int = 8
+    # GUI任务队列中同时运行的任务数，其余任务排队等待
+    max_concurrent_jobs: int = 2
+
+
 class HomologySelectionCriteria(BaseModel):
     sort_by: List[str] = Field(default_factory=lambda: HomologySelectionCriteria._default_sort_by())
     ascending: List[bool] = Field(default_factory=lambda: HomologySelectionCriteria._default_ascending())
@@ -109,6 +151,7 @@ class HomologySelectionCriteria(BaseModel):
     score_threshold: float = 50.0
     prioritize_subgenome: bool = True
     strict_subgenome_priority: bool = True
+    reciprocal_best_hit: bool = False
 
     @staticmethod
     def _default_sort_by() -> List[str]:
@@ -130,6 +173,8 @@ class MainConfig(BaseModel):
     annotation_tool: AnnotationToolConfig = Field(default_factory=AnnotationToolConfig)
     arabidopsis_analyzer: ArabidopsisAnalyzerConfig = Field(default_factory=ArabidopsisAnalyzerConfig)
     batch_ai_processor: BatchAIProcessorConfig = Field(default_factory=BatchAIProcessorConfig)
+    blast: BlastConfig = Field(default_factory=BlastConfig)
+    resources: ResourceConfig = Field(default_factory=ResourceConfig)
     config_file_abs_path_: Optional[str] = Field(default=None, exclude=True)
 
 
@@ -140,6 +185,7 @@ class GenomeSourceItem(BaseModel):
     species_name: str
     genome_type: str = "cotton"
     gff3_url: Optional[str] = None
+    genome_fasta_url: Optional[str] = None
     predicted_cds_url: Optional[str] = None
     predicted_protein_url: Optional[str] = None
     GO_url: Optional[str] = None
@@ -0,0 +1,469 @@
+# cotton_toolkit/core/ai_batch_engine.py
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from cotton_toolkit.core.ai_provider_pool import AIProviderPool, ProviderPoolMember
+from cotton_toolkit.core.ai_usage import estimate_tokens
+from cotton_toolkit.core.ai_wrapper import AIWrapper, AIRequestError, AIRateLimitError
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.ai_batch_engine")
+
+# 未知回复长度时，为每个请求预留的输出token数（用于TPM限流估算）
+DEFAULT_COMPLETION_TOKENS_ESTIMATE = 256
+# 并发数连续成功多少次后尝试加一
+CONCURRENCY_INCREASE_AFTER = 10
+
+# 打包请求时单个请求中文本的总字符数上限，避免回复超出模型的输出长度
+DEFAULT_MAX_CHARS_PER_REQUEST = 6000
+
+PROCESSING_CANCELLED = "PROCESSING_CANCELLED"
+
+# 等待试探请求结果时的最长单次等待（秒）；池被其它批处理共用时，对方的结果不会通知到本引擎
+TRIAL_WAIT_POLL_SECONDS = 1.0
+
+PACKED_PROMPT_SUFFIX = (
+    "\n\nThe input above is a JSON array of {count} independent items. "
+    "Apply the instructions to each item separately and reply with ONLY a JSON array of exactly {count} strings, "
+    "one result per item in the same order, without any explanation or markdown."
+)
+
+
+def compute_backoff_delay(attempt: int, base_delay: float, max_delay: float,
+                          retry_after: Optional[float] = None) -> float:
+    """
+    指数退避加“全抖动”：在 [0, min(max_delay, base_delay * 2^attempt)] 中随机取值，
+    避免大量请求在同一时刻集中重试。服务商给出 Retry-After 时至少等待该时长。
+    """
+    delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, max_delay))
+    return delay
+
+
+def pack_texts(texts: List[str], items_per_request: int, max_chars_per_request: int) -> List[List[int]]:
+    """按条数与总字符数上限将文本下标分组，每组作为一次请求；超长文本单独成组。"""
+    items_per_request = max(1, items_per_request)
+    jobs: List[List[int]] = []
+    current: List[int] = []
+    current_chars = 0
+    for index, text in enumerate(texts):
+        if current and (len(current) >= items_per_request or current_chars + len(text) > max_chars_per_request):
+            jobs.append(current)
+            current, current_chars = [], 0
+        current.append(index)
+        current_chars += len(text)
+    if current:
+        jobs.append(current)
+    return jobs
+
+
+def build_packed_prompt(prompt_template: str, texts: List[str]) -> str:
+    """将多条文本以JSON数组的形式代入用户模板，并要求模型以等长JSON数组回复。"""
+    packed = json.dumps(texts, ensure_ascii=False, indent=0)
+    return prompt_template.format(text=packed) + PACKED_PROMPT_SUFFIX.format(count=len(texts))
+
+
+def parse_packed_reply(reply: Optional[str], expected_count: int) -> Optional[List[str]]:
+    """
+    解析打包请求的回复。允许回复被 ```json 代码块包裹或前后带有少量说明文字；
+    不是JSON数组、条数不符或含有非字符串元素时返回 None，由调用方改为逐条请求。
+    """
+    if not reply or reply.startswith(("PROCESSING_ERROR", PROCESSING_CANCELLED)):
+        return None
+    start, end = reply.find('['), reply.rfind(']')
+    if start < 0 or end <= start:
+        return None
+    try:
+        items = json.loads(reply[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(items, list) or len(items) != expected_count:
+        return None
+    if not all(isinstance(item, (str, int, float)) for item in items):
+        return None
+    return [str(item).strip() for item in items]
+
+
+class TokenBucket:
+    """
+    令牌桶：容量为每分钟的配额，按恒定速率补充。可在多个线程的事件循环间共享，
+    因此内部用线程锁保护，等待时使用 asyncio.sleep 而不阻塞事件循环。
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, amount: float) -> float:
+        """尝试取出 amount 个令牌；不足时返回还需等待的秒数（此时不取出）。"""
+        # 单次请求超过桶容量时按容量计，否则永远无法满足
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return 0.0
+            return (amount - self._tokens) / self.rate
+
+    def drain(self) -> None:
+        """清空当前令牌（收到429时调用，使后续请求按补充速率重新起步）。"""
+        with self._lock:
+            self._tokens = 0.0
+            self._updated = time.monotonic()
+
+    async def acquire(self, amount: float = 1, cancel_event: Optional[threading.Event] = None) -> bool:
+        while True:
+            wait = self._reserve(amount)
+            if wait <= 0:
+                return True
+            if cancel_event and cancel_event.is_set():
+                return False
+            await asyncio.sleep(min(wait, 0.5))
+
+
+class ProviderRateLimiter:
+    """同一服务商（同一Base URL与密钥）共享的RPM/TPM限流器；对应限制为空时不限流。"""
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, estimated_tokens: int, cancel_event: Optional[threading.Event] = None) -> bool:
+        if self.requests and not await self.requests.acquire(1, cancel_event):
+            return False
+        if self.tokens and not await self.tokens.acquire(estimated_tokens, cancel_event):
+            return False
+        return True
+
+    def on_rate_limited(self) -> None:
+        if self.requests:
+            self.requests.drain()
+
+
+_RATE_LIMITERS: Dict[Tuple, ProviderRateLimiter] = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+def get_provider_rate_limiter(client: AIWrapper, requests_per_minute: Optional[int] = None,
+                              tokens_per_minute: Optional[int] = None) -> ProviderRateLimiter:
+    """
+    获取服务商的限流器。配额是按账号计算的，所以同一进程内并发的多个AI任务共享同一个限流器；
+    限额配置变化时重新创建。
+    """
+    key = (client.provider, client.api_base, client.api_key, requests_per_minute, tokens_per_minute)
+    with _RATE_LIMITERS_LOCK:
+        limiter = _RATE_LIMITERS.get(key)
+        if limiter is None:
+            limiter = ProviderRateLimiter(requests_per_minute, tokens_per_minute)
+            _RATE_LIMITERS[key] = limiter
+        return limiter
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    加性增、乘性减（AIMD）的并发控制：连续成功若干次后并发数加一，
+    遇到限流或服务端错误时减半，使并发数逼近服务商实际能承受的水平。
+    """
+
+    def __init__(self, maximum: int, minimum: int = 1, initial: Optional[int] = None):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = max(self.minimum, min(initial or self.maximum, self.maximum))
+        self.in_flight = 0
+        self._successes = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        # 延迟创建，保证绑定到实际运行的事件循环
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def on_success(self) -> None:
+        self._successes += 1
+        if self._successes >= CONCURRENCY_INCREASE_AFTER and self.limit < self.maximum:
+            self.limit += 1
+            self._successes = 0
+            logger.debug(_("AI请求并发数提高到 {}。").format(self.limit))
+
+    def on_overload(self) -> None:
+        self._successes = 0
+        new_limit = max(self.minimum, self.limit // 2)
+        if new_limit != self.limit:
+            logger.info(_("服务商繁忙，AI请求并发数由 {} 降至 {}。").format(self.limit, new_limit))
+            self.limit = new_limit
+
+
+class AsyncAIBatchEngine:
+    """
+    基于 asyncio 的AI批量请求引擎。
+    请求本身仍由 AIWrapper（requests）在线程中完成，事件循环负责调度：
+    令牌桶限制RPM/TPM，AIMD动态调整并发数，失败时按指数退避加抖动重试并遵循 Retry-After。
+    client 可以是单个 AIWrapper，也可以是多个服务商组成的 AIProviderPool（加权轮询、熔断与失败转移），
+    此时RPM/TPM配额取各成员自己的设置。
+    items_per_request > 1 时将多条文本打包为一个JSON数组请求（文本总长度不超过 max_chars_per_request），
+    回复无法解析时该包内的文本逐条重新请求。
+    结果顺序与输入一致；被取消时未处理的条目为 None。
+    """
+
+    def __init__(
+            self,
+            client: Union[AIWrapper, AIProviderPool],
+            max_concurrency: int = 4,
+            min_concurrency: int = 1,
+            requests_per_minute: Optional[int] = None,
+            tokens_per_minute: Optional[int] = None,
+            max_retries: int = 3,
+            retry_base_delay: float = 1.0,
+            retry_max_delay: float = 60.0,
+            temperature: float = 0.7,
+            items_per_request: int = 1,
+            max_chars_per_request: int = DEFAULT_MAX_CHARS_PER_REQUEST
+    ):
+        if isinstance(client, AIProviderPool):
+            self.pool = client
+        else:
+            self.pool = AIProviderPool([ProviderPoolMember(client.provider, client, 1, requests_per_minute,
+                                                           tokens_per_minute)])
+        self.client = self.pool.primary.client
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = min_concurrency
+        self.rate_limiters = {m.name: get_provider_rate_limiter(m.client, m.requests_per_minute, m.tokens_per_minute)
+                              for m in self.pool.members}
+        self.max_retries = max(1, max_retries)
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self.temperature = temperature
+        self.items_per_request = max(1, items_per_request)
+        self.max_chars_per_request = max_chars_per_request
+        self._pool_changed: Optional[asyncio.Condition] = None
+
+    def run(
+            self,
+            texts: List[str],
+            prompt_template: str,
+            cancel_event: Optional[threading.Event] = None,
+            progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> List[Optional[str]]:
+        """
+        同步入口：在当前线程中运行事件循环处理全部文本。
+        progress_callback(已完成数, 总数) 在每个条目完成时调用。
+        """
+        return self.run_detailed(texts, prompt_template, cancel_event, progress_callback)[0]
+
+    def run_detailed(
+            self,
+            texts: List[str],
+            prompt_template: str,
+            cancel_event: Optional[threading.Event] = None,
+            progress_callback: Optional[Callable[[int, int], None]] = None
+    ) -> Tuple[List[Optional[str]], List[Optional[ProviderPoolMember]]]:
+        """与 run 相同，另外返回每条结果来自哪个服务商（失败或未处理的为 None），用于按来源写入缓存。"""
+        if not texts:
+            return [], []
+        jobs = pack_texts(texts, self.items_per_request, self.max_chars_per_request)
+        return asyncio.run(self._run_async(texts, jobs, prompt_template, cancel_event, progress_callback))
+
+    async def _run_async(self, texts, jobs, prompt_template, cancel_event, progress_callback):
+        results: List[Optional[str]] = [None] * len(texts)
+        sources: List[Optional[ProviderPoolMember]] = [None] * len(texts)
+        concurrency = AdaptiveConcurrencyLimiter(self.max_concurrency, self.min_concurrency)
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+        completed = 0
+        fallback_packs = 0
+        # 尚未完成的任务数；打包失败拆分后会增加，因此不能只看队列是否为空
+        unfinished_jobs = len(jobs)
+        # 服务商状态变化（成功/失败）时通知等待试探请求结果的协程
+        self._pool_changed = asyncio.Condition()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="ai-request") as executor:
+            async def worker():
+                nonlocal completed, fallback_packs, unfinished_jobs
+                while unfinished_jobs > 0:
+                    if cancel_event and cancel_event.is_set():
+                        return
+                    if queue.empty():
+                        await asyncio.sleep(0.05)
+                        continue
+                    indices = queue.get_nowait()
+                    batch = [texts[i] for i in indices]
+                    if len(batch) == 1:
+                        output, member = await self._request(batch[0], prompt_template, executor, concurrency,
+                                                             cancel_event)
+                        if output == PROCESSING_CANCELLED:
+                            return
+                        outputs = [output]
+                    else:
+                        reply, member = await self._request(build_packed_prompt(prompt_template, batch), "{text}",
+                                                            executor, concurrency, cancel_event)
+                        if reply == PROCESSING_CANCELLED:
+                            return
+                        outputs = parse_packed_reply(reply, len(batch))
+                        if outputs is None:
+                            # 打包回复不合格（条数不符、不是JSON等），拆成单条请求放回队列
+                            fallback_packs += 1
+                            logger.debug(_("打包请求的回复无法解析，{} 条文本将逐条重新请求。").format(len(batch)))
+                            for index in indices:
+                                queue.put_nowait([index])
+                            unfinished_jobs += len(indices) - 1
+                            continue
+                    for index, output in zip(indices, outputs):
+                        results[index] = output
+                        sources[index] = member
+                    unfinished_jobs -= 1
+                    completed += len(indices)
+                    if progress_callback:
+                        progress_callback(completed, len(texts))
+
+            await asyncio.gather(*(worker() for _i in range(min(self.max_concurrency, len(texts)))))
+
+        if fallback_packs:
+            logger.info(_("{} 个打包请求的回复格式不符，已改为逐条请求。").format(fallback_packs))
+        if cancel_event and cancel_event.is_set():
+            logger.info(_("AI批处理已取消，已完成 {}/{} 条。").format(completed, len(texts)))
+        if len(self.pool.members) > 1:
+            logger.info(_("各AI服务商状态: {}").format(
+                "; ".join(_("{}: 成功 {} / 失败 {}（{}）").format(name, h['successes'], h['failures'], h['state'])
+                          for name, h in self.pool.health().items())))
+        return results, sources
+
+    async def _request(self, text, prompt_template, executor, concurrency,
+                       cancel_event) -> Tuple[str, Optional[ProviderPoolMember]]:
+        """
+        发送一次请求（含服务商选择、限流、并发控制与重试），返回 (回复文本, 给出回复的服务商)；
+        失败或取消时文本为 PROCESSING_ERROR/PROCESSING_CANCELLED，服务商为 None。
+        池中有多个服务商时，失败的请求优先改由其它服务商重试。
+        """
+        loop = asyncio.get_running_loop()
+        estimated = estimate_tokens(prompt_template) + estimate_tokens(text) * 2 + DEFAULT_COMPLETION_TOKENS_ESTIMATE
+        last_error: Optional[Exception] = None
+        failed_members: List[str] = []
+        fatal_members = set()
+        max_attempts = self.max_retries + len(self.pool.members) - 1
+
+        attempt = 0
+        while attempt < max_attempts:
+            member = self.pool.select(exclude=failed_members)
+            if member is None:
+                if self.pool.trial_in_progress():
+                    # 冷却已结束，试探请求尚未返回：等它有结果再选，不计入尝试次数
+                    if not await self._wait_for_pool_change(cancel_event):
+                        return PROCESSING_CANCELLED, None
+                    continue
+                # 所有服务商都在熔断冷却中
+                delay = min(self.pool.seconds_until_available(), self.retry_max_delay)
+                logger.warning(_("所有AI服务商暂不可用，{:.0f}秒 后重试。").format(delay))
+                if not await _sleep_unless_cancelled(delay, cancel_event):
+                    return PROCESSING_CANCELLED, None
+                attempt += 1
+                continue
+
+            rate_limiter = self.rate_limiters[member.name]
+            if not await rate_limiter.acquire(estimated, cancel_event):
+                return PROCESSING_CANCELLED, None
+
+            retry_after = None
+            await concurrency.acquire()
+            try:
+                processed = await loop.run_in_executor(
+                    executor, lambda: member.client.process(text=text, custom_prompt_template=prompt_template,
+                                                            temperature=self.temperature))
+                concurrency.on_success()
+                self.pool.record_success(member)
+                return processed, member
+            except Exception as e:
+                last_error = e
+                fatal = isinstance(e, AIRequestError) and not e.retryable
+                self.pool.record_failure(member, fatal=fatal, rate_limited=isinstance(e, AIRateLimitError))
+                failed_members.append(member.name)
+                if fatal:
+                    fatal_members.add(member.name)
+                    if len(fatal_members) == len(self.pool.members):
+                        attempt += 1
+                        break
+                if isinstance(e, AIRequestError) and not fatal:
+                    retry_after = e.retry_after
+                    # 池中单个服务商的偶发错误由换服务商重试消化，只有限流或单一服务商时才收缩并发
+                    if len(self.pool.members) == 1 or isinstance(e, AIRateLimitError):
+                        concurrency.on_overload()
+                    if isinstance(e, AIRateLimitError):
+                        rate_limiter.on_rate_limited()
+            finally:
+                await concurrency.release()
+                await self._notify_pool_change()
+
+            attempt += 1
+            if attempt < max_attempts:
+                if len(self.pool.members) > 1 and len(set(failed_members)) < len(self.pool.members):
+                    # 还有未失败过的服务商，立即换一个重试
+                    logger.info(_("服务商 '{}' 请求失败，改由其它服务商重试: {}").format(
+                        member.name, str(last_error).splitlines()[0]))
+                    continue
+                delay = compute_backoff_delay(attempt - 1, self.retry_base_delay, self.retry_max_delay, retry_after)
+                logger.warning(_("API调用错误: {}。在 {:.1f}秒 后重试 {}/{}。").format(
+                    str(last_error).splitlines()[0], delay, attempt, max_attempts))
+                if not await _sleep_unless_cancelled(delay, cancel_event):
+                    return PROCESSING_CANCELLED, None
+
+        logger.error(_("警告: 经过 {} 次尝试后，文本 '{}' 处理失败。").format(attempt, text[:50] + '...'))
+        return f"PROCESSING_ERROR: {last_error or _('所有AI服务商暂不可用')}", None
+
+    async def _wait_for_pool_change(self, cancel_event: Optional[threading.Event]) -> bool:
+        """等待服务商状态变化（最多 TRIAL_WAIT_POLL_SECONDS 秒），期间被取消则返回 False。"""
+        async with self._pool_changed:
+            try:
+                await asyncio.wait_for(self._pool_changed.wait(), TRIAL_WAIT_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+        return not (cancel_event and cancel_event.is_set())
+
+    async def _notify_pool_change(self) -> None:
+        if self._pool_changed is not None:
+            async with self._pool_changed:
+                self._pool_changed.notify_all()
+
+
+async def _sleep_unless_cancelled(seconds: float, cancel_event: Optional[threading.Event]) -> bool:
+    """等待指定时长，期间被取消则提前返回 False。"""
+    deadline = time.monotonic() + seconds
+    while True:
+        if cancel_event and cancel_event.is_set():
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return True
+        await asyncio.sleep(min(remaining, 0.5))
@@ -0,0 +1,149 @@
+# cotton_toolkit/core/ai_provider_pool.py
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from cotton_toolkit.core.ai_wrapper import AIWrapper
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.ai_provider_pool")
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+# 熔断后的冷却时间每次翻倍，但不超过该上限
+MAX_COOLDOWN_SECONDS = 600.0
+
+
+class ProviderPoolMember:
+    """池中的一个服务商：客户端、权重、RPM/TPM配额以及熔断状态。"""
+
+    def __init__(self, name: str, client: AIWrapper, weight: int = 1, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None):
+        self.name = name
+        self.client = client
+        self.weight = max(1, int(weight))
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.cooldown = 0.0
+        self.trial_in_progress = False
+        self.current_weight = 0
+        self.successes = 0
+        self.failures = 0
+
+
+class AIProviderPool:
+    """
+    多个AI服务商组成的池，按平滑加权轮询分配请求。
+    某个服务商连续失败 failure_threshold 次（或返回密钥无效等不可恢复错误）后熔断，
+    冷却 cooldown_seconds 秒后放行一个试探请求：成功则恢复，失败则冷却时间翻倍。
+    池中只有一个服务商时，可重试的限流错误（429）不计入熔断，交给限速器与AIMD处理。
+    成员的先后顺序即优先级，也用于按固定顺序查找共享缓存，保证重复运行得到相同结果。
+    """
+
+    def __init__(self, members: Iterable[ProviderPoolMember], failure_threshold: int = 3,
+                 cooldown_seconds: float = 30.0):
+        self.members: List[ProviderPoolMember] = list(members)
+        if not self.members:
+            raise ValueError(_("AI服务商池中至少需要一个服务商。"))
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> ProviderPoolMember:
+        return self.members[0]
+
+    def _is_available(self, member: ProviderPoolMember, now: float) -> bool:
+        if member.state == CIRCUIT_CLOSED:
+            return True
+        if member.state == CIRCUIT_OPEN and now >= member.open_until:
+            member.state = CIRCUIT_HALF_OPEN
+            member.trial_in_progress = False
+            logger.info(_("服务商 '{}' 冷却结束，发送试探请求。").format(member.name))
+        return member.state == CIRCUIT_HALF_OPEN and not member.trial_in_progress
+
+    def select(self, exclude: Iterable[str] = ()) -> Optional[ProviderPoolMember]:
+        """
+        按平滑加权轮询选出一个可用成员，尽量避开 exclude 中的成员（同一条目已失败过的服务商）；
+        除被排除的之外没有可用成员时退回被排除的成员。全部熔断时返回 None。
+        """
+        excluded = set(exclude)
+        with self._lock:
+            now = time.monotonic()
+            available = [m for m in self.members if self._is_available(m, now)]
+            candidates = [m for m in available if m.name not in excluded] or available
+            if not candidates:
+                return None
+            total = sum(m.weight for m in candidates)
+            for member in candidates:
+                member.current_weight += member.weight
+            chosen = max(candidates, key=lambda m: m.current_weight)
+            chosen.current_weight -= total
+            if chosen.state == CIRCUIT_HALF_OPEN:
+                chosen.trial_in_progress = True
+            return chosen
+
+    def seconds_until_available(self) -> float:
+        """全部成员都处于熔断状态时，距最早恢复还有多少秒。"""
+        with self._lock:
+            now = time.monotonic()
+            return max(0.0, min(m.open_until for m in self.members) - now)
+
+    def trial_in_progress(self) -> bool:
+        """是否有成员正在等待试探请求的结果（此时 select 可能返回 None，但无需等待冷却）。"""
+        with self._lock:
+            return any(m.state == CIRCUIT_HALF_OPEN and m.trial_in_progress for m in self.members)
+
+    def record_success(self, member: ProviderPoolMember) -> None:
+        with self._lock:
+            member.successes += 1
+            member.consecutive_failures = 0
+            if member.state != CIRCUIT_CLOSED:
+                logger.info(_("服务商 '{}' 已恢复。").format(member.name))
+            member.state = CIRCUIT_CLOSED
+            member.cooldown = 0.0
+            member.trial_in_progress = False
+
+    def record_failure(self, member: ProviderPoolMember, fatal: bool = False, rate_limited: bool = False) -> None:
+        """
+        记录一次失败；fatal 表示不可恢复的错误（如密钥无效），直接熔断。
+        rate_limited 表示可重试的限流错误，池中只有一个服务商时不计入熔断（没有可转移的服务商）。
+        """
+        with self._lock:
+            member.failures += 1
+            member.trial_in_progress = False
+            if rate_limited and not fatal and len(self.members) == 1:
+                return
+            member.consecutive_failures += 1
+            if fatal or member.state == CIRCUIT_HALF_OPEN or member.consecutive_failures >= self.failure_threshold:
+                if member.state == CIRCUIT_CLOSED:
+                    member.cooldown = self.cooldown_seconds
+                else:
+                    member.cooldown = min(MAX_COOLDOWN_SECONDS, max(member.cooldown, self.cooldown_seconds) * 2)
+                if fatal:
+                    member.cooldown = MAX_COOLDOWN_SECONDS
+                member.state = CIRCUIT_OPEN
+                member.open_until = time.monotonic() + member.cooldown
+                logger.warning(_("服务商 '{}' 连续失败 {} 次，暂停使用 {:.0f} 秒。").format(
+                    member.name, member.consecutive_failures, member.cooldown))
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """各成员的熔断状态与成功/失败次数。"""
+        with self._lock:
+            return {m.name: {'state': m.state, 'weight': m.weight, 'successes': m.successes,
+                             'failures': m.failures, 'consecutive_failures': m.consecutive_failures}
+                    for m in self.members}
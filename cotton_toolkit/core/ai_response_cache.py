@@ -0,0 +1,177 @@
+# cotton_toolkit/core/ai_response_cache.py
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from diskcache import Cache
+
+from cotton_toolkit import AI_CACHE_DIR
+from cotton_toolkit.config.models import MainConfig
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.ai_response_cache")
+
+# 缓存键结构版本，键的组成变化时递增
+CACHE_KEY_VERSION = 1
+# 导出文件的格式标识，导入时据此校验
+EXPORT_FORMAT = "fcgt-ai-cache"
+
+
+def make_response_key(provider: str, model: str, prompt_template: str, temperature: float, text: str) -> str:
+    """由服务商、模型、提示词模板、温度与输入文本计算缓存键（与任务、文件名无关）。"""
+    raw = json.dumps([CACHE_KEY_VERSION, provider, model, prompt_template, round(float(temperature), 3), text],
+                     ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class AIResponseCache:
+    """
+    所有AI任务共享的回复缓存（基于 diskcache）。
+    相同的文本只要服务商、模型、提示词与温度相同，无论来自哪个文件都能命中；
+    超出容量时按最近最少使用淘汰，设置了有效期的条目过期后不再命中。
+    """
+
+    def __init__(self, directory: str, size_limit_mb: int = 512, ttl_days: Optional[float] = None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.expire = ttl_days * 86400 if ttl_days else None
+        # cull_limit=0 关闭写入时的自动淘汰，改为每批写入后手动清理，以便统计淘汰数量
+        self._cache = Cache(directory, size_limit=int(size_limit_mb) * 1024 * 1024,
+                            eviction_policy='least-recently-used', cull_limit=0)
+        self._cache.stats(enable=True)
+        self._lock = threading.Lock()
+        self.session_hits = 0
+        self.session_misses = 0
+        self.session_evicted = 0
+        self.session_expired = 0
+
+    def get(self, provider: str, model: str, prompt_template: str, temperature: float, text: str) -> Optional[str]:
+        entry = self._cache.get(make_response_key(provider, model, prompt_template, temperature, text))
+        with self._lock:
+            if entry is None:
+                self.session_misses += 1
+            else:
+                self.session_hits += 1
+        return entry['result'] if entry is not None else None
+
+    def set(self, provider: str, model: str, prompt_template: str, temperature: float, text: str,
+            result: str) -> None:
+        entry = {'result': result, 'provider': provider, 'model': model, 'created': time.time()}
+        self._cache.set(make_response_key(provider, model, prompt_template, temperature, text), entry,
+                        expire=self.expire)
+
+    def trim(self) -> None:
+        """删除过期条目并按容量淘汰最久未用的条目。"""
+        expired = self._cache.expire()
+        evicted = self._cache.cull()
+        with self._lock:
+            self.session_expired += expired
+            self.session_evicted += evicted
+        if expired or evicted:
+            logger.debug(_("AI回复缓存清理: 过期 {} 条，淘汰 {} 条。").format(expired, evicted))
+
+    def stats(self) -> Dict[str, int]:
+        """返回本次会话与累计的命中/未命中次数、本次会话的过期/淘汰数量，以及缓存占用。"""
+        total_hits, total_misses = self._cache.stats()
+        return {
+            'session_hits': self.session_hits,
+            'session_misses': self.session_misses,
+            'session_expired': self.session_expired,
+            'session_evicted': self.session_evicted,
+            'total_hits': total_hits,
+            'total_misses': total_misses,
+            'entries': len(self._cache),
+            'size_bytes': self._cache.volume(),
+        }
+
+    def export_to(self, path: str, provider: Optional[str] = None, model: Optional[str] = None) -> int:
+        """
+        将缓存导出为 gzip 压缩的 JSON Lines 文件（可只导出指定服务商/模型的条目），返回导出条数。
+        文件中只有键的哈希与回复，不含提示词原文。
+        """
+        count = 0
+        tmp_path = path + '.part'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({'format': EXPORT_FORMAT, 'version': CACHE_KEY_VERSION}) + '\n')
+            for key in self._cache.iterkeys():
+                entry = self._cache.get(key, retry=True)
+                if entry is None:
+                    continue
+                if (provider and entry.get('provider') != provider) or (model and entry.get('model') != model):
+                    continue
+                f.write(json.dumps({'key': key, **entry}, ensure_ascii=False) + '\n')
+                count += 1
+        os.replace(tmp_path, path)
+        logger.info(_("已导出 {} 条AI回复缓存到 {}").format(count, path))
+        return count
+
+    def import_from(self, path: str, overwrite: bool = False) -> int:
+        """从 export_to 生成的文件导入缓存条目，默认不覆盖本地已有的条目，返回导入条数。"""
+        count = 0
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline() or '{}')
+            if header.get('format') != EXPORT_FORMAT:
+                raise ValueError(_("文件 {} 不是有效的AI回复缓存导出文件。").format(path))
+            if header.get('version') != CACHE_KEY_VERSION:
+                raise ValueError(_("缓存文件版本 {} 与当前版本 {} 不兼容。").format(header.get('version'),
+                                                                           CACHE_KEY_VERSION))
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                key = record.pop('key')
+                if not overwrite and key in self._cache:
+                    continue
+                self._cache.set(key, record, expire=self.expire)
+                count += 1
+        self.trim()
+        logger.info(_("已从 {} 导入 {} 条AI回复缓存。").format(path, count))
+        return count
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._cache.stats(reset=True)
+
+    def close(self) -> None:
+        self._cache.close()
+
+
+_CACHE_INSTANCES: Dict[str, AIResponseCache] = {}
+_CACHE_INSTANCES_LOCK = threading.Lock()
+
+
+def get_ai_response_cache(config: MainConfig) -> Optional[AIResponseCache]:
+    """
+    获取共享的AI回复缓存（同一目录在进程内共享一个实例）。
+    缓存位于项目目录下；没有配置文件路径时使用当前工作目录。缓存被禁用或无法创建时返回 None。
+    """
+    batch_cfg = config.batch_ai_processor
+    if not batch_cfg.cache_enabled:
+        return None
+
+    project_root = os.path.dirname(config.config_file_abs_path_) if config.config_file_abs_path_ else os.getcwd()
+    directory = os.path.join(project_root, AI_CACHE_DIR)
+    with _CACHE_INSTANCES_LOCK:
+        cache = _CACHE_INSTANCES.get(directory)
+        if cache is None:
+            try:
+                cache = AIResponseCache(directory, size_limit_mb=batch_cfg.cache_size_limit_mb,
+                                        ttl_days=batch_cfg.cache_ttl_days)
+            except Exception as e:
+                logger.warning(_("无法打开AI回复缓存 {}，将不使用缓存: {}").format(directory, e))
+                return None
+            _CACHE_INSTANCES[directory] = cache
+        return cache
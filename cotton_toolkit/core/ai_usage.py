@@ -0,0 +1,151 @@
+# cotton_toolkit/core/ai_usage.py
+import math
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+
+class AIResponse(NamedTuple):
+    """一次AI请求的回复与用量。服务商未返回用量时 usage_estimated 为 True，token数为估算值。"""
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    latency: float
+    first_token_latency: Optional[float] = None
+    usage_estimated: bool = False
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：英文约4字符/token，中日韩文字约1字/token。"""
+    if not text:
+        return 0
+    wide = sum(1 for ch in text if ord(ch) > 0x2E80)
+    return wide + math.ceil((len(text) - wide) / 4)
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+class AIUsageTracker:
+    """
+    线程安全的AI用量统计：请求数、失败与限流次数、token用量、延迟分布与费用估算。
+    价格单位为每百万token的费用（与服务商报价一致），未设置时不估算费用。
+    多个服务商共用一个统计时，用 set_prices 为每个来源单独设置价格，并按来源分别计数。
+    """
+
+    def __init__(self, input_price_per_million: Optional[float] = None,
+                 output_price_per_million: Optional[float] = None):
+        self.input_price_per_million = input_price_per_million
+        self.output_price_per_million = output_price_per_million
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.requests = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_requests = 0
+        self._latencies: List[float] = []
+        self._first_token_latencies: List[float] = []
+        self._prices: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+        self._by_source: Dict[str, Dict[str, int]] = {}
+
+    def set_prices(self, source: str, input_price_per_million: Optional[float],
+                   output_price_per_million: Optional[float]) -> None:
+        with self._lock:
+            self._prices[source] = (input_price_per_million, output_price_per_million)
+
+    def _source_counts(self, source: Optional[str]) -> Dict[str, int]:
+        return self._by_source.setdefault(source or "", {'requests': 0, 'failures': 0, 'prompt_tokens': 0,
+                                                         'completion_tokens': 0})
+
+    def record(self, response: AIResponse, source: Optional[str] = None) -> None:
+        with self._lock:
+            counts = self._source_counts(source)
+            counts['requests'] += 1
+            counts['prompt_tokens'] += response.prompt_tokens
+            counts['completion_tokens'] += response.completion_tokens
+            self.requests += 1
+            self.prompt_tokens += response.prompt_tokens
+            self.completion_tokens += response.completion_tokens
+            self.estimated_requests += int(response.usage_estimated)
+            self._latencies.append(response.latency)
+            if response.first_token_latency is not None:
+                self._first_token_latencies.append(response.first_token_latency)
+
+    def record_failure(self, latency: float, rate_limited: bool = False, source: Optional[str] = None) -> None:
+        with self._lock:
+            counts = self._source_counts(source)
+            counts['requests'] += 1
+            counts['failures'] += 1
+            self.requests += 1
+            self.failures += 1
+            self.rate_limited += int(rate_limited)
+            self._latencies.append(latency)
+
+    def summary(self) -> Dict[str, Any]:
+        """返回汇总字典；延迟单位为秒，cost 在未配置价格时为 None。"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            first_token = sorted(self._first_token_latencies)
+            elapsed = time.monotonic() - self._started
+            cost = None
+            for source, counts in self._by_source.items():
+                input_price, output_price = self._prices.get(
+                    source, (self.input_price_per_million, self.output_price_per_million))
+                if input_price is None and output_price is None:
+                    continue
+                cost = (cost or 0.0) + (counts['prompt_tokens'] * (input_price or 0)
+                                        + counts['completion_tokens'] * (output_price or 0)) / 1_000_000
+            total_tokens = self.prompt_tokens + self.completion_tokens
+            return {
+                'requests': self.requests,
+                'failures': self.failures,
+                'rate_limited': self.rate_limited,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'total_tokens': total_tokens,
+                'usage_estimated': self.estimated_requests > 0,
+                'cost': cost,
+                'latency_p50': _percentile(latencies, 0.5),
+                'latency_p95': _percentile(latencies, 0.95),
+                'first_token_p50': _percentile(first_token, 0.5),
+                'elapsed': elapsed,
+                'tokens_per_second': total_tokens / elapsed if elapsed > 0 else 0.0,
+                'by_provider': {source: dict(counts) for source, counts in self._by_source.items() if source},
+            }
+
+
+def format_usage_summary(summary: Dict[str, Any]) -> str:
+    """将 AIUsageTracker.summary() 格式化为一行便于阅读的文字。"""
+    parts = [
+        _("请求 {} 次（失败 {}，限流 {}）").format(summary['requests'], summary['failures'], summary['rate_limited']),
+        _("Token {}（输入 {} / 输出 {}）{}").format(
+            summary['total_tokens'], summary['prompt_tokens'], summary['completion_tokens'],
+            _("，含估算值") if summary['usage_estimated'] else ""),
+    ]
+    if summary['cost'] is not None:
+        parts.append(_("估算费用 {:.4f}").format(summary['cost']))
+    if summary['latency_p50'] is not None:
+        parts.append(_("延迟 p50 {:.2f}s / p95 {:.2f}s").format(summary['latency_p50'], summary['latency_p95']))
+    if summary['first_token_p50'] is not None:
+        parts.append(_("首字 p50 {:.2f}s").format(summary['first_token_p50']))
+    parts.append(_("吞吐 {:.0f} token/s").format(summary['tokens_per_second']))
+    by_provider = summary.get('by_provider') or {}
+    if len(by_provider) > 1:
+        parts.append(_("按服务商: {}").format(", ".join(
+            _("{} 请求 {} 次").format(name, counts['requests']) for name, counts in by_provider.items())))
+    return "; ".join(parts)
@@ -1,13 +1,17 @@
 import json
 import requests
 import logging
-from typing import Dict, Any, Optional, List
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional, List, Callable
 import threading
 import os
 import contextlib
 
 from requests.adapters import HTTPAdapter
 
+from cotton_toolkit.core.ai_usage import AIResponse, AIUsageTracker, estimate_tokens
+
 # 尝试导入 google.generativeai，如果失败则优雅处理
 try:
     import google.generativeai as genai
@@ -23,6 +27,43 @@ except ImportError:
 # --- 使用统一的日志系统 ---
 logger = logging.getLogger("cotton_toolkit.core.ai_wrapper")
 
+# 这些HTTP状态码表示服务暂时不可用，值得稍后重试；其余4xx错误（如密钥无效）重试也不会成功
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class AIRequestError(RuntimeError):
+    """AI请求失败。status_code 为服务商返回的HTTP状态码（网络错误时为 None）。"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status_code is None or self.status_code in RETRYABLE_STATUS_CODES
+
+
+class AIRateLimitError(AIRequestError):
+    """服务商返回 429（请求过于频繁）。retry_after 为服务商建议的等待秒数（如有）。"""
+
+
+def _parse_retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    """解析 Retry-After 响应头（秒数或HTTP日期）。"""
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
 
 @contextlib.contextmanager
 def temp_proxies(proxies: Optional[Dict[str, str]]):
@@ -60,7 +101,9 @@ class AIWrapper:
             model: str,
             base_url: Optional[str] = None,
             proxies: Optional[Dict[str, str]] = None,
-            max_workers: int = 4
+            max_workers: int = 4,
+            stream: bool = False,
+            usage_tracker: Optional[AIUsageTracker] = None
     ):
         if not provider or not api_key or not model:
             logger.error(_("AI服务商、API Key和模型名称不能为空。"))
@@ -70,6 +113,10 @@ class AIWrapper:
         self.api_key = api_key
         self.model = model
         self.proxies = proxies
+        self.stream = stream
+        self.usage_tracker = usage_tracker
+        # 流式请求是否附带 stream_options；服务商因该参数返回400时自动关闭
+        self.stream_usage_supported = True
         self.client = None
         self.session = None
         self.api_base = None
@@ -112,13 +159,27 @@ class AIWrapper:
                 self.session.proxies.update(self.proxies)
 
     def process(self, text: str, custom_prompt_template: str = "{text}", temperature: float = 0.7,
-                timeout: int = 90) -> str:
+                timeout: int = 90, stream: Optional[bool] = None,
+                on_delta: Optional[Callable[[str], None]] = None) -> str:
+        return self.process_with_usage(text, custom_prompt_template, temperature, timeout, stream, on_delta).text
+
+    def process_with_usage(self, text: str, custom_prompt_template: str = "{text}", temperature: float = 0.7,
+                           timeout: int = 90, stream: Optional[bool] = None,
+                           on_delta: Optional[Callable[[str], None]] = None) -> AIResponse:
+        """
+        发送一次请求，返回回复文本及token用量与延迟。
+        stream 为 True（默认取初始化时的设置）时以流式方式接收回复，on_delta 会收到每个增量片段，
+        同时记录首字延迟；超时按相邻两个片段之间的间隔计算，长回复不会因总时长超时。
+        设置了 usage_tracker 时成功与失败的请求都会计入统计。
+        """
         prompt = custom_prompt_template.format(text=text)
+        stream = self.stream if stream is None else stream
+        started = time.monotonic()
         try:
             if self.provider == 'google':
-                with temp_proxies(self.proxies):
-                    response = self.client.generate_content(prompt)
-                    return response.text.strip()
+                result = self._process_google(prompt, stream, on_delta, started)
+            elif stream:
+                result = self._process_openai_stream(prompt, temperature, timeout, on_delta, started)
             else:
                 url = f"{self.api_base}/chat/completions"
                 payload = {
@@ -129,9 +190,17 @@ class AIWrapper:
                 response = self.session.post(url, json=payload, timeout=timeout)
                 response.raise_for_status()
                 data = response.json()
-                return data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+                content = data.get("choices", [{}])[0].get("message", {}).get("content", "").strip()
+                result = self._make_response(prompt, content, data.get("usage"), started)
+            if self.usage_tracker:
+                self.usage_tracker.record(result, source=self.provider)
+            return result
         except requests.exceptions.RequestException as e:
             error_message = f"{_('AI API请求失败 (requests):')} {e}"
+            status_code = e.response.status_code if e.response is not None else None
+            if self.usage_tracker:
+                self.usage_tracker.record_failure(time.monotonic() - started, rate_limited=status_code == 429,
+                                                  source=self.provider)
             if e.response is not None:
                 try:
                     error_details = e.response.json()
@@ -139,14 +208,101 @@ class AIWrapper:
                     error_message += f"\n{_('服务商响应:')} {msg}"
                 except json.JSONDecodeError:
                     error_message += f"\n{_('服务商响应 (非JSON):')} {e.response.text}"
-            logger.error(error_message)
-            raise RuntimeError(error_message) from e
+            error_class = AIRateLimitError if status_code == 429 else AIRequestError
+            error = error_class(error_message, status_code=status_code, retry_after=_parse_retry_after(e.response))
+            # 可重试的错误由调用方决定是否重试，这里不再按错误级别记录，避免批处理时刷屏
+            if error.retryable:
+                logger.debug(error_message)
+            else:
+                logger.error(error_message)
+            raise error from e
         except Exception as e:
+            if self.usage_tracker:
+                self.usage_tracker.record_failure(time.monotonic() - started, source=self.provider)
             error_type = type(e).__name__
             error_message = f"{_('AI API处理时发生错误')} ({error_type}): {e}"
             logger.exception(error_message)
             raise RuntimeError(error_message) from e
 
+    @staticmethod
+    def _make_response(prompt: str, content: str, usage: Optional[Dict[str, Any]], started: float,
+                       first_token_latency: Optional[float] = None) -> AIResponse:
+        """根据服务商返回的 usage 构造结果；没有 usage 时按文本长度估算。"""
+        latency = time.monotonic() - started
+        if usage and usage.get("prompt_tokens") is not None:
+            return AIResponse(content, int(usage.get("prompt_tokens") or 0), int(usage.get("completion_tokens") or 0),
+                              latency, first_token_latency)
+        return AIResponse(content, estimate_tokens(prompt), estimate_tokens(content), latency, first_token_latency,
+                          usage_estimated=True)
+
+    def _process_openai_stream(self, prompt: str, temperature: float, timeout: int,
+                               on_delta: Optional[Callable[[str], None]], started: float) -> AIResponse:
+        """以 SSE 流式接收 chat/completions 回复。"""
+        url = f"{self.api_base}/chat/completions"
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": temperature,
+            "stream": True,
+        }
+        if self.stream_usage_supported:
+            # 要求在最后一个数据块中附带用量；服务商不返回用量时按估算值计
+            payload["stream_options"] = {"include_usage": True}
+        pieces: List[str] = []
+        usage = None
+        first_token_latency = None
+        stream_options_rejected = False
+        with self.session.post(url, json=payload, timeout=timeout, stream=True) as response:
+            if response.status_code == 400 and "stream_options" in payload and "stream_options" in response.text:
+                stream_options_rejected = True
+            else:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or usage
+                    for choice in chunk.get("choices") or []:
+                        delta = (choice.get("delta") or {}).get("content")
+                        if not delta:
+                            continue
+                        if first_token_latency is None:
+                            first_token_latency = time.monotonic() - started
+                        pieces.append(delta)
+                        if on_delta:
+                            on_delta(delta)
+        if stream_options_rejected:
+            # 严格的OpenAI兼容服务不接受 stream_options：记住这一点，去掉该参数重试一次
+            logger.info(_("服务商 '{}' 不支持 stream_options 参数，将不再请求流式用量统计。").format(self.provider))
+            self.stream_usage_supported = False
+            return self._process_openai_stream(prompt, temperature, timeout, on_delta, started)
+        return self._make_response(prompt, "".join(pieces).strip(), usage, started, first_token_latency)
+
+    def _process_google(self, prompt: str, stream: bool, on_delta: Optional[Callable[[str], None]],
+                        started: float) -> AIResponse:
+        with temp_proxies(self.proxies):
+            response = self.client.generate_content(prompt, stream=stream)
+            first_token_latency = None
+            if stream:
+                pieces = []
+                for chunk in response:
+                    if first_token_latency is None:
+                        first_token_latency = time.monotonic() - started
+                    pieces.append(chunk.text)
+                    if on_delta:
+                        on_delta(chunk.text)
+                content = "".join(pieces).strip()
+            else:
+                content = response.text.strip()
+        metadata = getattr(response, 'usage_metadata', None)
+        usage = None
+        if metadata is not None and getattr(metadata, 'prompt_token_count', None) is not None:
+            usage = {"prompt_tokens": metadata.prompt_token_count,
+                     "completion_tokens": getattr(metadata, 'candidates_token_count', 0)}
+        return self._make_response(prompt, content, usage, started, first_token_latency)
 
     @staticmethod
     def get_models(
@@ -0,0 +1,160 @@
+# cotton_toolkit/core/blast_cache.py
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+import pandas as pd
+from diskcache import Cache
+
+from cotton_toolkit import BLAST_CACHE_DIR
+from cotton_toolkit.config.models import MainConfig
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.blast_cache")
+
+# 缓存条目结构版本，结构变化时递增，旧条目自然不会再被命中
+CACHE_ENTRY_VERSION = 1
+
+
+def sequence_digest(sequence: str) -> str:
+    """查询序列的哈希，与序列ID无关，大小写不敏感。"""
+    return hashlib.sha1(sequence.upper().encode('ascii', errors='replace')).hexdigest()
+
+
+def get_database_fingerprint(db_fasta_path: str) -> str:
+    """以数据库序列文件的路径、大小与修改时间作为指纹，文件被重新下载或解压后缓存自动失效。"""
+    stat = os.stat(db_fasta_path)
+    raw = f"{os.path.abspath(db_fasta_path)}|{stat.st_size}|{int(stat.st_mtime)}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def get_parameters_key(**params: Any) -> str:
+    """将BLAST参数规范化为稳定的字符串（参数顺序无关）。"""
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:16]
+
+
+class BlastHitCache:
+    """
+    基于 diskcache 的单条查询命中表缓存。
+    键为 (序列哈希, 数据库指纹, 参数哈希)，值为该查询的全部命中行（不含 Query_ID，读取时按当前ID回填），
+    没有命中的查询同样会被缓存为空表，避免重复搜索。超出容量后按最近最少使用淘汰。
+    """
+
+    def __init__(self, directory: str, size_limit_mb: int = 1024):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self._cache = Cache(directory, size_limit=int(size_limit_mb) * 1024 * 1024,
+                            eviction_policy='least-recently-used')
+        # 开启 diskcache 自带的持久化命中统计
+        self._cache.stats(enable=True)
+        self._lock = threading.Lock()
+        self.session_hits = 0
+        self.session_misses = 0
+
+    @staticmethod
+    def _make_key(digest: str, db_fingerprint: str, params_key: str) -> str:
+        return f"v{CACHE_ENTRY_VERSION}|{db_fingerprint}|{params_key}|{digest}"
+
+    def lookup(
+            self,
+            records: List[Tuple[str, str]],
+            db_fingerprint: str,
+            params_key: str
+    ) -> Tuple[pd.DataFrame, List[Tuple[str, str]]]:
+        """
+        查询一批 (ID, 序列) 记录。
+        返回 (已缓存的命中表（Query_ID 已替换为当前ID）, 需要重新搜索的记录列表)。
+        """
+        cached_frames, missing = [], []
+        for query_id, sequence in records:
+            entry = self._cache.get(self._make_key(sequence_digest(sequence), db_fingerprint, params_key))
+            if entry is None:
+                missing.append((query_id, sequence))
+                continue
+            columns, rows = entry
+            if rows:
+                frame = pd.DataFrame.from_records(rows, columns=columns)
+                frame.insert(0, 'Query_ID', query_id)
+                cached_frames.append(frame)
+
+        with self._lock:
+            self.session_hits += len(records) - len(missing)
+            self.session_misses += len(missing)
+
+        cached_df = pd.concat(cached_frames, ignore_index=True) if cached_frames else pd.DataFrame()
+        return cached_df, missing
+
+    def store(
+            self,
+            records: List[Tuple[str, str]],
+            results_df: Optional[pd.DataFrame],
+            db_fingerprint: str,
+            params_key: str
+    ) -> None:
+        """将一批记录的搜索结果按查询拆分写入缓存，未出现在结果中的查询记为“无命中”。"""
+        grouped: Dict[str, pd.DataFrame] = {}
+        columns: List[str] = []
+        if results_df is not None and not results_df.empty:
+            columns = [c for c in results_df.columns if c != 'Query_ID']
+            grouped = {query_id: group for query_id, group in results_df.groupby('Query_ID', sort=False)}
+
+        for query_id, sequence in records:
+            group = grouped.get(query_id)
+            rows = list(group[columns].itertuples(index=False, name=None)) if group is not None else []
+            self._cache.set(self._make_key(sequence_digest(sequence), db_fingerprint, params_key), (columns, rows))
+
+    def stats(self) -> Dict[str, int]:
+        """返回本次会话与累计的命中/未命中次数，以及缓存占用。"""
+        total_hits, total_misses = self._cache.stats()
+        return {
+            'session_hits': self.session_hits,
+            'session_misses': self.session_misses,
+            'total_hits': total_hits,
+            'total_misses': total_misses,
+            'entries': len(self._cache),
+            'size_bytes': self._cache.volume(),
+        }
+
+    def clear(self) -> None:
+        self._cache.clear()
+        self._cache.stats(reset=True)
+
+    def close(self) -> None:
+        self._cache.close()
+
+
+_CACHE_INSTANCES: Dict[str, BlastHitCache] = {}
+_CACHE_INSTANCES_LOCK = threading.Lock()
+
+
+def get_blast_hit_cache(config: MainConfig) -> Optional[BlastHitCache]:
+    """
+    获取项目的BLAST命中缓存（同一目录在进程内共享一个实例）。
+    缓存被禁用或无法创建时返回 None，调用方应直接执行BLAST。
+    """
+    if not config.blast.cache_enabled or not config.config_file_abs_path_:
+        return None
+
+    project_root = os.path.dirname(config.config_file_abs_path_)
+    directory = os.path.join(project_root, BLAST_CACHE_DIR)
+    with _CACHE_INSTANCES_LOCK:
+        cache = _CACHE_INSTANCES.get(directory)
+        if cache is None:
+            try:
+                cache = BlastHitCache(directory, size_limit_mb=config.blast.cache_size_limit_mb)
+            except Exception as e:
+                logger.warning(_("无法打开BLAST结果缓存 {}，将不使用缓存: {}").format(directory, e))
+                return None
+            _CACHE_INSTANCES[directory] = cache
+        return cache
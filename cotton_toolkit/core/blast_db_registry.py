@@ -0,0 +1,350 @@
+# cotton_toolkit/core/blast_db_registry.py
+import glob
+import gzip
+import logging
+import os
+import re
+import subprocess
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from cotton_toolkit.config.loader import get_genome_data_sources, get_local_downloaded_file_path
+from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.utils.file_utils import inter_process_file_lock
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.blast_db_registry")
+
+# 每种数据库类型对应的下载文件键
+DB_TYPE_FILE_KEYS = {'nucl': 'predicted_cds', 'prot': 'predicted_protein'}
+
+MAKEBLASTDB_NOT_FOUND_MSG = _(
+    "错误: 'makeblastdb' 命令未找到。请确保 BLAST+ 已被正确安装并添加到了系统的 PATH 环境变量中。\n\n"
+    "官方下载地址:\nhttps://ftp.ncbi.nlm.nih.gov/blast/executables/blast+/LATEST/")
+
+_INFO_COUNTS_PATTERN = re.compile(r'([\d,]+)\s+sequences;\s+([\d,]+)\s+total\s+(?:bases|residues)')
+
+
+class BlastDatabaseInfo(NamedTuple):
+    """已就绪的BLAST数据库及其元数据；无法获取的统计值为 None。"""
+    assembly_id: str
+    db_type: str
+    db_path: str
+    num_sequences: Optional[int]
+    total_length: Optional[int]
+    volumes: Tuple[str, ...]
+    parse_seqids: bool
+
+
+def get_blast_db_type(blast_type: str) -> str:
+    """blastp/blastx 搜索蛋白库，其余搜索核酸库。"""
+    return 'prot' if blast_type in ('blastp', 'blastx') else 'nucl'
+
+
+def _index_prefix(db_type: str) -> str:
+    return 'p' if db_type == 'prot' else 'n'
+
+
+def _database_marker_files(db_path: str, db_type: str) -> List[str]:
+    """
+    返回能够证明数据库存在的文件：多分卷数据库为别名文件（.nal/.pal）及各分卷头文件，
+    单卷数据库为头文件（.nhr/.phr）。
+    """
+    prefix = _index_prefix(db_type)
+    alias_file = f"{db_path}.{prefix}al"
+    if os.path.exists(alias_file):
+        return [alias_file] + sorted(glob.glob(f"{glob.escape(db_path)}.[0-9][0-9]*.{prefix}hr"))
+    header_file = f"{db_path}.{prefix}hr"
+    return [header_file] if os.path.exists(header_file) else []
+
+
+def _database_has_seqids(db_path: str, db_type: str) -> bool:
+    """以 -parse_seqids 建库时会生成 .nog/.pog 文件（多分卷时位于各分卷）。"""
+    prefix = _index_prefix(db_type)
+    return bool(glob.glob(f"{glob.escape(db_path)}.{prefix}og") or
+                glob.glob(f"{glob.escape(db_path)}.[0-9][0-9]*.{prefix}og"))
+
+
+def _remove_database_files(db_path: str, db_type: str) -> None:
+    """删除某个数据库的全部索引文件（含分卷），不会触碰序列文件本身。"""
+    pattern = re.compile(re.escape(os.path.basename(db_path)) +
+                         r'(\.\d{2,})?\.' + _index_prefix(db_type) + r'(hr|in|sq|og|sd|si|os|ot|tf|to|db|js|al|ni|pi)$')
+    for path in glob.glob(f"{glob.escape(db_path)}.*"):
+        if pattern.match(os.path.basename(path)):
+            os.remove(path)
+
+
+def _is_decompressed(source_path: str) -> bool:
+    """非压缩文件（或压缩包不存在），或解压结果存在且不早于压缩包。"""
+    if not source_path.endswith('.gz') or not os.path.exists(source_path):
+        return True
+    decompressed_path = source_path.removesuffix('.gz')
+    return os.path.exists(decompressed_path) and os.path.getmtime(source_path) <= os.path.getmtime(decompressed_path)
+
+
+def blast_database_is_current(db_path: str, db_type: str) -> bool:
+    """数据库文件存在、不早于序列文件，且序列文件不早于其 .gz 原始文件时视为最新。"""
+    markers = _database_marker_files(db_path, db_type)
+    if not markers or not _is_decompressed(db_path + '.gz'):
+        return False
+    if os.path.exists(db_path):
+        source_mtime = os.path.getmtime(db_path)
+        return all(os.path.getmtime(marker) >= source_mtime for marker in markers)
+    return True
+
+
+def get_blast_db_source_path(config: MainConfig, assembly_id: str, db_type: str) -> str:
+    """
+    返回某个基因组用于建库的已下载序列文件（可能为 .gz）。
+    基因组未配置或文件未下载时抛出异常。
+    """
+    genome_info = get_genome_data_sources(config).get(assembly_id)
+    if not genome_info:
+        raise ValueError(_("错误: 无法找到目标基因组 '{}' 的配置。").format(assembly_id))
+
+    seq_file_key = DB_TYPE_FILE_KEYS[db_type]
+    source_path = get_local_downloaded_file_path(config, genome_info, seq_file_key)
+    if not source_path or not os.path.exists(source_path):
+        raise FileNotFoundError(_("错误: 未找到目标基因组的 '{}' 序列文件。请先下载数据。").format(seq_file_key))
+    return source_path
+
+
+def list_blast_databases(config: MainConfig, assembly_id: Optional[str] = None) -> List[Tuple[str, str, str]]:
+    """
+    列出所有可以建库的 (基因组ID, 数据库类型, 数据库路径)，即相应序列文件已下载的组合。
+    指定 assembly_id 时只列出该基因组。
+    """
+    genome_sources = get_genome_data_sources(config) or {}
+    if assembly_id is not None:
+        genome_sources = {assembly_id: genome_sources[assembly_id]} if assembly_id in genome_sources else {}
+
+    databases = []
+    for genome_id, genome_info in genome_sources.items():
+        for db_type, seq_file_key in DB_TYPE_FILE_KEYS.items():
+            if not getattr(genome_info, f"{seq_file_key}_url", None):
+                continue
+            source_path = get_local_downloaded_file_path(config, genome_info, seq_file_key)
+            if source_path and os.path.exists(source_path):
+                databases.append((genome_id, db_type, source_path.removesuffix('.gz')))
+    return databases
+
+
+def _decompress_source(source_path: str, check_cancel: Callable[[], bool]) -> Optional[str]:
+    """
+    必要时将 .gz 序列文件解压到同目录（先写临时文件再原子替换，避免其它进程读到半个文件）。
+    返回解压后的路径；被取消时返回 None。
+    """
+    decompressed_path = source_path.removesuffix('.gz')
+    if _is_decompressed(source_path):
+        return decompressed_path
+
+    logger.info(_("正在解压 {} 到 {}...").format(os.path.basename(source_path), os.path.basename(decompressed_path)))
+    tmp_path = decompressed_path + '.part'
+    try:
+        with gzip.open(source_path, 'rb') as f_in, open(tmp_path, 'wb') as f_out:
+            while True:
+                if check_cancel():
+                    break
+                chunk = f_in.read(1024 * 1024)
+                if not chunk:
+                    break
+                f_out.write(chunk)
+        if check_cancel():
+            os.remove(tmp_path)
+            return None
+        os.replace(tmp_path, decompressed_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise IOError(_("解压文件时出错: {}").format(e))
+    logger.info(_("解压成功。"))
+    return decompressed_path
+
+
+def _run_makeblastdb(db_path: str, db_type: str, title: str, parse_seqids: bool,
+                     max_file_size: Optional[str]) -> subprocess.CompletedProcess:
+    cmd = ["makeblastdb", "-in", db_path, "-dbtype", db_type, "-out", db_path, "-title", title]
+    if parse_seqids:
+        cmd.append("-parse_seqids")
+    if max_file_size:
+        cmd.extend(["-max_file_sz", str(max_file_size)])
+    logger.debug(_("执行建库命令: {}").format(" ".join(cmd)))
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
+    except FileNotFoundError:
+        raise FileNotFoundError(MAKEBLASTDB_NOT_FOUND_MSG)
+
+
+def build_blast_database(config: MainConfig, assembly_id: str, db_type: str, db_path: str) -> None:
+    """
+    对已解压的序列文件运行 makeblastdb（调用方负责加锁）。
+    按配置使用 -parse_seqids 与 -max_file_sz；若序列ID不满足 -parse_seqids 的要求则退回普通建库。
+    """
+    title = f"{assembly_id} {db_type} DB"
+    parse_seqids = config.blast.parse_seqids
+    _remove_database_files(db_path, db_type)
+
+    result = _run_makeblastdb(db_path, db_type, title, parse_seqids, config.blast.db_max_file_size)
+    if result.returncode != 0 and parse_seqids:
+        logger.warning(_("使用 -parse_seqids 建库失败（序列ID可能过长或重复），将改为普通建库: {}").format(
+            result.stderr.strip()))
+        _remove_database_files(db_path, db_type)
+        result = _run_makeblastdb(db_path, db_type, title, False, config.blast.db_max_file_size)
+
+    if result.returncode != 0:
+        if not _database_marker_files(db_path, db_type):
+            raise RuntimeError(_("创建BLAST数据库失败: {} \nStderror: {}").format(result.stdout, result.stderr))
+        # 索引文件已生成，说明只是退出码有问题，后续的 blastdbcmd 校验会兜底
+        logger.warning(_("makeblastdb命令返回了非零退出码，但数据库索引文件已成功创建。将继续执行..."))
+        logger.debug(f"makeblastdb stdout:\n{result.stdout}")
+        logger.debug(f"makeblastdb stderr:\n{result.stderr}")
+    logger.info(_("BLAST数据库 {} 创建成功。").format(os.path.basename(db_path)))
+
+
+def _read_info_with_blastdbcmd(db_path: str, db_type: str) -> Optional[Tuple[int, int, Tuple[str, ...]]]:
+    """
+    运行 blastdbcmd -info 校验数据库并读取 (序列数, 总长度, 分卷列表)。
+    数据库损坏或不完整时返回 None；未安装 blastdbcmd 时抛出 FileNotFoundError。
+    """
+    result = subprocess.run(["blastdbcmd", "-db", db_path, "-dbtype", db_type, "-info"],
+                            capture_output=True, text=True, encoding='utf-8', errors='ignore')
+    match = _INFO_COUNTS_PATTERN.search(result.stdout)
+    if result.returncode != 0 or not match:
+        logger.debug(_("blastdbcmd 校验失败: {}").format(result.stderr.strip()))
+        return None
+
+    volumes, in_volumes = [], False
+    for line in result.stdout.splitlines():
+        if line.strip() == 'Volumes:':
+            in_volumes = True
+        elif in_volumes and line.strip():
+            volumes.append(line.strip())
+    return int(match.group(1).replace(',', '')), int(match.group(2).replace(',', '')), tuple(volumes) or (db_path,)
+
+
+def _read_info_from_fasta(db_path: str) -> Tuple[Optional[int], Optional[int]]:
+    """没有 blastdbcmd 时的退路：直接扫描序列文件统计条数与总长度。"""
+    if not os.path.exists(db_path):
+        return None, None
+    num_sequences, total_length = 0, 0
+    with open(db_path, 'r', encoding='utf-8', errors='ignore') as handle:
+        for line in handle:
+            if line.startswith('>'):
+                num_sequences += 1
+            else:
+                total_length += len(line.strip())
+    return num_sequences, total_length
+
+
+_blastdbcmd_available = True
+_METADATA_CACHE: Dict[Tuple[str, str], Tuple[float, BlastDatabaseInfo]] = {}
+_METADATA_CACHE_LOCK = threading.Lock()
+
+
+def get_blast_database_info(db_path: str, db_type: str, assembly_id: str = '') -> Optional[BlastDatabaseInfo]:
+    """
+    校验数据库并返回其元数据，结果按索引文件的修改时间缓存。
+    数据库不存在或 blastdbcmd 校验失败时返回 None。
+    """
+    global _blastdbcmd_available
+    markers = _database_marker_files(db_path, db_type)
+    if not markers:
+        return None
+    signature = max(os.path.getmtime(marker) for marker in markers)
+
+    key = (db_path, db_type)
+    with _METADATA_CACHE_LOCK:
+        cached = _METADATA_CACHE.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+    volumes = (db_path,)
+    num_sequences = total_length = None
+    if _blastdbcmd_available:
+        try:
+            info = _read_info_with_blastdbcmd(db_path, db_type)
+            if info is None:
+                return None
+            num_sequences, total_length, volumes = info
+        except FileNotFoundError:
+            _blastdbcmd_available = False
+            logger.warning(_("未找到 'blastdbcmd'，将跳过BLAST数据库完整性校验。"))
+    if not _blastdbcmd_available:
+        num_sequences, total_length = _read_info_from_fasta(db_path)
+
+    info = BlastDatabaseInfo(assembly_id=assembly_id, db_type=db_type, db_path=db_path,
+                             num_sequences=num_sequences, total_length=total_length, volumes=volumes,
+                             parse_seqids=_database_has_seqids(db_path, db_type))
+    with _METADATA_CACHE_LOCK:
+        _METADATA_CACHE[key] = (signature, info)
+    return info
+
+
+def ensure_blast_database(
+        config: MainConfig,
+        assembly_id: str,
+        db_type: str,
+        check_cancel: Optional[Callable[[], bool]] = None,
+        progress: Optional[Callable[[int, str], None]] = None,
+        force: bool = False
+) -> Optional[BlastDatabaseInfo]:
+    """
+    确保某个基因组的 nucl/prot 数据库可用并返回其信息；任务被取消时返回 None。
+    解压与建库在跨进程文件锁内进行，多个任务（包括其它进程）同时请求同一个库时只会构建一次。
+    已存在但过期（序列文件更新过）或无法通过 blastdbcmd 校验的数据库会被重建。
+    """
+    check_cancel = check_cancel or (lambda: False)
+    progress = progress or (lambda p, m: None)
+
+    source_path = get_blast_db_source_path(config, assembly_id, db_type)
+    db_path = source_path.removesuffix('.gz')
+    logger.debug(_("BLAST 数据库序列源文件: {}").format(source_path))
+
+    # 快速路径：数据库已是最新时不需要加锁
+    if not force and _is_decompressed(source_path) and blast_database_is_current(db_path, db_type):
+        info = get_blast_database_info(db_path, db_type, assembly_id)
+        if info is not None:
+            return info
+
+    with inter_process_file_lock(db_path + '.lock', check_cancel=check_cancel) as acquired:
+        if not acquired:
+            return None
+
+        progress(8, _("正在检查序列文件..."))
+        db_fasta_path = _decompress_source(source_path, check_cancel)
+        if db_fasta_path is None:
+            return None
+
+        # 等锁期间其它进程可能已经建好了数据库
+        if not force and blast_database_is_current(db_fasta_path, db_type):
+            info = get_blast_database_info(db_fasta_path, db_type, assembly_id)
+            if info is not None:
+                return info
+            logger.warning(_("BLAST数据库 {} 未通过完整性校验，将重新创建。").format(os.path.basename(db_fasta_path)))
+
+        if check_cancel():
+            return None
+        progress(10, _("正在创建BLAST数据库... (可能需要一些时间)"))
+        logger.info(_("正在为 '{}' 创建一个新的 {} 库...").format(os.path.basename(db_fasta_path), db_type))
+        build_blast_database(config, assembly_id, db_type, db_fasta_path)
+
+        info = get_blast_database_info(db_fasta_path, db_type, assembly_id)
+        if info is None:
+            raise RuntimeError(_("新创建的BLAST数据库 {} 未通过 blastdbcmd 校验。").format(db_fasta_path))
+        return info
+
+
+def clear_blast_db_metadata_cache():
+    """清空内存中缓存的数据库元数据（例如手动替换了数据库文件之后）。"""
+    global _blastdbcmd_available
+    with _METADATA_CACHE_LOCK:
+        _METADATA_CACHE.clear()
+    _blastdbcmd_available = True
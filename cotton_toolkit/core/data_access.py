@@ -5,14 +5,15 @@ import os
 import sqlite3
 import threading
 from random import sample
-from typing import List, Tuple, Optional, Callable
+from typing import List, Tuple, Optional, Callable, Iterator
 import logging
 import pandas as pd
 
-from cotton_toolkit import PREPROCESSED_DB_NAME
+from cotton_toolkit import PREPROCESSED_DB_NAME, PACKED_SEQ_DIR
 from cotton_toolkit.config.loader import get_genome_data_sources, get_local_downloaded_file_path
 from cotton_toolkit.config.models import MainConfig
 from cotton_toolkit.core.convertXlsx2csv import _find_header_row
+from cotton_toolkit.core.packed_sequence_store import load_packed_sequence_store
 from cotton_toolkit.utils.file_utils import _sanitize_table_name
 from cotton_toolkit.utils.gene_utils import logger, _, resolve_gene_ids, _to_gene_id, _to_transcript_id
 
@@ -26,21 +27,11 @@ logger = logging.getLogger("cotton_toolkit.pipeline.data_access")
 
 # 文件路径: cotton_toolkit/core/data_access.py
 
-def get_sequences_for_gene_ids(
-        config: MainConfig,
-        source_assembly_id: str,
-        gene_ids: List[str],
-        sequence_type: str = 'cds'  # 【修改】新增参数，默认为 'cds' 以保持向后兼容
-) -> Tuple[Optional[str], List[str]]:
+def _locate_sequence_table(config: MainConfig, source_assembly_id: str, sequence_type: str) -> Tuple[str, str, str]:
     """
-    根据基因ID列表，从预处理的SQLite数据库中检索FASTA格式的CDS或蛋白质序列。
-    它会智能地将用户ID解析为数据库中存在的规范ID（优先使用转录本ID），
-    并在FASTA头中使用这些数据库中正确的ID。
+    根据 sequence_type 确定序列所在的数据库与表名。
+    返回 (project_root, db_path, table_name)。
     """
-    if not gene_ids:
-        return "", []
-
-    # --- 根据 sequence_type 动态确定要查询的文件和表名 ---
     project_root = os.path.dirname(config.config_file_abs_path_)
     db_path = os.path.join(project_root, "genomes", "genomes.db")
     if not os.path.exists(db_path):
@@ -59,8 +50,68 @@ def get_sequences_for_gene_ids(
         )
 
     table_name = _sanitize_table_name(os.path.basename(seq_file_path), version_id=source_genome_info.version_id)
+    return project_root, db_path, table_name
+
+
+def _iter_table_sequences(db_path: str, table_name: str, db_ids: Optional[List[str]],
+                          batch_size: int) -> Iterator[Tuple[str, str]]:
+    """
+    从SQLite游标中逐批读取序列。db_ids 为 None 时导出整张表，否则按给定顺序产出。
+    """
+    try:
+        with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
+            cursor = conn.cursor()
+            if db_ids is None:
+                cursor.execute(f'SELECT Gene, Seq FROM "{table_name}"')
+                while True:
+                    rows = cursor.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for gene, seq in rows:
+                        if seq:
+                            yield gene, seq
+                return
+
+            for i in range(0, len(db_ids), batch_size):
+                batch = db_ids[i:i + batch_size]
+                placeholders = ','.join('?' for _c in batch)
+                query = f'SELECT Gene, Seq FROM "{table_name}" WHERE Gene IN ({placeholders})'
+                batch_sequences = dict(cursor.execute(query, batch).fetchall())
+                for db_id in batch:
+                    sequence = batch_sequences.get(db_id)
+                    if sequence:
+                        yield db_id, sequence
+    except sqlite3.Error as e:
+        error_msg = _("批量获取序列时发生数据库错误: {}").format(e)
+        logger.error(error_msg)
+        raise sqlite3.Error(error_msg) from e
+
+
+def stream_sequences_for_gene_ids(
+        config: MainConfig,
+        source_assembly_id: str,
+        gene_ids: Optional[List[str]],
+        sequence_type: str = 'cds',
+        batch_size: int = 500
+) -> Tuple[Iterator[Tuple[str, str]], List[str]]:
+    """
+    流式版本的序列检索。ID解析会立即完成，序列则由返回的生成器逐批从数据库游标
+    （或CDS的2-bit压缩存储）中读取，按用户输入顺序产出 (数据库ID, 序列)，不会一次性载入内存。
+
+    gene_ids 为 None 时导出该基因组的全部序列。
+    返回 (记录生成器, 未找到的基因ID列表)。
+    """
+    project_root, db_path, table_name = _locate_sequence_table(config, source_assembly_id, sequence_type)
 
-    # --- 后续的ID解析和序列提取逻辑无需修改，因为它们是通用的 ---
+    # CDS优先从2-bit压缩存储读取（如果预处理时已构建），避免查询SQLite中的大文本列
+    packed_store = None
+    if sequence_type != 'protein':
+        packed_store = load_packed_sequence_store(os.path.join(project_root, PACKED_SEQ_DIR), table_name)
+
+    if gene_ids is None:
+        if packed_store is not None:
+            return packed_store.iter_sequences(packed_store.ids.tolist()), []
+        return _iter_table_sequences(db_path, table_name, None, batch_size), []
 
     # 1. Generate all possible ID variations for all unique user IDs.
     unique_user_ids = list(dict.fromkeys(gene_ids))
@@ -73,27 +124,29 @@ def get_sequences_for_gene_ids(
 
     # 2. Find which of these potential IDs actually exist in the DB in one batched query.
     existing_db_ids = set()
-    try:
-        with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-            if cursor.fetchone() is None:
-                raise ValueError(_("错误: 在数据库中找不到表 '{}'。请确保对应的文件已预处理。").format(table_name))
-
-            batch_size = 500
-            potential_list = list(all_potential_ids)
-            for i in range(0, len(potential_list), batch_size):
-                batch = potential_list[i:i + batch_size]
-                placeholders = ','.join('?' for _9 in batch)
-                query = f'SELECT Gene FROM "{table_name}" WHERE Gene IN ({placeholders})'
-                cursor.execute(query, batch)
-                for row in cursor.fetchall():
-                    existing_db_ids.add(row[0])
-
-    except (sqlite3.Error, ValueError) as e:
-        error_msg = _("查询序列时发生数据库错误: {}").format(e)
-        logger.error(error_msg)
-        raise sqlite3.Error(error_msg) from e
+    if packed_store is not None:
+        existing_db_ids = {pot_id for pot_id in all_potential_ids if pot_id in packed_store}
+    else:
+        try:
+            with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
+                if cursor.fetchone() is None:
+                    raise ValueError(_("错误: 在数据库中找不到表 '{}'。请确保对应的文件已预处理。").format(table_name))
+
+                potential_list = list(all_potential_ids)
+                for i in range(0, len(potential_list), batch_size):
+                    batch = potential_list[i:i + batch_size]
+                    placeholders = ','.join('?' for _9 in batch)
+                    query = f'SELECT Gene FROM "{table_name}" WHERE Gene IN ({placeholders})'
+                    cursor.execute(query, batch)
+                    for row in cursor.fetchall():
+                        existing_db_ids.add(row[0])
+
+        except (sqlite3.Error, ValueError) as e:
+            error_msg = _("查询序列时发生数据库错误: {}").format(e)
+            logger.error(error_msg)
+            raise sqlite3.Error(error_msg) from e
 
     # 3. Resolve which user ID maps to which existing DB ID based on the preferred order.
     resolved_map = {}  # { user_id: db_id }
@@ -114,38 +167,43 @@ def get_sequences_for_gene_ids(
                                                                                     '...' if len(
                                                                                         not_found_genes) > 5 else '')))
 
-    # 4. Fetch all required sequences in a single query.
-    db_ids_to_fetch = list(set(resolved_map.values()))
-    if not db_ids_to_fetch:
-        return "", not_found_genes
+    # 4. Keep the user's order and emit each database ID only once.
+    db_ids_to_fetch = list(dict.fromkeys(resolved_map[user_id] for user_id in unique_user_ids
+                                         if user_id in resolved_map))
+    if packed_store is not None:
+        return packed_store.iter_sequences(db_ids_to_fetch), not_found_genes
+    return _iter_table_sequences(db_path, table_name, db_ids_to_fetch, batch_size), not_found_genes
+
+
+def count_sequences(config: MainConfig, source_assembly_id: str, sequence_type: str = 'cds') -> int:
+    """返回某个基因组预处理后的序列条数（用于在流式处理前估算进度）。"""
+    project_root, db_path, table_name = _locate_sequence_table(config, source_assembly_id, sequence_type)
+    if sequence_type != 'protein':
+        packed_store = load_packed_sequence_store(os.path.join(project_root, PACKED_SEQ_DIR), table_name)
+        if packed_store is not None:
+            return len(packed_store)
+    with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
+        return conn.execute(f'SELECT COUNT(*) FROM "{table_name}" WHERE Seq IS NOT NULL').fetchone()[0]
 
-    fasta_sequences = {}  # { db_id: sequence }
-    try:
-        with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
-            cursor = conn.cursor()
-            placeholders = ','.join('?' for _c in db_ids_to_fetch)
-            query = f'SELECT Gene, Seq FROM "{table_name}" WHERE Gene IN ({placeholders})'
-            cursor.execute(query, db_ids_to_fetch)
-            for gene, seq in cursor.fetchall():
-                fasta_sequences[gene] = seq
-    except sqlite3.Error as e:
-        error_msg = _("批量获取序列时发生数据库错误: {}").format(e)
-        logger.error(error_msg)
-        raise sqlite3.Error(error_msg) from e
 
-    # 5. Build the FASTA string, using the database ID for the header.
-    # Iterate through the original gene_ids list to maintain user's order.
-    fasta_parts = []
-    emitted_db_ids = set()  # Ensure each sequence is only output once
-    for user_id in gene_ids:
-        db_id = resolved_map.get(user_id)
-        if db_id and db_id not in emitted_db_ids:
-            sequence = fasta_sequences.get(db_id)
-            if sequence:
-                fasta_parts.append(f">{db_id}\n{sequence}")
-                emitted_db_ids.add(db_id)
-
-    fasta_string = "\n".join(fasta_parts)
+def get_sequences_for_gene_ids(
+        config: MainConfig,
+        source_assembly_id: str,
+        gene_ids: List[str],
+        sequence_type: str = 'cds'  # 【修改】新增参数，默认为 'cds' 以保持向后兼容
+) -> Tuple[Optional[str], List[str]]:
+    """
+    根据基因ID列表，从预处理的SQLite数据库中检索FASTA格式的CDS或蛋白质序列。
+    它会智能地将用户ID解析为数据库中存在的规范ID（优先使用转录本ID），
+    并在FASTA头中使用这些数据库中正确的ID。
+    大批量导出请使用 stream_sequences_for_gene_ids，避免拼接整个FASTA字符串。
+    """
+    if not gene_ids:
+        return "", []
+
+    records, not_found_genes = stream_sequences_for_gene_ids(config, source_assembly_id, gene_ids,
+                                                             sequence_type=sequence_type)
+    fasta_string = "\n".join(f">{db_id}\n{sequence}" for db_id, sequence in records)
     return fasta_string, not_found_genes
 
 
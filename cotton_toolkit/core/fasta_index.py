@@ -0,0 +1,351 @@
+# cotton_toolkit/core/fasta_index.py
+import gzip
+import logging
+import mmap
+import os
+import shutil
+import struct
+import threading
+import zlib
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, Optional, Callable, List, Tuple, Iterator
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.fasta_index")
+
+_COMPLEMENT_TABLE = str.maketrans('ACGTUMRWSYKVHDBNacgtumrwsykvhdbn', 'TGCAAKYWSRMBDHVNtgcaakywsrmbdhvn')
+_BGZF_MAGIC = b'\x1f\x8b\x08\x04'
+_BGZF_HEADER_SIZE = 18
+# 解压后的BGZF块缓存数量（每块最多64KB）
+_BGZF_BLOCK_CACHE_SIZE = 256
+
+
+def reverse_complement(sequence: str) -> str:
+    """返回核酸序列的反向互补序列，支持IUPAC简并碱基。"""
+    return sequence.translate(_COMPLEMENT_TABLE)[::-1]
+
+
+def is_bgzf(file_path: str) -> bool:
+    """判断文件是否为BGZF格式（bgzip压缩），此类文件可以直接随机访问。"""
+    try:
+        with open(file_path, 'rb') as f:
+            header = f.read(_BGZF_HEADER_SIZE)
+    except OSError:
+        return False
+    return len(header) == _BGZF_HEADER_SIZE and header[:4] == _BGZF_MAGIC and header[12:14] == b'BC'
+
+
+def get_indexable_fasta_path(fasta_path: str) -> str:
+    """
+    返回真正被建立索引的FASTA路径。
+    BGZF文件可直接索引；普通gzip文件需要先解压（与BLAST建库时的约定一致，去掉.gz后缀）。
+    """
+    if fasta_path.endswith('.gz') and not is_bgzf(fasta_path):
+        return fasta_path.removesuffix('.gz')
+    return fasta_path
+
+
+def _iter_bgzf_blocks(file_path: str) -> Iterator[Tuple[int, int]]:
+    """逐块扫描BGZF文件头，产出 (压缩偏移, 解压后块大小)，无需解压数据。"""
+    with open(file_path, 'rb') as f:
+        compressed_offset = 0
+        while True:
+            header = f.read(_BGZF_HEADER_SIZE)
+            if not header:
+                break
+            if len(header) < _BGZF_HEADER_SIZE or header[:4] != _BGZF_MAGIC:
+                raise ValueError(_("文件 '{}' 不是有效的BGZF格式。").format(os.path.basename(file_path)))
+            block_size = struct.unpack('<H', header[16:18])[0] + 1
+            f.seek(compressed_offset + block_size - 4)
+            isize = struct.unpack('<I', f.read(4))[0]
+            yield compressed_offset, isize
+            compressed_offset += block_size
+            f.seek(compressed_offset)
+
+
+def _write_gzi_index(bgzf_path: str, gzi_path: str):
+    """写出与 samtools 兼容的 .gzi 索引（压缩偏移与解压偏移的对应表）。"""
+    entries = []
+    uncompressed_offset = 0
+    for compressed_offset, isize in _iter_bgzf_blocks(bgzf_path):
+        if compressed_offset > 0:
+            entries.append((compressed_offset, uncompressed_offset))
+        uncompressed_offset += isize
+    with open(gzi_path, 'wb') as f:
+        f.write(struct.pack('<Q', len(entries)))
+        for compressed_offset, uncompressed_offset in entries:
+            f.write(struct.pack('<QQ', compressed_offset, uncompressed_offset))
+
+
+def build_fasta_index(
+        fasta_path: str,
+        force: bool = False,
+        cancel_event: Optional[threading.Event] = None,
+        progress_callback: Optional[Callable[[int, str], None]] = None
+) -> Optional[str]:
+    """
+    为基因组FASTA文件构建 faidx 风格的索引（.fai，与 samtools 兼容）。
+    - BGZF压缩文件：额外生成 .gzi 块索引，直接在压缩文件上随机访问。
+    - 普通gzip文件：先解压到同目录，再对解压后的文件建立索引。
+    返回被索引的FASTA路径；任务被取消时返回 None。
+    """
+    progress = progress_callback if progress_callback else lambda p, m: None
+    if not os.path.exists(fasta_path):
+        raise FileNotFoundError(_("FASTA文件不存在: {}").format(fasta_path))
+
+    indexed_path = get_indexable_fasta_path(fasta_path)
+    bgzf = indexed_path.endswith('.gz')
+    fai_path = indexed_path + '.fai'
+
+    if not force and os.path.exists(fai_path) and os.path.getmtime(fai_path) >= os.path.getmtime(fasta_path):
+        progress(100, _("FASTA索引已是最新。"))
+        return indexed_path
+
+    if indexed_path != fasta_path:
+        progress(0, _("正在解压基因组文件..."))
+        logger.info(_("正在解压 {} 以建立索引...").format(os.path.basename(fasta_path)))
+        with gzip.open(fasta_path, 'rb') as f_in, open(indexed_path, 'wb') as f_out:
+            shutil.copyfileobj(f_in, f_out, length=4 * 1024 * 1024)
+
+    logger.info(_("正在为 {} 建立FASTA索引...").format(os.path.basename(indexed_path)))
+    progress(5, _("正在扫描FASTA文件..."))
+
+    raw_handle = open(indexed_path, 'rb')
+    handle = gzip.GzipFile(fileobj=raw_handle, mode='rb') if bgzf else raw_handle
+    total_size = max(os.path.getsize(indexed_path), 1)
+    records = []
+    seen_names = set()
+
+    try:
+        # 当前记录状态: [name, length, offset, linebases, linewidth]
+        current = None
+        offset = 0
+        last_line_short = False
+        line_count = 0
+        for line in handle:
+            line_len = len(line)
+            if line.startswith(b'>'):
+                if current:
+                    records.append(current)
+                name = line[1:].split(None, 1)[0].decode('utf-8', errors='replace') if line[1:].strip() else ''
+                if not name or name in seen_names:
+                    raise ValueError(_("FASTA文件中存在空的或重复的序列名: '{}'").format(name))
+                seen_names.add(name)
+                current = [name, 0, offset + line_len, 0, 0]
+                last_line_short = False
+            elif current is not None:
+                bases = len(line.rstrip(b'\r\n'))
+                if current[3] == 0 and bases > 0 and not last_line_short:
+                    current[3], current[4] = bases, line_len
+                elif bases > 0 and (last_line_short or bases > current[3]):
+                    # 除最后一行外，同一序列的所有行必须等长
+                    raise ValueError(_("序列 '{}' 的行长度不一致，无法建立索引。").format(current[0]))
+                if bases < current[3] or bases == 0:
+                    last_line_short = True
+                current[1] += bases
+            offset += line_len
+
+            line_count += 1
+            if line_count % 200000 == 0:
+                if cancel_event and cancel_event.is_set():
+                    logger.info(_("FASTA索引构建已被取消。"))
+                    return None
+                position = raw_handle.tell()
+                progress(5 + int(position / total_size * 85), _("已扫描 {} 条序列...").format(len(records)))
+        if current:
+            records.append(current)
+    finally:
+        handle.close()
+        raw_handle.close()
+
+    tmp_path = fai_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for name, length, seq_offset, linebases, linewidth in records:
+            f.write(f"{name}\t{length}\t{seq_offset}\t{linebases}\t{linewidth}\n")
+    os.replace(tmp_path, fai_path)
+
+    if bgzf:
+        progress(92, _("正在写入BGZF块索引..."))
+        _write_gzi_index(indexed_path, indexed_path + '.gzi')
+
+    logger.info(_("FASTA索引构建完成: {} 条序列 -> {}").format(len(records), os.path.basename(fai_path)))
+    progress(100, _("FASTA索引构建完成。"))
+    return indexed_path
+
+
+class _BgzfReader:
+    """基于 .gzi 块索引的BGZF随机读取器，带有解压块的LRU缓存。"""
+
+    def __init__(self, bgzf_path: str, gzi_path: str):
+        with open(gzi_path, 'rb') as f:
+            count = struct.unpack('<Q', f.read(8))[0]
+            data = f.read(16 * count)
+        pairs = [struct.unpack_from('<QQ', data, 16 * i) for i in range(count)]
+        self._compressed_offsets = [0] + [p[0] for p in pairs]
+        self._uncompressed_offsets = [0] + [p[1] for p in pairs]
+        self._file = open(bgzf_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._cache: "OrderedDict[int, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _block(self, block_index: int) -> bytes:
+        cached = self._cache.get(block_index)
+        if cached is not None:
+            self._cache.move_to_end(block_index)
+            return cached
+        start = self._compressed_offsets[block_index]
+        block_size = struct.unpack('<H', self._mm[start + 16:start + 18])[0] + 1
+        # 跳过18字节的头部，末尾8字节为CRC32与ISIZE
+        data = zlib.decompress(self._mm[start + _BGZF_HEADER_SIZE:start + block_size - 8], -15)
+        self._cache[block_index] = data
+        if len(self._cache) > _BGZF_BLOCK_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return data
+
+    def read(self, offset: int, length: int) -> bytes:
+        chunks = []
+        with self._lock:
+            block_index = bisect_right(self._uncompressed_offsets, offset) - 1
+            in_block = offset - self._uncompressed_offsets[block_index]
+            while length > 0 and block_index < len(self._compressed_offsets):
+                data = self._block(block_index)
+                piece = data[in_block:in_block + length]
+                chunks.append(piece)
+                length -= len(piece)
+                block_index += 1
+                in_block = 0
+        return b''.join(chunks)
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class _MmapReader:
+    """未压缩FASTA的内存映射读取器。"""
+
+    def __init__(self, fasta_path: str):
+        self._file = open(fasta_path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read(self, offset: int, length: int) -> bytes:
+        return self._mm[offset:offset + length]
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+class IndexedFasta:
+    """
+    基于 .fai 索引的基因组FASTA随机访问读取器。
+    坐标采用GFF约定：1-based，闭区间。未压缩文件通过 mmap 读取，BGZF文件按块解压。
+    """
+
+    def __init__(self, fasta_path: str):
+        self.fasta_path = fasta_path
+        fai_path = fasta_path + '.fai'
+        if not os.path.exists(fai_path):
+            raise FileNotFoundError(_("未找到FASTA索引文件: {}").format(fai_path))
+
+        # seqid -> (length, offset, linebases, linewidth)
+        self.index: Dict[str, Tuple[int, int, int, int]] = {}
+        with open(fai_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                if len(parts) >= 5:
+                    self.index[parts[0]] = (int(parts[1]), int(parts[2]), int(parts[3]), int(parts[4]))
+        self._lower_names = {name.lower(): name for name in self.index}
+
+        if fasta_path.endswith('.gz'):
+            gzi_path = fasta_path + '.gzi'
+            if not os.path.exists(gzi_path):
+                raise FileNotFoundError(_("未找到BGZF块索引文件: {}").format(gzi_path))
+            self._reader = _BgzfReader(fasta_path, gzi_path)
+        else:
+            self._reader = _MmapReader(fasta_path)
+
+    def __contains__(self, seqid: str) -> bool:
+        return seqid in self.index
+
+    @property
+    def seqids(self) -> List[str]:
+        return list(self.index.keys())
+
+    def get_length(self, seqid: str) -> int:
+        return self.index[self.resolve_seqid(seqid)][0]
+
+    def resolve_seqid(self, seqid: str) -> str:
+        """将用户输入的染色体名匹配到索引中的序列名（先精确匹配，再忽略大小写）。"""
+        if seqid in self.index:
+            return seqid
+        resolved = self._lower_names.get(seqid.lower())
+        if resolved is None:
+            raise KeyError(_("序列 '{}' 不在基因组索引中。").format(seqid))
+        return resolved
+
+    def fetch(self, seqid: str, start: int, end: int, strand: str = '+') -> str:
+        """
+        提取 [start, end] 区间的序列（1-based，闭区间），超出染色体范围的部分会被截断。
+        strand 为 '-' 时返回反向互补序列。
+        """
+        seqid = self.resolve_seqid(seqid)
+        length, offset, linebases, linewidth = self.index[seqid]
+        start = max(1, int(start))
+        end = min(length, int(end))
+        if end < start:
+            return ''
+
+        begin0, end0 = start - 1, end
+        byte_start = offset + (begin0 // linebases) * linewidth + begin0 % linebases
+        byte_end = offset + (end0 // linebases) * linewidth + end0 % linebases
+        raw = self._reader.read(byte_start, byte_end - byte_start)
+        sequence = raw.translate(None, b'\r\n').decode('ascii', errors='replace')
+        return reverse_complement(sequence) if strand == '-' else sequence
+
+    def fetch_many(self, intervals: List[Tuple[str, int, int, str]]) -> List[str]:
+        """批量提取多个区间，每个区间为 (seqid, start, end, strand)。"""
+        return [self.fetch(seqid, start, end, strand) for seqid, start, end, strand in intervals]
+
+    def close(self):
+        self._reader.close()
+
+
+_READER_CACHE: Dict[str, Tuple[float, IndexedFasta]] = {}
+_READER_CACHE_LOCK = threading.Lock()
+
+
+def get_indexed_fasta(fasta_path: str) -> Optional[IndexedFasta]:
+    """
+    获取（并缓存）已建立索引的FASTA读取器；索引不存在时返回 None。
+    fasta_path 可以是下载的原始文件路径，会自动定位到实际被索引的文件。
+    """
+    if not fasta_path:
+        return None
+    indexed_path = get_indexable_fasta_path(fasta_path)
+    fai_path = indexed_path + '.fai'
+    if not os.path.exists(fai_path):
+        return None
+    mtime = os.path.getmtime(fai_path)
+    with _READER_CACHE_LOCK:
+        cached = _READER_CACHE.get(indexed_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        if cached:
+            cached[1].close()
+        try:
+            reader = IndexedFasta(indexed_path)
+        except (OSError, ValueError) as e:
+            logger.warning(_("加载FASTA索引 '{}' 失败: {}").format(os.path.basename(fai_path), e))
+            return None
+        _READER_CACHE[indexed_path] = (mtime, reader)
+        return reader
@@ -3,7 +3,6 @@
 import pandas as pd
 import gzip
 import os
-import openpyxl  # pandas 读取 .xlsx 文件需要此依赖
 import logging
 from typing import Optional
 
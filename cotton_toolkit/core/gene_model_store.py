@@ -0,0 +1,423 @@
+# cotton_toolkit/core/gene_model_store.py
+import gzip
+import io
+import logging
+import os
+import threading
+from typing import Dict, Any, Optional, Callable, List, Tuple
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+
+from cotton_toolkit.core.gff_parser import _apply_regex_to_id
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.gene_model_store")
+
+# 存储文件格式版本，结构变化时递增，旧文件会被自动重建
+STORE_FORMAT_VERSION = 2
+
+TRANSCRIPT_TYPES = ('mRNA', 'transcript', 'ncRNA', 'lnc_RNA', 'tRNA', 'rRNA', 'snoRNA', 'snRNA', 'miRNA')
+PART_TYPES = ('exon', 'CDS', 'five_prime_UTR', 'three_prime_UTR')
+PART_TYPE_CODES = {name: code for code, name in enumerate(PART_TYPES)}
+STRAND_CODES = {'+': 1, '-': -1}
+
+
+def get_gene_model_store_path(gff_db_dir: str, assembly_id: str) -> str:
+    """与 {assembly_id}_genes.db 并列存放的基因模型存储文件路径。"""
+    return os.path.join(gff_db_dir, f"{assembly_id}_models.npz")
+
+
+def _parse_gff_attributes(attr_field: str) -> Dict[str, str]:
+    """只解析我们需要的 ID / Parent 属性，比完整解析快得多。"""
+    attrs = {}
+    for item in attr_field.strip().strip(';').split(';'):
+        if '=' not in item:
+            continue
+        key, value = item.split('=', 1)
+        key = key.strip()
+        if key in ('ID', 'Parent'):
+            attrs[key] = unquote(value.strip())
+    return attrs
+
+
+def _read_store_format_version(store_path: str) -> Optional[int]:
+    try:
+        with np.load(store_path, allow_pickle=False) as data:
+            return int(data['format_version'])
+    except Exception:
+        return None
+
+
+def build_gene_model_store(
+        gff_filepath: str,
+        store_path: str,
+        id_regex: Optional[str] = None,
+        force: bool = False,
+        cancel_event: Optional[threading.Event] = None,
+        progress_callback: Optional[Callable[[int, str], None]] = None
+) -> Optional[str]:
+    """
+    单次流式扫描GFF文件，构建 gene→mRNA→exon/CDS 的列式基因模型存储 (.npz)。
+    基因ID会使用与GFF数据库相同的正则表达式规范化，转录本保留GFF中的原始ID。
+    """
+    progress = progress_callback if progress_callback else lambda p, m: None
+
+    if os.path.exists(store_path) and os.path.getsize(store_path) > 0 and not force:
+        if (os.path.getmtime(gff_filepath) <= os.path.getmtime(store_path)
+                and _read_store_format_version(store_path) == STORE_FORMAT_VERSION):
+            logger.debug(f"基因模型存储 '{os.path.basename(store_path)}' 已是最新，直接使用。")
+            progress(100, _("基因模型存储已是最新。"))
+            return store_path
+
+    logger.info(_("正在从 {} 构建基因模型存储...").format(os.path.basename(gff_filepath)))
+    progress(0, _("开始构建基因模型存储..."))
+
+    # 第一遍 (也是唯一一遍) 扫描：按列收集原始特征
+    gene_ids, gene_seqids, gene_starts, gene_ends, gene_strands = [], [], [], [], []
+    tx_ids, tx_parents, tx_starts, tx_ends = [], [], [], []
+    part_parents, part_types, part_starts, part_ends, part_phases = [], [], [], [], []
+    raw_gene_id_map: Dict[str, str] = {}  # 原始GFF ID -> 规范化基因ID
+    raw_tx_id_map: Dict[str, str] = {}  # 原始GFF ID -> 转录本ID
+
+    total_bytes = os.path.getsize(gff_filepath) or 1
+
+    with open(gff_filepath, 'rb') as raw_handle:
+        # 通过底层二进制句柄的偏移量估算进度 (对gz文件同样有效)
+        if gff_filepath.endswith('.gz'):
+            text_handle = gzip.open(raw_handle, 'rt', encoding='utf-8', errors='ignore')
+        else:
+            text_handle = io.TextIOWrapper(raw_handle, encoding='utf-8', errors='ignore')
+        for line_no, line in enumerate(text_handle, 1):
+            if line_no % 100000 == 0:
+                if cancel_event and cancel_event.is_set():
+                    logger.info(_("基因模型存储构建被取消。"))
+                    return None
+                percent = min(80, int(raw_handle.tell() / total_bytes * 80))
+                progress(percent, _("正在扫描GFF特征..."))
+
+            if not line or line[0] == '#':
+                if line.startswith('##FASTA'):
+                    break
+                continue
+            columns = line.rstrip('\n').split('\t')
+            if len(columns) < 9:
+                continue
+
+            feature_type = columns[2]
+            try:
+                start, end = int(columns[3]), int(columns[4])
+            except ValueError:
+                continue
+            attrs = _parse_gff_attributes(columns[8])
+
+            if feature_type == 'gene':
+                raw_id = attrs.get('ID')
+                if not raw_id:
+                    continue
+                gene_id = _apply_regex_to_id(raw_id, id_regex)
+                raw_gene_id_map[raw_id] = gene_id
+                gene_ids.append(gene_id)
+                gene_seqids.append(columns[0])
+                gene_starts.append(start)
+                gene_ends.append(end)
+                gene_strands.append(STRAND_CODES.get(columns[6], 0))
+            elif feature_type in TRANSCRIPT_TYPES:
+                raw_id = attrs.get('ID')
+                parent = attrs.get('Parent')
+                if not raw_id or not parent:
+                    continue
+                # 转录本保留原始ID：基因ID的正则会把同一基因的不同转录本规范化成同一个ID
+                raw_tx_id_map[raw_id] = raw_id
+                tx_ids.append(raw_id)
+                tx_parents.append(parent.split(',')[0])
+                tx_starts.append(start)
+                tx_ends.append(end)
+            elif feature_type in PART_TYPE_CODES:
+                parent = attrs.get('Parent')
+                if not parent:
+                    continue
+                phase = int(columns[7]) if columns[7].isdigit() else -1
+                # 一个外显子可能同时属于多个转录本
+                for parent_id in parent.split(','):
+                    part_parents.append(parent_id)
+                    part_types.append(PART_TYPE_CODES[feature_type])
+                    part_starts.append(start)
+                    part_ends.append(end)
+                    part_phases.append(phase)
+
+    if not gene_ids:
+        logger.warning(_("GFF文件 {} 中没有找到任何基因特征，未创建基因模型存储。").format(
+            os.path.basename(gff_filepath)))
+        progress(100, _("警告：GFF文件中没有基因。"))
+        return None
+
+    progress(85, _("正在建立基因模型索引..."))
+
+    # 基因按 (seqid, start) 排序，以支持基于二分查找的区域查询
+    seqid_names, seqid_codes = np.unique(np.asarray(gene_seqids), return_inverse=True)
+    g_start = np.asarray(gene_starts, dtype=np.int64)
+    g_end = np.asarray(gene_ends, dtype=np.int64)
+    gene_order = np.lexsort((g_start, seqid_codes))
+    gene_id_arr = np.asarray(gene_ids)[gene_order]
+    gene_seqid_arr = seqid_codes[gene_order].astype(np.int32)
+    g_start, g_end = g_start[gene_order], g_end[gene_order]
+    gene_strand_arr = np.asarray(gene_strands, dtype=np.int8)[gene_order]
+    gene_index = {gid: i for i, gid in enumerate(gene_id_arr.tolist())}
+
+    # 没有 mRNA 层级、外显子直接挂在基因下的情况：为其补一个同名转录本
+    known_tx = set(raw_tx_id_map)
+    for parent_id in set(part_parents) - known_tx:
+        if parent_id in raw_gene_id_map:
+            gene_id = raw_gene_id_map[parent_id]
+            gi = gene_index[gene_id]
+            raw_tx_id_map[parent_id] = gene_id
+            tx_ids.append(gene_id)
+            tx_parents.append(parent_id)
+            tx_starts.append(int(g_start[gi]))
+            tx_ends.append(int(g_end[gi]))
+
+    tx_gene = np.array([gene_index.get(raw_gene_id_map.get(p, ''), -1) for p in tx_parents], dtype=np.int32)
+    keep_tx = tx_gene >= 0
+    tx_id_arr = np.asarray(tx_ids, dtype=str)[keep_tx]
+    tx_gene = tx_gene[keep_tx]
+    tx_start_arr = np.asarray(tx_starts, dtype=np.int64)[keep_tx]
+    tx_end_arr = np.asarray(tx_ends, dtype=np.int64)[keep_tx]
+
+    # 转录本按所属基因分组，使用 CSR 风格的偏移数组实现 O(1) 定位
+    tx_order = np.lexsort((tx_start_arr, tx_gene))
+    tx_id_arr, tx_gene = tx_id_arr[tx_order], tx_gene[tx_order]
+    tx_start_arr, tx_end_arr = tx_start_arr[tx_order], tx_end_arr[tx_order]
+    gene_tx_offsets = np.searchsorted(tx_gene, np.arange(len(gene_id_arr) + 1)).astype(np.int64)
+
+    raw_tx_ids = [raw for raw in raw_tx_id_map]
+    tx_index_by_id = {tid: i for i, tid in enumerate(tx_id_arr.tolist())}
+    raw_tx_index = {raw: tx_index_by_id.get(raw_tx_id_map[raw], -1) for raw in raw_tx_ids}
+
+    part_tx = np.array([raw_tx_index.get(p, -1) for p in part_parents], dtype=np.int32)
+    keep_part = part_tx >= 0
+    part_tx = part_tx[keep_part]
+    part_type_arr = np.asarray(part_types, dtype=np.int8)[keep_part]
+    part_start_arr = np.asarray(part_starts, dtype=np.int64)[keep_part]
+    part_end_arr = np.asarray(part_ends, dtype=np.int64)[keep_part]
+    part_phase_arr = np.asarray(part_phases, dtype=np.int8)[keep_part]
+
+    part_order = np.lexsort((part_start_arr, part_type_arr, part_tx))
+    part_tx, part_type_arr = part_tx[part_order], part_type_arr[part_order]
+    part_start_arr, part_end_arr = part_start_arr[part_order], part_end_arr[part_order]
+    part_phase_arr = part_phase_arr[part_order]
+    tx_part_offsets = np.searchsorted(part_tx, np.arange(len(tx_id_arr) + 1)).astype(np.int64)
+
+    seqid_gene_offsets = np.searchsorted(gene_seqid_arr, np.arange(len(seqid_names) + 1)).astype(np.int64)
+    max_gene_span = int((g_end - g_start).max()) + 1 if len(g_start) else 0
+
+    os.makedirs(os.path.dirname(store_path) or '.', exist_ok=True)
+    tmp_path = store_path + '.tmp.npz'
+    np.savez(
+        tmp_path,
+        format_version=np.int32(STORE_FORMAT_VERSION),
+        seqid_names=seqid_names.astype(str),
+        seqid_gene_offsets=seqid_gene_offsets,
+        max_gene_span=np.int64(max_gene_span),
+        gene_ids=gene_id_arr.astype(str),
+        gene_seqid=gene_seqid_arr,
+        gene_start=g_start,
+        gene_end=g_end,
+        gene_strand=gene_strand_arr,
+        gene_tx_offsets=gene_tx_offsets,
+        tx_ids=tx_id_arr.astype(str),
+        tx_gene=tx_gene,
+        tx_start=tx_start_arr,
+        tx_end=tx_end_arr,
+        tx_part_offsets=tx_part_offsets,
+        part_type=part_type_arr,
+        part_start=part_start_arr,
+        part_end=part_end_arr,
+        part_phase=part_phase_arr,
+    )
+    os.replace(tmp_path, store_path)
+
+    logger.info(_("基因模型存储构建完成: {} 个基因, {} 个转录本, {} 个外显子/CDS片段。").format(
+        len(gene_id_arr), len(tx_id_arr), len(part_tx)))
+    progress(100, _("基因模型存储构建完成。"))
+    return store_path
+
+
+class GeneModelStore:
+    """
+    只读的列式基因模型存储。
+    所有坐标均为GFF的1-based闭区间。
+    """
+
+    def __init__(self, store_path: str):
+        with np.load(store_path, allow_pickle=False) as data:
+            if int(data['format_version']) != STORE_FORMAT_VERSION:
+                raise ValueError(_("基因模型存储 '{}' 的格式版本不兼容，请重新预处理GFF文件。").format(
+                    os.path.basename(store_path)))
+            self.seqid_names = data['seqid_names']
+            self.seqid_gene_offsets = data['seqid_gene_offsets']
+            self.max_gene_span = int(data['max_gene_span'])
+            self.gene_ids = data['gene_ids']
+            self.gene_seqid = data['gene_seqid']
+            self.gene_start = data['gene_start']
+            self.gene_end = data['gene_end']
+            self.gene_strand = data['gene_strand']
+            self.gene_tx_offsets = data['gene_tx_offsets']
+            self.tx_ids = data['tx_ids']
+            self.tx_gene = data['tx_gene']
+            self.tx_start = data['tx_start']
+            self.tx_end = data['tx_end']
+            self.tx_part_offsets = data['tx_part_offsets']
+            self.part_type = data['part_type']
+            self.part_start = data['part_start']
+            self.part_end = data['part_end']
+            self.part_phase = data['part_phase']
+
+        self.store_path = store_path
+        self._gene_index = {gid: i for i, gid in enumerate(self.gene_ids.tolist())}
+        self._tx_index = {tid: i for i, tid in enumerate(self.tx_ids.tolist())}
+        self._seqid_index = {name: i for i, name in enumerate(self.seqid_names.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.gene_ids)
+
+    def __contains__(self, gene_id: str) -> bool:
+        return gene_id in self._gene_index
+
+    def _require_gene(self, gene_id: str) -> int:
+        gi = self._gene_index.get(gene_id)
+        if gi is None:
+            raise KeyError(_("基因 '{}' 不在基因模型存储中。").format(gene_id))
+        return gi
+
+    def _require_transcript(self, transcript_id: str) -> int:
+        ti = self._tx_index.get(transcript_id)
+        if ti is None:
+            # 允许直接传入基因ID，此时使用该基因的第一个转录本
+            gi = self._gene_index.get(transcript_id)
+            if gi is not None and self.gene_tx_offsets[gi] < self.gene_tx_offsets[gi + 1]:
+                return int(self.gene_tx_offsets[gi])
+            raise KeyError(_("转录本 '{}' 不在基因模型存储中。").format(transcript_id))
+        return ti
+
+    def get_gene(self, gene_id: str) -> Dict[str, Any]:
+        """返回基因的基本坐标信息，字段名与 extract_gene_details 保持一致。"""
+        gi = self._require_gene(gene_id)
+        strand = int(self.gene_strand[gi])
+        return {
+            'id': gene_id,
+            'seqid': str(self.seqid_names[self.gene_seqid[gi]]),
+            'start': int(self.gene_start[gi]),
+            'end': int(self.gene_end[gi]),
+            'strand': '+' if strand > 0 else '-' if strand < 0 else '.',
+        }
+
+    def transcripts(self, gene_id: str) -> List[str]:
+        gi = self._require_gene(gene_id)
+        return self.tx_ids[self.gene_tx_offsets[gi]:self.gene_tx_offsets[gi + 1]].tolist()
+
+    def features(self, transcript_id: str, feature_type: str = 'exon') -> np.ndarray:
+        """返回转录本某一类型片段的 (start, end) 数组，按坐标升序排列。"""
+        ti = self._require_transcript(transcript_id)
+        lo, hi = self.tx_part_offsets[ti], self.tx_part_offsets[ti + 1]
+        mask = self.part_type[lo:hi] == PART_TYPE_CODES[feature_type]
+        return np.column_stack((self.part_start[lo:hi][mask], self.part_end[lo:hi][mask]))
+
+    def exons(self, transcript_id: str) -> np.ndarray:
+        exons = self.features(transcript_id, 'exon')
+        # 部分注释只有CDS没有exon，此时以CDS代替
+        return exons if len(exons) else self.features(transcript_id, 'CDS')
+
+    def introns(self, transcript_id: str) -> np.ndarray:
+        """由相邻外显子之间的间隔推导出内含子坐标。"""
+        exons = self.exons(transcript_id)
+        if len(exons) < 2:
+            return np.empty((0, 2), dtype=np.int64)
+        starts = exons[:-1, 1] + 1
+        ends = exons[1:, 0] - 1
+        valid = ends >= starts
+        return np.column_stack((starts[valid], ends[valid]))
+
+    def intron_lengths(self, transcript_id: str) -> np.ndarray:
+        introns = self.introns(transcript_id)
+        return introns[:, 1] - introns[:, 0] + 1
+
+    def upstream_window(self, gene_id: str, length: int) -> Optional[Tuple[str, int, int, str]]:
+        """
+        返回基因上游 length bp 的窗口 (seqid, start, end, strand)，会考虑链方向，
+        左端截断在1；基因位于序列开头、上游没有任何碱基时返回 None。
+        """
+        gene = self.get_gene(gene_id)
+        if gene['strand'] == '-':
+            start, end = gene['end'] + 1, gene['end'] + length
+        else:
+            start, end = max(1, gene['start'] - length), gene['start'] - 1
+        if end < start:
+            return None
+        return gene['seqid'], start, end, gene['strand']
+
+    def genes_in_region(self, seqid: str, start: int, end: int) -> List[str]:
+        """返回与 [start, end] 有重叠的全部基因ID，按坐标排序。"""
+        si = self._seqid_index.get(seqid)
+        if si is None:
+            return []
+        lo, hi = self.seqid_gene_offsets[si], self.seqid_gene_offsets[si + 1]
+        starts = self.gene_start[lo:hi]
+        # 任何与区域重叠的基因，其起点都不会早于 start - 最长基因跨度
+        left = np.searchsorted(starts, start - self.max_gene_span, side='left')
+        right = np.searchsorted(starts, end, side='right')
+        ends = self.gene_end[lo + left:lo + right]
+        hits = np.nonzero(ends >= start)[0] + lo + left
+        return self.gene_ids[hits].tolist()
+
+    def structure_table(self, gene_ids: List[str]) -> pd.DataFrame:
+        """为一批基因导出外显子/CDS/UTR结构表，每个片段一行。"""
+        rows = []
+        for gene_id in gene_ids:
+            gi = self._gene_index.get(gene_id)
+            if gi is None:
+                continue
+            seqid = str(self.seqid_names[self.gene_seqid[gi]])
+            strand = int(self.gene_strand[gi])
+            for ti in range(self.gene_tx_offsets[gi], self.gene_tx_offsets[gi + 1]):
+                lo, hi = self.tx_part_offsets[ti], self.tx_part_offsets[ti + 1]
+                for pi in range(lo, hi):
+                    rows.append((gene_id, str(self.tx_ids[ti]), seqid,
+                                 PART_TYPES[self.part_type[pi]], int(self.part_start[pi]), int(self.part_end[pi]),
+                                 '+' if strand > 0 else '-' if strand < 0 else '.', int(self.part_phase[pi])))
+        return pd.DataFrame(rows, columns=['gene_id', 'transcript_id', 'seqid', 'featuretype',
+                                           'start', 'end', 'strand', 'phase'])
+
+
+_STORE_CACHE: Dict[str, Tuple[float, GeneModelStore]] = {}
+_STORE_CACHE_LOCK = threading.Lock()
+
+
+def load_gene_model_store(store_path: str) -> Optional[GeneModelStore]:
+    """
+    加载基因模型存储；文件不存在时返回 None。
+    按文件修改时间缓存，避免同一会话内重复加载。
+    """
+    if not store_path or not os.path.exists(store_path):
+        return None
+    mtime = os.path.getmtime(store_path)
+    with _STORE_CACHE_LOCK:
+        cached = _STORE_CACHE.get(store_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            store = GeneModelStore(store_path)
+        except Exception as e:
+            logger.warning(_("加载基因模型存储 '{}' 失败: {}").format(os.path.basename(store_path), e))
+            return None
+        _STORE_CACHE[store_path] = (mtime, store)
+        return store
@@ -12,6 +12,7 @@ import pandas as pd
 from diskcache import Cache
 
 from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.utils.resource_manager import get_resource_manager, RESOURCE_IO
 
 # 国际化函数占位符
 try:
@@ -326,11 +327,11 @@ def get_gene_info_by_ids(
         progress(40, _("正在并行查询 {} 个基因...").format(total_ids))
 
         all_found_genes = []
-        max_workers = 8 # 写死！太懒啦
-        chunk_size = max(1, (total_ids + max_workers - 1) // max_workers)
-        id_chunks = [unique_gene_ids[i:i + chunk_size] for i in range(0, total_ids, chunk_size)]
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # 并发读取GFF数据库的线程数由全局I/O槽位决定
+        io_slots = get_resource_manager().acquire(RESOURCE_IO)
+        with io_slots as max_workers, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            chunk_size = max(1, (total_ids + max_workers - 1) // max_workers)
+            id_chunks = [unique_gene_ids[i:i + chunk_size] for i in range(0, total_ids, chunk_size)]
             future_to_chunk = {executor.submit(_gff_lookup_worker, chunk, created_db_path): chunk for chunk in
                                id_chunks}
 
@@ -0,0 +1,282 @@
+﻿# cotton_toolkit/core/homology_pair_store.py
+import logging
+import os
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple, Iterable
+
+import numpy as np
+import pandas as pd
+
+from cotton_toolkit import HOMOLOGY_PAIR_DIR
+from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.core.blast_cache import get_database_fingerprint
+from cotton_toolkit.core.blast_db_registry import get_blast_db_source_path, blast_database_is_current
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.homology_pair_store")
+
+# 表结构版本，结构变化时递增，旧文件会被视为未完成并重新计算
+PAIR_STORE_VERSION = 1
+
+# 与 _parse_tabular_blast_output 的输出列一致（不含比对序列）
+HIT_COLUMNS = ['Query_ID', 'Query_Length', 'Hit_ID', 'Hit_Description', 'Hit_Length', 'E-value', 'Bit_Score',
+               'Identity (%)', 'Positives (%)', 'Gaps', 'Alignment_Length', 'Query_Start', 'Query_End',
+               'Hit_Start', 'Hit_End', 'Query_Strand', 'Hit_Strand']
+
+DIRECTION_FORWARD = 'fwd'
+DIRECTION_REVERSE = 'rev'
+
+
+def get_pair_store_path(config: MainConfig, source_assembly_id: str, target_assembly_id: str) -> str:
+    """每个 (源, 目标) 基因组对使用一个独立的SQLite文件，长时间写入不会锁住 genomes.db。"""
+    project_root = os.path.dirname(config.config_file_abs_path_)
+    safe = lambda s: re.sub(r'[^0-9a-zA-Z_.-]', '_', s)
+    return os.path.join(project_root, HOMOLOGY_PAIR_DIR,
+                        f"{safe(source_assembly_id)}__{safe(target_assembly_id)}.db")
+
+
+def open_pair_store(db_path: str) -> sqlite3.Connection:
+    """打开（必要时创建）基因组对数据库并确保表结构存在。"""
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('CREATE TABLE IF NOT EXISTS meta (Key TEXT PRIMARY KEY, Value TEXT)')
+    conn.execute('CREATE TABLE IF NOT EXISTS chunks (Direction TEXT, Chunk_Index INTEGER, Query_Count INTEGER, '
+                 'PRIMARY KEY (Direction, Chunk_Index))')
+    conn.execute('CREATE TABLE IF NOT EXISTS queries (Direction TEXT, Query_ID TEXT, PRIMARY KEY (Direction, Query_ID))')
+    columns = ", ".join(f'"{c}"' for c in HIT_COLUMNS)
+    conn.execute(f'CREATE TABLE IF NOT EXISTS hits (Direction TEXT, {columns})')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_hits_direction_query ON hits (Direction, Query_ID)')
+    conn.commit()
+    return conn
+
+
+def read_meta(conn: sqlite3.Connection) -> Dict[str, str]:
+    return dict(conn.execute('SELECT Key, Value FROM meta').fetchall())
+
+
+def write_meta(conn: sqlite3.Connection, values: Dict[str, object]) -> None:
+    conn.executemany('INSERT OR REPLACE INTO meta (Key, Value) VALUES (?, ?)',
+                     [(k, str(v)) for k, v in values.items()])
+    conn.commit()
+
+
+def reset_pair_store(conn: sqlite3.Connection) -> None:
+    """清空已有的计算结果（数据库或参数发生变化时调用）。"""
+    for table in ('meta', 'chunks', 'queries', 'hits'):
+        conn.execute(f'DELETE FROM {table}')
+    conn.execute('DROP TABLE IF EXISTS homology')
+    conn.commit()
+
+
+def completed_chunks(conn: sqlite3.Connection, direction: str) -> set:
+    return {row[0] for row in conn.execute('SELECT Chunk_Index FROM chunks WHERE Direction = ?', (direction,))}
+
+
+def save_chunk_result(
+        conn: sqlite3.Connection,
+        direction: str,
+        chunk_index: int,
+        query_ids: List[str],
+        results_df: Optional[pd.DataFrame]
+) -> None:
+    """在同一个事务中写入一个块的命中、已覆盖的查询ID与完成标记，保证中断后可以安全续算。"""
+    with conn:
+        if results_df is not None and not results_df.empty:
+            rows = results_df.reindex(columns=HIT_COLUMNS)
+            placeholders = ", ".join('?' for _c in range(len(HIT_COLUMNS) + 1))
+            conn.executemany(f'INSERT INTO hits VALUES ({placeholders})',
+                             ((direction, *row) for row in rows.itertuples(index=False, name=None)))
+        conn.executemany('INSERT OR IGNORE INTO queries (Direction, Query_ID) VALUES (?, ?)',
+                         ((direction, qid) for qid in query_ids))
+        conn.execute('INSERT OR REPLACE INTO chunks (Direction, Chunk_Index, Query_Count) VALUES (?, ?, ?)',
+                     (direction, chunk_index, len(query_ids)))
+
+
+def best_hits(hits_df: pd.DataFrame) -> pd.DataFrame:
+    """每个查询取得分最高（同分取E值最小）的一条命中。"""
+    if hits_df.empty:
+        return hits_df
+    ordered = hits_df.sort_values(['Query_ID', 'Bit_Score', 'E-value'], ascending=[True, False, True])
+    return ordered.drop_duplicates('Query_ID', keep='first')
+
+
+def find_reciprocal_best_hits(forward_df: pd.DataFrame, reverse_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    向量化地求互为最佳命中的基因对。
+    返回列: Query_ID, Hit_ID, Forward_Bit_Score, Reverse_Bit_Score。
+    """
+    fwd = best_hits(forward_df)[['Query_ID', 'Hit_ID', 'Bit_Score']]
+    rev = best_hits(reverse_df)[['Query_ID', 'Hit_ID', 'Bit_Score']]
+    if fwd.empty or rev.empty:
+        return pd.DataFrame(columns=['Query_ID', 'Hit_ID', 'Forward_Bit_Score', 'Reverse_Bit_Score'])
+    merged = fwd.merge(rev, left_on=['Query_ID', 'Hit_ID'], right_on=['Hit_ID', 'Query_ID'],
+                       suffixes=('', '_rev'))
+    return merged.rename(columns={'Bit_Score': 'Forward_Bit_Score', 'Bit_Score_rev': 'Reverse_Bit_Score'})[
+        ['Query_ID', 'Hit_ID', 'Forward_Bit_Score', 'Reverse_Bit_Score']]
+
+
+def finalize_pair_store(conn: sqlite3.Connection) -> int:
+    """
+    两个方向都完成后，计算互为最佳命中并生成带索引的 homology 表（正向命中 + Is_RBH 标记）。
+    返回互为最佳命中的对数。
+    """
+    forward_df = pd.read_sql_query('SELECT * FROM hits WHERE Direction = ?', conn, params=(DIRECTION_FORWARD,))
+    reverse_df = pd.read_sql_query('SELECT * FROM hits WHERE Direction = ?', conn, params=(DIRECTION_REVERSE,))
+    forward_df = forward_df.drop(columns=['Direction'])
+    reverse_df = reverse_df.drop(columns=['Direction'])
+
+    rbh = find_reciprocal_best_hits(forward_df, reverse_df)
+    rbh_keys = set(zip(rbh['Query_ID'], rbh['Hit_ID']))
+    forward_df['Is_RBH'] = [int((q, h) in rbh_keys) for q, h in zip(forward_df['Query_ID'], forward_df['Hit_ID'])]
+
+    with conn:
+        conn.execute('DROP TABLE IF EXISTS homology')
+        forward_df.to_sql('homology', conn, index=False)
+        conn.execute('CREATE INDEX idx_homology_query ON homology (Query_ID)')
+        conn.execute('CREATE INDEX idx_homology_hit ON homology (Hit_ID)')
+    write_meta(conn, {'status': 'complete', 'rbh_pairs': len(rbh)})
+    return len(rbh)
+
+
+def _score_margin(hits_df: pd.DataFrame) -> pd.Series:
+    """
+    每个查询的最佳目标与次佳目标之间的相对得分差距: 1 - 次佳得分 / 最佳得分。
+    只有一个目标时差距为 1。值越大说明最佳命中越明确（例如没有得分接近的旁系同源基因）。
+    """
+    per_target = hits_df.groupby(['Query_ID', 'Hit_ID'], sort=False)['Bit_Score'].max().reset_index()
+    per_target = per_target.sort_values(['Query_ID', 'Bit_Score'], ascending=[True, False])
+    rank = per_target.groupby('Query_ID').cumcount()
+    best = per_target[rank == 0].set_index('Query_ID')['Bit_Score']
+    second = per_target[rank == 1].set_index('Query_ID')['Bit_Score'].reindex(best.index)
+    return (1 - second / best).fillna(1.0).clip(lower=0.0)
+
+
+def build_orthology_calls(forward_df: pd.DataFrame, reverse_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    由正向与反向命中表向量化地得出直系同源判定：每个源基因保留其最佳正向命中行，并附加
+    Reverse_Bit_Score、Orthology（'RBH' 或 'one-way'）与 Confidence 列。
+    Confidence 取正反两个方向得分差距的较小值（0~1），非互为最佳命中的记录为 0。
+    """
+    if forward_df.empty:
+        return forward_df
+    calls = best_hits(forward_df).reset_index(drop=True)
+    if reverse_df.empty:
+        reverse_best = pd.DataFrame(columns=['Hit_ID', 'Reverse_Best_Hit', 'Reverse_Bit_Score'])
+        reverse_margin = pd.Series(dtype=float)
+    else:
+        reverse_best = best_hits(reverse_df)[['Query_ID', 'Hit_ID', 'Bit_Score']].rename(
+            columns={'Query_ID': 'Hit_ID', 'Hit_ID': 'Reverse_Best_Hit', 'Bit_Score': 'Reverse_Bit_Score'})
+        reverse_margin = _score_margin(reverse_df)
+    calls = calls.merge(reverse_best, on='Hit_ID', how='left')
+
+    is_rbh = (calls['Reverse_Best_Hit'] == calls['Query_ID']).to_numpy()
+    forward_margin = calls['Query_ID'].map(_score_margin(forward_df)).to_numpy(dtype=float)
+    backward_margin = calls['Hit_ID'].map(reverse_margin).to_numpy(dtype=float)
+    calls['Orthology'] = np.where(is_rbh, 'RBH', 'one-way')
+    calls['Confidence'] = np.where(is_rbh, np.fmin(forward_margin, backward_margin), 0.0).round(3)
+    return calls.drop(columns=['Reverse_Best_Hit'])
+
+
+def _open_completed_store(config: MainConfig, source_assembly_id: str, target_assembly_id: str):
+    """
+    找到覆盖 源->目标 方向的已完成预计算文件。
+    返回 (数据库路径, 该方向在文件中的方向标记, meta)，没有可用文件时返回 None。
+    反向的基因组对文件同样可用，其 'rev' 方向即为所需方向。
+    """
+    candidates = [
+        (get_pair_store_path(config, source_assembly_id, target_assembly_id), DIRECTION_FORWARD),
+        (get_pair_store_path(config, target_assembly_id, source_assembly_id), DIRECTION_REVERSE),
+    ]
+    for db_path, direction in candidates:
+        if not os.path.exists(db_path):
+            continue
+        try:
+            with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
+                meta = read_meta(conn)
+        except sqlite3.Error:
+            continue
+        if meta.get('status') == 'complete' and int(meta.get('version', 0)) == PAIR_STORE_VERSION:
+            return db_path, direction, meta
+    return None
+
+
+def _current_database_fingerprint(config: MainConfig, assembly_id: str) -> Optional[str]:
+    """预计算所用核酸BLAST数据库的当前指纹；序列文件已更新但尚未重新解压/建库时返回 None。"""
+    source_path = get_blast_db_source_path(config, assembly_id, 'nucl')
+    db_path = source_path.removesuffix('.gz')
+    if not os.path.exists(db_path) or not blast_database_is_current(db_path, 'nucl'):
+        return None
+    return get_database_fingerprint(db_path)
+
+
+def _databases_match(config: MainConfig, source_assembly_id: str, target_assembly_id: str, direction: str,
+                     meta: Dict[str, str]) -> bool:
+    """预计算时记录的双方数据库指纹是否与当前的一致（基因组文件更新后旧结果即作废）。"""
+    if direction == DIRECTION_REVERSE:
+        source_assembly_id, target_assembly_id = target_assembly_id, source_assembly_id
+    return (meta.get('source_db') == _current_database_fingerprint(config, source_assembly_id) and
+            meta.get('target_db') == _current_database_fingerprint(config, target_assembly_id))
+
+
+def lookup_precomputed_homology(
+        config: MainConfig,
+        source_assembly_id: str,
+        target_assembly_id: str,
+        query_ids: Iterable[str],
+        evalue_threshold: float,
+        top_n: int,
+        batch_size: int = 500
+) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    从预计算的基因组对文件中查询 源->目标 方向的命中。
+    只有预计算已完成、双方数据库与预计算时相同，且其参数不比本次请求更严格（E值阈值、每个查询保留的命中数）时才会使用。
+    返回 (命中表, 预计算未覆盖、仍需动态BLAST的ID列表)。
+    """
+    query_ids = list(dict.fromkeys(query_ids))
+    store = _open_completed_store(config, source_assembly_id, target_assembly_id) if query_ids else None
+    if store is None:
+        return pd.DataFrame(), query_ids
+
+    db_path, direction, meta = store
+    try:
+        if float(meta['evalue']) > evalue_threshold or int(meta['max_target_seqs']) < top_n:
+            logger.info(_("预计算同源表的参数（evalue={}, max_target_seqs={}）不满足本次筛选条件，将使用动态BLAST。")
+                        .format(meta['evalue'], meta['max_target_seqs']))
+            return pd.DataFrame(), query_ids
+        if not _databases_match(config, source_assembly_id, target_assembly_id, direction, meta):
+            logger.info(_("基因组序列文件在预计算后已更新，预计算同源表已过期，将使用动态BLAST。请重新运行预计算。"))
+            return pd.DataFrame(), query_ids
+
+        covered, frames = set(), []
+        with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
+            for i in range(0, len(query_ids), batch_size):
+                batch = query_ids[i:i + batch_size]
+                placeholders = ','.join('?' for _b in batch)
+                covered.update(row[0] for row in conn.execute(
+                    f'SELECT Query_ID FROM queries WHERE Direction = ? AND Query_ID IN ({placeholders})',
+                    (direction, *batch)))
+                frames.append(pd.read_sql_query(
+                    f'SELECT * FROM hits WHERE Direction = ? AND Query_ID IN ({placeholders}) AND "E-value" <= ?',
+                    conn, params=(direction, *batch, evalue_threshold)))
+    except (sqlite3.Error, KeyError, ValueError, OSError) as e:
+        logger.warning(_("读取预计算同源表失败，将使用动态BLAST: {}").format(e))
+        return pd.DataFrame(), query_ids
+
+    hits_df = pd.concat(frames, ignore_index=True).drop(columns=['Direction']) if frames else pd.DataFrame()
+    if not hits_df.empty:
+        # 与动态BLAST的 max_target_seqs 语义保持一致：每个查询保留得分最高的 top_n 个目标
+        hits_df = hits_df.sort_values(['Query_ID', 'Bit_Score', 'E-value'], ascending=[True, False, True])
+        keep_targets = hits_df.drop_duplicates(['Query_ID', 'Hit_ID']).groupby('Query_ID').head(top_n)
+        hits_df = hits_df.merge(keep_targets[['Query_ID', 'Hit_ID']], on=['Query_ID', 'Hit_ID'])
+    missing = [qid for qid in query_ids if qid not in covered]
+    return hits_df, missing
@@ -0,0 +1,175 @@
+# cotton_toolkit/core/id_alias_index.py
+import logging
+import os
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, List, Iterable, Tuple, FrozenSet
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.id_alias_index")
+
+# 同时在内存中保留的基因组别名索引数量，超出后淘汰最久未使用的
+MAX_CACHED_ASSEMBLIES = 4
+
+_TRANSCRIPT_SUFFIX = re.compile(r'\.(\d+)$')
+
+
+def get_alias_table_name(sequence_table_name: str) -> str:
+    """别名表与CDS序列表一一对应。"""
+    return f"{sequence_table_name}_id_aliases"
+
+
+def _derive_aliases(canonical_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    从数据库中的规范ID推导别名:
+    - 基础基因ID -> 编号最小的转录本（如 Gene -> Gene.1，若无 .1 则取最小编号）
+    - 忽略大小写的形式 -> 规范ID
+    与规范ID相同的别名不会被记录，以保持结构紧凑。
+    """
+    canonical = set(canonical_ids)
+    aliases: Dict[str, str] = {}
+    best_transcript: Dict[str, Tuple[int, str]] = {}
+    for db_id in canonical:
+        match = _TRANSCRIPT_SUFFIX.search(db_id)
+        if match:
+            base = db_id[:match.start()]
+            number = int(match.group(1))
+            current = best_transcript.get(base)
+            if current is None or number < current[0]:
+                best_transcript[base] = (number, db_id)
+
+    for base, (_number, db_id) in best_transcript.items():
+        if base not in canonical:
+            aliases[base] = db_id
+
+    for alias, target in list(aliases.items()) + [(db_id, db_id) for db_id in canonical]:
+        lowered = alias.lower()
+        if lowered != alias and lowered not in canonical and lowered not in aliases:
+            aliases[lowered] = target
+    return aliases
+
+
+def build_id_alias_table(db_path: str, sequence_table_name: str) -> int:
+    """
+    在预处理阶段为某个CDS表预先计算别名表，写入同一个数据库。返回别名条数。
+    """
+    alias_table = get_alias_table_name(sequence_table_name)
+    with sqlite3.connect(db_path, timeout=30.0) as conn:
+        cursor = conn.cursor()
+        canonical_ids = [row[0] for row in cursor.execute(f'SELECT Gene FROM "{sequence_table_name}"') if row[0]]
+        aliases = _derive_aliases(canonical_ids)
+        cursor.execute(f'DROP TABLE IF EXISTS "{alias_table}"')
+        cursor.execute(f'CREATE TABLE "{alias_table}" (Alias TEXT PRIMARY KEY, Target TEXT NOT NULL)')
+        cursor.executemany(f'INSERT INTO "{alias_table}" (Alias, Target) VALUES (?, ?)', aliases.items())
+        conn.commit()
+    logger.info(_("已为表 '{}' 构建 {} 条ID别名。").format(sequence_table_name, len(aliases)))
+    return len(aliases)
+
+
+class IdAliasIndex:
+    """
+    某个基因组的内存ID解析索引：规范ID集合加一张别名哈希表，所有查询都是纯内存操作。
+    """
+
+    def __init__(self, canonical_ids: Iterable[str], aliases: Optional[Dict[str, str]] = None):
+        self.canonical: FrozenSet[str] = frozenset(canonical_ids)
+        self.aliases: Dict[str, str] = aliases if aliases is not None else _derive_aliases(self.canonical)
+        # 以多数规范ID是否带转录本后缀来判断数据库的ID模式
+        sample_ids = list(self.canonical)[:1000]
+        transcript_count = sum(1 for db_id in sample_ids if _TRANSCRIPT_SUFFIX.search(db_id))
+        self.uses_transcript_ids = transcript_count * 2 > len(sample_ids)
+
+    def __len__(self) -> int:
+        return len(self.canonical)
+
+    def __contains__(self, db_id: str) -> bool:
+        return db_id in self.canonical
+
+    def resolve(self, user_id: str) -> Optional[str]:
+        """将用户输入的ID解析为数据库中存在的规范ID，找不到时返回 None。"""
+        user_id = str(user_id).strip()
+        match = _TRANSCRIPT_SUFFIX.search(user_id)
+        base = user_id[:match.start()] if match else user_id
+        # 与 get_sequences_for_gene_ids 的优先级一致：先转录本形式，再基础基因形式
+        candidates = (f"{base}.1", user_id) if match is None else (user_id, base)
+        for candidate in candidates:
+            if candidate in self.canonical:
+                return candidate
+        for candidate in candidates:
+            target = self.aliases.get(candidate) or self.aliases.get(candidate.lower())
+            # 别名表可能落后于序列表，只接受仍然存在的目标
+            if target and target in self.canonical:
+                return target
+        return None
+
+    def resolve_many(self, user_ids: Iterable[str]) -> Tuple[Dict[str, str], List[str]]:
+        """批量解析，返回 ({用户ID: 规范ID}, 未找到的ID列表)。"""
+        resolved, missing = {}, []
+        for user_id in user_ids:
+            target = self.resolve(user_id)
+            if target is None:
+                missing.append(user_id)
+            else:
+                resolved[user_id] = target
+        return resolved, missing
+
+
+_INDEX_CACHE: "OrderedDict[Tuple[str, str], Tuple[float, IdAliasIndex]]" = OrderedDict()
+_INDEX_CACHE_LOCK = threading.Lock()
+
+
+def _load_index_from_db(db_path: str, sequence_table_name: str) -> IdAliasIndex:
+    alias_table = get_alias_table_name(sequence_table_name)
+    with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name IN (?, ?)",
+                       (sequence_table_name, alias_table))
+        tables = {row[0] for row in cursor.fetchall()}
+        if sequence_table_name not in tables:
+            raise ValueError(_("错误: 在数据库中找不到表 '{}'。请先对CDS文件进行预处理。").format(sequence_table_name))
+
+        canonical_ids = [row[0] for row in cursor.execute(f'SELECT Gene FROM "{sequence_table_name}"') if row[0]]
+        aliases = None
+        if alias_table in tables:
+            aliases = dict(cursor.execute(f'SELECT Alias, Target FROM "{alias_table}"').fetchall())
+        else:
+            logger.debug(_("表 '{}' 尚无预计算的别名表，将在内存中即时构建。").format(sequence_table_name))
+    return IdAliasIndex(canonical_ids, aliases)
+
+
+def get_id_alias_index(db_path: str, sequence_table_name: str) -> IdAliasIndex:
+    """
+    获取某个CDS表的ID解析索引。索引按数据库修改时间失效，
+    并在多个基因组之间做LRU淘汰，最多同时保留 MAX_CACHED_ASSEMBLIES 个。
+    """
+    key = (db_path, sequence_table_name)
+    mtime = os.path.getmtime(db_path)
+    with _INDEX_CACHE_LOCK:
+        cached = _INDEX_CACHE.get(key)
+        if cached and cached[0] == mtime:
+            _INDEX_CACHE.move_to_end(key)
+            return cached[1]
+
+        index = _load_index_from_db(db_path, sequence_table_name)
+        _INDEX_CACHE[key] = (mtime, index)
+        _INDEX_CACHE.move_to_end(key)
+        while len(_INDEX_CACHE) > MAX_CACHED_ASSEMBLIES:
+            _INDEX_CACHE.popitem(last=False)
+        logger.debug(_("已加载表 '{}' 的ID解析索引（{} 个ID）。").format(sequence_table_name, len(index)))
+        return index
+
+
+def clear_id_alias_cache():
+    """清空内存中的ID解析索引（例如重新预处理之后）。"""
+    with _INDEX_CACHE_LOCK:
+        _INDEX_CACHE.clear()
@@ -0,0 +1,283 @@
+# cotton_toolkit/core/packed_sequence_store.py
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Callable, List, Tuple, Iterator, Iterable
+
+import numpy as np
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.core.packed_sequence_store")
+
+# 存储文件格式版本，结构变化时递增，旧文件会被自动重建
+PACKED_FORMAT_VERSION = 2
+
+# 2-bit 编码: A=0, C=1, G=2, T=3；其它字符（N及IUPAC简并碱基）以“例外片段”单独记录
+_ENCODE_TABLE = np.full(256, 255, dtype=np.uint8)
+for _code, _base in enumerate(b'ACGT'):
+    _ENCODE_TABLE[_base] = _code
+    _ENCODE_TABLE[ord(chr(_base).lower())] = _code
+# 每个字节解码为4个碱基的查找表
+_DECODE_TABLE = np.array(
+    [[b'ACGT'[(byte >> shift) & 3] for shift in (6, 4, 2, 0)] for byte in range(256)], dtype=np.uint8)
+_PACK_SHIFTS = np.array([6, 4, 2, 0], dtype=np.uint8)
+
+
+def get_packed_store_paths(packed_dir: str, table_name: str) -> Tuple[str, str]:
+    """返回 (序列数据文件, 索引文件) 路径，以SQLite表名命名，表变化时自然失效。"""
+    base = os.path.join(packed_dir, table_name)
+    return base + '.2bit', base + '.idx.npz'
+
+
+def remove_packed_sequence_store(packed_dir: str, table_name: str) -> None:
+    """删除某个CDS表对应的压缩序列存储（表被重建时旧存储即已过期）。"""
+    for path in get_packed_store_paths(packed_dir, table_name):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _encode_sequence(sequence: str) -> Tuple[bytes, List[Tuple[int, int, int]], List[Tuple[int, int]]]:
+    """
+    将一条序列编码为按字节对齐的2-bit数据、(起点, 长度, 字符) 形式的例外片段列表，
+    以及 (起点, 长度) 形式的小写（软屏蔽）片段列表。
+    """
+    raw = np.frombuffer(sequence.encode('ascii', errors='replace'), dtype=np.uint8)
+    lower = (raw >= ord('a')) & (raw <= ord('z'))
+    mask_runs = []
+    if lower.any():
+        positions = np.flatnonzero(lower)
+        for group in np.split(positions, np.flatnonzero(np.diff(positions) != 1) + 1):
+            mask_runs.append((int(group[0]), len(group)))
+        raw = np.where(lower, raw - 32, raw).astype(np.uint8)
+
+    codes = _ENCODE_TABLE[raw]
+    runs = []
+    invalid = codes == 255
+    if invalid.any():
+        positions = np.flatnonzero(invalid)
+        # 连续且字符相同的位置合并为一个片段（典型情况是成段的N）
+        breaks = np.flatnonzero((np.diff(positions) != 1) | (raw[positions[1:]] != raw[positions[:-1]])) + 1
+        for group in np.split(positions, breaks):
+            runs.append((int(group[0]), len(group), int(raw[group[0]])))
+        codes = np.where(invalid, 0, codes).astype(np.uint8)
+
+    padding = (-len(codes)) % 4
+    if padding:
+        codes = np.concatenate((codes, np.zeros(padding, dtype=np.uint8)))
+    packed = np.bitwise_or.reduce(codes.reshape(-1, 4) << _PACK_SHIFTS, axis=1).astype(np.uint8)
+    return packed.tobytes(), runs, mask_runs
+
+
+def _read_format_version(index_path: str) -> Optional[int]:
+    try:
+        with np.load(index_path) as data:
+            return int(data['format_version'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def build_packed_sequence_store(
+        db_path: str,
+        table_name: str,
+        packed_dir: str,
+        force: bool = False,
+        cancel_event: Optional[threading.Event] = None,
+        progress_callback: Optional[Callable[[int, str], None]] = None
+) -> Optional[str]:
+    """
+    从SQLite中的CDS表（Gene, Seq 两列）构建2-bit压缩序列存储。
+    每条序列按字节对齐，便于直接对内存映射文件切片；非ACGT字符以例外片段记录，
+    小写（软屏蔽）区段以单独的片段列表记录，还原后与原序列完全一致。
+    返回序列数据文件路径；任务被取消时返回 None。
+    """
+    progress = progress_callback if progress_callback else lambda p, m: None
+    seq_path, index_path = get_packed_store_paths(packed_dir, table_name)
+
+    if not force and os.path.exists(index_path) and os.path.exists(seq_path) \
+            and os.path.getmtime(index_path) >= os.path.getmtime(db_path) \
+            and _read_format_version(index_path) == PACKED_FORMAT_VERSION:
+        progress(100, _("压缩序列存储已是最新。"))
+        return seq_path
+
+    os.makedirs(packed_dir, exist_ok=True)
+    progress(0, _("正在构建压缩序列存储..."))
+
+    with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
+        cursor = conn.cursor()
+        total = cursor.execute(f'SELECT COUNT(*) FROM "{table_name}"').fetchone()[0]
+        cursor.execute(f'SELECT Gene, Seq FROM "{table_name}"')
+
+        ids, byte_offsets, lengths = [], [], []
+        run_offsets, run_starts, run_lengths, run_chars = [0], [], [], []
+        mask_offsets, mask_starts, mask_lengths = [0], [], []
+        byte_offset = 0
+        tmp_seq_path = seq_path + '.tmp'
+        with open(tmp_seq_path, 'wb') as out:
+            for i, (gene_id, sequence) in enumerate(cursor):
+                if not gene_id or sequence is None:
+                    continue
+                packed, runs, mask_runs = _encode_sequence(str(sequence))
+                out.write(packed)
+                ids.append(str(gene_id))
+                byte_offsets.append(byte_offset)
+                lengths.append(len(sequence))
+                byte_offset += len(packed)
+                for start, length, char in runs:
+                    run_starts.append(start)
+                    run_lengths.append(length)
+                    run_chars.append(char)
+                run_offsets.append(len(run_starts))
+                for start, length in mask_runs:
+                    mask_starts.append(start)
+                    mask_lengths.append(length)
+                mask_offsets.append(len(mask_starts))
+
+                if i % 5000 == 0:
+                    if cancel_event and cancel_event.is_set():
+                        out.close()
+                        os.remove(tmp_seq_path)
+                        logger.info(_("压缩序列存储构建已被取消。"))
+                        return None
+                    progress(int(i / max(total, 1) * 95), _("已压缩 {}/{} 条序列...").format(i, total))
+
+    tmp_index_path = index_path + '.tmp.npz'
+    np.savez(
+        tmp_index_path,
+        format_version=np.array(PACKED_FORMAT_VERSION),
+        ids=np.asarray(ids, dtype=str),
+        byte_offsets=np.asarray(byte_offsets, dtype=np.int64),
+        lengths=np.asarray(lengths, dtype=np.int64),
+        run_offsets=np.asarray(run_offsets, dtype=np.int64),
+        run_starts=np.asarray(run_starts, dtype=np.int64),
+        run_lengths=np.asarray(run_lengths, dtype=np.int64),
+        run_chars=np.asarray(run_chars, dtype=np.uint8),
+        mask_offsets=np.asarray(mask_offsets, dtype=np.int64),
+        mask_starts=np.asarray(mask_starts, dtype=np.int64),
+        mask_lengths=np.asarray(mask_lengths, dtype=np.int64),
+    )
+    os.replace(tmp_seq_path, seq_path)
+    os.replace(tmp_index_path, index_path)
+
+    raw_size = int(np.sum(lengths)) if lengths else 0
+    logger.info(_("压缩序列存储构建完成: {} 条序列，{:.1f} MB -> {:.1f} MB").format(
+        len(ids), raw_size / 1024 / 1024, byte_offset / 1024 / 1024))
+    progress(100, _("压缩序列存储构建完成。"))
+    return seq_path
+
+
+class PackedSequenceStore:
+    """
+    只读的2-bit压缩序列存储。序列数据通过 np.memmap 映射，按需解码，不会整体载入内存。
+    """
+
+    def __init__(self, seq_path: str, index_path: str):
+        with np.load(index_path) as data:
+            if int(data['format_version']) != PACKED_FORMAT_VERSION:
+                raise ValueError(_("压缩序列存储格式版本不匹配，请重新预处理。"))
+            self.ids = data['ids']
+            self.byte_offsets = data['byte_offsets']
+            self.lengths = data['lengths']
+            self.run_offsets = data['run_offsets']
+            self.run_starts = data['run_starts']
+            self.run_lengths = data['run_lengths']
+            self.run_chars = data['run_chars']
+            self.mask_offsets = data['mask_offsets']
+            self.mask_starts = data['mask_starts']
+            self.mask_lengths = data['mask_lengths']
+        self._index: Dict[str, int] = {gene_id: i for i, gene_id in enumerate(self.ids.tolist())}
+        self._data = np.memmap(seq_path, dtype=np.uint8, mode='r') if os.path.getsize(seq_path) > 0 \
+            else np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, gene_id: str) -> bool:
+        return gene_id in self._index
+
+    def length(self, gene_id: str) -> int:
+        return int(self.lengths[self._index[gene_id]])
+
+    def packed_view(self, gene_id: str) -> np.ndarray:
+        """返回该序列对应的压缩字节切片（内存映射视图，不发生拷贝）。"""
+        i = self._index[gene_id]
+        start = int(self.byte_offsets[i])
+        return self._data[start:start + (int(self.lengths[i]) + 3) // 4]
+
+    def get(self, gene_id: str, start: int = 0, end: Optional[int] = None) -> str:
+        """
+        解码一条序列，可选只解码 [start, end) 区间（0-based，半开区间）。
+        只会读取和解码区间覆盖的字节。
+        """
+        i = self._index[gene_id]
+        length = int(self.lengths[i])
+        end = length if end is None else min(int(end), length)
+        start = max(0, int(start))
+        if end <= start:
+            return ''
+
+        first_byte, last_byte = start // 4, (end + 3) // 4
+        offset = int(self.byte_offsets[i])
+        chars = _DECODE_TABLE[self._data[offset + first_byte:offset + last_byte]].reshape(-1)
+        chars = chars[start - first_byte * 4:end - first_byte * 4]
+
+        lo, hi = self.run_offsets[i], self.run_offsets[i + 1]
+        mask_lo, mask_hi = self.mask_offsets[i], self.mask_offsets[i + 1]
+        if hi > lo or mask_hi > mask_lo:
+            chars = chars.copy()
+        for run_start, run_length, run_char in zip(self.run_starts[lo:hi], self.run_lengths[lo:hi],
+                                                   self.run_chars[lo:hi]):
+            s = max(int(run_start), start)
+            e = min(int(run_start + run_length), end)
+            if s < e:
+                chars[s - start:e - start] = run_char
+        # 软屏蔽区段恢复为小写（编码时这些位置都是字母，置位 0x20 即可）
+        for mask_start, mask_length in zip(self.mask_starts[mask_lo:mask_hi], self.mask_lengths[mask_lo:mask_hi]):
+            s = max(int(mask_start), start)
+            e = min(int(mask_start + mask_length), end)
+            if s < e:
+                chars[s - start:e - start] |= 0x20
+        return chars.tobytes().decode('ascii')
+
+    def iter_sequences(self, gene_ids: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """按给定顺序产出 (gene_id, sequence)，跳过不存在的ID和空序列（与SQLite查询路径一致）。"""
+        for gene_id in gene_ids:
+            i = self._index.get(gene_id)
+            if i is not None and self.lengths[i] > 0:
+                yield gene_id, self.get(gene_id)
+
+    def get_many(self, gene_ids: Iterable[str]) -> Dict[str, str]:
+        return dict(self.iter_sequences(gene_ids))
+
+
+_STORE_CACHE: Dict[str, Tuple[float, PackedSequenceStore]] = {}
+_STORE_CACHE_LOCK = threading.Lock()
+
+
+def load_packed_sequence_store(packed_dir: str, table_name: str) -> Optional[PackedSequenceStore]:
+    """
+    加载某个CDS表对应的压缩序列存储；不存在或无法读取时返回 None（调用方应回退到SQLite）。
+    """
+    seq_path, index_path = get_packed_store_paths(packed_dir, table_name)
+    if not (os.path.exists(seq_path) and os.path.exists(index_path)):
+        return None
+    mtime = os.path.getmtime(index_path)
+    with _STORE_CACHE_LOCK:
+        cached = _STORE_CACHE.get(index_path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            store = PackedSequenceStore(seq_path, index_path)
+        except Exception as e:
+            logger.warning(_("加载压缩序列存储 '{}' 失败，将回退到数据库查询: {}").format(table_name, e))
+            return None
+        _STORE_CACHE[index_path] = (mtime, store)
+        return store
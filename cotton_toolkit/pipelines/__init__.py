@@ -1,14 +1,51 @@
 ﻿# cotton_toolkit/pipelines/__init__.py
 
-# 从各个模块中导入核心的 "run_" 函数，以便外部可以直接从 cotton_toolkit.pipelines 导入
-from .ai_tasks import run_ai_task
-from .gff_tasks import run_gff_lookup
-from .annotation import run_functional_annotation, run_enrichment_pipeline
-from .homology import run_homology_mapping, run_locus_conversion
-from .preprocessing import (
-    run_download_pipeline,
-    run_preprocess_annotation_files,
-    run_build_blast_db_pipeline,
-
-)
-from .blast import run_blast_pipeline
+# 各个模块中的核心 "run_" 函数，外部可以直接从 cotton_toolkit.pipelines 导入。
+# 子模块按需导入（PEP 562）：只运行下载流程时不会加载富集分析、绘图或BLAST所需的重型依赖。
+import importlib
+from typing import TYPE_CHECKING
+
+_PIPELINE_MODULES = {
+    'run_ai_task': '.ai_tasks',
+    'run_gff_lookup': '.gff_tasks',
+    'run_functional_annotation': '.annotation',
+    'run_enrichment_pipeline': '.annotation',
+    'run_homology_mapping': '.homology',
+    'run_locus_conversion': '.homology',
+    'run_precompute_homology': '.homology',
+    'run_download_pipeline': '.preprocessing',
+    'run_preprocess_annotation_files': '.preprocessing',
+    'run_build_blast_db_pipeline': '.preprocessing',
+    'run_blast_pipeline': '.blast',
+    'run_sequence_extraction': '.seqence_query',
+    'run_region_sequence_extraction': '.seqence_query',
+}
+
+__all__ = list(_PIPELINE_MODULES)
+
+
+def __getattr__(name: str):
+    module_name = _PIPELINE_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
+
+if TYPE_CHECKING:
+    from .ai_tasks import run_ai_task
+    from .gff_tasks import run_gff_lookup
+    from .annotation import run_functional_annotation, run_enrichment_pipeline
+    from .homology import run_homology_mapping, run_locus_conversion, run_precompute_homology
+    from .preprocessing import (
+        run_download_pipeline,
+        run_preprocess_annotation_files,
+        run_build_blast_db_pipeline,
+    )
+    from .blast import run_blast_pipeline
+    from .seqence_query import run_sequence_extraction, run_region_sequence_extraction
@@ -4,9 +4,13 @@ import threading
 from typing import Optional, Dict, Any, Callable
 
 from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.core.ai_provider_pool import AIProviderPool, ProviderPoolMember
+from cotton_toolkit.core.ai_response_cache import get_ai_response_cache
+from cotton_toolkit.core.ai_usage import AIUsageTracker
 from cotton_toolkit.core.ai_wrapper import AIWrapper
 from cotton_toolkit.pipelines.decorators import pipeline_task
 from cotton_toolkit.tools.batch_ai_processor import process_single_csv_file
+from cotton_toolkit.utils.resource_manager import get_resource_manager, RESOURCE_NETWORK
 
 try:
     from builtins import _
@@ -15,6 +19,45 @@ except ImportError:
 
 logger = logging.getLogger("cotton_toolkit.pipeline.ai_task")
 
+def _build_provider_pool(
+        config: MainConfig,
+        primary_name: str,
+        primary_client: AIWrapper,
+        proxies: Optional[Dict[str, str]],
+        max_workers: int,
+        usage_tracker: AIUsageTracker
+) -> AIProviderPool:
+    """由所选服务商和 ai_services.pool_providers 中的其它服务商组成服务商池；未配置有效密钥的服务商会被跳过。"""
+    ai_cfg = config.ai_services
+    primary_cfg = ai_cfg.providers[primary_name]
+    members = [ProviderPoolMember(primary_name, primary_client, primary_cfg.weight, primary_cfg.requests_per_minute,
+                                  primary_cfg.tokens_per_minute)]
+    usage_tracker.set_prices(primary_name, primary_cfg.input_price_per_million, primary_cfg.output_price_per_million)
+
+    for name in ai_cfg.pool_providers:
+        provider_cfg = ai_cfg.providers.get(name)
+        if name == primary_name or provider_cfg is None:
+            continue
+        if not provider_cfg.api_key or provider_cfg.api_key.startswith("YOUR_"):
+            logger.warning(_("服务商 '{}' 未设置有效的API Key，不加入服务商池。").format(name))
+            continue
+        try:
+            client = AIWrapper(provider=name, api_key=provider_cfg.api_key, model=provider_cfg.model,
+                               base_url=provider_cfg.base_url, proxies=proxies, max_workers=max_workers,
+                               stream=config.batch_ai_processor.stream_responses, usage_tracker=usage_tracker)
+        except (ValueError, ImportError) as e:
+            logger.warning(_("服务商 '{}' 初始化失败，不加入服务商池: {}").format(name, e))
+            continue
+        members.append(ProviderPoolMember(name, client, provider_cfg.weight, provider_cfg.requests_per_minute,
+                                          provider_cfg.tokens_per_minute))
+        usage_tracker.set_prices(name, provider_cfg.input_price_per_million, provider_cfg.output_price_per_million)
+
+    if len(members) > 1:
+        logger.info(_("AI服务商池: {}").format(", ".join(f"{m.name}(x{m.weight})" for m in members)))
+    return AIProviderPool(members, failure_threshold=ai_cfg.circuit_failure_threshold,
+                          cooldown_seconds=ai_cfg.circuit_cooldown_seconds)
+
+
 @pipeline_task(_("AI"))
 def run_ai_task(
         config: MainConfig,
@@ -60,43 +103,60 @@ def run_ai_task(
     progress(10, _("正在初始化AI客户端..."))
     if check_cancel(): return
 
-    logger.info(_("正在初始化AI客户端... 服务商: {}, 模型: {}").format(provider_name, model_name))
-    ai_client = AIWrapper(provider=provider_name, api_key=api_key, model=model_name, base_url=base_url,
-                          proxies=proxies_to_use, max_workers=config.batch_ai_processor.max_workers)
-
-    prompt_to_use = custom_prompt_template or (
-        config.ai_prompts.translation_prompt if task_type == 'translate' else config.ai_prompts.analysis_prompt)
-
-    final_output_path = None
-    if output_file is not None:
-        output_directory = os.path.dirname(output_file)
-        final_output_path = output_file
-        logger.info(_("将在原文件上修改: {}").format(output_file))
-    else:
-        output_directory = os.path.dirname(input_file)
-        logger.info(_("将创建新文件并保存于源文件目录: {}").format(output_directory))
-
-    os.makedirs(output_directory, exist_ok=True)
-
-    progress(15, _("正在处理CSV文件并调用AI服务..."))
-    if check_cancel(): return
-
-    process_single_csv_file(
-        client=ai_client,
-        input_csv_path=input_file,
-        output_csv_directory=output_directory,
-        source_column_name=source_column,
-        new_column_name=new_column,
-        user_prompt_template=prompt_to_use,
-        task_identifier=f"{os.path.basename(input_file)}_{task_type}",
-        max_row_workers=config.batch_ai_processor.max_workers,
-        progress_callback=lambda p, m: progress(15 + int(p * 0.8), _("AI处理: {}").format(m)),
-        cancel_event=cancel_event,
-        output_csv_path=final_output_path
-    )
+    # 并发请求数受全局网络槽位限制，与同时进行的下载等任务共享
+    network = get_resource_manager(config).acquire(RESOURCE_NETWORK, config.batch_ai_processor.max_workers,
+                                                   check_cancel=check_cancel)
+    with network as network_slots:
+        if not network_slots: return
+        logger.info(_("正在初始化AI客户端... 服务商: {}, 模型: {}").format(provider_name, model_name))
+        usage_tracker = AIUsageTracker(provider_cfg_obj.input_price_per_million,
+                                       provider_cfg_obj.output_price_per_million)
+        ai_client = AIWrapper(provider=provider_name, api_key=api_key, model=model_name, base_url=base_url,
+                              proxies=proxies_to_use, max_workers=network_slots,
+                              stream=config.batch_ai_processor.stream_responses, usage_tracker=usage_tracker)
+        ai_pool = _build_provider_pool(config, provider_name, ai_client, proxies_to_use, network_slots,
+                                       usage_tracker)
+
+        prompt_to_use = custom_prompt_template or (
+            config.ai_prompts.translation_prompt if task_type == 'translate' else config.ai_prompts.analysis_prompt)
+
+        final_output_path = None
+        if output_file is not None:
+            output_directory = os.path.dirname(output_file)
+            final_output_path = output_file
+            logger.info(_("将在原文件上修改: {}").format(output_file))
+        else:
+            output_directory = os.path.dirname(input_file)
+            logger.info(_("将创建新文件并保存于源文件目录: {}").format(output_directory))
+
+        os.makedirs(output_directory, exist_ok=True)
+
+        progress(15, _("正在处理CSV文件并调用AI服务..."))
+        if check_cancel(): return
+
+        usage_summary = process_single_csv_file(
+            client=ai_pool,
+            input_csv_path=input_file,
+            output_csv_directory=output_directory,
+            source_column_name=source_column,
+            new_column_name=new_column,
+            user_prompt_template=prompt_to_use,
+            task_identifier=f"{os.path.basename(input_file)}_{task_type}",
+            max_row_workers=network_slots,
+            progress_callback=lambda p, m: progress(15 + int(p * 0.8), _("AI处理: {}").format(m)),
+            cancel_event=cancel_event,
+            output_csv_path=final_output_path,
+            max_retries=config.batch_ai_processor.max_retries,
+            temperature=config.batch_ai_processor.temperature,
+            items_per_request=config.batch_ai_processor.items_per_request,
+            max_chars_per_request=config.batch_ai_processor.max_chars_per_request,
+            cache=get_ai_response_cache(config),
+            chunk_rows=config.batch_ai_processor.chunk_rows
+        )
 
     if cancel_event and cancel_event.is_set():
         return
 
     progress(100, _("任务完成。"))
     logger.info(_("AI任务流程成功完成。"))
+    return usage_summary
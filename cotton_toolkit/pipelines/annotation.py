@@ -35,7 +35,8 @@ def run_functional_annotation(
         custom_db_dir: Optional[str] = None,
         cancel_event: Optional[threading.Event] = None,
         **kwargs
-) -> None:
+) -> Optional[str]:
+    """为基因列表添加功能注释并保存为CSV，返回输出文件路径；没有生成任何结果或被取消时返回 None。"""
 
     progress = kwargs['progress_callback']
     check_cancel = kwargs['check_cancel']
@@ -107,7 +108,8 @@ def run_functional_annotation(
         final_df = pd.merge(final_df_base, result_df, on='Gene_ID', how='left')
 
         try:
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            if os.path.dirname(output_path):
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
             final_df.to_csv(output_path, index=False, encoding='utf-8-sig')
             logger.info(_("注释成功！结果已保存至: {}").format(output_path))
         except Exception as e:
@@ -115,8 +117,11 @@ def run_functional_annotation(
 
     else:
         logger.warning(_("注释完成，但没有生成任何结果。"))
+        progress(100, _("功能注释流程结束。"))
+        return None
 
     progress(100, _("功能注释流程结束。"))
+    return output_path
 
 
 @pipeline_task(_("富集分析"))
@@ -1,21 +1,29 @@
-﻿import gzip
+﻿import hashlib
+import csv
+import io
+import json
 import os
+import shutil
+import signal
 import subprocess
 import tempfile
-import threading
 import locale
 import traceback
-from typing import Optional, Callable
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from typing import Optional, Callable, NamedTuple, List, Tuple, Iterable, Dict, Any, TextIO
 import logging
+import numpy as np
 import pandas as pd
-from Bio import SeqIO
-from Bio.Blast.Applications import NcbiblastnCommandline, NcbiblastpCommandline, NcbiblastxCommandline, \
-    NcbitblastnCommandline
-from Bio.SearchIO import parse as blast_parse
 
-from cotton_toolkit.config.loader import get_genome_data_sources, get_local_downloaded_file_path
+from cotton_toolkit import BLAST_RUN_DIR
 from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.core.blast_cache import get_database_fingerprint, get_parameters_key
+from cotton_toolkit.core.blast_db_registry import DB_TYPE_FILE_KEYS, ensure_blast_database, get_blast_db_type
 from cotton_toolkit.pipelines.decorators import pipeline_task
+from cotton_toolkit.utils.lazy_import import lazy_import
+from cotton_toolkit.utils.resource_manager import get_resource_manager, RESOURCE_CPU
+from cotton_toolkit.utils.sequence_io import open_text_input, detect_sequence_format, iter_sequence_records, \
+    filter_sequence_records, format_fasta_record
 
 # 国际化函数占位符
 try:
@@ -28,6 +36,480 @@ except (AttributeError, ImportError):
 
 logger = logging.getLogger("cotton_toolkit.pipeline.blast")
 
+# Biopython 的 SearchIO 导入较慢，只在真正运行BLAST时才导入
+blast_applications = lazy_import("Bio.Blast.Applications")
+SearchIO = lazy_import("Bio.SearchIO")
+
+# 表格输出 (outfmt 6) 的自定义列，顺序即BLAST输出的列顺序
+TABULAR_FIELDS = ['qseqid', 'qlen', 'sseqid', 'stitle', 'slen', 'evalue', 'bitscore', 'nident', 'positive', 'gaps',
+                  'length', 'qstart', 'qend', 'sstart', 'send']
+TABULAR_ALIGNMENT_FIELDS = ['qseq', 'sseq']
+_TABULAR_DTYPES = {
+    'qseqid': str, 'qlen': np.int64, 'sseqid': str, 'stitle': str, 'slen': np.int64, 'evalue': np.float64,
+    'bitscore': np.float64, 'nident': np.int64, 'positive': np.int64, 'gaps': np.int64, 'length': np.int64,
+    'qstart': np.int64, 'qend': np.int64, 'sstart': np.int64, 'send': np.int64, 'qseq': str, 'sseq': str,
+}
+# 未使用 -parse_seqids 建库时，BLAST以序号代替真实ID，此时真实ID位于标题的第一个词
+_ORDINAL_ID_PREFIX = 'gnl|BL_ORD_ID|'
+# BLAST运行期间检查取消信号的间隔（秒）
+BLAST_CANCEL_POLL_SECONDS = 0.5
+
+
+def _strand_and_bounds(start: pd.Series, end: pd.Series, is_nucleotide: bool):
+    """
+    将BLAST的1-based坐标转换为与 Bio.SearchIO 一致的约定:
+    起点为0-based、终点不变且 start < end；核酸按坐标方向给出 1/-1，蛋白质链方向为 0。
+    """
+    lower = np.minimum(start, end)
+    upper = np.maximum(start, end)
+    if is_nucleotide:
+        strand = np.where(end >= start, 1, -1)
+    else:
+        strand = np.zeros(len(start), dtype=np.int64)
+    return lower - 1, upper, strand
+
+
+def _parse_tabular_blast_output(tabular_path: str, blast_type: str, include_alignments: bool) -> pd.DataFrame:
+    """
+    以向量化方式解析自定义列的表格结果，列名与XML解析结果保持一致。
+    """
+    fields = TABULAR_FIELDS + (TABULAR_ALIGNMENT_FIELDS if include_alignments else [])
+    # outfmt 6 不含注释行，而标题中可能出现 '#' 或引号，因此既不按注释截断也不解析引号
+    raw = pd.read_csv(tabular_path, sep='\t', header=None, names=fields, quoting=csv.QUOTE_NONE,
+                      dtype={f: _TABULAR_DTYPES[f] for f in fields}, keep_default_na=False, na_values=[])
+    if raw.empty:
+        return pd.DataFrame()
+
+    titles = raw['stitle'].str.split(' ', n=1, expand=True).reindex(columns=[0, 1]).fillna('')
+    ordinal = raw['sseqid'].str.startswith(_ORDINAL_ID_PREFIX)
+    hit_ids = raw['sseqid'].where(~ordinal, titles[0])
+    # 与SearchIO一致：描述中不重复ID本身
+    hit_desc = titles[1].where(titles[0] == hit_ids, raw['stitle'])
+
+    query_is_nucl = blast_type in ('blastn', 'blastx')
+    hit_is_nucl = blast_type in ('blastn', 'tblastn')
+    query_start, query_end, query_strand = _strand_and_bounds(raw['qstart'], raw['qend'], query_is_nucl)
+    hit_start, hit_end, hit_strand = _strand_and_bounds(raw['sstart'], raw['send'], hit_is_nucl)
+
+    span = raw['length'].where(raw['length'] > 0)
+    results_df = pd.DataFrame({
+        "Query_ID": raw['qseqid'], "Query_Length": raw['qlen'],
+        "Hit_ID": hit_ids, "Hit_Description": hit_desc, "Hit_Length": raw['slen'],
+        "E-value": raw['evalue'], "Bit_Score": raw['bitscore'],
+        "Identity (%)": (raw['nident'] / span * 100).fillna(0).round(2),
+        "Positives (%)": (raw['positive'] / span * 100).fillna(0).round(2),
+        "Gaps": raw['gaps'], "Alignment_Length": raw['length'],
+        "Query_Start": query_start, "Query_End": query_end,
+        "Hit_Start": hit_start, "Hit_End": hit_end,
+        "Query_Strand": query_strand, "Hit_Strand": hit_strand,
+    })
+    if include_alignments:
+        results_df["Query_Sequence"] = raw['qseq']
+        results_df["Hit_Sequence"] = raw['sseq']
+    return results_df
+
+
+class BlastExecutionPlan(NamedTuple):
+    """BLAST执行方案：并行的BLAST进程数、每个进程的线程数，以及查询序列被切分的块数。"""
+    processes: int
+    threads_per_process: int
+    chunk_count: int
+
+
+# 每个BLAST进程至少分到的查询序列数，低于此值时多开进程得不偿失（每个进程都要重新加载数据库）
+MIN_QUERIES_PER_PROCESS = 50
+# 单个BLAST进程的线程数超过此值后扩展性明显下降，此时改为增加进程数
+THREADS_PER_PROCESS_TARGET = 4
+# 为了让进度条平滑推进，每个进程会依次处理的块数
+CHUNKS_PER_PROCESS = 4
+
+
+def plan_blast_execution(num_queries: int, max_threads: Optional[int] = None) -> BlastExecutionPlan:
+    """
+    根据查询序列数量与可用CPU核心数，在“单进程多线程”与“K个进程各T个线程”之间选择，
+    保证 processes * threads_per_process 不超过 max_threads，避免CPU超额订阅。
+    """
+    max_threads = max(1, max_threads or os.cpu_count() or 1)
+    if num_queries <= MIN_QUERIES_PER_PROCESS or max_threads <= THREADS_PER_PROCESS_TARGET:
+        return BlastExecutionPlan(processes=1, threads_per_process=max_threads,
+                                  chunk_count=1 if num_queries <= MIN_QUERIES_PER_PROCESS else CHUNKS_PER_PROCESS)
+
+    processes = max(1, min(max_threads // THREADS_PER_PROCESS_TARGET, num_queries // MIN_QUERIES_PER_PROCESS))
+    threads_per_process = max(1, max_threads // processes)
+    chunk_count = max(processes, min(processes * CHUNKS_PER_PROCESS, num_queries // MIN_QUERIES_PER_PROCESS))
+    return BlastExecutionPlan(processes=processes, threads_per_process=threads_per_process, chunk_count=chunk_count)
+
+
+def _prepare_blast_database(
+        config: MainConfig,
+        target_assembly_id: str,
+        blast_type: str,
+        check_cancel: Callable[[], bool],
+        progress: Callable[[int, str], None]
+) -> Optional[str]:
+    """
+    确保目标基因组的BLAST数据库可用（由数据库注册表按需解压、建库并校验）。
+    返回数据库路径；任务被取消时返回 None。
+    """
+    progress(5, _("正在验证目标基因组数据库..."))
+    logger.info(_("步骤 1: 准备目标数据库 '{}'...").format(target_assembly_id))
+
+    db_type = get_blast_db_type(blast_type)
+    logger.info(_("为 {} 需要 {} 类型的数据库，将使用 '{}' 文件。").format(blast_type, db_type, DB_TYPE_FILE_KEYS[db_type]))
+
+    db_info = ensure_blast_database(config, target_assembly_id, db_type, check_cancel=check_cancel, progress=progress)
+    if db_info is None:
+        return None
+    if db_info.num_sequences is not None:
+        logger.info(_("目标数据库包含 {} 条序列，总长度 {}（{} 个分卷）。").format(
+            db_info.num_sequences, db_info.total_length, len(db_info.volumes)))
+    return db_info.db_path
+
+
+def _terminate_process_tree(process: subprocess.Popen) -> None:
+    """终止通过 shell 启动的BLAST进程及其子进程。"""
+    try:
+        if os.name == 'posix':
+            os.killpg(process.pid, signal.SIGKILL)
+        else:
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+    except (ProcessLookupError, PermissionError, OSError):
+        pass
+    process.communicate()
+
+
+def _run_blast_command(blast_cline, check_cancel: Callable[[], bool]) -> Optional[Tuple[str, str]]:
+    """
+    运行BLAST命令并返回 (stdout, stderr)。运行期间定期检查取消信号，被取消时终止BLAST进程并返回 None，
+    保证任务结束后不会有BLAST进程继续占用CPU。
+    """
+    command = str(blast_cline)
+    process = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, universal_newlines=True,
+                               start_new_session=os.name == 'posix')
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=BLAST_CANCEL_POLL_SECONDS)
+            break
+        except subprocess.TimeoutExpired:
+            if check_cancel():
+                _terminate_process_tree(process)
+                return None
+        except BaseException:
+            _terminate_process_tree(process)
+            raise
+    if process.returncode:
+        raise RuntimeError(_("BLAST运行时发生致命错误（退出码 {}）: {}").format(process.returncode, stderr.strip()))
+    return stdout, stderr
+
+
+def _execute_blast(
+        blast_type: str,
+        query_fasta_path: str,
+        db_fasta_path: str,
+        evalue: float,
+        word_size: int,
+        max_target_seqs: int,
+        num_threads: int,
+        blast_output_format: str = 'xml',
+        include_alignments: bool = False,
+        check_cancel: Optional[Callable[[], bool]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    对一个查询FASTA文件运行一次BLAST并解析结果。原始输出写在查询文件旁边（.xml/.tsv），由调用方清理。
+    无匹配时返回空DataFrame；任务被取消时返回 None。
+    """
+    check_cancel = check_cancel or (lambda: False)
+    use_tabular = blast_output_format == 'tabular'
+    raw_output_path = query_fasta_path + (".tsv" if use_tabular else ".xml")
+    if use_tabular:
+        tabular_fields = TABULAR_FIELDS + (TABULAR_ALIGNMENT_FIELDS if include_alignments else [])
+        outfmt = "6 " + " ".join(tabular_fields)
+    else:
+        outfmt = 5
+
+    blast_map = {'blastn': blast_applications.NcbiblastnCommandline,
+                 'blastp': blast_applications.NcbiblastpCommandline,
+                 'blastx': blast_applications.NcbiblastxCommandline,
+                 'tblastn': blast_applications.NcbitblastnCommandline}
+    blast_cline = blast_map[blast_type](query=query_fasta_path, db=db_fasta_path, out=raw_output_path,
+                                        outfmt=outfmt, evalue=evalue, word_size=word_size,
+                                        max_target_seqs=max_target_seqs, num_threads=num_threads)
+
+    logger.info(_("BLAST命令: {}").format(str(blast_cline)))
+    if check_cancel(): return None
+    blast_output = _run_blast_command(blast_cline, check_cancel)
+    if blast_output is None:
+        return None
+    stdout, stderr = blast_output
+    if stderr:
+        stderr_lower = stderr.lower()
+        if "error:" in stderr_lower or "fatal:" in stderr_lower or "command not found" in stderr_lower:
+            raise RuntimeError(_("BLAST运行时发生致命错误: {}").format(stderr))
+        else:
+            logger.warning(_("BLAST运行时产生警告或提示信息: {}").format(stderr.strip()))
+
+    if check_cancel(): return None
+
+    all_hits = []
+    results_df = pd.DataFrame()
+    if not os.path.exists(raw_output_path) or os.path.getsize(raw_output_path) == 0:
+        logger.warning(_("BLAST运行完毕，但未产生任何结果。"))
+    elif use_tabular:
+        results_df = _parse_tabular_blast_output(raw_output_path, blast_type, include_alignments)
+    else:
+        blast_results = SearchIO.parse(raw_output_path, "blast-xml")
+        for query_result in blast_results:
+            if check_cancel(): return None
+            for hit in query_result:
+                for hsp in hit:
+                    hit_data = {
+                        "Query_ID": query_result.id, "Query_Length": query_result.seq_len,
+                        "Hit_ID": hit.id, "Hit_Description": hit.description, "Hit_Length": hit.seq_len,
+                        "E-value": hsp.evalue, "Bit_Score": hsp.bitscore,
+                        "Identity (%)": (hsp.ident_num / hsp.aln_span) * 100 if hsp.aln_span > 0 else 0,
+                        "Positives (%)": (hsp.pos_num / hsp.aln_span) * 100 if hsp.aln_span > 0 else 0,
+                        "Gaps": hsp.gap_num, "Alignment_Length": hsp.aln_span,
+                        "Query_Start": hsp.query_start, "Query_End": hsp.query_end,
+                        "Hit_Start": hsp.hit_start, "Hit_End": hsp.hit_end,
+                        "Query_Strand": hsp.query_strand, "Hit_Strand": hsp.hit_strand,
+                        "Query_Sequence": str(hsp.query.seq), "Hit_Sequence": str(hsp.hit.seq),
+                        "Alignment_Midline": hsp.aln_annotation.get('homology', '')
+                    }
+                    all_hits.append(hit_data)
+        if all_hits:
+            results_df = pd.DataFrame(all_hits)
+            results_df['Identity (%)'] = results_df['Identity (%)'].round(2)
+            results_df['Positives (%)'] = results_df['Positives (%)'].round(2)
+    return results_df
+
+
+# 流式写入查询序列时，每处理多少条检查一次取消信号
+QUERY_CANCEL_CHECK_INTERVAL = 10000
+# 运行目录中的清单文件名，以及各分片结果检查点的后缀
+RUN_MANIFEST_NAME = "run.json"
+CHECKPOINT_SUFFIX = ".result.pkl"
+# 主进程取消或出错时创建的标记文件，各分片子进程看到它即终止自己的BLAST进程
+CANCEL_MARKER_NAME = "cancel"
+
+
+def _write_query_fasta(
+        records: Iterable[Tuple[str, str]],
+        query_fasta_path: str,
+        check_cancel: Callable[[], bool]
+) -> Optional[Tuple[int, int]]:
+    """将查询记录逐条写入FASTA（不换行），返回 (序列数, 总长度)；任务被取消时返回 None。"""
+    num_queries, total_length = 0, 0
+    with open(query_fasta_path, 'w', encoding='utf-8') as handle:
+        for title, sequence in records:
+            handle.write(format_fasta_record(title, sequence, line_width=None))
+            num_queries += 1
+            total_length += len(sequence)
+            if num_queries % QUERY_CANCEL_CHECK_INTERVAL == 0 and check_cancel():
+                return None
+    return num_queries, total_length
+
+
+def _split_query_fasta(query_fasta_path: str, num_queries: int, shard_count: int, work_dir: str) -> List[str]:
+    """
+    将查询FASTA按原有顺序切分为 shard_count 个连续的分片，各分片的序列数尽量相等。
+    按分片顺序拼接各自的结果即可得到与输入顺序一致的输出。
+    """
+    shard_count = max(1, min(shard_count, num_queries))
+    base_size, remainder = divmod(num_queries, shard_count)
+    shard_paths = []
+    with open(query_fasta_path, 'r', encoding='utf-8') as source:
+        records = iter_sequence_records(source, 'fasta')
+        for shard_index in range(shard_count):
+            shard_size = base_size + (1 if shard_index < remainder else 0)
+            shard_path = os.path.join(work_dir, f"query_shard_{shard_index:04d}.fasta")
+            with open(shard_path, 'w', encoding='utf-8') as handle:
+                for _i, (title, sequence) in zip(range(shard_size), records):
+                    handle.write(format_fasta_record(title, sequence, line_width=None))
+            shard_paths.append(shard_path)
+    return shard_paths
+
+
+def _blast_shard_worker(
+        blast_type: str,
+        shard_path: str,
+        checkpoint_path: str,
+        db_fasta_path: str,
+        evalue: float,
+        word_size: int,
+        max_target_seqs: int,
+        num_threads: int,
+        blast_output_format: str,
+        include_alignments: bool,
+        cancel_marker_path: str
+) -> Optional[str]:
+    """
+    在子进程中运行：对一个分片执行BLAST，并将解析后的结果原子地写入检查点文件。
+    检查点存在即表示该分片已完成，中断后重新运行时会被跳过。
+    主进程创建 cancel_marker_path 时终止BLAST进程并返回 None（不写检查点）。
+    """
+    results_df = _execute_blast(blast_type, shard_path, db_fasta_path, evalue, word_size, max_target_seqs,
+                                num_threads, blast_output_format, include_alignments,
+                                check_cancel=lambda: os.path.exists(cancel_marker_path))
+    if results_df is None:
+        return None
+    tmp_path = checkpoint_path + '.tmp'
+    results_df.to_pickle(tmp_path)
+    os.replace(tmp_path, checkpoint_path)
+    for ext in (".xml", ".tsv"):
+        if os.path.exists(shard_path + ext):
+            os.remove(shard_path + ext)
+    return checkpoint_path
+
+
+def _get_blast_run_dir(config: MainConfig, run_key: str) -> str:
+    """每次BLAST运行的工作目录，由输入与参数决定，相同的任务再次运行时会找到同一个目录并从断点继续。"""
+    if config.config_file_abs_path_:
+        base_dir = os.path.join(os.path.dirname(config.config_file_abs_path_), BLAST_RUN_DIR)
+    else:
+        base_dir = os.path.join(tempfile.gettempdir(), "fcgt_blast_runs")
+    return os.path.join(base_dir, run_key)
+
+
+def _read_run_manifest(run_dir: str) -> Optional[Dict[str, Any]]:
+    manifest_path = os.path.join(run_dir, RUN_MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _prepare_query_shards(
+        run_dir: str,
+        query_handle: TextIO,
+        min_query_length: Optional[int],
+        max_query_length: Optional[int],
+        subsample_fraction: Optional[float],
+        subsample_seed: int,
+        max_threads: Optional[int],
+        check_cancel: Callable[[], bool]
+) -> Optional[Dict[str, Any]]:
+    """
+    流式读取、过滤查询序列并切分为分片，最后写入运行清单（清单存在即表示分片已准备完毕）。
+    任务被取消时返回 None。
+    """
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir, exist_ok=True)
+    query_fasta_path = os.path.join(run_dir, "query.fasta")
+
+    sequence_format = detect_sequence_format(query_handle)
+    if sequence_format == 'fastq':
+        logger.info(_("检测到FASTQ格式，将流式转换为FASTA..."))
+    records = filter_sequence_records(
+        iter_sequence_records(query_handle, sequence_format),
+        min_length=min_query_length, max_length=max_query_length,
+        subsample_fraction=subsample_fraction, seed=subsample_seed)
+    query_summary = _write_query_fasta(records, query_fasta_path, check_cancel)
+    if query_summary is None:
+        return None
+
+    num_queries, total_length = query_summary
+    logger.info(_("共 {} 条查询序列（总长度 {}）。").format(num_queries, total_length))
+    shard_names = []
+    if num_queries > 0:
+        plan = plan_blast_execution(num_queries, max_threads)
+        if plan.chunk_count > 1:
+            shard_paths = _split_query_fasta(query_fasta_path, num_queries, plan.chunk_count, run_dir)
+            os.remove(query_fasta_path)
+        else:
+            shard_paths = [os.path.join(run_dir, "query_shard_0000.fasta")]
+            os.replace(query_fasta_path, shard_paths[0])
+        shard_names = [os.path.basename(path) for path in shard_paths]
+
+    manifest = {'num_queries': num_queries, 'total_length': total_length, 'shards': shard_names}
+    tmp_path = os.path.join(run_dir, RUN_MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(run_dir, RUN_MANIFEST_NAME))
+    return manifest
+
+
+def _run_blast_shards(
+        run_dir: str,
+        manifest: Dict[str, Any],
+        blast_type: str,
+        db_fasta_path: str,
+        evalue: float,
+        word_size: int,
+        max_target_seqs: int,
+        blast_output_format: str,
+        include_alignments: bool,
+        max_threads: Optional[int],
+        check_cancel: Callable[[], bool],
+        progress: Callable[[int, str], None]
+) -> Optional[pd.DataFrame]:
+    """
+    用进程池并行运行尚未完成的分片，每完成一个分片即更新进度；
+    全部完成后按分片顺序读取检查点并合并结果。任务被取消时返回 None（已完成的检查点保留）。
+    """
+    shard_paths = [os.path.join(run_dir, name) for name in manifest['shards']]
+    cancel_marker_path = os.path.join(run_dir, CANCEL_MARKER_NAME)
+    if os.path.exists(cancel_marker_path):
+        os.remove(cancel_marker_path)
+    checkpoint_paths = [path + CHECKPOINT_SUFFIX for path in shard_paths]
+    pending = [i for i, checkpoint in enumerate(checkpoint_paths) if not os.path.exists(checkpoint)]
+    total = len(shard_paths)
+    done = total - len(pending)
+    if done:
+        logger.info(_("发现上次运行留下的检查点，{}/{} 个分片已完成，将从断点继续。").format(done, total))
+
+    def report():
+        progress(40 + int(done / total * 40), _("BLAST 进度: {}/{} 个分片").format(done, total))
+
+    report()
+    if pending:
+        plan = plan_blast_execution(manifest['num_queries'], max_threads)
+        processes = max(1, min(plan.processes, len(pending)))
+        logger.info(_("以 {} 个BLAST进程（每个 {} 线程）运行 {} 个分片。").format(
+            processes, plan.threads_per_process, len(pending)))
+        executor = ProcessPoolExecutor(max_workers=processes)
+        all_finished = False
+        try:
+            # 只让 processes 个分片同时在途，取消时不会有已排队的分片继续启动
+            queue = iter(pending)
+            in_flight = set()
+            while True:
+                while len(in_flight) < processes:
+                    index = next(queue, None)
+                    if index is None:
+                        break
+                    in_flight.add(executor.submit(
+                        _blast_shard_worker, blast_type, shard_paths[index], checkpoint_paths[index], db_fasta_path,
+                        evalue, word_size, max_target_seqs, plan.threads_per_process, blast_output_format,
+                        include_alignments, cancel_marker_path))
+                if not in_flight:
+                    break
+                if check_cancel():
+                    logger.info(_("任务已取消，已完成的分片检查点保存在 {}").format(run_dir))
+                    return None
+                finished, in_flight = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    future.result()
+                    done += 1
+                    report()
+            all_finished = True
+        finally:
+            if not all_finished:
+                # 取消或某个分片出错：通知其余子进程终止各自的BLAST进程
+                open(cancel_marker_path, 'w').close()
+            # 等待子进程退出后再返回，调用方随后释放的CPU名额才是真正空闲的
+            executor.shutdown(wait=True, cancel_futures=True)
+            if os.path.exists(cancel_marker_path):
+                os.remove(cancel_marker_path)
+
+    frames = [pd.read_pickle(checkpoint) for checkpoint in checkpoint_paths]
+    non_empty = [df for df in frames if not df.empty]
+    return pd.concat(non_empty, ignore_index=True) if non_empty else pd.DataFrame()
+
+
 @pipeline_task("BLAST+")
 def run_blast_pipeline(
         config: MainConfig,
@@ -39,210 +521,102 @@ def run_blast_pipeline(
         evalue: float,
         word_size: int,
         max_target_seqs: int,
+        blast_output_format: str = 'xml',
+        include_alignments: bool = False,
+        min_query_length: Optional[int] = None,
+        max_query_length: Optional[int] = None,
+        subsample_fraction: Optional[float] = None,
+        subsample_seed: int = 0,
+        max_threads: Optional[int] = None,
         **kwargs
 ) -> Optional[pd.DataFrame]:
+    """
+    blast_output_format:
+      - 'xml': 以 outfmt 5 运行并通过 Bio.SearchIO 解析，总是包含比对序列与中间匹配行。
+      - 'tabular': 以自定义列的 outfmt 6 运行并向量化解析，速度快得多；
+        仅当 include_alignments 为 True 时才输出比对序列（不含中间匹配行）。
+    查询文件（FASTA/FASTQ，可为 .gz）以流式方式读取，内存占用与文件大小无关；
+    可按长度过滤（min/max_query_length）并按比例抽样（subsample_fraction，相同 subsample_seed 结果可复现）。
+    查询序列较多时会切分为多个连续分片并行运行BLAST，结果按输入顺序合并。
+    """
+    if blast_output_format not in ('xml', 'tabular'):
+        raise ValueError(_("不支持的BLAST输出格式: {}").format(blast_output_format))
+
+    if subsample_fraction is not None and not 0 < subsample_fraction <= 1:
+        raise ValueError(_("抽样比例必须在 (0, 1] 之间: {}").format(subsample_fraction))
 
     progress = kwargs['progress_callback']
     check_cancel = kwargs['check_cancel']
 
-    tmp_query_file_to_clean = None
     try:
         progress(0, _("BLAST 流程启动..."))
         if check_cancel(): return _("任务已取消。")
 
-        progress(5, _("正在验证目标基因组数据库..."))
-        logger.info(_("步骤 1: 准备目标数据库 '{}'...").format(target_assembly_id))
-
-        # 修改: get_genome_data_sources 不再需要 logger_func
-        genome_sources = get_genome_data_sources(config)
-        target_genome_info = genome_sources.get(target_assembly_id)
-        if not target_genome_info:
-            raise ValueError(_("错误: 无法找到目标基因组 '{}' 的配置。").format(target_assembly_id))
-
-
-        db_type = 'prot' if blast_type in ['blastp', 'blastx'] else 'nucl'
-        seq_file_key = 'predicted_protein' if db_type == 'prot' else 'predicted_cds'
-
-        logger.info(_("为 {} 需要 {} 类型的数据库，将使用 '{}' 文件。").format(blast_type, db_type, seq_file_key))
-
-        compressed_seq_file = get_local_downloaded_file_path(config, target_genome_info, seq_file_key)
-        if not compressed_seq_file or not os.path.exists(compressed_seq_file):
-            raise FileNotFoundError(_("错误: 未找到目标基因组的 '{}' 序列文件。请先下载数据。").format(seq_file_key))
-
-
-        db_fasta_path = compressed_seq_file
-        logger.debug(_("BLAST 数据库序列源文件: {}").format(db_fasta_path))
-
-        if compressed_seq_file.endswith('.gz'):
-            decompressed_path = compressed_seq_file.removesuffix('.gz')
-            db_fasta_path = decompressed_path
-            if not os.path.exists(decompressed_path) or os.path.getmtime(compressed_seq_file) > os.path.getmtime(
-                    decompressed_path):
-                progress(8, _("文件为gz压缩格式，正在解压..."))
-                logger.info(_("正在解压 {} 到 {}...").format(os.path.basename(compressed_seq_file),
-                                                             os.path.basename(decompressed_path)))
-                try:
-                    with gzip.open(compressed_seq_file, 'rb') as f_in, open(decompressed_path, 'wb') as f_out:
-                        while True:
-                            if check_cancel(): return _("解压过程被取消。")
-                            chunk = f_in.read(1024 * 1024)
-                            if not chunk:
-                                break
-                            f_out.write(chunk)
-                    logger.info(_("解压成功。"))
-                except Exception as e:
-                    raise IOError(_("解压文件时出错: {}").format(e))
-
-
-        if check_cancel(): return _("任务已取消。")
-
-        db_check_ext = '.phr' if db_type == 'prot' else '.nhr'
-        logger.debug(_("检查是否存在BLAST索引文件，例如: {}").format(db_fasta_path + db_check_ext))
-        if not os.path.exists(db_fasta_path + db_check_ext):
-            progress(10, _("正在创建BLAST数据库... (可能需要一些时间)"))
-            logger.info(
-                _("未找到现有的BLAST数据库，正在为 '{}' 创建一个新的 {} 库...").format(os.path.basename(db_fasta_path),
-                                                                                      db_type))
-
-            makeblastdb_cmd = ["makeblastdb", "-in", db_fasta_path, "-dbtype", db_type, "-out", db_fasta_path, "-title",
-                               f"{target_assembly_id} {db_type} DB"]
-            try:
-                if check_cancel(): return _("数据库创建过程在开始前被取消。")
-                result = subprocess.run(makeblastdb_cmd, capture_output=True, text=True, encoding='utf-8', errors='ignore')
-                if result.returncode != 0:
-                    # 如果返回码非0，我们检查索引文件是否实际已创建
-                    if not os.path.exists(db_fasta_path + db_check_ext):
-                        # 如果索引文件不存在，说明真的失败了
-                        logger.error(_("创建BLAST数据库失败: {} \nStderror: {}").format(result.stdout, result.stderr))
-                        return None
-                    else:
-                        # 如果索引文件存在，说明只是退出码有问题，可以继续
-                        logger.warning(_("makeblastdb命令返回了非零退出码，但数据库索引文件已成功创建。将继续执行..."))
-                        logger.debug(f"makeblastdb stdout:\n{result.stdout}")
-                        logger.debug(f"makeblastdb stderr:\n{result.stderr}")
-
-                logger.info(_("BLAST数据库创建成功。"))
-
-            except FileNotFoundError:
-                raise FileNotFoundError(_(
-                    "错误: 'makeblastdb' 命令未找到。请确保 BLAST+ 已被正确安装并添加到了系统的 PATH 环境变量中。\n\n官方下载地址:\nhttps://ftp.ncbi.nlm.nih.gov/blast/executables/blast+/LATEST/"))
-            except subprocess.CalledProcessError as e:
-                raise RuntimeError(_("创建BLAST数据库失败: {} \nStderror: {}").format(e.stdout, e.stderr))
-
-        if check_cancel(): return _("任务已取消。")
+        db_fasta_path = _prepare_blast_database(config, target_assembly_id, blast_type, check_cancel, progress)
+        if db_fasta_path is None: return _("任务已取消。")
 
         progress(25, _("正在准备查询序列..."))
-        tmp_query_file = tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix=".fasta")
-        tmp_query_file_to_clean = tmp_query_file.name
-        with tmp_query_file:
-            query_fasta_path = tmp_query_file.name
-            if query_file_path:
-                if check_cancel(): return _("任务已取消。")
-                logger.info(_("正在处理输入文件: {}").format(query_file_path))
-                file_format = "fasta"
-                try:
-                    with open(query_file_path, "r") as f:
-                        if f.read(1) == '@': file_format = "fastq"
-                except:
-                    pass
-                if file_format == "fastq":
-                    logger.info(_("检测到FASTQ格式，正在转换为FASTA..."))
-                    SeqIO.convert(query_file_path, "fastq", query_fasta_path, "fasta")
-                else:
-                    logger.info(_("将输入文件作为FASTA格式处理..."))
-                    with open(query_file_path, 'r') as infile:
-                        tmp_query_file.write(infile.read())
-            elif query_text:
-                if check_cancel(): return _("任务已取消。")
-                logger.info(_("正在处理文本输入..."))
-                logger.debug(_("--- Received query_text in pipeline (first 1000 chars) ---\n{}\n-------------------------------------------------").format(query_text[:1000]))
-                tmp_query_file.write(query_text)
-
-        logger.debug(_("查询序列已写入临时文件: {}").format(query_fasta_path))
+        if query_file_path:
+            logger.info(_("正在处理输入文件: {}").format(query_file_path))
+            query_key = get_database_fingerprint(query_file_path)
+        elif query_text:
+            logger.info(_("正在处理文本输入（{} 个字符）...").format(len(query_text)))
+            query_key = hashlib.sha1(query_text.encode('utf-8')).hexdigest()
+        else:
+            raise ValueError(_("没有提供查询序列。"))
+
+        run_key = get_parameters_key(
+            query=query_key, db=get_database_fingerprint(db_fasta_path), blast_type=blast_type, evalue=evalue,
+            word_size=word_size, max_target_seqs=max_target_seqs, output_format=blast_output_format,
+            include_alignments=include_alignments, min_length=min_query_length, max_length=max_query_length,
+            subsample_fraction=subsample_fraction, subsample_seed=subsample_seed)
+        run_dir = _get_blast_run_dir(config, run_key)
+
+        manifest = _read_run_manifest(run_dir)
+        if manifest is None:
+            with (open_text_input(query_file_path) if query_file_path else io.StringIO(query_text)) as query_handle:
+                manifest = _prepare_query_shards(run_dir, query_handle, min_query_length, max_query_length,
+                                                 subsample_fraction, subsample_seed, max_threads, check_cancel)
+            if manifest is None: return _("任务已取消。")
+
+        if manifest['num_queries'] == 0:
+            logger.warning(_("过滤后没有可用的查询序列。"))
+            shutil.rmtree(run_dir, ignore_errors=True)
+            return pd.DataFrame()
         if check_cancel(): return _("任务已取消。")
 
         progress(40, _("正在执行 {} ...").format(blast_type))
         logger.info(_("步骤 2: 执行 {} ...").format(blast_type.upper()))
-
-        output_xml_path = query_fasta_path + ".xml"
-
-        blast_map = {'blastn': NcbiblastnCommandline, 'blastp': NcbiblastpCommandline, 'blastx': NcbiblastxCommandline,
-                     'tblastn': NcbitblastnCommandline}
-        blast_cline = blast_map[blast_type](query=query_fasta_path, db=db_fasta_path, out=output_xml_path, outfmt=5,
-                                            evalue=evalue, word_size=word_size, max_target_seqs=max_target_seqs,
-                                            num_threads=config.downloader.max_workers)
-
-        logger.info(_("BLAST命令: {}").format(str(blast_cline)))
-        if check_cancel(): return _("BLAST在执行前被取消。")
-        stdout, stderr = blast_cline()
-        if stderr:
-            stderr_lower = stderr.lower()
-            if "error:" in stderr_lower or "fatal:" in stderr_lower or "command not found" in stderr_lower:
-                raise RuntimeError(_("BLAST运行时发生致命错误: {}").format(stderr))
-            else:
-                logger.warning(_("BLAST运行时产生警告或提示信息: {}").format(stderr.strip()))
-
-        if check_cancel(): return _("任务已取消。")
-
-        progress(80, _("正在解析BLAST结果..."))
+        with get_resource_manager(config).acquire(RESOURCE_CPU, max_threads, check_cancel=check_cancel) as cpu_slots:
+            if not cpu_slots: return _("任务已取消。")
+            results_df = _run_blast_shards(run_dir, manifest, blast_type, db_fasta_path, evalue, word_size,
+                                           max_target_seqs, blast_output_format, include_alignments, cpu_slots,
+                                           check_cancel, progress)
+        if results_df is None: return _("任务已取消。")
+        # 结果已合并，检查点不再需要
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+        progress(80, _("正在整理BLAST结果..."))
         logger.info(_("步骤 3: 解析结果并保存到 {} ...").format(output_path))
 
-        all_hits = []
-        if not os.path.exists(output_xml_path) or os.path.getsize(output_xml_path) == 0:
-            logger.warning(_("BLAST运行完毕，但未产生任何结果。"))
-        else:
-            blast_results = blast_parse(output_xml_path, "blast-xml")
-            for query_result in blast_results:
-                if check_cancel(): break
-                for hit in query_result:
-                    for hsp in hit:
-                        hit_data = {
-                            "Query_ID": query_result.id, "Query_Length": query_result.seq_len,
-                            "Hit_ID": hit.id, "Hit_Description": hit.description, "Hit_Length": hit.seq_len,
-                            "E-value": hsp.evalue, "Bit_Score": hsp.bitscore,
-                            "Identity (%)": (hsp.ident_num / hsp.aln_span) * 100 if hsp.aln_span > 0 else 0,
-                            "Positives (%)": (hsp.pos_num / hsp.aln_span) * 100 if hsp.aln_span > 0 else 0,
-                            "Gaps": hsp.gap_num, "Alignment_Length": hsp.aln_span,
-                            "Query_Start": hsp.query_start, "Query_End": hsp.query_end,
-                            "Hit_Start": hsp.hit_start, "Hit_End": hsp.hit_end,
-                            "Query_Strand": hsp.query_strand, "Hit_Strand": hsp.hit_strand,
-                            "Query_Sequence": str(hsp.query.seq), "Hit_Sequence": str(hsp.hit.seq),
-                            "Alignment_Midline": hsp.aln_annotation.get('homology', '')
-                        }
-                        all_hits.append(hit_data)
+        if results_df.empty:
+            logger.warning(_("未找到任何显著的BLAST匹配项。"))
+            return results_df
 
-        if check_cancel(): return _("任务已取消。")
+        logger.info(_("成功找到 {} 条匹配记录。").format(len(results_df)))
 
-        if not all_hits:
-            logger.warning(_("未找到任何显著的BLAST匹配项。"))
-        else:
-            results_df = pd.DataFrame()  # 默认返回一个空的DataFrame
-            if not all_hits:
-                logger.warning(_("未找到任何显著的BLAST匹配项。"))
-            else:
-                results_df = pd.DataFrame(all_hits)
-                results_df['Identity (%)'] = results_df['Identity (%)'].map('{:.2f}'.format)
-                results_df['Positives (%)'] = results_df['Positives (%)'].map('{:.2f}'.format)
-                logger.info(_("成功找到 {} 条匹配记录。").format(len(results_df)))
-
-            if output_path:
-                progress(95, _("正在保存到文件..."))
-                if output_path.lower().endswith('.csv'):
-                    results_df.to_csv(output_path, index=False, encoding='utf-8-sig')
-                elif output_path.lower().endswith('.xlsx'):
-                    results_df.to_excel(output_path, index=False, engine='openpyxl')
-                logger.info(_("BLAST 任务完成！结果已保存到 {}").format(output_path))
-
-            progress(100, _("BLAST流程完成。"))
-            return results_df  # 总是返回DataFrame对象
+        if output_path:
+            progress(95, _("正在保存到文件..."))
+            if output_path.lower().endswith('.csv'):
+                results_df.to_csv(output_path, index=False, encoding='utf-8-sig')
+            elif output_path.lower().endswith('.xlsx'):
+                results_df.to_excel(output_path, index=False, engine='openpyxl')
+            logger.info(_("BLAST 任务完成！结果已保存到 {}").format(output_path))
+
+        progress(100, _("BLAST流程完成。"))
+        return results_df  # 总是返回DataFrame对象
 
     except Exception as e:
         logger.error(_("BLAST流水线执行过程中发生意外错误: {}").format(e))
         logger.debug(traceback.format_exc())
         raise e
-    finally:
-        if tmp_query_file_to_clean and os.path.exists(tmp_query_file_to_clean):
-            os.remove(tmp_query_file_to_clean)
-            output_xml_path = tmp_query_file_to_clean + ".xml"
-            if os.path.exists(output_xml_path):
-                os.remove(output_xml_path)
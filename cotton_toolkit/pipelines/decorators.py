@@ -4,6 +4,8 @@ import logging
 import threading
 from typing import Callable
 
+from cotton_toolkit.utils.resource_manager import resource_owner
+
 try:
     from builtins import _
 except (AttributeError, ImportError):
@@ -55,7 +57,9 @@ def pipeline_task(task_name: str):
                 return None
 
             try:
-                result = func(*args, **kwargs)
+                # 任务期间申请的CPU/I/O/网络槽位都记在该任务名下
+                with resource_owner(task_name):
+                    result = func(*args, **kwargs)
                 if not check_cancel():  # 只有在任务未被取消时才显示成功
                     logger.info(_("--- 流水线任务成功完成: {} ---").format(task_name))
                     progress(100, _("{} - 任务完成。").format(task_name))
@@ -9,6 +9,7 @@ import pandas as pd
 from cotton_toolkit import GFF3_DB_DIR
 from cotton_toolkit.config.loader import get_genome_data_sources, get_local_downloaded_file_path
 from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.core.gene_model_store import get_gene_model_store_path, load_gene_model_store
 from cotton_toolkit.core.gff_parser import get_gene_info_by_ids, get_genes_in_region
 from cotton_toolkit.pipelines.decorators import pipeline_task
 from cotton_toolkit.utils.gene_utils import resolve_gene_ids, _to_gene_id
@@ -29,8 +30,13 @@ def run_gff_lookup(
         region: Optional[Tuple[str, int, int]] = None,
         output_csv_path: Optional[str] = None,
         cancel_event: Optional[threading.Event] = None,
+        include_structure: bool = False,
         **kwargs
 ) -> bool:
+    """
+    按基因ID或染色体区域查询GFF基因信息。
+    include_structure 为 True 时，额外导出这些基因的外显子/CDS/UTR结构表（需要预处理生成的基因模型存储）。
+    """
     progress = kwargs['progress_callback']
     check_cancel = kwargs['check_cancel']
 
@@ -135,5 +141,17 @@ def run_gff_lookup(
             progress(100, _("任务终止：保存结果失败。"))
             return False
 
+        if include_structure:
+            progress(95, _("正在导出基因结构..."))
+            model_store = load_gene_model_store(get_gene_model_store_path(gff_db_dir, assembly_id))
+            if model_store is None:
+                logger.warning(_("未找到基因组 '{}' 的基因模型存储，跳过基因结构导出。请重新预处理GFF文件。").format(assembly_id))
+            else:
+                structure_df = model_store.structure_table(results_df['id'].astype(str).tolist())
+                base, ext = os.path.splitext(final_output_path)
+                structure_path = f"{base}_structure{ext or '.csv'}"
+                structure_df.to_csv(structure_path, index=False, encoding='utf-8-sig')
+                logger.info(_("基因结构（{} 个片段）已保存到: {}").format(len(structure_df), structure_path))
+
     progress(100, _("GFF查询流程结束。"))
     return True
@@ -1,8 +1,9 @@
 ﻿import os
 import re
+import tempfile
 import threading
 import traceback
-from concurrent.futures import as_completed
+from concurrent.futures import as_completed, wait, FIRST_COMPLETED
 from concurrent.futures.thread import ThreadPoolExecutor
 from typing import List, Optional, Tuple, Dict, Any, Callable
 import logging
@@ -12,11 +13,17 @@ from cotton_toolkit import GFF3_DB_DIR
 from cotton_toolkit.config.loader import get_genome_data_sources, get_local_downloaded_file_path
 from cotton_toolkit.config.models import MainConfig, HomologySelectionCriteria
 from cotton_toolkit.core.gff_parser import get_genes_in_region, _apply_regex_to_id, get_gene_info_by_ids
+from cotton_toolkit.core.blast_cache import get_blast_hit_cache, get_database_fingerprint, get_parameters_key
+from cotton_toolkit.core.homology_pair_store import lookup_precomputed_homology, get_pair_store_path, open_pair_store, \
+    read_meta, write_meta, reset_pair_store, completed_chunks, save_chunk_result, finalize_pair_store, \
+    best_hits, build_orthology_calls, PAIR_STORE_VERSION, DIRECTION_FORWARD, DIRECTION_REVERSE
 from cotton_toolkit.pipelines.decorators import pipeline_task
-from cotton_toolkit.pipelines.blast import run_blast_pipeline
+from cotton_toolkit.pipelines.blast import _prepare_blast_database, _execute_blast, plan_blast_execution
 from cotton_toolkit.utils.config_overrides_utils import _update_config_from_overrides
-from cotton_toolkit.utils.gene_utils import resolve_gene_ids, parse_gene_id, _to_transcript_id, _to_gene_id
-from cotton_toolkit.core.data_access import get_sequences_for_gene_ids, get_homology_by_gene_ids, \
+from cotton_toolkit.utils.resource_manager import get_resource_manager, RESOURCE_CPU
+from cotton_toolkit.utils.sequence_io import write_fasta
+from cotton_toolkit.utils.gene_utils import resolve_gene_ids, parse_gene_ids, _to_transcript_id, _to_gene_id
+from cotton_toolkit.core.data_access import stream_sequences_for_gene_ids, count_sequences, get_homology_by_gene_ids, \
     resolve_arabidopsis_ids_from_homology_db
 
 try:
@@ -26,48 +33,299 @@ except ImportError:
 
 logger = logging.getLogger("cotton_toolkit.pipeline.homology")
 
+# RBH 模式下每个方向至少检索的目标数，用于比较最佳与次佳命中
+RBH_SEARCH_DEPTH = 5
+
 
 def _homology_blast_worker(
-        gene_ids_chunk: List[str],
-        config: MainConfig,
-        source_assembly_id: str,
-        target_assembly_id: str,
+        query_records: List[Tuple[str, str]],
+        chunk_index: int,
+        work_dir: str,
+        db_fasta_path: str,
         criteria: HomologySelectionCriteria,
+        num_threads: int,
         cancel_event: Optional[threading.Event]
 ) -> Optional[pd.DataFrame]:
     """
-    每个线程执行的工作单元：为一小批基因提取序列，然后执行BLAST。
+    每个线程执行的工作单元：将一块查询序列写入临时FASTA，然后对已准备好的数据库运行一次BLAST。
     此函数在开始和关键步骤检查中断信号。
     """
     # 检查1: 任务开始时
     if cancel_event and cancel_event.is_set():
         return None
 
-    # 步骤 A: 获取序列
-    query_fasta_str, _ = get_sequences_for_gene_ids(config, source_assembly_id, gene_ids_chunk)
-    if not query_fasta_str:
-        return pd.DataFrame()  # 如果这个区块没有序列，返回空DataFrame以示完成
+    query_fasta_path = os.path.join(work_dir, f"query_chunk_{chunk_index:04d}.fasta")
+    with open(query_fasta_path, 'w', encoding='utf-8') as handle:
+        write_fasta(query_records, handle, line_width=None)
 
-    # 检查2: 获取序列后，执行BLAST前
+    # 检查2: 写入查询序列后，执行BLAST前（_execute_blast 内部也包含中断检查）
     if cancel_event and cancel_event.is_set():
         return None
 
-    # 步骤 B: 执行BLAST
-    # run_blast_pipeline 内部也包含了多步中断检查
-    return run_blast_pipeline(
-        config=config,
+    return _execute_blast(
         blast_type='blastn',
-        target_assembly_id=target_assembly_id,
-        query_file_path=None,
-        query_text=query_fasta_str,
-        output_path=None,  # 在工作线程中不保存文件，只返回DataFrame
+        query_fasta_path=query_fasta_path,
+        db_fasta_path=db_fasta_path,
         evalue=criteria.evalue_threshold,
         word_size=11,
         max_target_seqs=criteria.top_n,
-        cancel_event=cancel_event
+        num_threads=num_threads,
+        # 同源映射只需要得分与坐标，表格输出省去了XML解析和比对字符串的开销
+        blast_output_format='tabular',
+        check_cancel=lambda: bool(cancel_event and cancel_event.is_set())
     )
 
 
+def _run_dynamic_homology_blast(
+        config: MainConfig,
+        source_assembly_id: str,
+        target_assembly_id: str,
+        gene_ids: List[str],
+        criteria: HomologySelectionCriteria,
+        cancel_event: Optional[threading.Event],
+        progress: Callable[[int, str], None],
+        max_threads: Optional[int] = None,
+        on_results: Optional[Callable[[pd.DataFrame], None]] = None
+) -> Optional[List[pd.DataFrame]]:
+    """
+    对一组源基因执行动态BLAST（先查磁盘缓存，再按执行方案并行搜索未缓存的序列）。
+    每得到一批命中（缓存命中或一个完成的块）都会在调用线程中回调 on_results。
+    返回各块的命中表列表；任务被取消时返回 None。
+    """
+    check_cancel = lambda: bool(cancel_event and cancel_event.is_set())
+
+    # --- 查询序列只提取一次，BLAST数据库只准备一次 ---
+    progress(12, _("正在提取查询序列..."))
+    records, not_found_genes = stream_sequences_for_gene_ids(config, source_assembly_id, gene_ids)
+    query_records = list(records)
+    if not_found_genes:
+        logger.warning(_("{} 个基因没有可用的CDS序列，将被忽略。").format(len(not_found_genes)))
+    if not query_records:
+        logger.warning(_("所有输入基因均未找到序列，无法执行BLAST。"))
+        return []
+
+    db_fasta_path = _prepare_blast_database(config, target_assembly_id, 'blastn', check_cancel,
+                                            lambda p, m: progress(15 + int(p * 0.05), m))
+    if db_fasta_path is None: return None
+
+    # 先查询磁盘缓存，只有未缓存过的序列才需要重新BLAST
+    all_results_df = []
+    blast_cache = get_blast_hit_cache(config)
+    if blast_cache is not None:
+        db_fingerprint = get_database_fingerprint(db_fasta_path)
+        params_key = get_parameters_key(blast_type='blastn', evalue=criteria.evalue_threshold, word_size=11,
+                                        max_target_seqs=criteria.top_n, output='tabular')
+        total_queries = len(query_records)
+        cached_df, query_records = blast_cache.lookup(query_records, db_fingerprint, params_key)
+        if not cached_df.empty:
+            all_results_df.append(cached_df)
+            if on_results: on_results(cached_df)
+        cache_stats = blast_cache.stats()
+        logger.info(_("BLAST缓存: 命中 {} 条，需重新搜索 {} 条（缓存共 {} 条记录，{:.1f} MB）。").format(
+            total_queries - len(query_records), len(query_records), cache_stats['entries'],
+            cache_stats['size_bytes'] / 1024 / 1024))
+
+    # 根据查询数量与CPU核心数决定进程数与每个进程的线程数，避免 进程数×线程数 超额订阅CPU
+    plan = plan_blast_execution(len(query_records), max_threads)
+    chunk_size = max(1, (len(query_records) + plan.chunk_count - 1) // plan.chunk_count)
+    query_chunks = [query_records[i:i + chunk_size] for i in range(0, len(query_records), chunk_size)]
+    logger.info(_("BLAST执行方案: {} 条查询序列，{} 个进程 × {} 个线程，分为 {} 块。").format(
+        len(query_records), plan.processes, plan.threads_per_process, len(query_chunks)))
+
+    progress(20, _("正在并行启动BLAST任务 (共 {} 个子任务)...").format(len(query_chunks)))
+
+    with tempfile.TemporaryDirectory(prefix="homology_blast_") as work_dir, \
+            ThreadPoolExecutor(max_workers=plan.processes) as executor:
+        future_to_chunk = {
+            executor.submit(_homology_blast_worker, chunk, i, work_dir, db_fasta_path, criteria,
+                            plan.threads_per_process, cancel_event): i
+            for i, chunk in enumerate(query_chunks)
+        }
+
+        completed_chunks = 0
+        for future in as_completed(future_to_chunk):
+            if check_cancel():
+                executor.shutdown(wait=False, cancel_futures=True)
+                return None
+
+            result_df = future.result()
+            if result_df is not None and blast_cache is not None:
+                blast_cache.store(query_chunks[future_to_chunk[future]], result_df, db_fingerprint, params_key)
+            if result_df is not None and not result_df.empty:
+                all_results_df.append(result_df)
+                if on_results: on_results(result_df)
+
+            completed_chunks += 1
+            progress(20 + int((completed_chunks / len(query_chunks)) * 70),
+                     _("已完成 {}/{} 个BLAST子任务...").format(completed_chunks, len(query_chunks)))
+
+    if check_cancel(): return None
+    return all_results_df
+
+
+def _search_homologs(
+        config: MainConfig,
+        source_assembly_id: str,
+        target_assembly_id: str,
+        gene_ids: List[str],
+        criteria: HomologySelectionCriteria,
+        cancel_event: Optional[threading.Event],
+        progress: Callable[[int, str], None],
+        max_threads: Optional[int] = None,
+        on_results: Optional[Callable[[pd.DataFrame], None]] = None
+) -> Optional[pd.DataFrame]:
+    """
+    查找 源->目标 方向的命中：预计算的基因组对同源表是最快的路径，只有未被覆盖的基因才需要动态BLAST。
+    返回合并后的原始命中表；任务被取消时返回 None。
+    """
+    all_results_df = []
+
+    def collect(result_df: pd.DataFrame):
+        all_results_df.append(result_df)
+        if on_results: on_results(result_df)
+
+    precomputed_df, remaining_ids = lookup_precomputed_homology(
+        config, source_assembly_id, target_assembly_id, gene_ids,
+        evalue_threshold=criteria.evalue_threshold, top_n=criteria.top_n)
+    if not precomputed_df.empty:
+        collect(precomputed_df)
+    covered_count = len(set(gene_ids)) - len(remaining_ids)
+    if covered_count:
+        logger.info(_("预计算同源表覆盖了 {} 个基因，其余 {} 个将使用动态BLAST。").format(
+            covered_count, len(remaining_ids)))
+
+    if remaining_ids:
+        blast_results = _run_dynamic_homology_blast(config, source_assembly_id, target_assembly_id, remaining_ids,
+                                                    criteria, cancel_event, progress, max_threads=max_threads,
+                                                    on_results=collect)
+        if blast_results is None: return None
+
+    return pd.concat(all_results_df, ignore_index=True) if all_results_df else pd.DataFrame()
+
+
+def _run_reciprocal_best_hit_search(
+        config: MainConfig,
+        source_assembly_id: str,
+        target_assembly_id: str,
+        gene_ids: List[str],
+        criteria: HomologySelectionCriteria,
+        cancel_event: Optional[threading.Event],
+        progress: Callable[[int, str], None],
+        max_threads: Optional[int] = None
+) -> Optional[pd.DataFrame]:
+    """
+    互为最佳命中 (RBH) 模式：正向搜索每完成一批，就立即把这批查询的最佳命中基因提交给反向搜索，
+    两个方向并发执行、各占一半CPU线程；两个方向都会复用预计算表与BLAST缓存。
+    返回每个源基因一行的直系同源判定表；任务被取消时返回 None。
+    """
+    # 置信度需要比较最佳与次佳命中，因此每个方向至少检索 RBH_SEARCH_DEPTH 个目标
+    search_criteria = criteria.model_copy(update={'top_n': max(criteria.top_n, RBH_SEARCH_DEPTH)})
+    half_threads = max(1, (max_threads or os.cpu_count() or 1) // 2)
+    submitted_targets = set()
+    reverse_futures = []
+
+    with ThreadPoolExecutor(max_workers=1) as reverse_executor:
+        def submit_reverse(forward_batch: pd.DataFrame):
+            # 单个查询的全部命中总在同一批中，所以这里的最佳命中就是最终的最佳命中
+            targets = [t for t in best_hits(forward_batch)['Hit_ID'].unique() if t not in submitted_targets]
+            if not targets:
+                return
+            submitted_targets.update(targets)
+            reverse_futures.append(reverse_executor.submit(
+                _search_homologs, config, target_assembly_id, source_assembly_id, targets, search_criteria,
+                cancel_event, lambda p, m: None, half_threads))
+
+        forward_df = _search_homologs(config, source_assembly_id, target_assembly_id, gene_ids, search_criteria,
+                                      cancel_event, progress, max_threads=half_threads, on_results=submit_reverse)
+        if forward_df is None:
+            return None
+
+        progress(88, _("正在等待反向搜索完成（共 {} 个目标基因）...").format(len(submitted_targets)))
+        reverse_frames = [future.result() for future in reverse_futures]
+
+    if any(frame is None for frame in reverse_frames) or (cancel_event and cancel_event.is_set()):
+        return None
+    reverse_frames = [frame for frame in reverse_frames if not frame.empty]
+    reverse_df = pd.concat(reverse_frames, ignore_index=True) if reverse_frames else pd.DataFrame()
+
+    calls = build_orthology_calls(forward_df, reverse_df)
+    if not calls.empty:
+        logger.info(_("RBH判定完成: {} 个源基因中有 {} 个互为最佳命中。").format(
+            len(calls), int((calls['Orthology'] == 'RBH').sum())))
+    return calls
+
+
+# HomologySelectionCriteria.sort_by 中的简写与结果列名的对应关系
+_SORT_COLUMN_ALIASES = {
+    'score': 'Bit_Score', 'bitscore': 'Bit_Score', 'bit_score': 'Bit_Score',
+    'exp': 'E-value', 'evalue': 'E-value', 'e-value': 'E-value',
+    'pid': 'Identity (%)', 'identity': 'Identity (%)',
+    'length': 'Alignment_Length', 'confidence': 'Confidence',
+}
+
+
+def _apply_selection_criteria(
+        results_df: pd.DataFrame,
+        criteria: HomologySelectionCriteria,
+        subgenome_rules: bool
+) -> pd.DataFrame:
+    """
+    对原始命中表应用 HomologySelectionCriteria（全部为向量化操作）:
+    PID/得分阈值 -> 严格亚组过滤或同亚组优先 -> 按 sort_by/ascending 排序后每个查询保留前 top_n 个目标。
+    subgenome_rules 仅在源与目标都是棉花基因组时为 True。
+    """
+    if criteria.pid_threshold is not None and 'Identity (%)' in results_df.columns:
+        results_df = results_df[
+            pd.to_numeric(results_df['Identity (%)'], errors='coerce') >= criteria.pid_threshold]
+
+    if criteria.score_threshold is not None and 'Bit_Score' in results_df.columns:
+        results_df = results_df[results_df['Bit_Score'] >= criteria.score_threshold]
+
+    if results_df.empty:
+        return results_df.reset_index(drop=True)
+
+    # 排序与分组均基于整数编码，避免在百万行级别的表上反复比较字符串
+    query_codes = pd.factorize(results_df['Query_ID'], sort=True)[0]
+    sort_keys = {'_query': query_codes}
+    ascending = [True]
+    if subgenome_rules and (criteria.strict_subgenome_priority or criteria.prioritize_subgenome):
+        source_parsed = parse_gene_ids(results_df['Query_ID'])
+        target_parsed = parse_gene_ids(results_df['Hit_ID'])
+        same_location = ((source_parsed['Subgenome'] == target_parsed['Subgenome']) &
+                         (source_parsed['Chromosome'] == target_parsed['Chromosome'])).to_numpy()
+        if criteria.strict_subgenome_priority:
+            logger.info(_("已启用严格模式：筛选同亚组、同染色体编号的匹配。"))
+            results_df = results_df[same_location]
+            query_codes = query_codes[same_location]
+            sort_keys['_query'] = query_codes
+        else:
+            # 同亚组、同染色体编号的匹配排在前面，但不排除其它匹配
+            sort_keys['_same_location'] = same_location
+            ascending.append(False)
+
+    if not criteria.top_n or criteria.top_n <= 0 or results_df.empty:
+        return results_df.reset_index(drop=True)
+
+    for column, is_ascending in zip(criteria.sort_by, criteria.ascending):
+        column = _SORT_COLUMN_ALIASES.get(str(column).lower(), column)
+        if column in results_df.columns and column not in sort_keys:
+            sort_keys[column] = results_df[column].to_numpy()
+            ascending.append(bool(is_ascending))
+
+    keys_df = pd.DataFrame(sort_keys)
+    order = keys_df.sort_values(list(sort_keys), ascending=ascending, kind='stable').index.to_numpy()
+    results_df = results_df.iloc[order]
+    query_codes = query_codes[order]
+    hit_codes = pd.factorize(results_df['Hit_ID'])[0]
+
+    # 与 max_target_seqs 的语义一致：按目标计数，同一目标的多个HSP一并保留
+    pair_codes = pd.Series(query_codes.astype('int64') * (int(hit_codes.max()) + 1) + hit_codes)
+    is_new_target = ~pair_codes.duplicated()
+    target_rank = is_new_target.groupby(query_codes, sort=False).cumsum()
+    target_rank = target_rank.groupby(pair_codes, sort=False).transform('first')
+    return results_df[target_rank.to_numpy() <= criteria.top_n].reset_index(drop=True)
+
+
 @pipeline_task(_("拟南芥基因转换"))
 def run_arabidopsis_homology_conversion(
         config: MainConfig,
@@ -235,65 +493,31 @@ def run_homology_mapping(
         if criteria_overrides:
             _update_config_from_overrides(criteria, criteria_overrides)
 
-        # --- 多线程执行 (后续代码保持不变) ---
-        max_workers = config.downloader.max_workers
-        chunk_size = max(1, (len(source_gene_ids) + max_workers - 1) // max_workers)
-        gene_chunks = [source_gene_ids[i:i + chunk_size] for i in range(0, len(source_gene_ids), chunk_size)]
-
-        all_results_df = []
-        progress(20, _("正在并行启动BLAST任务 (共 {} 个子任务)...").format(len(gene_chunks)))
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_chunk = {
-                executor.submit(_homology_blast_worker, chunk, config, source_assembly_id, target_assembly_id, criteria,
-                                cancel_event): i
-                for i, chunk in enumerate(gene_chunks)
-            }
-
-            completed_chunks = 0
-            for future in as_completed(future_to_chunk):
-                if check_cancel():
-                    executor.shutdown(wait=False, cancel_futures=True)
-                    return None
-
-                result_df = future.result()
-                if result_df is not None and not result_df.empty:
-                    all_results_df.append(result_df)
-
-                completed_chunks += 1
-                progress(20 + int((completed_chunks / len(gene_chunks)) * 70),
-                         _("已完成 {}/{} 个BLAST子任务...").format(completed_chunks, len(gene_chunks)))
+        with get_resource_manager(config).acquire(RESOURCE_CPU, check_cancel=check_cancel) as cpu_slots:
+            if not cpu_slots: return None
+            if criteria.reciprocal_best_hit:
+                results_df = _run_reciprocal_best_hit_search(config, source_assembly_id, target_assembly_id,
+                                                             source_gene_ids, criteria, cancel_event, progress,
+                                                             max_threads=cpu_slots)
+            else:
+                results_df = _search_homologs(config, source_assembly_id, target_assembly_id, source_gene_ids,
+                                              criteria, cancel_event, progress, max_threads=cpu_slots)
 
-        if check_cancel(): return None
+        if results_df is None or check_cancel(): return None
 
-        if not all_results_df:
+        if results_df.empty:
             logger.warning(_("所有BLAST任务完成，但未找到任何匹配项。"))
             return pd.DataFrame()
 
-        results_df = pd.concat(all_results_df, ignore_index=True)
-        logger.debug(_("所有线程共返回 {} 条原始匹配。").format(len(results_df)))
+        logger.debug(_("共得到 {} 条原始匹配。").format(len(results_df)))
 
         progress(90, _("正在应用筛选条件并整理结果..."))
 
-        if criteria.pid_threshold is not None and 'Identity (%)' in results_df.columns:
-            results_df = results_df[
-                pd.to_numeric(results_df['Identity (%)'], errors='coerce') >= criteria.pid_threshold]
-
-        if criteria.score_threshold is not None and 'Bit_Score' in results_df.columns:
-            results_df = results_df[results_df['Bit_Score'] >= criteria.score_threshold]
-
-        if criteria.strict_subgenome_priority:
-            genome_sources = get_genome_data_sources(config)
-            source_info = genome_sources.get(source_assembly_id)
-            target_info = genome_sources.get(target_assembly_id)
-            if source_info and target_info and source_info.is_cotton() and target_info.is_cotton():
-                logger.info(_("已启用严格模式：筛选同亚组、同染色体编号的匹配。"))
-                results_df['Source_Parsed'] = results_df['Query_ID'].apply(parse_gene_id)
-                results_df['Target_Parsed'] = results_df['Hit_ID'].apply(parse_gene_id)
-                condition = ((results_df['Source_Parsed'].notna()) & (results_df['Target_Parsed'].notna()) &
-                             (results_df['Source_Parsed'].str[0] == results_df['Target_Parsed'].str[0]) &
-                             (results_df['Source_Parsed'].str[1] == results_df['Target_Parsed'].str[1]))
-                results_df = results_df[condition].drop(columns=['Source_Parsed', 'Target_Parsed'])
+        genome_sources = get_genome_data_sources(config)
+        source_info = genome_sources.get(source_assembly_id)
+        target_info = genome_sources.get(target_assembly_id)
+        both_cotton = bool(source_info and target_info and source_info.is_cotton() and target_info.is_cotton())
+        results_df = _apply_selection_criteria(results_df, criteria, subgenome_rules=both_cotton)
 
         if output_csv_path:
             progress(95, _("正在保存最终结果..."))
@@ -454,3 +678,161 @@ def run_locus_conversion(
         logger.debug(traceback.format_exc())
         progress(100, _("任务因错误而终止。"))
         raise e
+
+
+def _precompute_direction(
+        config: MainConfig,
+        conn,
+        direction: str,
+        query_assembly_id: str,
+        db_fasta_path: str,
+        criteria: HomologySelectionCriteria,
+        chunk_size: int,
+        cancel_event: Optional[threading.Event],
+        progress: Callable[[int, str], None],
+        max_threads: Optional[int] = None
+) -> bool:
+    """
+    对一个方向（查询基因组的全部CDS vs 目标数据库）分块并行BLAST，每完成一块立即写入数据库。
+    已完成的块会被跳过，因此中断后可以续算。返回 False 表示任务被取消。
+    """
+    total = count_sequences(config, query_assembly_id)
+    total_chunks = max(1, (total + chunk_size - 1) // chunk_size)
+    done = completed_chunks(conn, direction)
+    if len(done) >= total_chunks:
+        progress(100, _("该方向已完成，跳过。"))
+        return True
+    if done:
+        logger.info(_("发现 {} 个已完成的块，将从断点继续。").format(len(done)))
+
+    records, _nf = stream_sequences_for_gene_ids(config, query_assembly_id, None)
+    plan = plan_blast_execution(total - len(done) * chunk_size, max_threads)
+    max_in_flight = plan.processes * 2
+    finished = len(done)
+
+    def handle(future, pending, work_dir):
+        nonlocal finished
+        chunk_index, chunk = pending.pop(future)
+        result_df = future.result()
+        if result_df is None:
+            return
+        save_chunk_result(conn, direction, chunk_index, [record[0] for record in chunk], result_df)
+        for suffix in ('', '.tsv'):
+            tmp_path = os.path.join(work_dir, f"query_chunk_{chunk_index:04d}.fasta{suffix}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        finished += 1
+        progress(int(finished / total_chunks * 100), _("已完成 {}/{} 块...").format(finished, total_chunks))
+
+    with tempfile.TemporaryDirectory(prefix="homology_precompute_") as work_dir, \
+            ThreadPoolExecutor(max_workers=plan.processes) as executor:
+        pending = {}
+        chunk, chunk_index = [], 0
+        for record in records:
+            chunk.append(record)
+            if len(chunk) < chunk_size:
+                continue
+            if chunk_index not in done:
+                pending[executor.submit(_homology_blast_worker, chunk, chunk_index, work_dir, db_fasta_path,
+                                        criteria, plan.threads_per_process, cancel_event)] = (chunk_index, chunk)
+            chunk, chunk_index = [], chunk_index + 1
+
+            # 控制同时在途的块数，避免一次性把全部序列读入内存
+            while len(pending) >= max_in_flight:
+                finished_futures, _w = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished_futures:
+                    handle(future, pending, work_dir)
+                if cancel_event and cancel_event.is_set():
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    return False
+
+        if chunk and chunk_index not in done:
+            pending[executor.submit(_homology_blast_worker, chunk, chunk_index, work_dir, db_fasta_path,
+                                    criteria, plan.threads_per_process, cancel_event)] = (chunk_index, chunk)
+
+        for future in as_completed(list(pending)):
+            handle(future, pending, work_dir)
+            if cancel_event and cancel_event.is_set():
+                executor.shutdown(wait=False, cancel_futures=True)
+                return False
+
+    return not (cancel_event and cancel_event.is_set())
+
+
+@pipeline_task(_("预计算同源表"))
+def run_precompute_homology(
+        config: MainConfig,
+        source_assembly_id: str,
+        target_assembly_id: str,
+        evalue: float = 1.0e-10,
+        max_target_seqs: int = 5,
+        chunk_size: int = 500,
+        force: bool = False,
+        cancel_event: Optional[threading.Event] = None,
+        **kwargs
+) -> Optional[str]:
+    """
+    批量预计算两个棉花基因组之间的全基因组同源关系（双向BLAST + 互为最佳命中），
+    写入每个基因组对独立的SQLite文件。结果按块提交，任务中断后再次运行会从断点继续；
+    数据库文件或参数变化后会自动重新计算。
+    完成后 run_homology_mapping / run_locus_conversion 会优先使用该表，只对未覆盖的基因执行动态BLAST。
+    """
+    progress = kwargs['progress_callback']
+    check_cancel = kwargs['check_cancel']
+
+    progress(2, _("正在准备双方的BLAST数据库..."))
+    target_db_path = _prepare_blast_database(config, target_assembly_id, 'blastn', check_cancel,
+                                             lambda p, m: progress(2 + int(p * 0.03), m))
+    if target_db_path is None: return None
+    source_db_path = _prepare_blast_database(config, source_assembly_id, 'blastn', check_cancel,
+                                             lambda p, m: progress(5 + int(p * 0.03), m))
+    if source_db_path is None: return None
+
+    signature = {
+        'version': PAIR_STORE_VERSION,
+        'source_db': get_database_fingerprint(source_db_path),
+        'target_db': get_database_fingerprint(target_db_path),
+        'evalue': evalue,
+        'max_target_seqs': max_target_seqs,
+        'chunk_size': chunk_size,
+    }
+
+    store_path = get_pair_store_path(config, source_assembly_id, target_assembly_id)
+    conn = open_pair_store(store_path)
+    try:
+        meta = read_meta(conn)
+        if force or any(meta.get(key) != str(value) for key, value in signature.items()):
+            if meta:
+                logger.info(_("基因组或参数已变化（或要求强制重算），将清空旧的预计算结果。"))
+            reset_pair_store(conn)
+            write_meta(conn, signature)
+        elif meta.get('status') == 'complete':
+            progress(100, _("预计算同源表已是最新。"))
+            return _("预计算同源表已是最新: {}").format(store_path)
+
+        criteria = HomologySelectionCriteria(evalue_threshold=evalue, top_n=max_target_seqs)
+        directions = [
+            (DIRECTION_FORWARD, source_assembly_id, target_db_path, 10, 50),
+            (DIRECTION_REVERSE, target_assembly_id, source_db_path, 50, 90),
+        ]
+        with get_resource_manager(config).acquire(RESOURCE_CPU, check_cancel=check_cancel) as cpu_slots:
+            if not cpu_slots: return None
+            for direction, query_assembly_id, db_fasta_path, start, end in directions:
+                logger.info(_("正在计算 {} -> {} 方向的命中...").format(
+                    query_assembly_id, target_assembly_id if direction == DIRECTION_FORWARD else source_assembly_id))
+                completed = _precompute_direction(
+                    config, conn, direction, query_assembly_id, db_fasta_path, criteria, chunk_size, cancel_event,
+                    lambda p, m, s=start, e=end: progress(s + int(p * (e - s) / 100), m), max_threads=cpu_slots)
+                if not completed or check_cancel():
+                    logger.info(_("预计算已中断，已完成的块会在下次运行时保留。"))
+                    return None
+
+        progress(92, _("正在计算互为最佳命中..."))
+        rbh_count = finalize_pair_store(conn)
+    finally:
+        conn.close()
+
+    message = _("预计算完成: {} 对互为最佳命中，结果保存在 {}").format(rbh_count, store_path)
+    logger.info(message)
+    progress(100, _("预计算同源表完成。"))
+    return message
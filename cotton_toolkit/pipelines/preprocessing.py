@@ -1,21 +1,26 @@
-﻿import gzip
-import os
-import subprocess
+﻿import os
 import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Optional, Dict, Any, Callable
 import logging
 import sqlite3
-from cotton_toolkit import PREPROCESSED_DB_NAME, GFF3_DB_DIR
+from cotton_toolkit import PREPROCESSED_DB_NAME, GFF3_DB_DIR, PACKED_SEQ_DIR
 from cotton_toolkit.config.loader import get_genome_data_sources, get_local_downloaded_file_path
 from cotton_toolkit.config.models import MainConfig, GenomeSourceItem
 from cotton_toolkit.core.convertFiles2sqlite import _read_excel_to_dataframe, _read_text_to_dataframe, \
     _read_annotation_text_file, _read_fasta_to_dataframe, process_single_file_to_sqlite
+from cotton_toolkit.core.blast_db_registry import blast_database_is_current, ensure_blast_database, \
+    list_blast_databases
 from cotton_toolkit.core.downloader import download_genome_data
+from cotton_toolkit.core.fasta_index import build_fasta_index, get_indexable_fasta_path
 from cotton_toolkit.core.file_normalizer import normalize_to_csv
+from cotton_toolkit.core.gene_model_store import build_gene_model_store, get_gene_model_store_path
 from cotton_toolkit.core.gff_parser import create_gff_database
+from cotton_toolkit.core.id_alias_index import build_id_alias_table
+from cotton_toolkit.core.packed_sequence_store import build_packed_sequence_store, remove_packed_sequence_store
 from cotton_toolkit.pipelines.decorators import pipeline_task
 from cotton_toolkit.utils.file_utils import _sanitize_table_name
+from cotton_toolkit.utils.resource_manager import get_resource_manager, RESOURCE_NETWORK
 
 # 国际化函数占位符
 try:
@@ -51,6 +56,78 @@ def _create_sub_progress_updater(
 
 
 
+def _create_gff_databases(
+        gff_filepath: str,
+        db_path: str,
+        force: bool = False,
+        id_regex: Optional[str] = None,
+        model_store_path: Optional[str] = None,
+        cancel_event: Optional[threading.Event] = None,
+        progress_callback: Optional[Callable[[int, str], None]] = None
+) -> Optional[str]:
+    """
+    创建GFF基因数据库，并可选地在其后构建包含完整基因结构的基因模型存储。
+    """
+    progress = progress_callback if progress_callback else lambda p, m: None
+    gff_progress = _create_sub_progress_updater(progress, _("基因数据库"), 0, 70 if model_store_path else 100)
+    result = create_gff_database(gff_filepath=gff_filepath, db_path=db_path, force=force, id_regex=id_regex,
+                                 progress_callback=gff_progress)
+    if not result or not model_store_path:
+        return result
+    if cancel_event and cancel_event.is_set():
+        return None
+
+    model_progress = _create_sub_progress_updater(progress, _("基因模型"), 70, 100)
+    try:
+        build_gene_model_store(gff_filepath, model_store_path, id_regex=id_regex, force=force,
+                               cancel_event=cancel_event, progress_callback=model_progress)
+    except Exception as e:
+        # 基因模型存储是可选的加速结构，构建失败不影响GFF数据库本身
+        logger.warning(_("构建基因模型存储失败，将仅使用GFF基因数据库: {}").format(e))
+    return result
+
+
+def _process_cds_file_to_sqlite(
+        packed_dir: str,
+        build_packed: bool = True,
+        progress_callback: Optional[Callable[[int, str], None]] = None,
+        **kwargs
+):
+    """
+    将CDS文件写入SQLite，随后构建ID别名表，并可选地构建2-bit压缩序列存储。
+    旧的压缩存储在重建表之前就会被删除，不构建新存储时序列查询直接使用数据库，不会读到过期的序列。
+    """
+    progress = progress_callback if progress_callback else lambda p, m: None
+    table_name = _sanitize_table_name(os.path.basename(kwargs['source_path']), version_id=kwargs['version_id'])
+    try:
+        remove_packed_sequence_store(packed_dir, table_name)
+    except OSError as e:
+        logger.warning(_("删除旧的压缩序列存储失败: {}").format(e))
+
+    result = process_single_file_to_sqlite(
+        progress_callback=_create_sub_progress_updater(progress, _("数据库"), 0, 80 if build_packed else 95), **kwargs)
+    # process_single_file_to_sqlite 出错时返回错误信息字符串
+    if result is not True:
+        return result
+
+    progress(80 if build_packed else 95, _("正在构建ID别名索引..."))
+    try:
+        build_id_alias_table(kwargs['db_path'], table_name)
+    except sqlite3.Error as e:
+        # 别名表缺失时，ID解析会在内存中即时构建
+        logger.warning(_("构建ID别名表失败: {}").format(e))
+
+    if build_packed:
+        try:
+            build_packed_sequence_store(kwargs['db_path'], table_name, packed_dir, force=True,
+                                        cancel_event=kwargs.get('cancel_event'),
+                                        progress_callback=_create_sub_progress_updater(progress, _("压缩存储"), 82, 100))
+        except Exception as e:
+            # 压缩存储是可选的加速结构，失败时序列查询会回退到SQLite
+            logger.warning(_("构建压缩序列存储失败，将仅使用数据库: {}").format(e))
+    return result
+
+
 def check_preprocessing_status(config: MainConfig, genome_info: GenomeSourceItem) -> Dict[str, str]:
     """
     检查预处理状态。使用基于配置文件位置的绝对路径来定位数据库。
@@ -68,7 +145,7 @@ def check_preprocessing_status(config: MainConfig, genome_info: GenomeSourceItem
     logger.debug(f"[CHECKER] Attempting to check database at absolute path: {db_path}")
 
     ALL_FILE_KEYS = [
-        "predicted_cds", "predicted_protein", "gff3", "GO", "IPR",
+        "predicted_cds", "predicted_protein", "gff3", "genome_fasta", "GO", "IPR",
         "KEGG_pathways", "KEGG_orthologs", "homology_ath"
     ]
 
@@ -89,11 +166,10 @@ def check_preprocessing_status(config: MainConfig, genome_info: GenomeSourceItem
 
                 # --- 核心状态判断逻辑 ---
                 if key in ['predicted_cds', 'predicted_protein']:
-                    # 检查1: BLAST数据库是否存在
+                    # 检查1: BLAST数据库是否存在且不早于序列文件（兼容多分卷数据库）
                     db_fasta_path = local_path.removesuffix('.gz')
                     db_type = 'prot' if key == 'predicted_protein' else 'nucl'
-                    db_check_ext = '.phr' if db_type == 'prot' else '.nhr'
-                    blast_exists = os.path.exists(db_fasta_path + db_check_ext)
+                    blast_exists = blast_database_is_current(db_fasta_path, db_type)
 
                     # 检查2: SQLite中的数据表是否存在
                     table_exists = False
@@ -115,7 +191,7 @@ def check_preprocessing_status(config: MainConfig, genome_info: GenomeSourceItem
                 elif key == 'predicted_protein':
                     # 蛋白质文件简化为双状态：只要BLAST库建好，即为“已就绪”
                     db_fasta_path = local_path.removesuffix('.gz')
-                    if os.path.exists(db_fasta_path + '.phr'):
+                    if blast_database_is_current(db_fasta_path, 'prot'):
                         status = 'processed'
 
                 elif key == 'gff3':
@@ -124,6 +200,11 @@ def check_preprocessing_status(config: MainConfig, genome_info: GenomeSourceItem
                     if os.path.exists(os.path.join(gff_db_dir, db_filename)):
                         status = 'processed'
 
+                elif key == 'genome_fasta':
+                    # 基因组FASTA只需建立 faidx 索引即可随机访问
+                    if os.path.exists(get_indexable_fasta_path(local_path) + '.fai'):
+                        status = 'processed'
+
                 elif key in ['GO', 'IPR', 'KEGG_pathways', 'KEGG_orthologs', 'homology_ath']:
                     if cursor:
                         table_name = _sanitize_table_name(os.path.basename(local_path),
@@ -147,7 +228,8 @@ def run_download_pipeline(
         config: MainConfig,
         cli_overrides: Optional[Dict[str, Any]] = None,
         **kwargs
-):
+) -> Optional[bool]:
+    """下载基因组数据文件。全部成功时返回 True；没有可下载的文件或有文件下载失败时返回 False；被取消时返回 None。"""
     progress = kwargs.get('progress_callback')
     cancel_event = kwargs.get('cancel_event')
     check_cancel = kwargs.get('check_cancel')
@@ -183,8 +265,8 @@ def run_download_pipeline(
 
     all_download_tasks = []
     if not file_keys_to_process:
-        all_possible_keys = [f.name.replace('_url', '') for f in GenomeSourceItem.model_fields.values() if
-                             f.name.endswith('_url')]
+        all_possible_keys = [key.replace('_url', '') for key in GenomeSourceItem.model_fields if
+                             key.endswith('_url')]
         logger.debug(_("未从UI指定文件类型，将尝试检查所有可能的类型: {}").format(all_possible_keys))
     else:
         all_possible_keys = file_keys_to_process
@@ -214,14 +296,18 @@ def run_download_pipeline(
     if not all_download_tasks:
         logger.warning(_("根据您的选择，没有找到任何有效的URL可供下载。"))
         progress(100, _("任务完成：无文件可下载。"))
-        return
+        return False
 
     progress(10, _("找到 {} 个文件需要下载。").format(len(all_download_tasks)))
     if check_cancel(): logger.info(_("任务被取消。")); return
     logger.info(_("准备下载 {} 个文件...").format(len(all_download_tasks)))
 
     successful_downloads, failed_downloads = 0, 0
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+    network = get_resource_manager(config).acquire(RESOURCE_NETWORK, max_workers, check_cancel=check_cancel)
+    with network as network_slots, ThreadPoolExecutor(max_workers=max(1, network_slots)) as executor:
+        if not network_slots:
+            logger.info(_("任务被取消。"))
+            return
         future_to_task = {
             executor.submit(
                 download_genome_data,
@@ -265,6 +351,7 @@ def run_download_pipeline(
 
     logger.info(_("所有指定的下载任务已完成。成功: {}, 失败: {}。").format(successful_downloads, failed_downloads))
     progress(100, _("下载流程完成。"))
+    return failed_downloads == 0
 
 
 @pipeline_task(task_name=_("预处理注释文件"))
@@ -272,9 +359,13 @@ def run_preprocess_annotation_files(
         config: MainConfig,
         selected_assembly_id: Optional[str] = None,
         status_callback: Optional[Callable[[str, str], None]] = None,
+        build_gene_models: bool = True,
+        build_packed_sequences: bool = True,
         **kwargs) -> bool:
     """
     串行预处理所有注释和同源文件。
+    build_gene_models 为 True 时，会在GFF基因数据库之外额外构建包含外显子/CDS结构的基因模型存储。
+    build_packed_sequences 为 True 时，会为CDS序列额外构建2-bit压缩存储。
     """
     progress = kwargs.get('progress_callback')
     cancel_event = kwargs.get('cancel_event')
@@ -301,8 +392,8 @@ def run_preprocess_annotation_files(
     tasks_to_run = []
     project_root = os.path.dirname(config.config_file_abs_path_)
 
-    ALL_ANNOTATION_KEYS = ['predicted_cds', 'predicted_protein', 'gff3', 'GO', 'IPR', 'KEGG_pathways', 'KEGG_orthologs',
-                           'homology_ath']
+    ALL_ANNOTATION_KEYS = ['predicted_cds', 'predicted_protein', 'gff3', 'genome_fasta', 'GO', 'IPR', 'KEGG_pathways',
+                           'KEGG_orthologs', 'homology_ath']
     files_to_process_keys = [
         key for key in ALL_ANNOTATION_KEYS
         if all_statuses.get(key, 'not_downloaded') not in ['processed', 'not_downloaded']
@@ -324,11 +415,17 @@ def run_preprocess_annotation_files(
             gff_db_dir = os.path.join(project_root, GFF3_DB_DIR)
             db_filename = f"{genome_info.version_id}_genes.db"
             final_db_path = os.path.join(gff_db_dir, db_filename)
-            task_info["target_func"] = create_gff_database
+            task_info["target_func"] = _create_gff_databases
             task_info["args"] = {
                 "gff_filepath": source_path, "db_path": final_db_path,
-                "force": True, "id_regex": genome_info.gene_id_regex
+                "force": True, "id_regex": genome_info.gene_id_regex,
+                "model_store_path": get_gene_model_store_path(gff_db_dir, genome_info.version_id)
+                if build_gene_models else None,
+                "cancel_event": cancel_event,
             }
+        elif key == 'genome_fasta':
+            task_info["target_func"] = build_fasta_index
+            task_info["args"] = {"fasta_path": source_path, "force": True, "cancel_event": cancel_event}
         else:
             db_path = os.path.join(project_root, PREPROCESSED_DB_NAME)
             KEYS_NEEDING_REGEX = ['predicted_cds', 'predicted_protein', 'GO', 'IPR', 'KEGG_pathways', 'KEGG_orthologs', 'homology_ath']
@@ -339,6 +436,10 @@ def run_preprocess_annotation_files(
                 "version_id": genome_info.version_id, "id_regex": regex_to_use,
                 "cancel_event": cancel_event,
             }
+            if key == 'predicted_cds':
+                task_info["target_func"] = _process_cds_file_to_sqlite
+                task_info["args"]["packed_dir"] = os.path.join(project_root, PACKED_SEQ_DIR)
+                task_info["args"]["build_packed"] = build_packed_sequences
         tasks_to_run.append(task_info)
 
     if not tasks_to_run:
@@ -403,52 +504,6 @@ def run_preprocess_annotation_files(
     return overall_success
 
 
-def _process_single_blast_db(
-        compressed_file: str,
-        db_fasta_path: str,
-        db_type: str,
-        cancel_event: Optional[threading.Event] = None
-) -> str:
-    """
-    处理单个FASTA文件以构建BLAST数据库的worker函数。
-    返回处理结果的日志信息。
-    """
-
-    def check_cancel():
-        if cancel_event and cancel_event.is_set():
-            raise InterruptedError("Task cancelled.")
-
-    try:
-        if compressed_file.endswith('.gz'):
-            if not os.path.exists(db_fasta_path) or os.path.getmtime(compressed_file) > os.path.getmtime(db_fasta_path):
-                logger.info(_("正在解压 {}...").format(os.path.basename(compressed_file)))
-                with gzip.open(compressed_file, 'rb') as f_in, open(db_fasta_path, 'wb') as f_out:
-                    while True:
-                        check_cancel()
-                        chunk = f_in.read(1024 * 1024)
-                        if not chunk: break
-                        f_out.write(chunk)
-
-        check_cancel()
-
-        logger.info(_("正在为 {} 创建 {} 数据库...").format(os.path.basename(db_fasta_path), db_type))
-        makeblastdb_cmd = ["makeblastdb", "-in", db_fasta_path, "-dbtype", db_type, "-out", db_fasta_path]
-
-        result = subprocess.run(makeblastdb_cmd, check=True, capture_output=True, text=True, encoding='utf-8')
-        return _("数据库 {} 创建成功。").format(os.path.basename(db_fasta_path))
-
-    except InterruptedError:
-        return _("任务在解压时被取消: {}").format(os.path.basename(compressed_file))
-    except FileNotFoundError:
-        msg = _("错误: 'makeblastdb' 命令未找到。请确保 BLAST+ 已被正确安装并添加到了系统的 PATH 环境变量中。")
-        logger.error(msg)
-        raise  # 重新抛出异常，让主线程知道
-    except subprocess.CalledProcessError as e:
-        return _("创建数据库 {} 失败: {}").format(os.path.basename(db_fasta_path), e.stderr)
-    except Exception as e:
-        return _("处理文件 {} 时发生未知错误: {}").format(os.path.basename(compressed_file), e)
-
-
 @pipeline_task(task_name=_("构建BLAST数据库"))
 def run_build_blast_db_pipeline(
         config: MainConfig,
@@ -457,7 +512,6 @@ def run_build_blast_db_pipeline(
         **kwargs
 ) -> bool:
     progress = kwargs.get('progress_callback')
-    cancel_event = kwargs.get('cancel_event')
     check_cancel = kwargs.get('check_cancel')
     status_update = status_callback if status_callback else lambda key, msg: None
 
@@ -473,31 +527,18 @@ def run_build_blast_db_pipeline(
     if not genome_sources:
         raise ValueError(_("任务终止：未能加载基因组源数据。"))
 
-    genomes_to_process = [genome_sources[
-                              selected_assembly_id]] if selected_assembly_id and selected_assembly_id in genome_sources else genome_sources.values()
+    assembly_ids = [selected_assembly_id] if selected_assembly_id and selected_assembly_id in genome_sources \
+        else list(genome_sources)
 
     tasks_to_run = []
-    BLAST_FILE_KEYS = ['predicted_cds', 'predicted_protein']
     progress(10, _("正在检查需要预处理的文件..."))
     if check_cancel(): logger.info(_("任务被取消。")); return False
 
-    for genome_info in genomes_to_process:
+    for selected_id in assembly_ids:
         if check_cancel(): break
-        for key in BLAST_FILE_KEYS:
-            url_attr = f"{key}_url"
-            if not hasattr(genome_info, url_attr) or not getattr(genome_info, url_attr):
-                continue
-
-            compressed_file = get_local_downloaded_file_path(config, genome_info, key)
-            if not compressed_file or not os.path.exists(compressed_file):
-                continue
-
-            db_fasta_path = compressed_file.removesuffix('.gz')
-            db_type = 'prot' if key == 'predicted_protein' else 'nucl'
-            db_check_ext = '.phr' if db_type == 'prot' else '.nhr'
-
-            if not os.path.exists(db_fasta_path + db_check_ext):
-                tasks_to_run.append((compressed_file, db_fasta_path, db_type))
+        for assembly_id, db_type, db_fasta_path in list_blast_databases(config, selected_id):
+            if not blast_database_is_current(db_fasta_path, db_type):
+                tasks_to_run.append((assembly_id, db_type, db_fasta_path))
 
     if check_cancel(): logger.info(_("任务在文件检查后被取消。")); return False
 
@@ -514,26 +555,30 @@ def run_build_blast_db_pipeline(
     success_count = 0
     completed_count = 0
 
-    for task_tuple in tasks_to_run:
+    for assembly_id, db_type, db_fasta_path in tasks_to_run:
         if check_cancel():
             break
 
-        file_key = os.path.basename(task_tuple[0])
+        file_key = os.path.basename(db_fasta_path)
         status_update(file_key, _("处理中..."))
 
         try:
-            result_msg = _process_single_blast_db(*task_tuple, cancel_event)
-            logger.info(f"Task {file_key}: {result_msg}")
-            if "成功" in result_msg:
+            db_info = ensure_blast_database(config, assembly_id, db_type, check_cancel=check_cancel)
+            if db_info is None:
+                status_update(file_key, _("警告"))
+                errors_found.append(_("任务在处理时被取消: {}").format(file_key))
+            else:
+                logger.info(_("数据库 {} 创建成功。").format(file_key))
                 success_count += 1
                 status_update(file_key, _("完成"))
-            else:
-                status_update(file_key, _("警告"))
-                errors_found.append(result_msg)
 
-        except FileNotFoundError:
-            raise FileNotFoundError(
-                _("错误: 'makeblastdb' 命令未找到。请确保 BLAST+ 已被正确安装并添加到了系统的 PATH 环境变量中。"))
+        except FileNotFoundError as e:
+            if 'makeblastdb' in str(e):
+                raise
+            error_msg = _("处理 {} 时发生未知异常: {}").format(file_key, e)
+            logger.error(error_msg)
+            status_update(file_key, _("错误"))
+            errors_found.append(error_msg)
 
         except Exception as e:
             error_msg = _("处理 {} 时发生未知异常: {}").format(file_key, e)
@@ -602,12 +647,14 @@ def run_gff_preprocessing(
 
             try:
                 logger.info(f"Creating GFF database for '{assembly_id}' -> '{db_filename}'")
-                # 直接调用 gff_parser 中的函数来创建数据库
-                create_gff_database(
+                # 创建GFF基因数据库，并同时构建基因模型存储
+                _create_gff_databases(
                     gff_filepath=gff_path,
                     db_path=db_path,
                     force=True,  # 在预处理时，总是强制重建以确保最新
-                    id_regex=getattr(genome_info, 'gene_id_regex', None)
+                    id_regex=getattr(genome_info, 'gene_id_regex', None),
+                    model_store_path=get_gene_model_store_path(db_storage_dir, assembly_id),
+                    cancel_event=kwargs.get('cancel_event')
                 )
             except Exception as e:
                 logger.error(f"Failed to create database for {assembly_id}. Reason: {e}")
@@ -1,15 +1,19 @@
 ﻿import os
 import threading
 import traceback
-from typing import Optional, List, Dict, Callable, Union
+from typing import Optional, List, Dict, Callable, Union, Tuple
 
-import pandas as pd
 import logging
 
 from .decorators import pipeline_task
+from .. import GFF3_DB_DIR
+from ..config.loader import get_genome_data_sources, get_local_downloaded_file_path
 from ..config.models import MainConfig
-from ..core.data_access import get_sequences_for_gene_ids
-from ..utils.gene_utils import resolve_gene_ids
+from ..core.data_access import stream_sequences_for_gene_ids
+from ..core.fasta_index import get_indexed_fasta
+from ..core.gene_model_store import get_gene_model_store_path, load_gene_model_store
+from ..utils.gene_utils import resolve_gene_ids, _to_gene_id
+from ..utils.sequence_io import write_sequences
 
 try:
     from builtins import _
@@ -24,46 +28,53 @@ logger = logging.getLogger("cotton_toolkit.pipelines.data_query")
 def run_sequence_extraction(
         config: MainConfig,
         assembly_id: str,
-        gene_ids: List[str],
+        gene_ids: Optional[List[str]],
         sequence_type: str = 'cds',
         output_path: Optional[str] = None,
+        output_format: Optional[str] = None,
+        line_width: int = 60,
         **kwargs
 ) -> Optional[Union[Dict[str, str], str]]:
     """
     从数据库中提取一个或多个基因/转录本的CDS或蛋白质序列。
 
-    此函数通过调用 get_sequences_for_gene_ids 来复用与其他流程相同的核心数据提取逻辑。
+    此函数通过调用 stream_sequences_for_gene_ids 来复用与其他流程相同的核心数据提取逻辑，
+    序列从数据库游标中逐批读取并直接写入磁盘。
 
-    - 如果提供了 output_path (多基因模式)，则将结果保存为CSV文件。
+    - 如果提供了 output_path (多基因模式)，则将结果流式保存为文件：
+      格式由 output_format ('fasta' / 'csv') 指定，未指定时按扩展名推断，以 .gz 结尾时自动压缩。
+      gene_ids 为 None 时导出该基因组的全部序列。
     - 如果未提供 output_path (单基因模式)，则返回一个包含序列的字典。
     """
 
     progress = kwargs['progress_callback']
     check_cancel = kwargs['check_cancel']
 
-    progress(5, _("正在解析基因/转录本ID..."))
-    try:
-        resolved_gene_ids = resolve_gene_ids(config, assembly_id, gene_ids)
-        if not resolved_gene_ids:
-            raise ValueError(_("输入错误: 解析后未发现任何有效的基因ID。请检查您的输入。"))
+    if gene_ids is None and not output_path:
+        raise ValueError(_("输入错误: 导出全部序列时必须指定输出文件。"))
+
+    resolved_gene_ids = None
+    if gene_ids is not None:
+        progress(5, _("正在解析基因/转录本ID..."))
+        try:
+            resolved_gene_ids = resolve_gene_ids(config, assembly_id, gene_ids)
+            if not resolved_gene_ids:
+                raise ValueError(_("输入错误: 解析后未发现任何有效的基因ID。请检查您的输入。"))
 
-        logger.info(_("基因ID解析完成，共 {} 个有效ID。").format(len(resolved_gene_ids)))
-    except (ValueError, FileNotFoundError) as e:
-        logger.error(_("基因ID解析失败: {}").format(e))
-        raise e
+            logger.info(_("基因ID解析完成，共 {} 个有效ID。").format(len(resolved_gene_ids)))
+        except (ValueError, FileNotFoundError) as e:
+            logger.error(_("基因ID解析失败: {}").format(e))
+            raise e
 
     if check_cancel(): return None
 
-    # 步骤 1: 调用可复用的核心函数获取序列
-    # 这与 run_homology_mapping 的第一步完全相同
+    # 步骤 1: 调用可复用的核心函数获取序列生成器
     progress(10, _("正在从数据库提取基因序列..."))
-    fasta_str, not_found_genes = get_sequences_for_gene_ids(
+    records, not_found_genes = stream_sequences_for_gene_ids(
         config, assembly_id, resolved_gene_ids, sequence_type=sequence_type
     )
 
-    if check_cancel(): return None
-
-    if not fasta_str:
+    if resolved_gene_ids is not None and len(not_found_genes) >= len(set(resolved_gene_ids)):
         error_message = _("未能获取任何查询序列，任务终止。")
         if not_found_genes:
             error_message += "\n" + _("未找到序列的基因列表: {}").format(", ".join(not_found_genes))
@@ -73,38 +84,200 @@ def run_sequence_extraction(
         logger.warning(
             _("以下 {} 个基因未找到序列，将被忽略: {}").format(len(not_found_genes), ", ".join(not_found_genes)))
 
-    progress(80, _("序列提取完成，正在整理输出..."))
-
-    # --- 将FASTA字符串解析为字典 ---
-    sequences_dict = {}
-    if fasta_str:
-        current_id = None
-        for line in fasta_str.strip().split('\n'):
-            line = line.strip()
-            if not line: continue
-            if line.startswith('>'):
-                current_id = line[1:]
-                sequences_dict[current_id] = []
-            elif current_id:
-                sequences_dict[current_id].append(line)
+    expected_total = len(set(resolved_gene_ids)) - len(not_found_genes) if resolved_gene_ids is not None else 0
 
-        for gene_id, seq_parts in sequences_dict.items():
-            sequences_dict[gene_id] = "".join(seq_parts)
+    def tracked_records():
+        for i, record in enumerate(records, 1):
+            if i % 2000 == 0:
+                if check_cancel():
+                    raise InterruptedError(_("序列提取已被取消。"))
+                if expected_total:
+                    progress(10 + int(min(i / expected_total, 1) * 80), _("已提取 {}/{} 条序列...").format(i, expected_total))
+                else:
+                    progress(50, _("已提取 {} 条序列...").format(i))
+            yield record
 
     # 步骤 2: 根据模式处理输出 (这是此函数独有的部分)
     if not output_path:
         # 单基因/GUI模式: 直接返回序列字典
-        logger.info(_("成功为查询ID提取了 {} 条CDS序列。").format(len(sequences_dict)))
+        sequences_dict = dict(tracked_records())
+        logger.info(_("成功为查询ID提取了 {} 条序列。").format(len(sequences_dict)))
         return sequences_dict
-    else:
-        # 多基因/文件输出模式: 保存为CSV
+
+    # 多基因/文件输出模式: 边读边写
+    try:
+        count = write_sequences(tracked_records(), output_path, output_format=output_format, line_width=line_width)
+    except InterruptedError:
+        logger.info(_("序列提取已被取消，未完成的输出文件将被删除。"))
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+    except Exception as e:
+        err_msg = _("保存序列文件失败: {}").format(e)
+        logger.error(err_msg)
+        raise IOError(err_msg)
+
+    if count == 0:
+        # 不留下只有表头或完全为空的输出文件
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise FileNotFoundError(_("未能获取任何查询序列，任务终止。"))
+
+    progress(95, _("序列提取完成，正在整理输出..."))
+    success_msg = _("{} 条序列已成功保存到: {}").format(count, output_path)
+    logger.info(success_msg)
+    return success_msg
+
+def _get_gene_coordinates(config: MainConfig, assembly_id: str, gene_ids: List[str]) -> Tuple[Dict[str, Tuple[str, int, int, str]], List[str]]:
+    """
+    获取基因坐标 {gene_id: (seqid, start, end, strand)}。
+    优先使用基因模型存储，缺失时回退到 gffutils 基因数据库。
+    """
+    project_root = os.path.dirname(config.config_file_abs_path_)
+    gff_db_dir = os.path.join(project_root, GFF3_DB_DIR)
+    coordinates, missing = {}, []
+
+    model_store = load_gene_model_store(get_gene_model_store_path(gff_db_dir, assembly_id))
+    if model_store is not None:
+        for gene_id in gene_ids:
+            if gene_id in model_store:
+                gene = model_store.get_gene(gene_id)
+                coordinates[gene_id] = (gene['seqid'], gene['start'], gene['end'], gene['strand'])
+            else:
+                missing.append(gene_id)
+        return coordinates, missing
+
+    db_path = os.path.join(gff_db_dir, f"{assembly_id}_genes.db")
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(
+            _("未找到基因组 '{}' 的GFF数据库，请先在“数据下载”选项卡中预处理GFF文件。").format(assembly_id))
+
+    import gffutils
+    db = gffutils.FeatureDB(db_path, keep_order=True)
+    for gene_id in gene_ids:
         try:
-            df = pd.DataFrame(list(sequences_dict.items()), columns=['GeneID', 'Sequence'])
-            df.to_csv(output_path, index=False, encoding='utf-8-sig')
-            success_msg = _("序列已成功保存到: {}").format(output_path)
-            logger.info(success_msg)
-            return success_msg
-        except Exception as e:
-            err_msg = _("保存CSV文件失败: {}").format(e)
-            logger.error(err_msg)
-            raise IOError(_("保存CSV文件失败: {}").format(e))
+            feature = db[gene_id]
+            coordinates[gene_id] = (feature.seqid, feature.start, feature.end, feature.strand)
+        except gffutils.exceptions.FeatureNotFoundError:
+            missing.append(gene_id)
+    return coordinates, missing
+
+
+@pipeline_task(_("基因组区域序列提取"))
+def run_region_sequence_extraction(
+        config: MainConfig,
+        assembly_id: str,
+        regions: Optional[List[Tuple]] = None,
+        gene_ids: Optional[List[str]] = None,
+        upstream_length: int = 2000,
+        output_path: Optional[str] = None,
+        output_format: Optional[str] = None,
+        line_width: int = 60,
+        **kwargs
+) -> Optional[Union[Dict[str, str], str]]:
+    """
+    从已建立索引的基因组FASTA中提取序列。
+
+    - regions: 区域列表，每项为 (seqid, start, end) 或 (seqid, start, end, strand)，坐标1-based闭区间。
+    - gene_ids: 提取这些基因的启动子区域，即转录起点上游 upstream_length bp（按链方向，负链为反向互补）。
+
+    输出方式与 run_sequence_extraction 一致：提供 output_path 时流式保存为FASTA或CSV文件，否则返回序列字典。
+    """
+    progress = kwargs['progress_callback']
+    check_cancel = kwargs['check_cancel']
+
+    if not regions and not gene_ids:
+        raise ValueError(_("错误: 必须提供染色体区域或基因ID列表。"))
+
+    progress(5, _("正在加载基因组索引..."))
+    genome_info = get_genome_data_sources(config).get(assembly_id)
+    if not genome_info:
+        raise ValueError(_("错误: 基因组 '{}' 未在基因组源列表中找到。").format(assembly_id))
+
+    fasta_path = get_local_downloaded_file_path(config, genome_info, 'genome_fasta')
+    indexed_fasta = get_indexed_fasta(fasta_path)
+    if indexed_fasta is None:
+        raise FileNotFoundError(
+            _("未找到基因组 '{}' 的已索引基因组序列。请先下载基因组FASTA文件并运行预处理。").format(assembly_id))
+
+    if check_cancel(): return None
+
+    # 统一整理为 (输出ID, seqid, start, end, strand)
+    intervals = []
+    if gene_ids:
+        progress(15, _("正在解析基因ID并定位启动子区域..."))
+        resolved_ids = resolve_gene_ids(config, assembly_id, gene_ids)
+        base_ids = list(dict.fromkeys(_to_gene_id(gid) for gid in resolved_ids))
+        coordinates, missing = _get_gene_coordinates(config, assembly_id, base_ids)
+        if missing:
+            logger.warning(_("以下 {} 个基因未在GFF数据库中找到，将被忽略: {}").format(len(missing), ", ".join(missing)))
+        no_upstream = []
+        for gene_id in base_ids:
+            if gene_id not in coordinates:
+                continue
+            seqid, start, end, strand = coordinates[gene_id]
+            if strand == '-':
+                win_start, win_end = end + 1, end + upstream_length
+            else:
+                win_start, win_end = max(1, start - upstream_length), start - 1
+            if win_end < win_start:
+                # 正链基因从序列第1位开始，上游没有可提取的碱基
+                no_upstream.append(gene_id)
+                continue
+            intervals.append((f"{gene_id}_promoter_{upstream_length}bp", seqid, win_start, win_end, strand))
+        if no_upstream:
+            logger.warning(_("以下 {} 个基因位于序列开头，没有上游区域，已跳过: {}").format(
+                len(no_upstream), ", ".join(no_upstream)))
+
+    for region in regions or []:
+        seqid, start, end = region[0], int(region[1]), int(region[2])
+        strand = region[3] if len(region) > 3 else '+'
+        intervals.append((f"{seqid}:{start}-{end}({strand})", seqid, start, end, strand))
+
+    if check_cancel(): return None
+
+    progress(40, _("正在提取 {} 个区域的序列...").format(len(intervals)))
+    failed = []
+
+    def region_records():
+        for i, (seq_name, seqid, start, end, strand) in enumerate(intervals):
+            try:
+                yield seq_name, indexed_fasta.fetch(seqid, start, end, strand)
+            except KeyError:
+                failed.append(f"{seqid}:{start}-{end}")
+            if i % 5000 == 0:
+                if check_cancel():
+                    raise InterruptedError(_("序列提取已被取消。"))
+                progress(40 + int(i / len(intervals) * 50), _("已提取 {}/{} 个区域...").format(i, len(intervals)))
+
+    try:
+        if not output_path:
+            sequences = dict(region_records())
+            count = len(sequences)
+        else:
+            count = write_sequences(region_records(), output_path, output_format=output_format,
+                                    line_width=line_width, columns=('ID', 'Sequence'))
+    except InterruptedError:
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+        return None
+    except (OSError, ValueError) as e:
+        logger.error(_("保存序列文件失败: {}").format(e))
+        raise IOError(_("保存序列文件失败: {}").format(e))
+
+    if failed:
+        logger.warning(_("以下 {} 个区域的染色体不在基因组索引中: {}").format(len(failed), ", ".join(failed[:20])))
+    if count == 0:
+        # 不留下只有表头或完全为空的输出文件
+        if output_path and os.path.exists(output_path):
+            os.remove(output_path)
+        raise ValueError(_("未能提取到任何序列，请检查输入的区域或基因ID。"))
+
+    progress(95, _("序列提取完成，正在整理输出..."))
+    if not output_path:
+        logger.info(_("成功提取了 {} 条基因组区域序列。").format(count))
+        return sequences
+
+    success_msg = _("{} 条序列已成功保存到: {}").format(count, output_path)
+    logger.info(success_msg)
+    return success_msg
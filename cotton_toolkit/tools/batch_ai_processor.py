@@ -1,15 +1,18 @@
 ﻿# cotton_toolkit/tools/batch_ai_processor.py
 
+import codecs
+import hashlib
+import json
 import os
 import threading
-import time
-from typing import Optional, Callable
+from typing import Optional, Callable, List, Dict, Any, Tuple, Union
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from diskcache import Cache
-from functools import partial
 import logging
 
+from ..core.ai_provider_pool import AIProviderPool
+from ..core.ai_response_cache import AIResponseCache
+from ..core.ai_usage import format_usage_summary
+from ..core.ai_batch_engine import AsyncAIBatchEngine, PROCESSING_CANCELLED, DEFAULT_MAX_CHARS_PER_REQUEST
 from ..core.ai_wrapper import AIWrapper
 
 try:
@@ -23,91 +26,46 @@ except (AttributeError, ImportError):
 # 修改: 创建 logger 实例
 logger = logging.getLogger("cotton_toolkit.tools.batch_ai_processor")
 
-CACHE_DIRECTORY_BASE = "tmp/.ai_cache"
-client_global: 'AIWrapper'
+# 每块处理的行数；处理完一块即写出并记录断点
+DEFAULT_CHUNK_ROWS = 2000
+PARTIAL_OUTPUT_SUFFIX = '.part'
+CHECKPOINT_SUFFIX = '.checkpoint.json'
 
 
-def _prepare_cache(task_identifier: str) -> Optional[Cache]:
-    cache_directory = f"{CACHE_DIRECTORY_BASE}_{task_identifier}"
-    try:
-        os.makedirs(cache_directory, exist_ok=True)
-        cache = Cache(cache_directory)
-        # 修改: 直接使用 logger
-        logger.debug(_("任务 '{}' 的缓存目录: {}").format(task_identifier, os.path.abspath(cache_directory)))
-        return cache
-    except Exception as e:
-        # 修改: 直接使用 logger
-        logger.error(_("错误: 无法创建缓存目录 {}: {}").format(cache_directory, e))
+def _cached_result(cache: Optional[AIResponseCache], engine: AsyncAIBatchEngine, prompt_template: str,
+                   text: str) -> Optional[str]:
+    """按服务商池中成员的固定顺序查找缓存，无论本次由哪个服务商处理，重复运行都得到相同结果。"""
+    if cache is None:
         return None
+    for member in engine.pool.members:
+        result = cache.get(member.client.provider, member.client.model, prompt_template, engine.temperature, text)
+        if result is not None:
+            return result
+    return None
 
 
-def _process_text_with_ai(
-        text_to_process: str,
-        cache: Cache,
-        user_prompt_template: str,
-        task_identifier: str,
-        retries: int = 3,
-        delay: int = 5,
-        cancel_event: Optional[threading.Event] = None,
-) -> str:
-    """
-    使用 AIWrapper.process() 处理文本。
-    """
-    if cancel_event and cancel_event.is_set():
-        return "PROCESSING_CANCELLED"
-
-    if not text_to_process or not isinstance(text_to_process, str) or not text_to_process.strip():
+def _clean_ai_output(processed_text: Optional[str]) -> str:
+    """去掉模型有时给整段回复加上的外层引号。"""
+    if not processed_text:
         return ""
+    if processed_text.startswith('"') and processed_text.endswith('"'):
+        processed_text = processed_text[1:-1]
+    return processed_text
 
-    cache_key = f"{task_identifier}::{user_prompt_template}::{text_to_process}"
-
-    cached_result = cache.get(cache_key)
-    if cached_result is not None:
-        return cached_result
 
-    for attempt in range(retries):
-        if cancel_event and cancel_event.is_set():
-            return "PROCESSING_CANCELLED"
-
-        try:
-            global client_global
-            processed_text = client_global.process(
-                text=text_to_process,
-                custom_prompt_template=user_prompt_template
-            )
-
-            if processed_text:
-                if processed_text.startswith('"') and processed_text.endswith('"'):
-                    processed_text = processed_text[1:-1]
-                cache.set(cache_key, processed_text)
-                return processed_text
-            cache.set(cache_key, "")
-            return ""
-        except Exception as e:
-            # 修改: 直接使用 logger
-            logger.warning(_("API调用错误: {}。在 {}秒 后重试 {}/{}。").format(e, delay, attempt + 1, retries))
-
-            if attempt < retries - 1:
-                if cancel_event and cancel_event.is_set():
-                    return "PROCESSING_CANCELLED"
-                time.sleep(delay)
-            else:
-                # 修改: 直接使用 logger
-                logger.error(
-                    _("警告: 经过 {} 次尝试后，文本 '{}' 处理失败。").format(retries, text_to_process[:50] + '...'))
-                return f"PROCESSING_ERROR: {e}"
-
-    return _("PROCESSING_ERROR: Max retries reached")
+def _is_final_result(result: Optional[str]) -> bool:
+    """只有正常完成的结果才写入缓存；出错或取消的条目下次仍需重新请求。"""
+    return result is not None and not result.startswith(("PROCESSING_ERROR", PROCESSING_CANCELLED))
 
 
 def _process_dataframe_column(
         df_input: pd.DataFrame,
-        cache: Cache,
+        cache: Optional[AIResponseCache],
         source_column_name: str,
         new_column_name: str,
         user_prompt_template: str,
         task_identifier: str,
-        max_row_workers: int,
+        engine: AsyncAIBatchEngine,
         progress_callback: Callable,
         cancel_event: Optional[threading.Event] = None
 ) -> pd.DataFrame:
@@ -119,44 +77,55 @@ def _process_dataframe_column(
         logger.warning(_("警告: 列 '{}' 在DataFrame中未找到。").format(source_column_name))
         return df
 
-    texts_to_process = df[source_column_name].tolist()
-    process_func_for_row = partial(
-        _process_text_with_ai,
-        cache=cache,
-        user_prompt_template=user_prompt_template,
-        task_identifier=task_identifier,
-        cancel_event=cancel_event
-    )
-
-    items_to_process = [str(text_data) if pd.notna(text_data) else "" for text_data in texts_to_process]
+    items_to_process = [str(text_data) if pd.notna(text_data) else "" for text_data in df[source_column_name]]
     total_items = len(items_to_process)
-    results_list = [None] * total_items
-
-    if max_row_workers > 1 and total_items > 1:
-        with ThreadPoolExecutor(max_workers=max_row_workers) as executor:
-            future_to_index = {executor.submit(process_func_for_row, item): i for i, item in
-                               enumerate(items_to_process)}
-            for i, future in enumerate(as_completed(future_to_index)):
-                if cancel_event and cancel_event.is_set():
-                    # 修改: 直接使用 logger
-                    logger.info("任务已被用户取消。")
-                    for f in future_to_index:
-                        f.cancel()
-                    break
-                original_index = future_to_index[future]
-                try:
-                    results_list[original_index] = future.result()
-                except Exception as exc:
-                    results_list[original_index] = f"ERROR: {exc}"
-                progress_callback(int((i + 1) * 100 / total_items), f"{_('正在处理行')} {i + 1}/{total_items}")
-    else:
-        for i, text_data in enumerate(items_to_process):
-            if cancel_event and cancel_event.is_set():
-                # 修改: 直接使用 logger
-                logger.info("任务已被用户取消。")
-                break
-            results_list[i] = process_func_for_row(text_data)
-            progress_callback(int((i + 1) * 100 / total_items), f"{_('正在处理行')} {i + 1}/{total_items}")
+    results_list: List[Optional[str]] = [None] * total_items
+
+    # 空文本直接得到空结果，已缓存的文本直接回填；其余文本去重后交给引擎，结果再分发回所有相同文本的行
+    pending_rows: Dict[str, List[int]] = {}
+    cached_texts: Dict[str, str] = {}
+    for i, text in enumerate(items_to_process):
+        if not text.strip():
+            results_list[i] = ""
+            continue
+        if text in pending_rows:
+            pending_rows[text].append(i)
+            continue
+        if text not in cached_texts:
+            cached_result = _cached_result(cache, engine, user_prompt_template, text)
+            if cached_result is None:
+                pending_rows[text] = [i]
+                continue
+            cached_texts[text] = cached_result
+        results_list[i] = cached_texts[text]
+
+    pending_texts = list(pending_rows)
+    pending_row_count = sum(len(rows) for rows in pending_rows.values())
+    done_before = total_items - pending_row_count
+    if pending_texts:
+        logger.info(_("共 {} 行，其中 {} 行为空或命中缓存，其余 {} 行去重后需请求AI {} 条文本。").format(
+            total_items, done_before, pending_row_count, len(pending_texts)))
+
+    def on_item_done(completed: int, total: int):
+        # 按唯一文本的完成比例折算行进度
+        finished = done_before + int(pending_row_count * completed / total)
+        progress_callback(int(finished * 100 / total_items), f"{_('正在处理行')} {finished}/{total_items}")
+
+    engine_results, sources = engine.run_detailed(pending_texts, user_prompt_template, cancel_event=cancel_event,
+                                                  progress_callback=on_item_done)
+    for text, result, source in zip(pending_texts, engine_results, sources):
+        if _is_final_result(result):
+            result = _clean_ai_output(result)
+            if cache is not None and source is not None:
+                cache.set(source.client.provider, source.client.model, user_prompt_template, engine.temperature,
+                          text, result)
+        for i in pending_rows[text]:
+            results_list[i] = result
+
+    if cancel_event and cancel_event.is_set():
+        logger.info(_("任务已被用户取消。"))
+    elif not pending_texts:
+        progress_callback(100, f"{_('正在处理行')} {total_items}/{total_items}")
 
     try:
         source_col_index = df.columns.get_loc(source_column_name)
@@ -171,42 +140,143 @@ def _process_dataframe_column(
     return df
 
 
+def _detect_csv_encoding(filepath: str) -> str:
+    """逐块尝试按UTF-8解码整个文件（内存占用恒定），失败时认为是GBK编码。"""
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                decoder.decode(block)
+            decoder.decode(b'', final=True)
+        return 'utf-8'
+    except UnicodeDecodeError:
+        logger.info(_("文件 {} UTF-8解码失败，尝试GBK...").format(os.path.basename(filepath)))
+        return 'gbk'
+
+
+def _checkpoint_signature(filepath: str, source_column_name: str, new_column_name: str,
+                          user_prompt_template: str, engine: AsyncAIBatchEngine) -> Dict[str, Any]:
+    """断点对应的输入与参数；任何一项变化时旧断点作废，从头处理。"""
+    stat = os.stat(filepath)
+    return {
+        'input': os.path.abspath(filepath),
+        'size': stat.st_size,
+        'mtime': int(stat.st_mtime),
+        'source_column': source_column_name,
+        'new_column': new_column_name,
+        'prompt': hashlib.sha1(user_prompt_template.encode('utf-8')).hexdigest(),
+        'providers': [f"{m.client.provider}/{m.client.model}" for m in engine.pool.members],
+    }
+
+
+def _load_checkpoint(checkpoint_path: str, part_path: str, signature: Dict[str, Any]) -> Tuple[int, int]:
+    """
+    读取断点，返回 (已完成的行数, 部分输出文件的有效字节数)；没有可用断点时返回 (0, 0)。
+    部分输出文件会被截断到断点记录的长度，丢弃最后一块写入了一半的数据。
+    """
+    if not (os.path.exists(checkpoint_path) and os.path.exists(part_path)):
+        return 0, 0
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return 0, 0
+    if checkpoint.get('signature') != signature or os.path.getsize(part_path) < checkpoint.get('bytes', 0):
+        logger.info(_("输入文件或处理参数已变化，忽略旧的断点，从头处理。"))
+        return 0, 0
+    with open(part_path, 'r+b') as f:
+        f.truncate(checkpoint['bytes'])
+    return checkpoint['rows_done'], checkpoint['bytes']
+
+
+def _save_checkpoint(checkpoint_path: str, signature: Dict[str, Any], rows_done: int, part_bytes: int) -> None:
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'signature': signature, 'rows_done': rows_done, 'bytes': part_bytes}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
 def _process_csv_file(
         filepath: str,
         target_output_path: str,
-        cache: Cache,
+        cache: Optional[AIResponseCache],
         source_column_name: str,
         new_column_name: str,
         user_prompt_template: str,
         task_identifier: str,
-        max_row_workers: int,
+        engine: AsyncAIBatchEngine,
         progress_callback: Callable,
-        cancel_event: Optional[threading.Event] = None
+        cancel_event: Optional[threading.Event] = None,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS
 ):
-    """处理单个CSV文件。"""
+    """
+    分块处理单个CSV文件：每处理完 chunk_rows 行就追加写入 <输出>.part 并更新断点文件，
+    因此内存占用与文件大小无关；中途取消或崩溃后再次运行会从断点继续。
+    全部完成后 .part 文件替换为最终输出（输出与输入为同一文件时也是安全的）。
+    """
+    part_path = target_output_path + PARTIAL_OUTPUT_SUFFIX
+    checkpoint_path = target_output_path + CHECKPOINT_SUFFIX
     try:
-        try:
-            df = pd.read_csv(filepath, sep=',', encoding='utf-8')
-        except UnicodeDecodeError:
-            # 修改: 直接使用 logger
-            logger.info(_("文件 {} UTF-8解码失败，尝试GBK...").format(os.path.basename(filepath)))
-            df = pd.read_csv(filepath, sep=',', encoding='gbk')
-
-        if source_column_name not in df.columns:
+        encoding = _detect_csv_encoding(filepath)
+        header = pd.read_csv(filepath, sep=',', encoding=encoding, nrows=0)
+        if source_column_name not in header.columns:
             # 修改: 直接使用 logger
             logger.warning(
                 _("警告: 列 '{}' 在 {} 中未找到。跳过。").format(source_column_name, os.path.basename(filepath)))
             return
 
-        df_processed = _process_dataframe_column(
-            df, cache, source_column_name, new_column_name,
-            user_prompt_template, task_identifier,
-            max_row_workers, progress_callback,
-            cancel_event=cancel_event
-        )
+        # 预先只读取源列统计总行数，用于进度显示
+        total_rows = sum(len(chunk) for chunk in pd.read_csv(
+            filepath, sep=',', encoding=encoding, usecols=[source_column_name], chunksize=chunk_rows))
 
-        os.makedirs(os.path.dirname(target_output_path), exist_ok=True)
-        df_processed.to_csv(target_output_path, sep=',', index=False, encoding='utf-8-sig')
+        os.makedirs(os.path.dirname(os.path.abspath(target_output_path)), exist_ok=True)
+        signature = _checkpoint_signature(filepath, source_column_name, new_column_name, user_prompt_template, engine)
+        rows_done, part_bytes = _load_checkpoint(checkpoint_path, part_path, signature)
+        if rows_done:
+            logger.info(_("从断点继续: 已完成 {}/{} 行。").format(rows_done, total_rows))
+
+        reader = pd.read_csv(filepath, sep=',', encoding=encoding, chunksize=chunk_rows,
+                             skiprows=range(1, rows_done + 1) if rows_done else None)
+        for chunk in reader:
+            if cancel_event and cancel_event.is_set():
+                break
+            base_rows = rows_done
+
+            def chunk_progress(percent: int, _message: str):
+                finished = base_rows + len(chunk) * percent // 100
+                progress_callback(int(finished * 100 / max(1, total_rows)),
+                                  f"{_('正在处理行')} {finished}/{total_rows}")
+
+            df_processed = _process_dataframe_column(
+                chunk, cache, source_column_name, new_column_name,
+                user_prompt_template, task_identifier,
+                engine, chunk_progress,
+                cancel_event=cancel_event
+            )
+            if cancel_event and cancel_event.is_set():
+                # 被取消的这一块不写出，已完成的条目都在缓存里，续跑时几乎不需要重新请求
+                break
+
+            # 只有文件开头写BOM，之后追加的块使用普通UTF-8
+            first_chunk = part_bytes == 0
+            df_processed.to_csv(part_path, sep=',', index=False, header=first_chunk, mode='w' if first_chunk else 'a',
+                                encoding='utf-8-sig' if first_chunk else 'utf-8')
+            rows_done += len(chunk)
+            part_bytes = os.path.getsize(part_path)
+            _save_checkpoint(checkpoint_path, signature, rows_done, part_bytes)
+
+        if cancel_event and cancel_event.is_set():
+            logger.info(_("处理已取消，已完成的 {}/{} 行保存在断点中，再次运行将从断点继续。").format(
+                rows_done, total_rows))
+            return
+
+        if part_bytes == 0:
+            # 输入文件没有数据行，只写出表头
+            header.insert(header.columns.get_loc(source_column_name) + 1, new_column_name, [])
+            header.to_csv(part_path, sep=',', index=False, encoding='utf-8-sig')
+        os.replace(part_path, target_output_path)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
         # 修改: 直接使用 logger
         logger.info(
             _("文件 {} 已处理并保存到: {}").format(os.path.basename(filepath), os.path.basename(target_output_path)))
@@ -218,7 +288,7 @@ def _process_csv_file(
 
 
 def process_single_csv_file(
-        client: 'AIWrapper',
+        client: Union['AIWrapper', AIProviderPool],
         input_csv_path: str,
         output_csv_directory: str,
         source_column_name: str,
@@ -228,21 +298,39 @@ def process_single_csv_file(
         max_row_workers: int,
         progress_callback: Optional[Callable] = None,
         output_csv_path: Optional[str] = None,
-        cancel_event: Optional[threading.Event] = None
+        cancel_event: Optional[threading.Event] = None,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 3,
+        temperature: float = 0.7,
+        items_per_request: int = 1,
+        max_chars_per_request: int = DEFAULT_MAX_CHARS_PER_REQUEST,
+        cache: Optional[AIResponseCache] = None,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS
 ):
-    """针对单个CSV文件进行分析处理。"""
-    global client_global
-    client_global = client
+    """
+    针对单个CSV文件进行分析处理。
+    max_row_workers 为并发请求数上限，实际并发会根据服务商的限流情况自动调整；
+    requests_per_minute / tokens_per_minute 为服务商的RPM/TPM配额（为空表示不限）。
+    client 也可以是多个服务商组成的 AIProviderPool（负载均衡与失败转移），此时配额取各成员自己的设置。
+    items_per_request > 1 时相同的文本只请求一次，且多条文本合并为一个请求发送。
+    cache 为共享的AI回复缓存（见 get_ai_response_cache），为空时每次都重新请求。
+    文件按 chunk_rows 行分块处理并逐块写出，中断后再次运行会从断点继续。
+    client 设置了 usage_tracker 时返回本次的用量汇总（见 AIUsageTracker.summary），否则返回 None。
+    """
+    engine = AsyncAIBatchEngine(
+        client,
+        max_concurrency=max_row_workers,
+        requests_per_minute=requests_per_minute,
+        tokens_per_minute=tokens_per_minute,
+        max_retries=max_retries,
+        temperature=temperature,
+        items_per_request=items_per_request,
+        max_chars_per_request=max_chars_per_request
+    )
 
     progress = progress_callback if progress_callback else lambda p, m: None
 
-    # 修改: _prepare_cache不再接收log参数
-    cache = _prepare_cache(task_identifier)
-    if cache is None:
-        # 修改: 直接使用 logger
-        logger.error(_("错误: 任务 '{}' 的缓存初始化失败，处理中止。").format(task_identifier))
-        return
-
     actual_target_output_path = ""
     if output_csv_path:
         actual_target_output_path = output_csv_path
@@ -263,11 +351,20 @@ def process_single_csv_file(
         new_column_name=new_column_name,
         user_prompt_template=user_prompt_template,
         task_identifier=task_identifier,
-        max_row_workers=max_row_workers,
+        engine=engine,
         progress_callback=progress,
-        cancel_event=cancel_event
+        cancel_event=cancel_event,
+        chunk_rows=chunk_rows
     )
 
-    cache.close()
-    # 修改: 直接使用 logger
-    logger.debug(_("任务 '{}' 的磁盘缓存已关闭。").format(task_identifier))
\ No newline at end of file
+    usage_summary = None
+    if engine.client.usage_tracker is not None:
+        usage_summary = engine.client.usage_tracker.summary()
+        logger.info(_("AI用量统计: {}").format(format_usage_summary(usage_summary)))
+
+    if cache is not None:
+        cache.trim()
+        stats = cache.stats()
+        logger.info(_("任务 '{}' 的AI回复缓存: 本次会话命中 {} 次，未命中 {} 次；缓存共 {} 条。").format(
+            task_identifier, stats['session_hits'], stats['session_misses'], stats['entries']))
+    return usage_summary
\ No newline at end of file
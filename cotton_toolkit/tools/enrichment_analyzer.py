@@ -1,8 +1,6 @@
 ﻿# cotton_toolkit/tools/enrichment_analyzer.py
 import os
 import pandas as pd
-from scipy.stats import hypergeom
-from statsmodels.stats.multitest import multipletests
 from typing import List, Optional, Callable
 import logging
 import  sqlite3
@@ -11,6 +9,11 @@ from .. import PREPROCESSED_DB_NAME
 from ..config.models import MainConfig, GenomeSourceItem
 from ..utils.file_utils import _sanitize_table_name
 from ..utils.gene_utils import normalize_gene_ids, resolve_gene_ids
+from ..utils.lazy_import import lazy_import
+
+# scipy.stats 与 statsmodels 导入耗时较长，延迟到第一次做富集检验时再导入
+scipy_stats = lazy_import("scipy.stats")
+multitest = lazy_import("statsmodels.stats.multitest")
 
 try:
     from builtins import _
@@ -114,7 +117,7 @@ def _perform_hypergeometric_test(
         k = len(k_genes_norm)
 
         if k > 0:
-            p_value = hypergeom.sf(k - 1, M, n, N)
+            p_value = scipy_stats.hypergeom.sf(k - 1, M, n, N)
             rich_factor = k / n if n > 0 else 0
             results.append({'TermID': term_id, 'Description': term_id_to_name.get(term_id, ''),
                             'Namespace': background_df.loc[background_df['TermID'] == term_id, 'Namespace'].iloc[0],
@@ -137,7 +140,7 @@ def _perform_hypergeometric_test(
         progress(100, _("任务终止：p-value计算失败。"))
         return None
 
-    reject, pvals_corrected, _d, _c = multipletests(p_values, alpha=alpha, method='fdr_bh')
+    reject, pvals_corrected, _d, _c = multitest.multipletests(p_values, alpha=alpha, method='fdr_bh')
     results_df['FDR'] = pvals_corrected
 
     progress(95, _("正在保存完整结果..."))
@@ -3,15 +3,19 @@ import traceback
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import networkx as nx
-from upsetplot import from_contents, UpSet
 from typing import List, Optional, Dict, Any
 import os
 import textwrap
 import re
 import logging # 修改: 导入 logging
 
+from cotton_toolkit.utils.lazy_import import lazy_import
+
+# 绘图库导入较慢，延迟到第一次绘图时再导入
+plt = lazy_import("matplotlib.pyplot")
+nx = lazy_import("networkx")
+upsetplot = lazy_import("upsetplot")
+
 
 try:
     import builtins
@@ -247,12 +251,12 @@ def plot_enrichment_upset(
             return None
 
         gene_sets = {row['Description']: set(row['Genes'].split(';')) for index, row in df_plot.iterrows()}
-        upset_data = from_contents(gene_sets)
+        upset_data = upsetplot.from_contents(gene_sets)
 
         plt.style.use('seaborn-v0_8-whitegrid')
         fig = plt.figure(figsize=(12, 7 + top_n * 0.2))
 
-        upset = UpSet(upset_data, orientation='horizontal', sort_by='degree',
+        upset = upsetplot.UpSet(upset_data, orientation='horizontal', sort_by='degree',
                       show_counts=True, element_size=40)
         upset.plot(fig=fig)
 
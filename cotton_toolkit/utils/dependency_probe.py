@@ -0,0 +1,319 @@
+# cotton_toolkit/utils/dependency_probe.py
+"""
+外部依赖检测：BLAST+ 命令行工具与可选的 Python 库。
+
+检测在后台线程中进行，不阻塞GUI或命令行的启动。可执行文件的检测结果缓存在 ~/.fcgt/dependency_cache.json，
+以 PATH、可执行文件路径及其修改时间/大小为键；之后的启动只需一次 PATH 查找与 stat，无需再运行子进程。
+依赖缺失时只禁用（或降级）依赖它的功能，而不是阻止整个程序启动。
+
+    probe = get_dependency_probe()          # 第一次调用时在后台开始检测
+    missing = probe.missing_for('blast')    # 需要结果时才等待
+"""
+import builtins
+import hashlib
+import importlib.metadata
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+def _(text: str) -> str:
+    # GUI在安装翻译函数之前就会导入本模块，因此每次调用时再查找
+    translator = getattr(builtins, '_', None)
+    return translator(text) if translator is not None and translator is not _ else text
+
+
+logger = logging.getLogger("cotton_toolkit.utils.dependency_probe")
+
+BLAST_DOWNLOAD_URL = "https://ftp.ncbi.nlm.nih.gov/blast/executables/blast+/LATEST/"
+
+CACHE_FORMAT_VERSION = 1
+BINARY_PROBE_TIMEOUT = 15
+
+
+class DependencySpec(NamedTuple):
+    """kind 为 'binary'（以 -version 运行的可执行文件）或 'python'（可导入的模块）。"""
+    kind: str
+    target: str
+    distribution: Optional[str] = None
+    group: Optional[str] = None
+
+
+class DependencyStatus(NamedTuple):
+    name: str
+    available: bool
+    version: Optional[str] = None
+    path: Optional[str] = None
+    error: Optional[str] = None
+    cached: bool = False
+
+
+class FeatureRequirement(NamedTuple):
+    """功能所需的依赖；fallback 非空表示依赖缺失时功能仍可降级使用（值为待翻译的说明文字）。"""
+    dependencies: Tuple[str, ...]
+    fallback: Optional[str] = None
+
+
+DEPENDENCIES: Dict[str, DependencySpec] = {
+    'makeblastdb': DependencySpec('binary', 'makeblastdb', group='BLAST+'),
+    'blastn': DependencySpec('binary', 'blastn', group='BLAST+'),
+    'blastp': DependencySpec('binary', 'blastp', group='BLAST+'),
+    'blastx': DependencySpec('binary', 'blastx', group='BLAST+'),
+    'tblastn': DependencySpec('binary', 'tblastn', group='BLAST+'),
+    'biopython': DependencySpec('python', 'Bio', distribution='biopython'),
+    'scipy': DependencySpec('python', 'scipy'),
+    'statsmodels': DependencySpec('python', 'statsmodels'),
+    'matplotlib': DependencySpec('python', 'matplotlib'),
+    'networkx': DependencySpec('python', 'networkx'),
+    'upsetplot': DependencySpec('python', 'upsetplot', distribution='UpSetPlot'),
+    'openpyxl': DependencySpec('python', 'openpyxl'),
+}
+
+# 键与GUI工具页的键一致（build_blast_db、precompute_homology 仅用于命令行）
+FEATURES: Dict[str, FeatureRequirement] = {
+    'blast': FeatureRequirement(('makeblastdb', 'blastn', 'blastp', 'blastx', 'tblastn', 'biopython')),
+    'build_blast_db': FeatureRequirement(('makeblastdb',)),
+    'precompute_homology': FeatureRequirement(('makeblastdb', 'blastn')),
+    'homology': FeatureRequirement(('makeblastdb', 'blastn'), fallback="只能使用预计算的同源表"),
+    'locus_conversion': FeatureRequirement(('makeblastdb', 'blastn'), fallback="只能使用预计算的同源表"),
+    'enrichment': FeatureRequirement(('scipy', 'statsmodels', 'matplotlib')),
+}
+
+
+def default_cache_path() -> str:
+    return os.path.join(os.path.expanduser("~"), ".fcgt", "dependency_cache.json")
+
+
+def _path_env_digest() -> str:
+    return hashlib.sha1(os.environ.get('PATH', '').encode('utf-8', 'surrogateescape')).hexdigest()[:16]
+
+
+def _parse_version_output(output: str, executable: str) -> Optional[str]:
+    """BLAST+ 输出形如 'makeblastdb: 2.14.0+'，取第一行冒号后的部分。"""
+    for line in output.splitlines():
+        line = line.strip()
+        if line:
+            prefix = executable + ':'
+            return line[len(prefix):].strip() if line.startswith(prefix) else line
+    return None
+
+
+def _load_cache(cache_path: str) -> Dict[str, dict]:
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('version') != CACHE_FORMAT_VERSION:
+        return {}
+    entries = data.get('binaries')
+    return entries if isinstance(entries, dict) else {}
+
+
+def _save_cache(cache_path: str, entries: Dict[str, dict]) -> None:
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_FORMAT_VERSION, 'binaries': entries}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.debug(f"Failed to write dependency cache '{cache_path}': {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _probe_binary(name: str, executable: str, cache: Dict[str, dict],
+                  path_digest: str) -> Tuple[DependencyStatus, Optional[dict]]:
+    """返回检测结果与应写入缓存的条目（None 表示不缓存）。"""
+    path = shutil.which(executable)
+    if path is None:
+        return DependencyStatus(name, False, error=_("未在 PATH 中找到 {}").format(executable)), None
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        return DependencyStatus(name, False, path=path, error=str(e)), None
+
+    key = {'path_env': path_digest, 'path': path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+    entry = cache.get(name)
+    if isinstance(entry, dict) and all(entry.get(k) == v for k, v in key.items()):
+        return DependencyStatus(name, bool(entry.get('available')), entry.get('version'), path,
+                                entry.get('error'), cached=True), entry
+
+    startupinfo = None
+    if sys.platform == "win32":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+    try:
+        result = subprocess.run([path, '-version'], capture_output=True, text=True, errors='replace',
+                                timeout=BINARY_PROBE_TIMEOUT, startupinfo=startupinfo)
+    except subprocess.TimeoutExpired:
+        # 超时可能只是一时的系统繁忙，不写入缓存
+        return DependencyStatus(name, False, path=path, error=_("运行 {} -version 超时").format(executable)), None
+    except (OSError, subprocess.SubprocessError) as e:
+        status = DependencyStatus(name, False, path=path, error=str(e))
+    else:
+        if result.returncode == 0:
+            status = DependencyStatus(name, True, _parse_version_output(result.stdout, executable), path)
+        else:
+            status = DependencyStatus(name, False, path=path, error=_("{} -version 返回退出码 {}").format(
+                executable, result.returncode))
+    return status, dict(key, available=status.available, version=status.version, error=status.error)
+
+
+def _probe_python(name: str, spec: DependencySpec) -> DependencyStatus:
+    # 只查找模块而不导入，避免在启动时加载大型库
+    try:
+        module_spec = importlib.util.find_spec(spec.target)
+    except (ImportError, ValueError) as e:
+        return DependencyStatus(name, False, error=str(e))
+    if module_spec is None:
+        return DependencyStatus(name, False, error=_("未安装 Python 模块 {}").format(spec.target))
+    try:
+        version = importlib.metadata.version(spec.distribution or spec.target)
+    except importlib.metadata.PackageNotFoundError:
+        version = None
+    return DependencyStatus(name, True, version, module_spec.origin)
+
+
+class DependencyProbe:
+    """检测一组依赖。start() 在后台线程中检测；需要结果的方法会等待检测完成（未启动时就地检测）。"""
+
+    def __init__(self, names: Optional[Iterable[str]] = None, cache_path: Optional[str] = None,
+                 use_cache: bool = True):
+        self.names = list(names) if names is not None else list(DEPENDENCIES)
+        self.cache_path = cache_path or default_cache_path()
+        self.use_cache = use_cache
+        self.results: Dict[str, DependencyStatus] = {}
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[Dict[str, DependencyStatus]], None]] = []
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def start(self) -> "DependencyProbe":
+        with self._lock:
+            if self._thread is None and not self.done:
+                self._thread = threading.Thread(target=self.run, name="dependency-probe", daemon=True)
+                self._thread.start()
+        return self
+
+    def run(self) -> Dict[str, DependencyStatus]:
+        """同步检测全部依赖，写回缓存并调用已注册的回调。"""
+        cache = _load_cache(self.cache_path) if self.use_cache else {}
+        new_cache = dict(cache)
+        path_digest = _path_env_digest()
+        results: Dict[str, DependencyStatus] = {}
+        for name in self.names:
+            spec = DEPENDENCIES[name]
+            try:
+                if spec.kind == 'binary':
+                    status, entry = _probe_binary(name, spec.target, cache, path_digest)
+                    if entry is not None:
+                        new_cache[name] = entry
+                    else:
+                        new_cache.pop(name, None)
+                else:
+                    status = _probe_python(name, spec)
+            except Exception as e:
+                logger.debug(f"Unexpected error while probing '{name}': {e}")
+                status = DependencyStatus(name, False, error=str(e))
+            results[name] = status
+        if new_cache != cache:
+            _save_cache(self.cache_path, new_cache)
+
+        missing = [name for name, status in results.items() if not status.available]
+        logger.debug(f"Dependency probe finished; missing: {missing or 'none'}")
+
+        with self._lock:
+            self.results = results
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            self._invoke(callback)
+        return results
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict[str, DependencyStatus]]:
+        """等待检测结束并返回结果；超时返回 None。"""
+        with self._lock:
+            started = self._thread is not None
+        if not started and not self.done:
+            return self.run()
+        return self.results if self._done.wait(timeout) else None
+
+    def add_done_callback(self, callback: Callable[[Dict[str, DependencyStatus]], None]) -> None:
+        """检测结束后调用 callback(results)；已结束时立即调用。回调可能在检测线程中执行。"""
+        with self._lock:
+            if not self.done:
+                self._callbacks.append(callback)
+                return
+        self._invoke(callback)
+
+    def _invoke(self, callback: Callable[[Dict[str, DependencyStatus]], None]) -> None:
+        try:
+            callback(self.results)
+        except Exception as e:
+            logger.error(_("依赖检测回调出错: {}").format(e))
+
+    def is_available(self, name: str) -> bool:
+        status = (self.wait() or {}).get(name)
+        return bool(status and status.available)
+
+    def missing_for(self, feature: str) -> List[str]:
+        """返回功能 feature 缺少的依赖名（按 FEATURES 中的顺序）。"""
+        return find_unavailable_features(self.wait() or {}).get(feature, [])
+
+    def unavailable_features(self) -> Dict[str, List[str]]:
+        return find_unavailable_features(self.wait() or {})
+
+
+def find_unavailable_features(results: Dict[str, DependencyStatus]) -> Dict[str, List[str]]:
+    """功能 -> 缺少的依赖；只包含有依赖缺失的功能。未检测的依赖视为缺失。"""
+    unavailable = {}
+    for feature, requirement in FEATURES.items():
+        missing = [name for name in requirement.dependencies
+                   if not (name in results and results[name].available)]
+        if missing:
+            unavailable[feature] = missing
+    return unavailable
+
+
+def format_missing_dependencies(feature: str, missing: List[str]) -> str:
+    """生成给用户看的缺失依赖说明；缺少 BLAST+ 时附上下载地址。"""
+    requirement = FEATURES[feature]
+    message = _("功能 '{}' 缺少依赖: {}。").format(feature, ", ".join(missing))
+    if requirement.fallback:
+        message += " " + _("该功能仍可使用，但{}。").format(_(requirement.fallback))
+    if any(DEPENDENCIES[name].group == 'BLAST+' for name in missing):
+        message += "\n\n" + _("请安装 NCBI BLAST+ 并将其加入 PATH 环境变量。官方下载地址:\n{}").format(
+            BLAST_DOWNLOAD_URL)
+    elif any(DEPENDENCIES[name].kind == 'python' for name in missing):
+        message += "\n\n" + _("请使用 pip 安装缺少的 Python 库。")
+    return message
+
+
+_PROBE: Optional[DependencyProbe] = None
+_PROBE_LOCK = threading.Lock()
+
+
+def get_dependency_probe(start: bool = True) -> DependencyProbe:
+    """返回全局检测器；第一次调用（且 start 为 True）时在后台开始检测。"""
+    global _PROBE
+    with _PROBE_LOCK:
+        if _PROBE is None:
+            _PROBE = DependencyProbe()
+        probe = _PROBE
+    if start:
+        probe.start()
+    return probe
@@ -2,11 +2,13 @@
 import io
 import os
 import re
+import time
+from contextlib import contextmanager
 
 import pandas as pd
 import gzip
 import logging
-from typing import Optional
+from typing import Optional, Callable, Iterator
 
 from cotton_toolkit.core.file_normalizer import normalize_to_csv
 
@@ -149,3 +151,70 @@ def _sanitize_table_name(filename: str, version_id: Optional[str] = None) -> str
         return f"{sane_version}_{sane_name}"
 
     return sane_name
+
+
+@contextmanager
+def inter_process_file_lock(
+        lock_path: str,
+        timeout: Optional[float] = None,
+        check_cancel: Optional[Callable[[], bool]] = None,
+        poll_interval: float = 0.5
+) -> Iterator[bool]:
+    """
+    基于锁文件的跨进程互斥锁（POSIX 使用 fcntl.flock，Windows 使用 msvcrt.locking），
+    同一进程内的不同线程之间同样互斥。
+    以非阻塞方式轮询获取，等待期间可通过 check_cancel 取消；取消时 yield False，调用方应直接返回。
+    超过 timeout 秒仍未获取到锁时抛出 TimeoutError。
+    """
+    lock_dir = os.path.dirname(lock_path)
+    if lock_dir:
+        os.makedirs(lock_dir, exist_ok=True)
+
+    handle = open(lock_path, 'a+')
+    if os.name == 'nt':
+        import msvcrt
+
+        def try_lock() -> bool:
+            try:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                return False
+
+        def unlock():
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        import fcntl
+
+        def try_lock() -> bool:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                return False
+
+        def unlock():
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+    acquired = False
+    try:
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        waiting_logged = False
+        while not try_lock():
+            if check_cancel and check_cancel():
+                yield False
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(_("等待文件锁超时: {}").format(lock_path))
+            if not waiting_logged:
+                logger.info(_("另一个任务正在使用 {}，等待其完成...").format(os.path.basename(lock_path)))
+                waiting_logged = True
+            time.sleep(poll_interval)
+        acquired = True
+        yield True
+    finally:
+        if acquired:
+            unlock()
+        handle.close()
@@ -4,13 +4,13 @@ import re
 import sqlite3
 import threading
 import logging
-from random import sample
 
 import pandas as pd
 from typing import List, Optional, Tuple, Any
 
 from cotton_toolkit.config.loader import get_genome_data_sources, get_local_downloaded_file_path
 from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.core.id_alias_index import get_id_alias_index
 from cotton_toolkit.pipelines.blast import _, logger
 from cotton_toolkit.utils.file_utils import _sanitize_table_name
 
@@ -23,6 +23,10 @@ except (AttributeError, ImportError):
 
 logger = logging.getLogger("cotton_toolkit.gene_utils")
 
+# 棉花基因ID中的亚组与染色体编号，例如 Gh_A01G0001 / GH_D05G1234 / Ghir.A01G000010
+_SUBGENOME_CHROMOSOME_PATTERN = re.compile(r'[_.\s]([AD])(\d{2})G', re.IGNORECASE)
+
+
 def parse_gene_id(gene_id: str) -> Optional[Tuple[str, str]]:
     """
     【全新升级】从一个棉花基因ID中解析出亚组和染色体编号。
@@ -30,20 +34,24 @@ def parse_gene_id(gene_id: str) -> Optional[Tuple[str, str]]:
     if not isinstance(gene_id, str):
         return None
 
-    match = re.search(r'[_.\s]([AD])(\d{2})G', gene_id, re.IGNORECASE)
-
+    match = _SUBGENOME_CHROMOSOME_PATTERN.search(gene_id)
     if match:
-        subgenome = match.group(1).upper()
-        chromosome = match.group(2)
-        return (subgenome, chromosome)
+        return match.group(1).upper(), match.group(2)
+    return None
 
-    match = re.search(r'^GH_([AD])(\d{2})G', gene_id, re.IGNORECASE)
-    if match:
-        subgenome = match.group(1).upper()
-        chromosome = match.group(2)
-        return (subgenome, chromosome)
 
-    return None
+def parse_gene_ids(gene_ids: pd.Series) -> pd.DataFrame:
+    """
+    parse_gene_id 的向量化版本，返回与输入同索引的 Subgenome / Chromosome 两列（无法解析时为 NaN）。
+    命中表中同一个ID会重复出现很多次，因此只对去重后的ID做一次正则提取，再按编码映射回去。
+    """
+    codes, uniques = pd.factorize(gene_ids.astype(str), sort=False)
+    parsed = pd.Series(uniques, dtype=object).str.extract(_SUBGENOME_CHROMOSOME_PATTERN)
+    parsed.columns = ['Subgenome', 'Chromosome']
+    parsed['Subgenome'] = parsed['Subgenome'].str.upper()
+    result = parsed.reindex(codes).reset_index(drop=True)
+    result.index = gene_ids.index
+    return result
 
 
 def normalize_gene_ids(gene_ids: pd.Series, pattern: str) -> pd.Series:
@@ -184,13 +192,6 @@ def _to_transcript_id(an_id: str, suffix: str = ".1") -> str:
     return f"{an_id}{suffix}"
 
 
-def _check_id_exists(cursor: sqlite3.Cursor, table_name: str, gene_id: str) -> bool:
-    """在数据库表中快速检查单个ID是否存在"""
-    query = f'SELECT 1 FROM "{table_name}" WHERE Gene = ? LIMIT 1'
-    cursor.execute(query, (gene_id,))
-    return cursor.fetchone() is not None
-
-
 def resolve_gene_ids(
         config: MainConfig,
         assembly_id: str,
@@ -199,6 +200,8 @@ def resolve_gene_ids(
     """
     智能解析基因ID列表。
     自动检测用户提供的是基因还是转录本ID，并根据数据库进行校正。
+    解析基于预处理时生成的ID别名索引，整个过程为内存查找；
+    无法匹配的ID会按数据库的ID模式（基因/转录本）统一格式后原样保留，交由下游报告。
     """
     if not gene_ids:
         return []
@@ -217,52 +220,22 @@ def resolve_gene_ids(
     cds_file_path = get_local_downloaded_file_path(config, genome_info, 'predicted_cds')
     table_name = _sanitize_table_name(os.path.basename(cds_file_path), version_id=genome_info.version_id)
 
-    processing_mode = None  # 'gene' 或 'transcript'
-
-    with sqlite3.connect(f'file:{db_path}?mode=ro', uri=True) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-        if cursor.fetchone() is None:
-            raise ValueError(_("错误: 在数据库中找不到表 '{}'。请先对CDS文件进行预处理。").format(table_name))
-
-        # --- 根据ID数量选择不同逻辑 ---
-        if len(gene_ids) >= 2:
-            # 随机取两个样本进行探测
-            samples = sample(gene_ids, 2)
-            logger.debug(_("智能解析：抽取了两个样本进行探测: {}").format(samples))
-            for sample_id in samples:
-                # 优先尝试转录本格式
-                if _check_id_exists(cursor, table_name, _to_transcript_id(sample_id)):
-                    processing_mode = 'transcript'
-                    logger.info(_("智能解析：探测到数据库匹配转录本ID (例如: {})。").format(_to_transcript_id(sample_id)))
-                    break
-                # 如果转录本失败，尝试基础基因格式
-                elif _check_id_exists(cursor, table_name, _to_gene_id(sample_id)):
-                    processing_mode = 'gene'
-                    logger.info(_("智能解析：探测到数据库匹配基础基因ID (例如: {})。").format(_to_gene_id(sample_id)))
-                    break
-
-            if processing_mode is None:
-                raise ValueError(_("错误：无法在数据库中匹配提供的基因ID样本。请检查基因组版本和ID格式是否正确。"))
-
-        elif len(gene_ids) == 1:
-            sample_id = gene_ids[0]
-            logger.debug(_("智能解析：正在探测单个ID: {}").format(sample_id))
-            if _check_id_exists(cursor, table_name, _to_transcript_id(sample_id)):
-                processing_mode = 'transcript'
-            elif _check_id_exists(cursor, table_name, _to_gene_id(sample_id)):
-                processing_mode = 'gene'
-            else:
-                raise ValueError(_("错误：无法在数据库中匹配提供的基因ID '{}'。").format(sample_id))
-
-    # --- 根据探测到的模式，统一处理整个列表 ---
-    if processing_mode == 'transcript':
-        logger.debug(_("应用 '转录本' 模式处理整个列表。"))
-        return list(dict.fromkeys([_to_transcript_id(gid) for gid in gene_ids]))  # dict.fromkeys去重并保持顺序
-    elif processing_mode == 'gene':
-        logger.debug(_("应用 '基因' 模式处理整个列表。"))
-        return list(dict.fromkeys([_to_gene_id(gid) for gid in gene_ids]))
-
-    return gene_ids  # 如果只有一个ID且模式未定，返回原始ID
-
-
+    try:
+        alias_index = get_id_alias_index(db_path, table_name)
+    except sqlite3.Error as e:
+        raise ValueError(_("错误: 读取基因ID索引失败: {}").format(e)) from e
+
+    resolved_map, missing = alias_index.resolve_many(dict.fromkeys(gene_ids))
+    if not resolved_map:
+        if len(gene_ids) == 1:
+            raise ValueError(_("错误：无法在数据库中匹配提供的基因ID '{}'。").format(gene_ids[0]))
+        raise ValueError(_("错误：无法在数据库中匹配提供的基因ID样本。请检查基因组版本和ID格式是否正确。"))
+
+    if missing:
+        logger.debug(_("智能解析：{} 个ID未能在数据库中匹配。").format(len(missing)))
+    to_db_format = _to_transcript_id if alias_index.uses_transcript_ids else _to_gene_id
+    logger.info(_("智能解析：{} 个ID已匹配到数据库（{}模式）。").format(
+        len(resolved_map), _("转录本") if alias_index.uses_transcript_ids else _("基因")))
+
+    # dict.fromkeys去重并保持顺序
+    return list(dict.fromkeys(resolved_map.get(gid) or to_db_format(gid) for gid in gene_ids))
@@ -0,0 +1,389 @@
+# cotton_toolkit/utils/job_queue.py
+"""
+GUI 任务队列：按优先级排队、限制同时运行的任务数，每个任务有独立的取消事件与进度。
+任务的参数、状态与耗时写入 SQLite 历史库（默认 ~/.fcgt/job_history.db），用于查看历史与统计吞吐量。
+
+    queue = JobQueue(max_concurrent=2, history=JobHistory(), listener=on_job_event)
+    job = queue.submit(_("本地 BLAST"), run_blast_pipeline, {'config': config, ...}, priority=1)
+    queue.cancel(job.job_id)
+
+listener(event, job) 在提交线程或任务线程中调用，event 为 JOB_EVENTS 之一；GUI 应把它转发到主线程处理。
+"""
+import contextlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.utils.job_queue")
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED)
+
+JOB_EVENTS = ('queued', 'started', 'progress', 'finished')
+
+DEFAULT_MAX_CONCURRENT_JOBS = 2
+# 本次会话中保留的已结束任务数量（更早的只保留在历史库中）
+MAX_FINISHED_JOBS_IN_MEMORY = 200
+
+# 不写入历史的参数：回调、事件，以及体积大且无法序列化的配置对象
+_SKIPPED_PARAMETERS = {'config', 'cancel_event', 'progress_callback', 'status_callback', 'check_cancel'}
+_MAX_PARAMETER_CHARS = 500
+_MAX_PARAMETER_ITEMS = 50
+
+
+class Job:
+    """队列中的一个任务。状态与结果由队列维护，调用方只读。"""
+
+    def __init__(self, job_id: int, name: str, func: Callable, kwargs: Dict[str, Any], priority: int,
+                 task_key: str):
+        self.job_id = job_id
+        self.name = name
+        self.task_key = task_key
+        self.func = func
+        self.kwargs = kwargs
+        self.priority = priority
+        self.state = JOB_QUEUED
+        self.cancel_event = threading.Event()
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.progress = 0.0
+        self.message = ""
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.history_id: Optional[int] = None
+        self._queue_seq: Optional[int] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINISHED_STATES
+
+    @property
+    def wait_seconds(self) -> float:
+        """排队等待的时间（仍在排队时计到现在）。"""
+        return (self.started_at or self.finished_at or time.time()) - self.submitted_at
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        """运行时间（仍在运行时计到现在）；从未开始运行时为 None。"""
+        if self.started_at is None:
+            return None
+        return (self.finished_at or time.time()) - self.started_at
+
+    def __repr__(self) -> str:
+        return f"<Job {self.job_id} {self.name!r} {self.state}>"
+
+
+def _jsonable(value: Any) -> Any:
+    """把参数值转成便于存储的JSON值：长文本与长列表会被截断，其它对象记为其字符串形式。"""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        return value if len(value) <= _MAX_PARAMETER_CHARS else value[:_MAX_PARAMETER_CHARS] + "..."
+    if isinstance(value, dict):
+        items = list(value.items())
+        converted = {str(k): _jsonable(v) for k, v in items[:_MAX_PARAMETER_ITEMS]}
+        if len(items) > _MAX_PARAMETER_ITEMS:
+            converted['...'] = _("共 {} 项").format(len(items))
+        return converted
+    if isinstance(value, (list, tuple, set, frozenset)):
+        items = list(value)
+        converted = [_jsonable(v) for v in items[:_MAX_PARAMETER_ITEMS]]
+        if len(items) > _MAX_PARAMETER_ITEMS:
+            converted.append(_("共 {} 项").format(len(items)))
+        return converted
+    return _jsonable(str(value))
+
+
+def serialize_parameters(kwargs: Dict[str, Any]) -> str:
+    params = {key: _jsonable(value) for key, value in kwargs.items()
+              if key not in _SKIPPED_PARAMETERS and not callable(value) and not isinstance(value, threading.Event)}
+    return json.dumps(params, ensure_ascii=False, sort_keys=True)
+
+
+def default_history_path() -> str:
+    return os.path.join(os.path.expanduser("~"), ".fcgt", "job_history.db")
+
+
+# strftime 格式：按小时/天/周/月汇总吞吐量
+_THROUGHPUT_BUCKETS = {'hour': '%Y-%m-%d %H:00', 'day': '%Y-%m-%d', 'week': '%Y-W%W', 'month': '%Y-%m'}
+
+
+class JobHistory:
+    """任务历史库。每次操作使用独立的短连接，可在任意线程中调用。"""
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_history_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS jobs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, '
+                         'task_key TEXT, priority INTEGER, state TEXT, submitted_at REAL, started_at REAL, '
+                         'finished_at REAL, wait_seconds REAL, run_seconds REAL, parameters TEXT, error TEXT)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_finished_at ON jobs (finished_at)')
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record_submitted(self, job: Job) -> int:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT INTO jobs (name, task_key, priority, state, submitted_at, parameters) VALUES (?, ?, ?, ?, ?, ?)',
+                (job.name, job.task_key, job.priority, job.state, job.submitted_at, serialize_parameters(job.kwargs)))
+            return cursor.lastrowid
+
+    def record_state(self, job: Job) -> None:
+        """写入任务的当前状态、时间与错误（开始与结束时调用）。"""
+        if job.history_id is None:
+            return
+        with self._connect() as conn:
+            conn.execute('UPDATE jobs SET priority = ?, state = ?, started_at = ?, finished_at = ?, wait_seconds = ?, '
+                         'run_seconds = ?, error = ? WHERE id = ?',
+                         (job.priority, job.state, job.started_at, job.finished_at,
+                          job.wait_seconds if job.started_at is not None or job.finished else None,
+                          job.run_seconds if job.finished else None,
+                          str(job.error) if job.error is not None else None, job.history_id))
+
+    def recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """最近提交的任务，新的在前；parameters 已解析为字典。"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT * FROM jobs ORDER BY id DESC LIMIT ?', (limit,)).fetchall()
+        records = []
+        for row in rows:
+            record = dict(row)
+            try:
+                record['parameters'] = json.loads(record['parameters'] or '{}')
+            except ValueError:
+                record['parameters'] = {}
+            records.append(record)
+        return records
+
+    def throughput(self, bucket: str = 'day', since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        按时间段（hour/day/week/month，本地时间）与任务类型汇总已结束的任务：
+        数量、成功/失败/取消数、平均与总运行时间、平均排队时间。
+        """
+        period_format = _THROUGHPUT_BUCKETS[bucket]
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT strftime(?, finished_at, 'unixepoch', 'localtime') AS period, task_key, COUNT(*) AS jobs, "
+                "SUM(state = ?) AS succeeded, SUM(state = ?) AS failed, SUM(state = ?) AS cancelled, "
+                "AVG(run_seconds) AS mean_run_seconds, TOTAL(run_seconds) AS total_run_seconds, "
+                "AVG(wait_seconds) AS mean_wait_seconds "
+                "FROM jobs WHERE finished_at IS NOT NULL AND finished_at >= ? "
+                "GROUP BY period, task_key ORDER BY period, task_key",
+                (period_format, JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED, since or 0)).fetchall()
+        return [dict(row) for row in rows]
+
+    def prune(self, older_than_days: float) -> int:
+        """删除早于指定天数的已结束任务，返回删除条数。"""
+        cutoff = time.time() - older_than_days * 86400
+        with self._connect() as conn:
+            return conn.execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                                (cutoff,)).rowcount
+
+
+class JobQueue:
+    """
+    优先级任务队列：priority 越大越先运行，同优先级按提交顺序；最多同时运行 max_concurrent 个任务，
+    每个任务在独立的守护线程中执行。任务函数会收到该任务专属的 cancel_event 与 progress_callback。
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT_JOBS, history: Optional[JobHistory] = None,
+                 listener: Optional[Callable[[str, Job], None]] = None):
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.history = history
+        self.listener = listener
+        self._lock = threading.Lock()
+        # 堆中元素为 (-priority, seq, job)；调整优先级或取消后旧元素作废，出堆时跳过
+        self._pending: List[Tuple[int, int, Job]] = []
+        self._running: Dict[int, Job] = {}
+        self._jobs: Dict[int, Job] = {}
+        self._job_ids = itertools.count(1)
+        self._seq = itertools.count()
+
+    # --- 提交与调度 ---
+
+    def submit(self, name: str, func: Callable, kwargs: Optional[Dict[str, Any]] = None, priority: int = 0,
+               task_key: Optional[str] = None) -> Job:
+        """提交任务并立即尝试调度；返回时若有空闲名额，任务已处于运行状态。"""
+        job = Job(next(self._job_ids), name, func, dict(kwargs or {}), priority, task_key or name)
+        self._write_history(job, submitted=True)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._push(job)
+        self._notify('queued', job)
+        self._dispatch()
+        return job
+
+    def _push(self, job: Job) -> None:
+        job._queue_seq = next(self._seq)
+        heapq.heappush(self._pending, (-job.priority, job._queue_seq, job))
+
+    def _dispatch(self) -> None:
+        to_start = []
+        with self._lock:
+            while self._pending and len(self._running) < self.max_concurrent:
+                _priority, seq, job = heapq.heappop(self._pending)
+                if job.state != JOB_QUEUED or seq != job._queue_seq:
+                    continue
+                job.state = JOB_RUNNING
+                job.started_at = time.time()
+                self._running[job.job_id] = job
+                to_start.append(job)
+        for job in to_start:
+            threading.Thread(target=self._run, args=(job,), name=f"job-{job.job_id}", daemon=True).start()
+
+    def _run(self, job: Job) -> None:
+        self._write_history(job)
+        self._notify('started', job)
+
+        caller_progress = job.kwargs.get('progress_callback')
+
+        def progress_callback(percentage: float, message: str) -> None:
+            job.progress, job.message = percentage, message
+            if caller_progress:
+                caller_progress(percentage, message)
+            self._notify('progress', job)
+
+        kwargs = dict(job.kwargs, cancel_event=job.cancel_event, progress_callback=progress_callback)
+        try:
+            job.result = job.func(**kwargs)
+        except Exception as e:
+            job.error = e
+            logger.error(_("任务 '{}' 发生错误: {}").format(job.name, e))
+        finally:
+            with self._lock:
+                job.finished_at = time.time()
+                if job.cancel_event.is_set():
+                    job.state = JOB_CANCELLED
+                elif job.error is not None:
+                    job.state = JOB_FAILED
+                else:
+                    job.state = JOB_SUCCEEDED
+                self._running.pop(job.job_id, None)
+                self._forget_old_jobs()
+            self._write_history(job)
+            self._notify('finished', job)
+            self._dispatch()
+
+    def _forget_old_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS_IN_MEMORY)]:
+            del self._jobs[job_id]
+
+    # --- 控制 ---
+
+    def cancel(self, job_id: int) -> bool:
+        """取消排队中的任务（立即结束）或请求运行中的任务停止；任务已结束或不存在时返回 False。"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return False
+            job.cancel_event.set()
+            was_queued = job.state == JOB_QUEUED
+            if was_queued:
+                job.state = JOB_CANCELLED
+                job.finished_at = time.time()
+        if was_queued:
+            logger.info(_("已从队列中移除任务 '{}'。").format(job.name))
+            self._write_history(job)
+            self._notify('finished', job)
+        else:
+            logger.warning(_("已请求取消任务 '{}'，将在当前步骤完成后停止。").format(job.name))
+        return True
+
+    def cancel_all(self) -> None:
+        for job in self.active_jobs():
+            self.cancel(job.job_id)
+
+    def set_priority(self, job_id: int, priority: int) -> bool:
+        """调整排队中任务的优先级；任务已开始或不存在时返回 False。"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != JOB_QUEUED:
+                return False
+            job.priority = priority
+            self._push(job)
+        self._notify('queued', job)
+        return True
+
+    def set_max_concurrent(self, max_concurrent: int) -> None:
+        with self._lock:
+            self.max_concurrent = max(1, int(max_concurrent))
+        self._dispatch()
+
+    # --- 查询 ---
+
+    def get(self, job_id: int) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """本次会话中的任务（按提交顺序）。"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def queued_jobs(self) -> List[Job]:
+        """排队中的任务，按将要运行的先后顺序。"""
+        with self._lock:
+            entries = [entry for entry in self._pending
+                       if entry[2].state == JOB_QUEUED and entry[1] == entry[2]._queue_seq]
+        return [job for _priority, _seq, job in sorted(entries, key=lambda entry: entry[:2])]
+
+    def running_jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._running.values())
+
+    def active_jobs(self) -> List[Job]:
+        return self.running_jobs() + self.queued_jobs()
+
+    def has_active_jobs(self) -> bool:
+        with self._lock:
+            return bool(self._running) or any(job.state == JOB_QUEUED for job in self._jobs.values())
+
+    # --- 内部 ---
+
+    def _write_history(self, job: Job, submitted: bool = False) -> None:
+        # 历史库出错不能影响任务本身
+        if self.history is None:
+            return
+        try:
+            if submitted:
+                job.history_id = self.history.record_submitted(job)
+            else:
+                self.history.record_state(job)
+        except sqlite3.Error as e:
+            logger.warning(_("写入任务历史失败: {}").format(e))
+
+    def _notify(self, event: str, job: Job) -> None:
+        if self.listener is None:
+            return
+        try:
+            self.listener(event, job)
+        except Exception as e:
+            logger.error(_("任务队列事件处理出错: {}").format(e))
@@ -0,0 +1,61 @@
+# cotton_toolkit/utils/lazy_import.py
+"""
+延迟导入工具：scipy、statsmodels、matplotlib、networkx、upsetplot、Biopython 等模块导入一次要数百毫秒，
+而大多数运行只用到其中一两个流水线。用 lazy_import 代替模块顶部的 import，模块会在第一次访问属性时才真正导入，
+从而缩短GUI与命令行的启动时间。
+
+    plt = lazy_import("matplotlib.pyplot")      # 此时不导入
+    fig, ax = plt.subplots()                    # 第一次使用时导入
+
+缺少可选依赖时，ImportError 也会推迟到第一次使用时抛出。
+"""
+import importlib
+import sys
+import threading
+import types
+from typing import Any
+
+
+class LazyModule(types.ModuleType):
+    """在第一次访问属性时才导入目标模块的代理。"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_lock'] = threading.Lock()
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            with self.__dict__['_lazy_lock']:
+                module = self.__dict__['_lazy_module']
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr: str) -> Any:
+        value = getattr(self._load(), attr)
+        # 缓存到代理自身，之后的访问不再经过 __getattr__
+        self.__dict__[attr] = value
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__['_lazy_module'] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """返回模块 name 的延迟代理；模块已导入时直接返回模块本身。"""
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    return LazyModule(name)
+
+
+def is_loaded(module: types.ModuleType) -> bool:
+    """判断 lazy_import 返回的模块是否已经真正导入。"""
+    return not isinstance(module, LazyModule) or module.__dict__['_lazy_module'] is not None
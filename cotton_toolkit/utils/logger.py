@@ -3,7 +3,7 @@
 import logging
 import queue
 import sys
-from typing import Optional
+from typing import Optional, TextIO
 
 try:
     import builtins
@@ -97,10 +97,12 @@ class ColoredFormatter(logging.Formatter):
 
 def setup_global_logger(
         log_level_str: str = "INFO",
-        log_queue: Optional[queue.Queue] = None
+        log_queue: Optional[queue.Queue] = None,
+        console_stream: Optional[TextIO] = None
 ):
     """
     设置全局统一的日志系统。
+    console_stream 为控制台日志的输出流，默认是原始 stdout；命令行模式下改为 stderr，使 stdout 只输出结果。
     """
     root_logger = logging.getLogger()
     log_level = getattr(logging, log_level_str.upper(), logging.INFO)
@@ -119,7 +121,7 @@ def setup_global_logger(
 
     # 1. 创建控制台处理器，并使用带颜色的格式化器
     console_formatter = ColoredFormatter(fmt=log_format, datefmt=date_format)
-    console_handler = logging.StreamHandler(sys.__stdout__)  # 确保输出到原始控制台
+    console_handler = logging.StreamHandler(console_stream or sys.__stdout__)  # 确保输出到原始控制台
     console_handler.setLevel(log_level)
     console_handler.setFormatter(console_formatter)
     root_logger.addHandler(console_handler)
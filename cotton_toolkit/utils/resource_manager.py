@@ -0,0 +1,186 @@
+# cotton_toolkit/utils/resource_manager.py
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Any
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.utils.resource_manager")
+
+RESOURCE_CPU = 'cpu'
+RESOURCE_IO = 'io'
+RESOURCE_NETWORK = 'network'
+RESOURCE_KINDS = (RESOURCE_CPU, RESOURCE_IO, RESOURCE_NETWORK)
+
+DEFAULT_IO_SLOTS = 8
+DEFAULT_NETWORK_SLOTS = 8
+
+# 当前线程所属的任务名称，由 pipeline_task 设置，用于在分配记录中标识占用者
+_task_context = threading.local()
+
+
+@contextmanager
+def resource_owner(name: str) -> Iterator[None]:
+    """在此上下文中申请的资源都记在 name 名下（嵌套时以最内层为准）。"""
+    previous = getattr(_task_context, 'owner', None)
+    _task_context.owner = name
+    try:
+        yield
+    finally:
+        _task_context.owner = previous
+
+
+def _current_owner() -> str:
+    return getattr(_task_context, 'owner', None) or threading.current_thread().name
+
+
+class ResourceManager:
+    """
+    进程内共享的资源槽位管理器：CPU槽位（BLAST等计算线程）、I/O槽位（数据库/文件并发读取）、
+    网络槽位（下载与AI请求）。任务按需申请，槽位不足时等待其它任务释放，
+    从而避免GUI中同时运行的多个任务（如BLAST与预处理）超额占用CPU。
+    同一线程内嵌套申请同一种资源不会重复占用，而是沿用外层已分配的数量。
+    """
+
+    def __init__(self, cpu_slots: Optional[int] = None, io_slots: int = DEFAULT_IO_SLOTS,
+                 network_slots: int = DEFAULT_NETWORK_SLOTS):
+        self._condition = threading.Condition()
+        self._capacity: Dict[str, int] = {}
+        self._in_use: Dict[str, int] = {kind: 0 for kind in RESOURCE_KINDS}
+        self._allocations: Dict[int, Dict[str, Any]] = {}
+        self._next_id = 0
+        self._held = threading.local()
+        self.configure(cpu_slots=cpu_slots, io_slots=io_slots, network_slots=network_slots)
+
+    def configure(self, cpu_slots: Optional[int] = None, io_slots: Optional[int] = None,
+                  network_slots: Optional[int] = None) -> None:
+        """更新容量；cpu_slots 为 None 时使用本机CPU核心数。已发放的槽位不受影响。"""
+        with self._condition:
+            self._capacity[RESOURCE_CPU] = max(1, cpu_slots or os.cpu_count() or 1)
+            if io_slots is not None or RESOURCE_IO not in self._capacity:
+                self._capacity[RESOURCE_IO] = max(1, io_slots or DEFAULT_IO_SLOTS)
+            if network_slots is not None or RESOURCE_NETWORK not in self._capacity:
+                self._capacity[RESOURCE_NETWORK] = max(1, network_slots or DEFAULT_NETWORK_SLOTS)
+            self._condition.notify_all()
+
+    def capacity(self, kind: str) -> int:
+        with self._condition:
+            return self._capacity[kind]
+
+    def _held_amounts(self) -> Dict[str, int]:
+        if not hasattr(self._held, 'amounts'):
+            self._held.amounts = {}
+        return self._held.amounts
+
+    @contextmanager
+    def acquire(
+            self,
+            kind: str,
+            requested: Optional[int] = None,
+            minimum: int = 1,
+            owner: Optional[str] = None,
+            check_cancel: Optional[Callable[[], bool]] = None,
+            poll_interval: float = 0.5
+    ) -> Iterator[int]:
+        """
+        申请 requested 个 kind 类槽位（None 表示该类的全部容量），产出实际分配的数量:
+        空闲槽位不少于 minimum 时立即分配 min(requested, 空闲数)，否则等待。
+        等待期间 check_cancel 返回 True 时产出 0，调用方应直接返回。
+        """
+        if kind not in RESOURCE_KINDS:
+            raise ValueError(_("未知的资源类型: {}").format(kind))
+
+        held = self._held_amounts()
+        with self._condition:
+            capacity = self._capacity[kind]
+        requested = max(1, min(requested or capacity, capacity))
+        if held.get(kind):
+            yield min(requested, held[kind])
+            return
+
+        minimum = max(1, min(minimum, requested))
+        owner = owner or _current_owner()
+        granted = 0
+        waiting_logged = False
+        with self._condition:
+            while True:
+                free = self._capacity[kind] - self._in_use[kind]
+                if free >= minimum:
+                    granted = min(requested, free)
+                    break
+                if check_cancel and check_cancel():
+                    break
+                if not waiting_logged:
+                    logger.info(_("任务 '{}' 正在等待 {} 资源（需要 {}，空闲 {}）...").format(
+                        owner, kind, minimum, max(0, free)))
+                    waiting_logged = True
+                self._condition.wait(timeout=poll_interval)
+
+            allocation_id = None
+            if granted:
+                self._in_use[kind] += granted
+                self._next_id += 1
+                allocation_id = self._next_id
+                self._allocations[allocation_id] = {'owner': owner, 'kind': kind, 'amount': granted,
+                                                    'since': time.time()}
+                logger.debug(_("已为 '{}' 分配 {} 个 {} 槽位（占用 {}/{}）。").format(
+                    owner, granted, kind, self._in_use[kind], self._capacity[kind]))
+
+        if not granted:
+            yield 0
+            return
+
+        held[kind] = granted
+        try:
+            yield granted
+        finally:
+            held.pop(kind, None)
+            with self._condition:
+                self._in_use[kind] -= granted
+                self._allocations.pop(allocation_id, None)
+                self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """返回各类资源的容量、占用及当前分配明细，供界面或日志查看。"""
+        with self._condition:
+            result = {}
+            for kind in RESOURCE_KINDS:
+                allocations: List[Dict[str, Any]] = [
+                    {'owner': a['owner'], 'amount': a['amount'], 'seconds': round(time.time() - a['since'], 1)}
+                    for a in self._allocations.values() if a['kind'] == kind]
+                result[kind] = {'capacity': self._capacity[kind], 'in_use': self._in_use[kind],
+                                'allocations': allocations}
+            return result
+
+
+_MANAGER: Optional[ResourceManager] = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_resource_manager(config: Optional[Any] = None) -> ResourceManager:
+    """
+    获取全局资源管理器。传入 MainConfig 时按其 resources 配置更新容量（未变化时不做任何事）。
+    """
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = ResourceManager()
+        if config is not None and getattr(config, 'resources', None) is not None:
+            resources = config.resources
+            wanted = (max(1, resources.cpu_slots or os.cpu_count() or 1), resources.io_slots, resources.network_slots)
+            current = (_MANAGER.capacity(RESOURCE_CPU), _MANAGER.capacity(RESOURCE_IO),
+                       _MANAGER.capacity(RESOURCE_NETWORK))
+            if wanted != current:
+                _MANAGER.configure(cpu_slots=resources.cpu_slots, io_slots=resources.io_slots,
+                                   network_slots=resources.network_slots)
+        return _MANAGER
@@ -0,0 +1,152 @@
+# cotton_toolkit/utils/sequence_io.py
+import csv
+import gzip
+import logging
+import os
+import random
+from typing import Iterable, Iterator, Tuple, Optional, TextIO
+
+from cotton_toolkit.utils.lazy_import import lazy_import
+
+
+try:
+    import builtins
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.utils.sequence_io")
+
+# Bio.SeqIO 导入较慢，只在读取序列文件时才导入
+FastaIO = lazy_import("Bio.SeqIO.FastaIO")
+QualityIO = lazy_import("Bio.SeqIO.QualityIO")
+
+FASTA_EXTENSIONS = ('.fa', '.fasta', '.fna', '.faa', '.fas')
+
+
+def infer_sequence_format(output_path: str) -> str:
+    """根据文件扩展名（忽略 .gz）推断输出格式：'fasta' 或 'csv'。"""
+    base = output_path.lower().removesuffix('.gz')
+    return 'fasta' if base.endswith(FASTA_EXTENSIONS) else 'csv'
+
+
+def open_text_output(output_path: str, encoding: str = 'utf-8') -> TextIO:
+    """打开文本输出文件，路径以 .gz 结尾时自动使用gzip压缩。"""
+    output_dir = os.path.dirname(output_path)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    if output_path.lower().endswith('.gz'):
+        return gzip.open(output_path, 'wt', encoding=encoding, newline='')
+    return open(output_path, 'w', encoding=encoding, newline='')
+
+
+def format_fasta_record(seq_id: str, sequence: str, line_width: Optional[int] = 60) -> str:
+    """将一条序列格式化为FASTA文本；line_width 为 0 或 None 时不换行。"""
+    if not line_width or len(sequence) <= line_width:
+        return f">{seq_id}\n{sequence}\n"
+    lines = [sequence[i:i + line_width] for i in range(0, len(sequence), line_width)]
+    return f">{seq_id}\n" + "\n".join(lines) + "\n"
+
+
+def write_fasta(records: Iterable[Tuple[str, str]], handle: TextIO, line_width: Optional[int] = 60) -> int:
+    """将 (id, seq) 记录逐条写入FASTA，返回写入条数。"""
+    count = 0
+    for seq_id, sequence in records:
+        handle.write(format_fasta_record(seq_id, sequence, line_width))
+        count += 1
+    return count
+
+
+def write_sequences_csv(records: Iterable[Tuple[str, str]], handle: TextIO,
+                        columns: Tuple[str, str] = ('GeneID', 'Sequence')) -> int:
+    """将 (id, seq) 记录逐行写入CSV，返回写入条数。"""
+    writer = csv.writer(handle)
+    writer.writerow(columns)
+    count = 0
+    for seq_id, sequence in records:
+        writer.writerow((seq_id, sequence))
+        count += 1
+    return count
+
+
+def write_sequences(
+        records: Iterable[Tuple[str, str]],
+        output_path: str,
+        output_format: Optional[str] = None,
+        line_width: Optional[int] = 60,
+        columns: Tuple[str, str] = ('GeneID', 'Sequence')
+) -> int:
+    """
+    将序列记录流式写入磁盘，不在内存中保留全部序列。
+    output_format 为 None 时按扩展名推断；路径以 .gz 结尾时输出gzip压缩文件。
+    返回写入条数。
+    """
+    output_format = output_format or infer_sequence_format(output_path)
+    if output_format not in ('fasta', 'csv'):
+        raise ValueError(_("不支持的输出格式: {}").format(output_format))
+
+    # CSV沿用项目中 utf-8-sig 的约定，便于Excel直接打开
+    encoding = 'utf-8-sig' if output_format == 'csv' else 'utf-8'
+    with open_text_output(output_path, encoding=encoding) as handle:
+        if output_format == 'fasta':
+            count = write_fasta(records, handle, line_width=line_width)
+        else:
+            count = write_sequences_csv(records, handle, columns=columns)
+    logger.debug(_("已写入 {} 条序列到 {}").format(count, output_path))
+    return count
+
+
+def open_text_input(input_path: str, encoding: str = 'utf-8') -> TextIO:
+    """打开文本输入文件，路径以 .gz 结尾时自动解压读取。"""
+    if input_path.lower().endswith('.gz'):
+        return gzip.open(input_path, 'rt', encoding=encoding, errors='replace')
+    return open(input_path, 'r', encoding=encoding, errors='replace')
+
+
+def detect_sequence_format(handle: TextIO) -> str:
+    """根据第一个非空行判断 'fasta' 或 'fastq'，读取后将句柄复位到开头。"""
+    sequence_format = 'fasta'
+    for line in handle:
+        if line.strip():
+            sequence_format = 'fastq' if line.startswith('@') else 'fasta'
+            break
+    handle.seek(0)
+    return sequence_format
+
+
+def iter_sequence_records(handle: TextIO, sequence_format: Optional[str] = None) -> Iterator[Tuple[str, str]]:
+    """
+    逐条读取FASTA或FASTQ记录，产出 (标题行, 序列)，内存占用与单条记录大小相当。
+    sequence_format 为 None 时自动判断。FASTQ的质量值会被丢弃。
+    """
+    sequence_format = sequence_format or detect_sequence_format(handle)
+    if sequence_format == 'fastq':
+        for title, sequence, _quality in QualityIO.FastqGeneralIterator(handle):
+            yield title, sequence
+    elif sequence_format == 'fasta':
+        yield from FastaIO.SimpleFastaParser(handle)
+    else:
+        raise ValueError(_("不支持的输入格式: {}").format(sequence_format))
+
+
+def filter_sequence_records(
+        records: Iterable[Tuple[str, str]],
+        min_length: Optional[int] = None,
+        max_length: Optional[int] = None,
+        subsample_fraction: Optional[float] = None,
+        seed: int = 0
+) -> Iterator[Tuple[str, str]]:
+    """
+    按长度过滤并按比例随机抽样（相同 seed 得到相同的抽样结果），保持原有顺序。
+    """
+    rng = random.Random(seed) if subsample_fraction is not None and subsample_fraction < 1 else None
+    for title, sequence in records:
+        length = len(sequence)
+        if min_length is not None and length < min_length:
+            continue
+        if max_length is not None and length > max_length:
+            continue
+        if rng is not None and rng.random() >= subsample_fraction:
+            continue
+        yield title, sequence
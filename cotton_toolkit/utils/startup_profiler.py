@@ -0,0 +1,193 @@
+# cotton_toolkit/utils/startup_profiler.py
+"""
+启动耗时分析：记录启动各阶段的耗时，并可按模块统计导入时间（与 python -X importtime 相同的自身/累计口径）。
+
+启用方式：设置环境变量 FCGT_PROFILE_STARTUP=1（GUI 与命令行均可），或命令行使用 fcgt --profile-startup。
+报告在窗口首次显示（或命令结束）时写入日志。
+"""
+import importlib.abc
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# 国际化函数占位符
+try:
+    import builtins
+
+    _ = builtins._
+except (AttributeError, ImportError):
+    def _(text: str) -> str:
+        return text
+
+logger = logging.getLogger("cotton_toolkit.utils.startup_profiler")
+
+PROFILE_ENV_VAR = "FCGT_PROFILE_STARTUP"
+
+
+class _TimingLoader(importlib.abc.Loader):
+    """包装原始加载器以计时；模块执行前即把 __loader__ 还原为原始加载器，不留下任何痕迹。"""
+
+    def __init__(self, loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        with self._profiler._timed_import(spec.name):
+            return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        module.__loader__ = self._loader
+        if module.__spec__ is not None:
+            module.__spec__.loader = self._loader
+        with self._profiler._timed_import(module.__name__):
+            self._loader.exec_module(module)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    """放在 sys.meta_path 最前面，把其它查找器找到的模块的加载器替换为计时包装。"""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimingLoader(spec.loader, self._profiler)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    """记录启动阶段与模块导入耗时，并生成文字报告。"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float, float]] = []
+        # 模块名 -> [自身耗时, 累计耗时]（秒）；同一模块可能分两步（create/exec）计时，故累加
+        self.imports: Dict[str, List[float]] = {}
+        self._finder: Optional[_TimingFinder] = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # --- 导入计时 ---
+
+    def start_import_timing(self) -> None:
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def stop_import_timing(self) -> None:
+        if self._finder is not None:
+            try:
+                sys.meta_path.remove(self._finder)
+            except ValueError:
+                pass
+            self._finder = None
+
+    @contextmanager
+    def _timed_import(self, name: str) -> Iterator[None]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)  # 子模块累计耗时
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with self._lock:
+                entry = self.imports.setdefault(name, [0.0, 0.0])
+                entry[0] += elapsed - children
+                entry[1] += elapsed
+
+    # --- 阶段计时 ---
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, start - self.started, time.perf_counter() - start))
+
+    def mark(self, name: str) -> None:
+        """记录一个时间点（耗时为自上一个阶段结束以来的时间）。"""
+        now = time.perf_counter() - self.started
+        last_end = max((offset + duration for _n, offset, duration in self.phases), default=0.0)
+        self.phases.append((name, last_end, now - last_end))
+
+    # --- 报告 ---
+
+    def report(self, top_n: int = 25) -> str:
+        total = time.perf_counter() - self.started
+        lines = [_("启动耗时 {:.0f} ms").format(total * 1000), _("阶段:")]
+        for name, offset, duration in self.phases:
+            lines.append("  {:>8.0f} ms  +{:>7.0f} ms  {}".format(offset * 1000, duration * 1000, name))
+        if self.imports:
+            with self._lock:
+                # 只列出累计耗时最多的模块，避免报告过长
+                ranked = sorted(self.imports.items(), key=lambda item: item[1][1], reverse=True)[:top_n]
+            lines.append(_("导入耗时最多的模块（自身 | 累计）:"))
+            for name, (self_time, cumulative) in ranked:
+                lines.append("  {:>8.0f} | {:>8.0f} ms  {}".format(self_time * 1000, cumulative * 1000, name))
+        return "\n".join(lines)
+
+    def log_report(self, top_n: int = 25) -> str:
+        text = self.report(top_n)
+        logger.info(text)
+        return text
+
+
+_PROFILER: Optional[StartupProfiler] = None
+
+
+def startup_profiling_requested() -> bool:
+    return os.environ.get(PROFILE_ENV_VAR, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def start_startup_profiler(time_imports: bool = True) -> StartupProfiler:
+    """创建（或返回已有的）全局启动分析器，并按需开始统计导入耗时。应尽早调用。"""
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = StartupProfiler()
+        if time_imports:
+            _PROFILER.start_import_timing()
+    return _PROFILER
+
+
+def get_startup_profiler() -> Optional[StartupProfiler]:
+    """未启用启动分析时返回 None。"""
+    return _PROFILER
+
+
+@contextmanager
+def startup_phase(name: str) -> Iterator[None]:
+    """未启用启动分析时不做任何事的阶段计时。"""
+    if _PROFILER is None:
+        yield
+    else:
+        with _PROFILER.phase(name):
+            yield
+
+
+def finish_startup_profiler(top_n: int = 25) -> Optional[str]:
+    """停止导入计时并输出报告；未启用时返回 None。"""
+    global _PROFILER
+    profiler = _PROFILER
+    if profiler is None:
+        return None
+    profiler.stop_import_timing()
+    profiler.mark(_("启动完成"))
+    _PROFILER = None
+    return profiler.log_report(top_n)
@@ -3,15 +3,26 @@
 import builtins
 import json
 import logging
+import multiprocessing
 import os
 import sys
 import traceback
 import tkinter as tk
 from tkinter import messagebox
-import webbrowser
 
 import yaml
 
+# 启动耗时分析需在导入其它模块之前开启（设置环境变量 FCGT_PROFILE_STARTUP=1）
+from cotton_toolkit.utils.startup_profiler import (
+    finish_startup_profiler,
+    start_startup_profiler,
+    startup_phase,
+    startup_profiling_requested,
+)
+
+if startup_profiling_requested():
+    start_startup_profiler()
+
 from cotton_toolkit.config.compatibility_check import check_config_compatibility, MainConfig
 
 
@@ -51,54 +62,17 @@ def main():
     主函数，用于设置环境、创建并运行应用实例。
     """
     # 将模块导入移动到函数内部，以控制加载顺序
-    import subprocess
     from cotton_toolkit.config.loader import load_config
+    from cotton_toolkit.utils.dependency_probe import get_dependency_probe
     from cotton_toolkit.utils.localization import setup_localization
     from cotton_toolkit.utils.logger import setup_global_logger
 
     # 在UI完全启动前，使用基本的日志记录
     setup_global_logger(log_level_str="INFO")
 
-    # --- 步骤 1: 检查BLAST+是否已安装并可用 ---
-    try:
-        # 尝试运行一个简单的BLAST+命令来检查其是否存在于系统PATH中
-        startupinfo = None
-        if sys.platform == "win32":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-
-        subprocess.run(['makeblastdb', '-version'], capture_output=True, check=True, startupinfo=startupinfo)
-        logging.info("BLAST+ installation check passed.")
-    except (FileNotFoundError, subprocess.CalledProcessError):
-
-        temp_root = tk.Tk()
-        temp_root.withdraw()
-
-        # BLAST+ 官方下载地址
-        BLAST_URL = "https://ftp.ncbi.nlm.nih.gov/blast/executables/blast+/LATEST/"
-
-        message_text = (
-            "Error: The BLAST+ command could not be found.\n\n"
-            "Some features of FCGT (including but not limited to local BLAST) rely on the NCBI BLAST+ suite. "
-            "Please ensure it is installed and added to your system's PATH environment variable.\n\n"
-            "Do you want to open the download page in your browser now?"
-        )
-
-
-        should_open_browser = messagebox.askyesno(
-            title="Dependency Missing",
-            message=message_text,
-            parent=temp_root
-        )
-
-        temp_root.destroy()
-
-        if should_open_browser:
-            # 如果用户点击“是”，则打开浏览器
-            webbrowser.open(BLAST_URL)
-
-        # 无论用户选择什么，程序都将退出
-        sys.exit(1)
+    # --- 步骤 1: 在后台检测 BLAST+ 等外部依赖 ---
+    # 结果带缓存且不阻塞启动；缺少依赖时主窗口只禁用相关功能（见 CottonToolkitApp.apply_dependency_status）
+    get_dependency_probe()
 
     # --- 步骤 2: 在创建UI前，加载配置并确定语言 ---
     DEFAULT_LANGUAGE = 'en'
@@ -107,7 +81,8 @@ def main():
 
     try:
         if os.path.exists(DEFAULT_CONFIG_PATH):
-            config = load_config(DEFAULT_CONFIG_PATH)
+            with startup_phase("load config"):
+                config = load_config(DEFAULT_CONFIG_PATH)
 
             lang_code = getattr(config, 'i18n_language', DEFAULT_LANGUAGE)
             logging.info(f"Config file loaded. Startup language set to '{lang_code}'.")
@@ -136,18 +111,25 @@ def main():
         show_uncaught_exception(*sys.exc_info())
 
     # --- 步骤 3: 使用获取到的语言代码，初始化翻译功能 ---
-    translator = setup_localization(lang_code)
-    builtins._ = translator
+    with startup_phase("localization"):
+        translator = setup_localization(lang_code)
+        builtins._ = translator
 
-    from ui.gui_app import CottonToolkitApp
+    with startup_phase("import ui"):
+        from ui.gui_app import CottonToolkitApp
 
     # --- 步骤 4: 启动主应用，并注入 translator ---
     try:
-        app = CottonToolkitApp(translator=translator)
+        with startup_phase("create main window"):
+            app = CottonToolkitApp(translator=translator)
+        # 窗口第一次空闲（已显示）时输出启动耗时报告；未开启分析时什么也不做
+        app.after_idle(finish_startup_profiler)
         app.mainloop()
     except Exception:
         show_uncaught_exception(*sys.exc_info())
 
 
 if __name__ == "__main__":
+    # 打包后的程序中，BLAST分片进程池需要此调用才能正确启动子进程
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
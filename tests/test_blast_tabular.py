@@ -0,0 +1,33 @@
+import pandas as pd
+
+from cotton_toolkit.pipelines.blast import _parse_tabular_blast_output
+
+
+def _write_rows(path, rows):
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write('\t'.join(str(v) for v in row) + '\n')
+
+
+def test_hash_and_quote_in_subject_title_are_kept(tmp_path):
+    tabular = tmp_path / 'hits.tsv'
+    _write_rows(tabular, [
+        ['GhA01G0001', 300, 'GhD01G0001', 'GhD01G0001 kinase #2 "putative"', 310,
+         1e-50, 200.5, 95, 97, 0, 100, 1, 100, 201, 300],
+        ['GhA01G0002', 150, 'gnl|BL_ORD_ID|7', 'GhD01G0002 hypothetical', 160,
+         2e-10, 80.0, 40, 45, 2, 50, 60, 11, 150, 101],
+    ])
+
+    df = _parse_tabular_blast_output(str(tabular), 'blastn', include_alignments=False)
+
+    assert len(df) == 2
+    first, second = df.iloc[0], df.iloc[1]
+    assert first['Hit_ID'] == 'GhD01G0001'
+    assert first['Hit_Description'] == 'kinase #2 "putative"'
+    assert first['Hit_End'] == 300
+    assert first['Identity (%)'] == 95.0
+    # 未 -parse_seqids 建库时以标题第一个词作为ID；反向比对给出负链
+    assert second['Hit_ID'] == 'GhD01G0002'
+    assert second['Hit_Description'] == 'hypothetical'
+    assert (second['Query_Start'], second['Query_End'], second['Query_Strand']) == (10, 60, -1)
+    assert pd.api.types.is_integer_dtype(df['Hit_Length'])
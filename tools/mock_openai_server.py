@@ -0,0 +1,210 @@
+# tools/mock_openai_server.py
+"""
+本地模拟的 OpenAI 兼容服务，用于在不消耗真实额度的情况下调试AI批处理（限流、重试、并发）。
+
+用法:
+    python tools/mock_openai_server.py --port 8765 --rpm 120 --latency 0.2 --error-rate 0.05
+
+然后在配置中使用 openai_compatible 服务商，base_url 设为 http://127.0.0.1:8765/v1，API Key 任意。
+也可以在脚本中调用 start_mock_server() 在后台线程启动。
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+
+
+class MockOpenAIState:
+    """服务端行为参数与统计。"""
+
+    def __init__(self, rpm: Optional[int] = None, latency: float = 0.0, error_rate: float = 0.0,
+                 retry_after: Optional[float] = None, malformed_rate: float = 0.0, seed: Optional[int] = None):
+        self.rpm = rpm
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.malformed_rate = malformed_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_times = deque()
+        self.total_requests = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def admit(self) -> Tuple[int, Optional[float]]:
+        """返回 (状态码, Retry-After秒数)；200 表示正常处理。"""
+        now = time.monotonic()
+        with self.lock:
+            self.total_requests += 1
+            if self.rpm:
+                while self.request_times and now - self.request_times[0] >= 60:
+                    self.request_times.popleft()
+                if len(self.request_times) >= self.rpm:
+                    self.rate_limited += 1
+                    wait = self.retry_after if self.retry_after is not None else 60 - (now - self.request_times[0])
+                    return 429, max(0.0, wait)
+                self.request_times.append(now)
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.errors += 1
+                return 503, None
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return 200, None
+
+    def finish(self) -> None:
+        with self.lock:
+            self.in_flight -= 1
+
+
+PACKED_PROMPT_PATTERN = re.compile(r"JSON array of (\d+) independent items")
+
+
+def make_reply(prompt: str, malformed: bool = False) -> str:
+    """
+    确定性的模拟回复：取提示词最后一行并加上前缀，便于核对结果与输入的对应关系。
+    打包请求（JSON数组输入）按条回复等长的JSON数组；malformed 为 True 时故意少回一条。
+    """
+    if PACKED_PROMPT_PATTERN.search(prompt):
+        start = prompt.find('[')
+        items, _end = json.JSONDecoder().raw_decode(prompt[start:])
+        replies = [f"[mock] {item}" for item in items]
+        if malformed:
+            replies = replies[:-1]
+        return "```json\n" + json.dumps(replies, ensure_ascii=False) + "\n```"
+    last_line = prompt.strip().splitlines()[-1] if prompt.strip() else ""
+    return f"[mock] {last_line}"
+
+
+def _make_handler(state: MockOpenAIState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, body: dict, headers: Optional[dict] = None):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(self, model: str, reply: str, usage: Optional[dict]):
+            """以 SSE 分块发送回复（每块约8个字符），最后按需附带用量块。"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send_event(data: str):
+                raw = f"data: {data}\n\n".encode('utf-8')
+                self.wfile.write(f"{len(raw):X}\r\n".encode('ascii') + raw + b"\r\n")
+
+            for start in range(0, len(reply), 8):
+                send_event(json.dumps({"object": "chat.completion.chunk", "model": model, "choices": [
+                    {"index": 0, "delta": {"content": reply[start:start + 8]}, "finish_reason": None}]}))
+                if state.latency:
+                    time.sleep(state.latency / 10)
+            if usage:
+                send_event(json.dumps({"object": "chat.completion.chunk", "model": model, "choices": [],
+                                       "usage": usage}))
+            send_event("[DONE]")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_GET(self):
+            if self.path.rstrip('/').endswith('/models'):
+                self._send_json(200, {"object": "list", "data": [{"id": "mock-model", "object": "model"}]})
+            else:
+                self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if not self.path.rstrip('/').endswith('/chat/completions'):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+
+            status, retry_after = state.admit()
+            if status == 429:
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                headers={"Retry-After": f"{retry_after:.2f}"})
+                return
+            if status != 200:
+                self._send_json(status, {"error": {"message": "Service temporarily unavailable"}})
+                return
+
+            try:
+                if state.latency:
+                    time.sleep(state.latency)
+                prompt = "\n".join(m.get("content", "") for m in payload.get("messages", []))
+                with state.lock:
+                    malformed = bool(state.malformed_rate) and state.random.random() < state.malformed_rate
+                reply = make_reply(prompt, malformed)
+                prompt_tokens, completion_tokens = max(1, len(prompt) // 4), max(1, len(reply) // 4)
+                usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                         "total_tokens": prompt_tokens + completion_tokens}
+                if payload.get("stream"):
+                    include_usage = (payload.get("stream_options") or {}).get("include_usage", False)
+                    self._send_stream(payload.get("model", "mock-model"), reply, usage if include_usage else None)
+                    return
+                self._send_json(200, {
+                    "id": f"chatcmpl-mock-{state.total_requests}",
+                    "object": "chat.completion",
+                    "model": payload.get("model", "mock-model"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                                 "finish_reason": "stop"}],
+                    "usage": usage,
+                })
+            finally:
+                state.finish()
+
+    return Handler
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **options) -> Tuple[ThreadingHTTPServer, MockOpenAIState]:
+    """在后台线程启动模拟服务，返回 (server, state)；port=0 时自动选择空闲端口（见 server.server_port）。"""
+    state = MockOpenAIState(**options)
+    server = ThreadingHTTPServer((host, port), _make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rpm", type=int, default=None, help="requests per minute before returning 429")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to sleep per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--retry-after", type=float, default=None, help="fixed Retry-After value for 429 replies")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="fraction of batched (JSON array) replies returned with a missing item")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, state = start_mock_server(args.host, args.port, rpm=args.rpm, latency=args.latency,
+                                      error_rate=args.error_rate, retry_after=args.retry_after,
+                                      malformed_rate=args.malformed_rate, seed=args.seed)
+    print(f"Mock OpenAI server listening on http://{args.host}:{server.server_port}/v1 (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"requests={state.total_requests} rate_limited={state.rate_limited} "
+                  f"errors={state.errors} max_in_flight={state.max_in_flight}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,14 @@
 ﻿import os
 
 from .dialogs import MessageDialog,ProgressDialog
-from .tabs.annotation_tab import AnnotationTab
+
+
+def __getattr__(name: str):
+    # AnnotationTab 按需导入，避免导入 ui 包时就加载全部流水线
+    if name == "AnnotationTab":
+        from .tabs import AnnotationTab
+        return AnnotationTab
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_persistent_settings_path():
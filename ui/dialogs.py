@@ -9,6 +9,8 @@ import ttkbootstrap as ttkb
 from ttkbootstrap.constants import *
 from typing import Optional, List, Callable
 
+from cotton_toolkit.utils.job_queue import JOB_CANCELLED, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+
 # 全局翻译函数占位符
 try:
     from builtins import _
@@ -172,7 +174,8 @@ class MessageDialog(ttkb.Toplevel):
 class ProgressDialog(ttkb.Toplevel):
     """任务进度弹窗。"""
 
-    def __init__(self, parent, title: str, on_cancel: Optional[Callable] = None, style=None):
+    def __init__(self, parent, title: str, on_cancel: Optional[Callable] = None, style=None,
+                 on_background: Optional[Callable] = None):
         super().__init__(parent)
         self.title(title)
         self.transient(parent)
@@ -180,6 +183,7 @@ class ProgressDialog(ttkb.Toplevel):
         self.focus_set()
         self.resizable(False, False)
         self.on_cancel_callback = on_cancel
+        self.on_background_callback = on_background
         self.creation_time = time.time()
 
         main_frame = ttkb.Frame(self, padding=(30, 25))
@@ -193,10 +197,17 @@ class ProgressDialog(ttkb.Toplevel):
         self.progress_bar = ttkb.Progressbar(main_frame, length=400, mode='determinate', bootstyle="info-striped")
         self.progress_bar.grid(row=1, column=0, pady=10, padx=10, sticky="ew")
 
+        buttons_frame = ttkb.Frame(main_frame)
+        buttons_frame.grid(row=2, column=0, pady=(10, 0))
+        if on_background:
+            # 关闭弹窗但任务继续运行，以便继续提交其它任务
+            background_button = ttkb.Button(buttons_frame, text=_("后台运行"), command=self.on_background_button,
+                                            bootstyle="info-outline")
+            background_button.pack(side="left", padx=5)
         if on_cancel:
-            cancel_button = ttkb.Button(main_frame, text=_("取消"), command=self.on_close_button,
+            cancel_button = ttkb.Button(buttons_frame, text=_("取消"), command=self.on_close_button,
                                         bootstyle="danger-outline")
-            cancel_button.grid(row=2, column=0, pady=(10, 0))
+            cancel_button.pack(side="left", padx=5)
 
         self.protocol("WM_DELETE_WINDOW", self.on_close_button)
         self.bind("<Escape>", lambda e: self.on_close_button() if on_cancel else None)
@@ -223,6 +234,11 @@ class ProgressDialog(ttkb.Toplevel):
             self.on_cancel_callback()
         self.destroy()
 
+    def on_background_button(self):
+        if self.on_background_callback:
+            self.on_background_callback()
+        self.destroy()
+
     def close(self):
         if self.winfo_exists():
             self.destroy()
@@ -366,3 +382,156 @@ class FirstLaunchDialog(ttkb.Toplevel):
 
     def _on_close(self):
         self.destroy()
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+class JobQueueDialog(ttkb.Toplevel):
+    """
+    任务队列窗口（非模态）：查看、取消和提前排队中的任务，并按时间段查看历史任务的吞吐量。
+    """
+
+    REFRESH_INTERVAL_MS = 1000
+    THROUGHPUT_DAYS = 30
+
+    def __init__(self, parent, job_queue, history=None, translator: Optional[Callable[[str], str]] = None):
+        super().__init__(parent)
+        self._ = translator or _
+        self.job_queue = job_queue
+        self.history = history
+        self.title(self._("任务队列"))
+        self.transient(parent)
+        self.geometry("960x560")
+
+        self.state_names = {
+            JOB_QUEUED: self._("排队中"), JOB_RUNNING: self._("运行中"), JOB_SUCCEEDED: self._("完成"),
+            JOB_FAILED: self._("失败"), JOB_CANCELLED: self._("已取消"),
+        }
+        self.bucket_names = {self._("按小时"): 'hour', self._("按天"): 'day', self._("按周"): 'week',
+                             self._("按月"): 'month'}
+
+        notebook = ttkb.Notebook(self)
+        notebook.pack(fill=BOTH, expand=True, padx=10, pady=10)
+        notebook.add(self._create_jobs_page(notebook), text=self._("当前任务"))
+        notebook.add(self._create_history_page(notebook), text=self._("历史与吞吐量"))
+
+        self.refresh()
+        self.refresh_history()
+        self._schedule_refresh()
+
+    def _create_tree(self, parent, columns: List[tuple]) -> ttkb.Treeview:
+        container = ttkb.Frame(parent)
+        container.pack(fill=BOTH, expand=True)
+        tree = ttkb.Treeview(container, columns=[c[0] for c in columns], show="headings", height=12)
+        for key, heading, width in columns:
+            tree.heading(key, text=heading)
+            tree.column(key, width=width, anchor="w" if key in ('name', 'task', 'message') else "center")
+        scrollbar = ttkb.Scrollbar(container, orient="vertical", command=tree.yview, bootstyle="round")
+        tree.configure(yscrollcommand=scrollbar.set)
+        tree.pack(side="left", fill=BOTH, expand=True)
+        scrollbar.pack(side="right", fill="y")
+        return tree
+
+    def _create_jobs_page(self, parent) -> ttkb.Frame:
+        _ = self._
+        page = ttkb.Frame(parent, padding=10)
+        self.jobs_tree = self._create_tree(page, [
+            ('id', "#", 40), ('name', _("任务"), 200), ('state', _("状态"), 80), ('priority', _("优先级"), 60),
+            ('progress', _("进度"), 60), ('wait', _("排队"), 80), ('run', _("运行"), 80),
+            ('message', _("最新消息"), 320),
+        ])
+        buttons = ttkb.Frame(page)
+        buttons.pack(fill="x", pady=(10, 0))
+        ttkb.Button(buttons, text=_("优先运行"), command=self._prioritize_selected,
+                    bootstyle="info-outline").pack(side="left", padx=(0, 10))
+        ttkb.Button(buttons, text=_("取消所选"), command=self._cancel_selected,
+                    bootstyle="danger-outline").pack(side="left")
+        self.summary_var = tk.StringVar()
+        ttkb.Label(buttons, textvariable=self.summary_var, bootstyle="secondary").pack(side="right")
+        return page
+
+    def _create_history_page(self, parent) -> ttkb.Frame:
+        _ = self._
+        page = ttkb.Frame(parent, padding=10)
+        controls = ttkb.Frame(page)
+        controls.pack(fill="x", pady=(0, 10))
+        self.bucket_var = tk.StringVar(value=_("按天"))
+        ttkb.Combobox(controls, textvariable=self.bucket_var, values=list(self.bucket_names), state="readonly",
+                      width=10).pack(side="left")
+        self.bucket_var.trace_add("write", lambda *args: self.refresh_history())
+        ttkb.Button(controls, text=_("刷新"), command=self.refresh_history,
+                    bootstyle="info-outline").pack(side="left", padx=10)
+        self.history_summary_var = tk.StringVar()
+        ttkb.Label(controls, textvariable=self.history_summary_var, bootstyle="secondary").pack(side="right")
+        self.history_tree = self._create_tree(page, [
+            ('period', _("时间段"), 130), ('task', _("任务"), 220), ('jobs', _("任务数"), 70),
+            ('succeeded', _("成功"), 60), ('failed', _("失败"), 60), ('cancelled', _("取消"), 60),
+            ('mean_run', _("平均运行"), 90), ('total_run', _("总运行"), 90), ('mean_wait', _("平均排队"), 90),
+        ])
+        return page
+
+    def _selected_job_ids(self) -> List[int]:
+        return [int(item) for item in self.jobs_tree.selection()]
+
+    def _cancel_selected(self):
+        for job_id in self._selected_job_ids():
+            self.job_queue.cancel(job_id)
+        self.refresh()
+
+    def _prioritize_selected(self):
+        # 设为比当前所有排队任务都高的优先级
+        top = max((job.priority for job in self.job_queue.queued_jobs()), default=0)
+        for job_id in self._selected_job_ids():
+            self.job_queue.set_priority(job_id, top + 1)
+        self.refresh()
+
+    def _schedule_refresh(self):
+        if self.winfo_exists():
+            self.refresh()
+            self.after(self.REFRESH_INTERVAL_MS, self._schedule_refresh)
+
+    def refresh(self):
+        """刷新当前任务列表（保留选中项）。运行中与排队中的任务排在前面。"""
+        if not self.winfo_exists():
+            return
+        active = self.job_queue.active_jobs()
+        active_ids = {job.job_id for job in active}
+        finished = [job for job in reversed(self.job_queue.jobs()) if job.job_id not in active_ids]
+        selection = set(self.jobs_tree.selection())
+        self.jobs_tree.delete(*self.jobs_tree.get_children())
+        for job in active + finished:
+            progress = f"{job.progress:.0f}%" if job.state == JOB_RUNNING else "-"
+            values = (job.job_id, job.name, self.state_names.get(job.state, job.state), job.priority, progress,
+                      _format_seconds(job.wait_seconds), _format_seconds(job.run_seconds), job.message)
+            self.jobs_tree.insert("", "end", iid=str(job.job_id), values=values)
+        self.jobs_tree.selection_set([iid for iid in selection if self.jobs_tree.exists(iid)])
+        running = sum(1 for job in active if job.state == JOB_RUNNING)
+        self.summary_var.set(self._("运行 {} / 排队 {}（最多同时运行 {} 个）").format(
+            running, len(active) - running, self.job_queue.max_concurrent))
+
+    def refresh_history(self):
+        if not self.winfo_exists():
+            return
+        self.history_tree.delete(*self.history_tree.get_children())
+        if self.history is None:
+            self.history_summary_var.set(self._("任务历史不可用。"))
+            return
+        since = time.time() - self.THROUGHPUT_DAYS * 86400
+        rows = self.history.throughput(self.bucket_names.get(self.bucket_var.get(), 'day'), since=since)
+        for row in reversed(rows):
+            self.history_tree.insert("", "end", values=(
+                row['period'], row['task_key'], row['jobs'], row['succeeded'], row['failed'], row['cancelled'],
+                _format_seconds(row['mean_run_seconds']), _format_seconds(row['total_run_seconds']),
+                _format_seconds(row['mean_wait_seconds'])))
+        total_jobs = sum(row['jobs'] for row in rows)
+        total_run = sum(row['total_run_seconds'] or 0 for row in rows)
+        self.history_summary_var.set(self._("最近 {} 天: {} 个任务，共运行 {}").format(
+            self.THROUGHPUT_DAYS, total_jobs, _format_seconds(total_run)))
@@ -2,6 +2,7 @@
 
 import logging
 import os
+import sqlite3
 import threading
 import traceback
 import webbrowser
@@ -17,8 +18,10 @@ from cotton_toolkit.config.loader import load_config, save_config, generate_defa
     get_genome_data_sources
 from cotton_toolkit.core.ai_wrapper import AIWrapper
 from cotton_toolkit.utils.localization import setup_localization
-from .dialogs import MessageDialog, ConfirmationDialog
+from .dialogs import MessageDialog, ConfirmationDialog, JobQueueDialog
 from cotton_toolkit.utils.gene_utils import identify_genome_from_gene_ids
+from cotton_toolkit.utils.job_queue import JobQueue, JobHistory, Job, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, \
+    JOB_FAILED, JOB_CANCELLED
 
 if TYPE_CHECKING:
     from .gui_app import CottonToolkitApp
@@ -41,6 +44,15 @@ class EventHandler:
         self.message_handlers = self._initialize_message_handlers()
         self.last_ambiguity_text: str = ""
 
+        # 任务队列：任务在后台线程中运行，状态变化通过 message_queue 回到主线程处理
+        self.job_history: Optional[JobHistory] = self._open_job_history()
+        self.job_queue = JobQueue(history=self.job_history, listener=self._on_job_event)
+        self.foreground_job_id: Optional[int] = None  # 当前显示进度对话框的任务
+        self.job_queue_window: Optional[JobQueueDialog] = None
+        self._job_success_callbacks: Dict[int, Callable] = {}
+        self._notify_job_ids = set()  # 结束时需要弹窗提示结果的任务（未转入后台的任务）
+        self._pending_progress_ids = set()  # 已投递、尚未处理的进度事件，用于合并高频进度更新
+
     def _initialize_message_handlers(self) -> Dict[str, Callable]:
         """
         【修改】增加对新消息类型的处理。
@@ -60,6 +72,8 @@ class EventHandler:
             "show_progress_dialog": self.ui_manager._show_progress_dialog,
             "hide_progress_dialog": self.ui_manager._hide_progress_dialog,
             "auto_identify_success": self._handle_auto_identify_result,
+            "dependencies_probed": self.app.apply_dependency_status,
+            "job_event": self._handle_job_event,
 
         }
         return handlers
@@ -112,16 +126,20 @@ class EventHandler:
         处理主窗口关闭事件，增加退出确认。
         """
         _ = self.app._
+        running_names = [job.name for job in self.job_queue.active_jobs()]
         if self.app.active_task_name:
+            running_names.insert(0, self.app.active_task_name)
+        if running_names:
             dialog = ConfirmationDialog(
                 parent=self.app,
                 title=_("确认退出"),
-                message=_("任务'{}'正在运行中，确定要强制退出吗？").format(self.app.active_task_name),
+                message=_("任务'{}'正在运行中，确定要强制退出吗？").format("、".join(running_names)),
                 button1_text=_("强制退出"),
                 button2_text=_("取消")
             )
             if dialog.result is True:
                 self.app.cancel_current_task_event.set()
+                self.job_queue.cancel_all()
                 self.app.destroy()
         else:
             dialog = ConfirmationDialog(
@@ -184,32 +202,13 @@ class EventHandler:
             app.message_queue.put(("progress", (100, app._("初始化完成。"))))
             app.message_queue.put(("hide_progress_dialog", None))
 
-    def _cancel_and_cleanup_task(self):
-        """
-        立即取消任务并清理UI，不再等待后台线程的确认。
-        """
-        _ = self.app._
-        logger.warning(_("用户请求取消当前任务..."))
-
-        # 1. 向后台线程发送取消信号（尽力而为）
-        self.app.cancel_current_task_event.set()
-
-        # 2. 核心：不等后台线程响应，立即在UI层面终结任务
-        task_display_name = self.app.active_task_name or _("未知任务")
-        self.ui_manager._finalize_task_ui(
-            task_display_name=task_display_name,
-            success=False,  # 任务未成功
-            result_data="CANCELLED"  # 结果是“已取消”
-        )
-
-        logger.warning(
-            _("任务 '{}' 已被强制取消。后台线程可能会在完成最后的IO操作后悄默声地终止。").format(task_display_name)
-        )
-
     def start_task(self, task_name: str, target_func: Callable, kwargs: Dict[str, Any],
-                   on_success: Optional[Callable] = None, task_key: Optional[str] = None):
+                   on_success: Optional[Callable] = None, task_key: Optional[str] = None,
+                   priority: int = 0) -> Optional[Job]:
         """
-        启动一个后台任务，并确保所有必要的回调函数（包括自定义的 status_callback）都被正确传递。
+        将任务提交到任务队列。有空闲名额时立即运行并显示进度对话框（可点击“后台运行”转入后台），
+        否则排队等待，结果在任务结束时写入日志和状态栏。
+        选项卡传入的 cancel_event / progress_callback 会被替换为该任务专属的版本。
         """
         app = self.app
         _ = self.app._
@@ -217,63 +216,122 @@ class EventHandler:
             app.ui_manager.show_warning_message(_("任务进行中"),
                                                 _("任务 '{}' 正在运行中，请等待其完成后再开始新任务。").format(
                                                     app.active_task_name))
-            return
+            return None
 
         if task_key is None:
             task_key = task_name
+        if app.current_config is not None:
+            self.job_queue.set_max_concurrent(app.current_config.resources.max_concurrent_jobs)
+
+        job_kwargs = kwargs.copy()
+        job_kwargs.pop('cancel_event', None)
+        job_kwargs.pop('progress_callback', None)
+        job = self.job_queue.submit(task_name, target_func, job_kwargs, priority=priority, task_key=task_key)
+        if on_success:
+            self._job_success_callbacks[job.job_id] = on_success
+
+        if job.state == JOB_RUNNING and self.foreground_job_id is None:
+            self.foreground_job_id = job.job_id
+            self._notify_job_ids.add(job.job_id)
+            self.ui_manager._show_progress_dialog({"title": task_name, "message": _("正在处理..."),
+                                                   "on_cancel": lambda: self.cancel_job(job.job_id),
+                                                   "on_background": self._send_job_to_background})
+        else:
+            # 选项卡在提交前打开的进度对话框此时不再需要
+            self.ui_manager._hide_progress_dialog()
+            if job.state == JOB_QUEUED:
+                position = [queued.job_id for queued in self.job_queue.queued_jobs()].index(job.job_id)
+                logger.info(_("任务 '{}' 已加入队列，前面还有 {} 个任务。").format(task_name, position))
+            else:
+                logger.info(_("任务 '{}' 已在后台开始运行。").format(task_name))
 
-        app.ui_manager.update_button_states(is_task_running=True)
-        app.active_task_name = task_name
-        app.cancel_current_task_event.clear()
-        self.app.message_queue.put(("show_progress_dialog", {"title": task_name, "message": _("正在处理..."),
-                                                             "on_cancel": self._cancel_and_cleanup_task}))
-
-        # 1. 创建一个新的字典 thread_kwargs，用于传递给后台线程。
-        #    这样做可以避免直接修改原始的 kwargs 字典，是更安全的做法。
-        thread_kwargs = kwargs.copy()
-
-        # 2. 将所有标准的回调和事件添加到这个新字典中。
-        #    我们在 data_download_tab.py 中传入的 'status_callback' 已经存在于 kwargs 中，
-        #    所以 thread_kwargs.copy() 会自动包含它。
-        thread_kwargs.update({
-            'cancel_event': app.cancel_current_task_event,
-            'progress_callback': self.gui_progress_callback
-        })
-
-        # 3. 启动线程，并将这个构建好的 thread_kwargs 字典传递给包装器。
-        threading.Thread(target=self._task_wrapper, args=(target_func, thread_kwargs, task_name, task_key, on_success),
-                         daemon=True).start()
+        self._update_job_status()
+        return job
 
+    def cancel_job(self, job_id: int):
+        if job_id == self.foreground_job_id:
+            # 进度对话框会自行关闭
+            self.foreground_job_id = None
+        self.job_queue.cancel(job_id)
 
-    def _task_wrapper(self, target_func: Callable, kwargs: Dict[str, Any], task_name: str, task_key: str, on_success: Optional[Callable] = None):
-        """
-        在后台线程中执行任务的包装器。
-        (此方法无需修改，它会正确地将接收到的 kwargs 解包并传递给目标函数)
-        """
+    def _send_job_to_background(self):
         _ = self.app._
-        result = None
-        e = None
+        job = self.job_queue.get(self.foreground_job_id) if self.foreground_job_id is not None else None
+        self.foreground_job_id = None
+        if job is not None:
+            self._notify_job_ids.discard(job.job_id)
+            logger.info(_("任务 '{}' 已转入后台运行，可在任务队列中查看进度。").format(job.name))
+
+    def show_job_queue_window(self):
+        if self.job_queue_window is not None and self.job_queue_window.winfo_exists():
+            self.job_queue_window.refresh_history()
+            self.job_queue_window.lift()
+            return
+        self.job_queue_window = JobQueueDialog(self.app, self.job_queue, self.job_history,
+                                               translator=self.app._)
+
+    def _open_job_history(self) -> Optional[JobHistory]:
         try:
-            # kwargs 字典在这里被解包，所有回调函数 (progress_callback, status_callback, cancel_event)
-            # 都会被作为命名参数传递给 target_func (例如 run_preprocess_annotation_files)
-            result = target_func(**kwargs)
-            if on_success and not self.app.cancel_current_task_event.is_set():
-                self.app.after(0, on_success, result)
-        except Exception as exc:
-            e = exc
-            logger.error(_("任务 '{}' 发生错误: {}").format(task_name, exc))
-        finally:
-            final_data = None
-            if self.app.cancel_current_task_event.is_set():
-                final_data = (False, task_name, "CANCELLED", task_key)
-            elif e:
-                final_data = (False, task_name, e, task_key)
-            else:
-                final_data = (True, task_name, result, task_key)
+            return JobHistory()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(_("无法打开任务历史库，本次运行将不记录任务历史: {}").format(e))
+            return None
+
+    def _on_job_event(self, event: str, job: Job):
+        """由任务线程调用，只负责把事件转交给主线程。"""
+        if event == 'progress':
+            if job.job_id in self._pending_progress_ids:
+                return
+            self._pending_progress_ids.add(job.job_id)
+        self.app.message_queue.put(("job_event", (event, job)))
+
+    def _handle_job_event(self, data: tuple):
+        event, job = data
+        if event == 'progress':
+            self._pending_progress_ids.discard(job.job_id)
+            if job.job_id == self.foreground_job_id:
+                self._handle_progress((job.progress, job.message))
+            return
 
-            if final_data:
-                self.app.message_queue.put(("task_done", final_data))
+        if event == 'finished':
+            self._handle_job_finished(job)
+        self._update_job_status()
+
+    def _handle_job_finished(self, job: Job):
+        if job.job_id == self.foreground_job_id:
+            self.foreground_job_id = None
+            self.ui_manager._hide_progress_dialog()
+        notify = job.job_id in self._notify_job_ids
+        self._notify_job_ids.discard(job.job_id)
+
+        on_success = self._job_success_callbacks.pop(job.job_id, None)
+        if job.state == JOB_SUCCEEDED and on_success:
+            on_success(job.result)
+
+        if job.state == JOB_CANCELLED:
+            success, result_data = False, "CANCELLED"
+        elif job.state == JOB_FAILED:
+            success, result_data = False, job.error
+        else:
+            success, result_data = True, job.result
+        self.ui_manager.show_task_result(job.name, success, result_data, notify=notify)
+        self._after_task_done(success, job.name, result_data, job.task_key)
 
+        if self.job_queue_window is not None and self.job_queue_window.winfo_exists():
+            self.job_queue_window.refresh_history()
+
+    def _update_job_status(self):
+        """刷新状态栏中的任务队列按钮、各按钮状态以及任务队列窗口。"""
+        app = self.app
+        _ = app._
+        running, queued = len(self.job_queue.running_jobs()), len(self.job_queue.queued_jobs())
+        if running or queued:
+            app.job_status_var.set(_("任务队列（运行 {} / 排队 {}）").format(running, queued))
+        else:
+            app.job_status_var.set(_("任务队列"))
+        self.ui_manager.update_button_states(is_task_running=app.active_task_name is not None)
+        if self.job_queue_window is not None and self.job_queue_window.winfo_exists():
+            self.job_queue_window.refresh()
 
     def _handle_startup_complete(self, data: dict):
         app = self.app
@@ -399,7 +457,12 @@ class EventHandler:
         success, task_display_name, result_data, task_key = data
 
         app.ui_manager._finalize_task_ui(task_display_name, success, result_data)
+        self._after_task_done(success, task_display_name, result_data, task_key)
 
+    def _after_task_done(self, success: bool, task_display_name: str, result_data: Any, task_key: str):
+        """任务结束后的后续动作：自动加载新生成的配置、刷新数据下载选项卡等。"""
+        app = self.app
+        _ = self.app._
         if success and isinstance(result_data, dict) and result_data.get('action') == 'load_new_config':
             new_cfg_path = result_data.get('path')
             if new_cfg_path:
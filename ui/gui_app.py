@@ -9,7 +9,7 @@ import threading
 import traceback
 from queue import Queue
 from tkinter import font as tkfont
-from typing import Optional, Dict, Any, Callable
+from typing import Optional, Dict, Any, Callable, List
 import tkinter as tk
 import ttkbootstrap as ttkb
 import json
@@ -24,13 +24,13 @@ except ImportError:
 
 from cotton_toolkit.config.loader import save_config, load_config
 from cotton_toolkit.config.models import MainConfig
+from cotton_toolkit.utils.dependency_probe import (FEATURES, find_unavailable_features,
+                                                   format_missing_dependencies, get_dependency_probe)
 from cotton_toolkit.utils.logger import setup_global_logger
+from cotton_toolkit.utils.startup_profiler import startup_phase
 from ui.event_handler import EventHandler
 from ui.ui_manager import UIManager, determine_initial_theme
-from ui.tabs import (
-    AIAssistantTab, DataDownloadTab, AnnotationTab, EnrichmentTab, SequenceExtractionTab,
-    GenomeIdentifierTab, GFFQueryTab, HomologyTab, LocusConversionTab, BlastTab, ArabidopsisHomologyConversionTab
-)
+from ui import tabs as tool_tabs
 
 try:
     from builtins import _
@@ -56,6 +56,21 @@ class CottonToolkitApp(ttkb.Window):
         "blast", "ai_assistant",
     ]
 
+    # 选项卡类名；类在第一次打开对应工具页时才从 ui.tabs 导入并实例化
+    TOOL_TAB_CLASSES = {
+        "download": "DataDownloadTab",
+        "annotation": "AnnotationTab",
+        "sequence_extraction": "SequenceExtractionTab",
+        "enrichment": "EnrichmentTab",
+        "genome_identifier": "GenomeIdentifierTab",
+        "homology": "HomologyTab",
+        "arabidopsis_conversion": "ArabidopsisHomologyConversionTab",
+        "locus_conversion": "LocusConversionTab",
+        "gff_query": "GFFQueryTab",
+        "blast": "BlastTab",
+        "ai_assistant": "AIAssistantTab",
+    }
+
     @property
     def TAB_TITLE_KEYS(self):
         return {
@@ -136,7 +151,11 @@ class CottonToolkitApp(ttkb.Window):
         self.ui_settings = {}
         self.tool_tab_instances = {}
         self.tool_buttons = {}
+        # 功能 -> 缺少的依赖，由后台依赖检测结果填充
+        self.unavailable_features: Dict[str, List[str]] = {}
+        self.selected_tool_key: Optional[str] = None
         self.latest_log_message_var = tk.StringVar(value="")
+        self.job_status_var = tk.StringVar(value=self._("任务队列"))
         self.editor_canvas: Optional[tk.Canvas] = None
         self.editor_ui_built = False
         self.log_viewer_visible = False
@@ -161,6 +180,9 @@ class CottonToolkitApp(ttkb.Window):
 
         self.event_handler.start_app_async_startup()
         self.check_queue_periodic()
+        # 依赖检测在后台进行（main 中已开始），结果通过消息队列回到主线程
+        get_dependency_probe().add_done_callback(
+            lambda results: self.message_queue.put(("dependencies_probed", results)))
         self.protocol("WM_DELETE_WINDOW", self.event_handler.on_closing)
 
     def _check_for_first_launch(self):
@@ -713,7 +735,10 @@ class CottonToolkitApp(ttkb.Window):
         return frame
 
     def _populate_tools_ui(self):
-        """用正确的顺序和完整的映射关系来创建所有工具按钮和页面。"""
+        """
+        用正确的顺序创建所有工具按钮和（空的）页面容器。
+        选项卡本身在第一次被选中时才创建（见 _ensure_tool_tab），以缩短启动时间。
+        """
         for widget in self.tools_nav_frame.winfo_children(): widget.destroy()
         for widget in self.tools_content_frame.winfo_children(): widget.destroy()
 
@@ -721,25 +746,9 @@ class CottonToolkitApp(ttkb.Window):
         self.tool_content_pages = {}
         self.tool_buttons.clear()
 
-        tab_map = {
-            "download": DataDownloadTab,
-            "annotation": AnnotationTab,
-            "sequence_extraction": SequenceExtractionTab,
-            "enrichment": EnrichmentTab,
-            "genome_identifier": GenomeIdentifierTab,
-            "homology": HomologyTab,
-            "arabidopsis_conversion": ArabidopsisHomologyConversionTab,
-            "locus_conversion": LocusConversionTab,
-            "gff_query": GFFQueryTab,
-            "blast": BlastTab,
-            "ai_assistant": AIAssistantTab,
-        }
-
         for key in self.TOOL_TAB_ORDER:
-            if TabClass := tab_map.get(key):
+            if key in self.TOOL_TAB_CLASSES:
                 content_page = ttkb.Frame(self.tools_content_frame)
-                instance = TabClass(parent=content_page, app=self, translator=self._)
-                self.tool_tab_instances[key] = instance
                 self.tool_content_pages[key] = content_page
                 content_page.grid(row=0, column=0, sticky='nsew')
                 content_page.grid_remove()
@@ -748,7 +757,7 @@ class CottonToolkitApp(ttkb.Window):
                 btn = ttkb.Button(
                     master=self.tools_nav_frame,
                     text=btn_text,
-                    bootstyle="outline-info",
+                    bootstyle=self._tool_button_style(key),
                     command=lambda k=key: self.on_tool_button_select(k)
                 )
                 btn.pack(fill='x', padx=10, pady=4)
@@ -758,14 +767,58 @@ class CottonToolkitApp(ttkb.Window):
             self.on_tool_button_select(self.TOOL_TAB_ORDER[0])
 
     def on_tool_button_select(self, selected_key: str):
+        missing = self.unavailable_features.get(selected_key)
+        if missing and not FEATURES[selected_key].fallback:
+            self.ui_manager.show_warning_message(self._("功能不可用"),
+                                                 format_missing_dependencies(selected_key, missing))
+            return
         for key, button in self.tool_buttons.items():
-            button.config(bootstyle="info" if key == selected_key else "outline-info")
+            button.config(bootstyle="info" if key == selected_key else self._tool_button_style(key))
+        self.selected_tool_key = selected_key
         self._switch_tool_content_page(selected_key)
 
+    def _tool_button_style(self, key: str) -> str:
+        # 缺少必需依赖的工具显示为灰色
+        missing = self.unavailable_features.get(key)
+        return "outline-secondary" if missing and not FEATURES[key].fallback else "outline-info"
+
+    def apply_dependency_status(self, results: Dict[str, Any]):
+        """根据后台依赖检测结果禁用（或提示降级）相关工具，不打断用户当前的操作。"""
+        self.unavailable_features = find_unavailable_features(results)
+        for key, missing in self.unavailable_features.items():
+            if key in self.tool_buttons:
+                self.logger.warning(format_missing_dependencies(key, missing))
+        for key, button in self.tool_buttons.items():
+            if key != self.selected_tool_key:
+                button.config(bootstyle=self._tool_button_style(key))
+
+    def _ensure_tool_tab(self, key: str):
+        """返回工具选项卡实例；第一次调用时导入并创建它，并同步当前的基因组列表与任务状态。"""
+        if instance := self.tool_tab_instances.get(key):
+            return instance
+        content_page = self.tool_content_pages.get(key)
+        class_name = self.TOOL_TAB_CLASSES.get(key)
+        if content_page is None or class_name is None:
+            return None
+
+        with startup_phase(self._("创建选项卡 {}").format(key)):
+            TabClass = getattr(tool_tabs, class_name)
+            instance = TabClass(parent=content_page, app=self, translator=self._)
+        self.tool_tab_instances[key] = instance
+
+        if hasattr(instance, 'update_assembly_dropdowns'):
+            instance.update_assembly_dropdowns(
+                list(self.genome_sources_data.keys()) if self.genome_sources_data else [self._("无可用基因组")])
+        if hasattr(instance, 'update_button_state'):
+            instance.update_button_state(self.active_task_name is not None, bool(self.current_config))
+        self.logger.debug(f"Tab '{key}' has been created on first view.")
+        return instance
+
     def _switch_tool_content_page(self, key_to_show: str):
         """切换在主内容区显示的工具页面，并确保页面内容被刷新。"""
         for key, page in self.tool_content_pages.items():
             if key == key_to_show:
+                self._ensure_tool_tab(key)
                 page.grid()
 
                 if instance := self.tool_tab_instances.get(key):
@@ -817,7 +870,7 @@ class CottonToolkitApp(ttkb.Window):
 
         def save_via_shortcut(event=None):
             self.logger.debug(f"快捷键 '{event.keysym}' 触发保存操作。")
-            if self.save_editor_button['state'] == 'normal':
+            if self.editor_ui_built and self.save_editor_button['state'] == 'normal':
                 self._save_config_from_editor()
             return "break"
 
@@ -874,6 +927,14 @@ class CottonToolkitApp(ttkb.Window):
 
         return page
 
+    def _ensure_editor_ui(self):
+        """配置编辑器的控件较多，在第一次打开编辑器页面时才创建。"""
+        if self.editor_ui_built: return
+        with startup_phase(self._("创建配置编辑器")):
+            self._create_editor_widgets(self.editor_scroll_frame)
+        self.editor_ui_built = True
+        self._handle_editor_ui_update()
+
     def _handle_editor_ui_update(self):
         if not self.editor_ui_built: return
         has_config = bool(self.current_config)
@@ -1,17 +1,21 @@
 # 文件路径: D:\Python\cotton_tool\ui\tabs\__init__.py
+# 各选项卡模块按需导入（PEP 562）：主窗口只在第一次打开某个工具页时才导入并创建对应的选项卡。
+import importlib
 
-from .ai_assistant_tab import AIAssistantTab
-from .annotation_tab import AnnotationTab
-from .base_tab import BaseTab
-from .data_download_tab import DataDownloadTab
-from .enrichment_tab import EnrichmentTab
-from .genome_identifier_tab import GenomeIdentifierTab
-from .gff_query_tab import GFFQueryTab
-from .homology_tab import HomologyTab
-from .locus_conversion_tab import LocusConversionTab
-from .blast_tab import BlastTab
-from .sequence_extraction_tab import SequenceExtractionTab
-from .arabidopsis_homology_tab import ArabidopsisHomologyConversionTab
+_TAB_MODULES = {
+    "AIAssistantTab": ".ai_assistant_tab",
+    "AnnotationTab": ".annotation_tab",
+    "BaseTab": ".base_tab",
+    "DataDownloadTab": ".data_download_tab",
+    "EnrichmentTab": ".enrichment_tab",
+    "GenomeIdentifierTab": ".genome_identifier_tab",
+    "GFFQueryTab": ".gff_query_tab",
+    "HomologyTab": ".homology_tab",
+    "LocusConversionTab": ".locus_conversion_tab",
+    "BlastTab": ".blast_tab",
+    "SequenceExtractionTab": ".sequence_extraction_tab",
+    "ArabidopsisHomologyConversionTab": ".arabidopsis_homology_tab",
+}
 
 # 定义此包的公共API，当使用 from ui.tabs import * 时会导入这些
 __all__ = [
@@ -27,4 +31,17 @@ __all__ = [
     "BlastTab",
     "SequenceExtractionTab",
     "ArabidopsisHomologyConversionTab"
-]
\ No newline at end of file
+]
+
+
+def __getattr__(name: str):
+    module_name = _TAB_MODULES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -6,11 +6,12 @@ import threading
 import tkinter as tk
 import traceback
 from tkinter import filedialog, ttk
-from typing import TYPE_CHECKING, List, Optional, Callable
+from typing import TYPE_CHECKING, List, Optional, Callable, Dict, Any
 
 import pandas as pd
 import ttkbootstrap as ttkb
 
+from cotton_toolkit.core.ai_usage import format_usage_summary
 from cotton_toolkit.pipelines import run_ai_task
 from .base_tab import BaseTab
 
@@ -150,6 +151,11 @@ class AIAssistantTab(BaseTab):
 
         self.use_proxy_check.pack(side='top', anchor='w')
 
+        # 上次运行的请求数、token用量、费用估算与延迟，便于调整并发数和选择模型
+        self.usage_summary_label = ttk.Label(self.csv_card, text="", font=self.app.app_font, wraplength=600,
+                                             justify="left")
+        self.usage_summary_label.grid(row=4, column=0, columnspan=3, padx=10, pady=(0, 10), sticky="w")
+
 
     def _on_prompt_change_debounced(self, event=None):
         if self._prompt_save_timer is not None: self.after_cancel(self._prompt_save_timer)
@@ -338,6 +344,11 @@ class AIAssistantTab(BaseTab):
         self.update_button_state(self.app.active_task_name is not None, self.app.current_config is not None)
 
 
+    def _show_usage_summary(self, summary: Optional[Dict[str, Any]]):
+        if summary and self.usage_summary_label.winfo_exists():
+            self.usage_summary_label.configure(
+                text=self._("上次运行: {}").format(format_usage_summary(summary)))
+
     def start_ai_csv_processing_task(self):
         if not self.app.current_config:
             self.app.ui_manager.show_error_message(_("错误"), _("请先加载配置文件。"))
@@ -413,10 +424,12 @@ class AIAssistantTab(BaseTab):
                 'progress_callback': ui_progress_updater
             }
 
+            self.usage_summary_label.configure(text="")
             self.app.event_handler.start_task(
                 task_name=_("AI批量处理CSV"),
                 target_func=run_ai_task,
-                kwargs=task_kwargs
+                kwargs=task_kwargs,
+                on_success=self._show_usage_summary
             )
 
         except Exception as e:
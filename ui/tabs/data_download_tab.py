@@ -39,6 +39,7 @@ class DataDownloadTab(BaseTab):
             "predicted_cds": _("Predicted CDS"),
             "predicted_protein": _("Predicted Protein"),
             "gff3": _("注释 (gff3)"),
+            "genome_fasta": _("基因组序列 (FASTA)"),
             "GO": "GO",
             "IPR": "IPR",
             "KEGG_pathways": _("KEGG 通路"),
@@ -409,8 +410,8 @@ class DataDownloadTab(BaseTab):
             return
 
         all_statuses = check_preprocessing_status(self.app.current_config, genome_info)
-        annotation_keys_to_check = ['predicted_cds', 'predicted_protein', 'gff3', 'GO', 'IPR', 'KEGG_pathways', 'KEGG_orthologs',
-                                    'homology_ath']
+        annotation_keys_to_check = ['predicted_cds', 'predicted_protein', 'gff3', 'genome_fasta', 'GO', 'IPR',
+                                    'KEGG_pathways', 'KEGG_orthologs', 'homology_ath']
         missing_files_display_names = []
         for key in annotation_keys_to_check:
             url_attr = f"{key}_url"
@@ -25,6 +25,7 @@ class HomologyTab(BaseTab):
         self.selected_homology_source_assembly = tk.StringVar()
         self.selected_homology_target_assembly = tk.StringVar()
         self.homology_strict_priority_var = tk.BooleanVar(value=True)
+        self.homology_rbh_var = tk.BooleanVar(value=False)
         self.single_gene_mode_var = tk.BooleanVar(value=False)
 
         # 将 translator 传递给父类
@@ -105,6 +106,10 @@ class HomologyTab(BaseTab):
                                               variable=self.homology_strict_priority_var, bootstyle="round-toggle")
         self.strict_switch.grid(row=0, column=2, columnspan=2, padx=10, pady=10, sticky="w")
 
+        self.rbh_switch = ttkb.Checkbutton(self.params_card, text=_("互为最佳命中 (RBH) 模式"),
+                                           variable=self.homology_rbh_var, bootstyle="round-toggle")
+        self.rbh_switch.grid(row=3, column=0, columnspan=2, padx=10, pady=10, sticky="w")
+
         self.top_n_label = ttkb.Label(self.params_card, text=_("Top N:"), font=self.app.app_font_bold)
         self.pid_label = ttkb.Label(self.params_card, text=_("PID (%):"), font=self.app.app_font_bold)
         self.evalue_label = ttkb.Label(self.params_card, text=_("E-value:"), font=self.app.app_font_bold)
@@ -329,7 +334,8 @@ class HomologyTab(BaseTab):
                 "evalue_threshold": float(self.homology_evalue_entry.get()),
                 "pid_threshold": float(self.homology_pid_entry.get()),
                 "score_threshold": float(self.homology_score_entry.get()),
-                "strict_subgenome_priority": self.homology_strict_priority_var.get()
+                "strict_subgenome_priority": self.homology_strict_priority_var.get(),
+                "reciprocal_best_hit": self.homology_rbh_var.get()
             }
         except (ValueError, TypeError):
             self.app.ui_manager.show_error_message(_("输入错误"), _("参数设置中的阈值必须是有效的数字。"))
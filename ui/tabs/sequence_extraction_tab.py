@@ -5,7 +5,8 @@ from typing import TYPE_CHECKING, Callable, List, Any
 
 import ttkbootstrap as ttkb
 
-from cotton_toolkit.pipelines.seqence_query import run_sequence_extraction
+from cotton_toolkit.pipelines.seqence_query import run_sequence_extraction, run_region_sequence_extraction
+from cotton_toolkit.utils.gene_utils import parse_region_string
 from .base_tab import BaseTab
 
 if TYPE_CHECKING:
@@ -37,6 +38,7 @@ class SequenceExtractionTab(BaseTab):
         self.assembly_id_var = tk.StringVar()
         self.single_gene_mode_var = tk.BooleanVar(value=True)  # 默认设置为单基因模式
         self.sequence_type_var = tk.StringVar(value='cds')
+        self.upstream_length_var = tk.StringVar(value='2000')
 
         # 步骤2：调用父类构造函数
         super().__init__(parent, app, translator=translator)
@@ -77,7 +79,16 @@ class SequenceExtractionTab(BaseTab):
         cds_radio.pack(side="left", padx=(0, 15))
         protein_radio = ttkb.Radiobutton(seq_type_frame, text=_("蛋白质"), variable=self.sequence_type_var,
                                          value='protein', bootstyle="primary")
-        protein_radio.pack(side="left")
+        protein_radio.pack(side="left", padx=(0, 15))
+        # 以下两种类型从已索引的基因组FASTA中提取
+        region_radio = ttkb.Radiobutton(seq_type_frame, text=_("基因组区域"), variable=self.sequence_type_var,
+                                        value='region', bootstyle="primary")
+        region_radio.pack(side="left", padx=(0, 15))
+        promoter_radio = ttkb.Radiobutton(seq_type_frame, text=_("启动子"), variable=self.sequence_type_var,
+                                          value='promoter', bootstyle="primary")
+        promoter_radio.pack(side="left", padx=(0, 5))
+        ttkb.Label(seq_type_frame, text=_("上游长度(bp):")).pack(side="left", padx=(10, 5))
+        ttkb.Entry(seq_type_frame, textvariable=self.upstream_length_var, width=8).pack(side="left")
         ttkb.Label(input_card, text=_("基因ID列表:"), font=self.app.app_font_bold).grid(
             row=2, column=0, sticky="nw", padx=(10, 5), pady=10)
 
@@ -104,7 +115,7 @@ class SequenceExtractionTab(BaseTab):
         self.multi_gene_output_frame = ttk.Frame(self.output_card)
         self.multi_gene_output_frame.grid(row=0, column=0, sticky="ew", padx=5, pady=5)
         self.multi_gene_output_frame.grid_columnconfigure(1, weight=1)
-        ttkb.Label(self.multi_gene_output_frame, text=_("输出CSV文件:"), font=self.app.app_font_bold).grid(
+        ttkb.Label(self.multi_gene_output_frame, text=_("输出文件:"), font=self.app.app_font_bold).grid(
             row=0, column=0, padx=(10, 5), pady=5, sticky="w")
         self.output_file_entry = ttk.Entry(self.multi_gene_output_frame)
         self.output_file_entry.grid(row=0, column=1, sticky="ew", padx=(0, 5), pady=5)
@@ -195,11 +206,12 @@ class SequenceExtractionTab(BaseTab):
                                                _("无可用基因组"))
 
     def _browse_save_file(self):
-        """打开文件对话框以选择CSV保存位置。"""
+        """打开文件对话框以选择输出文件位置，输出格式由扩展名决定。"""
         filepath = filedialog.asksaveasfilename(
-            title=_("选择CSV文件保存位置"),
+            title=_("选择输出文件保存位置"),
             defaultextension=".csv",
-            filetypes=[(_("CSV文件"), "*.csv"), (_("所有文件"), "*.*")]
+            filetypes=[(_("CSV文件"), "*.csv"), (_("FASTA文件"), "*.fasta *.fa"),
+                       (_("压缩文件"), "*.csv.gz *.fasta.gz *.fa.gz"), (_("所有文件"), "*.*")]
         )
         if filepath:
             self.output_file_entry.delete(0, tk.END)
@@ -261,6 +273,33 @@ class SequenceExtractionTab(BaseTab):
             self.app.ui_manager.show_error_message(_("输入缺失"), _("请输入至少一个基因ID。"))
             return
 
+        # 获取用户选择的序列类型
+        sequence_type_selected = self.sequence_type_var.get()
+        regions = None
+        if sequence_type_selected == 'region':
+            # 区域格式: Chr01:1000-2000，可在末尾用 :- 指定负链
+            regions = []
+            for line in gene_ids:
+                strand = '+'
+                if line.endswith((':-', ':+')):
+                    line, strand = line[:-2], line[-1]
+                parsed = parse_region_string(line)
+                if not parsed:
+                    self.app.ui_manager.show_error_message(_("输入错误"),
+                                                           _("无法解析区域 '{}'，正确格式为 Chr01:1000-2000。").format(line))
+                    return
+                regions.append((*parsed, strand))
+
+        upstream_length = 0
+        if sequence_type_selected == 'promoter':
+            try:
+                upstream_length = int(self.upstream_length_var.get())
+                if upstream_length <= 0:
+                    raise ValueError
+            except ValueError:
+                self.app.ui_manager.show_error_message(_("输入错误"), _("上游长度必须是正整数。"))
+                return
+
         assembly_id = self.assembly_id_var.get()
         if not assembly_id or assembly_id in [_("加载中..."), _("无可用基因组")]:
             self.app.ui_manager.show_error_message(_("输入缺失"), _("请选择一个基因组版本。"))
@@ -272,16 +311,14 @@ class SequenceExtractionTab(BaseTab):
         if is_single_mode and len(gene_ids) > 1:
             self.app.ui_manager.show_warning_message(_("提示"), _("单基因模式下建议只输入一个基因ID，将只处理第一个ID。"))
             gene_ids = [gene_ids[0]]
+            regions = regions[:1] if regions else regions
 
         if not is_single_mode:
             output_path = self.output_file_entry.get().strip()
             if not output_path:
-                self.app.ui_manager.show_error_message(_("输入缺失"), _("请指定输出CSV文件的路径。"))
+                self.app.ui_manager.show_error_message(_("输入缺失"), _("请指定输出文件的路径。"))
                 return
 
-        # 获取用户选择的序列类型
-        sequence_type_selected = self.sequence_type_var.get()
-
         # --- 创建通信工具和对话框 ---
         cancel_event = threading.Event()
 
@@ -303,15 +340,23 @@ class SequenceExtractionTab(BaseTab):
         task_kwargs = {
             'config': self.app.current_config,
             'assembly_id': assembly_id,
-            'gene_ids': gene_ids,
-            'sequence_type': sequence_type_selected,
             'output_path': output_path,
             'cancel_event': cancel_event,
             'progress_callback': ui_progress_updater
         }
+        if sequence_type_selected == 'region':
+            task_kwargs['regions'] = regions
+        elif sequence_type_selected == 'promoter':
+            task_kwargs['gene_ids'] = gene_ids
+            task_kwargs['upstream_length'] = upstream_length
+        else:
+            task_kwargs['gene_ids'] = gene_ids
+            task_kwargs['sequence_type'] = sequence_type_selected
+        extraction_func = run_region_sequence_extraction if sequence_type_selected in ('region', 'promoter') \
+            else run_sequence_extraction
 
         def task_wrapper(**kwargs):
-            result = run_sequence_extraction(**kwargs)
+            result = extraction_func(**kwargs)
             if is_single_mode:
                 self.app.after(0, self._display_single_gene_result, result)
                 if isinstance(result, dict) and result:
@@ -195,12 +195,8 @@ class UIManager:
         app.editor_frame = app._create_editor_frame(app.main_content_frame)
         app.tools_frame = app._create_tools_frame(app.main_content_frame)
 
+        # 配置编辑器与各工具选项卡都在第一次打开时才创建
         app._populate_tools_ui()
-
-        if not app.editor_ui_built:
-            app._create_editor_widgets(app.editor_scroll_frame)
-            app.editor_ui_built = True
-        app._handle_editor_ui_update()
         self.select_frame_by_name("home")
 
     def _create_log_viewer_widgets(self):
@@ -247,6 +243,9 @@ class UIManager:
             app.log_text_container.grid_remove()
 
         self._update_log_tag_colors()
+        app.job_queue_button = ttkb.Button(app.status_bar_frame, textvariable=app.job_status_var, bootstyle="link",
+                                           command=app.event_handler.show_job_queue_window)
+        app.job_queue_button.pack(side="right", padx=10)
         app.status_label = ttkb.Label(app.status_bar_frame, textvariable=app.latest_log_message_var, font=app.app_font,
                                       bootstyle="secondary")
         app.status_label.pack(side="left", padx=10, fill="x", expand=True)
@@ -409,6 +408,8 @@ class UIManager:
 
     def select_frame_by_name(self, name):
         app = self.app
+        if name == "editor":
+            app._ensure_editor_ui()
         for btn_name in ["home", "editor", "tools"]:
             if btn := getattr(app, f"{btn_name}_button", None):
                 if btn_name == name:
@@ -441,7 +442,7 @@ class UIManager:
         message = data.get("message", "")
         on_cancel = data.get("on_cancel")
         if self.progress_dialog and self.progress_dialog.winfo_exists(): self.progress_dialog.close()
-        self.progress_dialog = ProgressDialog(self.app, _(title), on_cancel);
+        self.progress_dialog = ProgressDialog(self.app, _(title), on_cancel, on_background=data.get("on_background"));
         self.progress_dialog.update_progress(0, _(message))
 
     def _hide_progress_dialog(self):
@@ -449,13 +450,26 @@ class UIManager:
         self.progress_dialog = None
 
     def _finalize_task_ui(self, task_display_name: str, success: bool, result_data: Any = None):
-        _ = self.translator_func
-
         self._hide_progress_dialog()
         self.update_button_states(is_task_running=False)
         self.app.active_task_name = None
+        self.show_task_result(task_display_name, success, result_data)
 
-        if isinstance(result_data, Exception):
+    def show_task_result(self, task_display_name: str, success: bool, result_data: Any = None,
+                         notify: bool = True):
+        """显示任务结果并更新状态栏；notify 为 False 时（后台任务）只写日志，不弹窗打断用户。"""
+        _ = self.translator_func
+
+        if not notify:
+            if isinstance(result_data, Exception):
+                logger.error(_("任务 '{}' 执行时发生错误: {}").format(_(task_display_name), result_data))
+            elif isinstance(result_data, str) and result_data == "CANCELLED":
+                logger.info(_("任务 '{}' 已被用户取消。").format(_(task_display_name)))
+            elif success:
+                logger.info(_("任务 '{}' 已成功完成。").format(_(task_display_name)))
+            else:
+                logger.error(_("任务 '{}' 未能成功完成。").format(_(task_display_name)))
+        elif isinstance(result_data, Exception):
             self.show_error_message(
                 _("任务失败"),
                 _("任务 '{}' 执行时发生错误:\n\n{}").format(_(task_display_name), str(result_data))
@@ -491,9 +505,13 @@ class UIManager:
 
     def update_button_states(self, is_task_running: bool = False):
         state = "disabled" if is_task_running else "normal"
+        # 队列中的任务运行时仍可切换页面继续提交任务，但不能编辑配置
+        job_queue = getattr(getattr(self.app, 'event_handler', None), 'job_queue', None)
+        jobs_active = job_queue is not None and job_queue.has_active_jobs()
         for btn_name in ['home_button', 'editor_button', 'tools_button']:
             if btn := getattr(self.app, btn_name, None):
-                if btn.winfo_exists(): btn.configure(state=state)
+                btn_state = "disabled" if btn_name == 'editor_button' and jobs_active else state
+                if btn.winfo_exists(): btn.configure(state=btn_state)
         for tab in self.app.tool_tab_instances.values():
             if hasattr(tab, 'update_button_state'): tab.update_button_state(is_task_running,
                                                                             bool(self.app.current_config))